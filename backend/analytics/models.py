@@ -1,4 +1,4 @@
-# core/models.py
+# analytics/models.py
 from django.db import models
 from django.contrib.auth import get_user_model
 
@@ -24,9 +24,6 @@ class BaseModel(models.Model):
         abstract = True  # Marks this as a reusable base class
         
 
-# analytics/models.py
-from django.db import models
-from core.models import BaseModel
 from tenants.models import Tenant
 
 class Dashboard(BaseModel):
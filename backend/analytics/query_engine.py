@@ -0,0 +1,341 @@
+# analytics/query_engine.py
+"""
+Widget query engine.
+
+A widget's ``data_config`` describes one aggregate query::
+
+    {
+        "dataset": "calls",
+        "metric": {"agg": "avg", "field": "duration"},   # or "count"
+        "dimensions": ["status"],
+        "filters": [{"field": "direction", "op": "eq", "value": "IN"}],
+        "time_bucket": "day",                             # hour/day/week/month
+        "range": {"last_days": 30},
+        "limit": 100
+    }
+
+``compile_widget`` turns that into a single GROUP BY query scoped to the
+tenant. Dashboards run every widget whose result is not cached
+concurrently, and cache results per (widget, tenant, time bucket):
+
+- the cache key embeds the current time bucket, so results roll over on
+  their own (e.g. a ``day`` widget refreshes at most every TTL seconds and
+  never serves yesterday's buckets as today's),
+- editing a widget bumps its version, and saving or deleting a dataset
+  row bumps that tenant's dataset generation (``invalidate_dataset``, see
+  ``analytics.signals``); both are part of the key, so stale entries are
+  simply never read again. Bulk writes send no signals and show up when
+  the TTL window rolls over.
+
+Loading a dashboard whose widgets are cached costs two ``get_many`` calls.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Avg, Count, Max, Min, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+AGGREGATES = {'count': Count, 'sum': Sum, 'avg': Avg, 'min': Min, 'max': Max}
+
+FILTER_OPS = {
+    'eq': 'exact', 'in': 'in', 'gt': 'gt', 'gte': 'gte',
+    'lt': 'lt', 'lte': 'lte', 'contains': 'icontains', 'isnull': 'isnull',
+}
+
+TIME_BUCKETS = ('hour', 'day', 'week', 'month')
+
+# Default cache TTL (seconds) by time bucket; config['cache_ttl'] overrides
+DEFAULT_TTLS = {None: 300, 'hour': 60, 'day': 300, 'week': 900, 'month': 3600}
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+
+
+class WidgetConfigError(ValueError):
+    """Raised when a widget's data_config cannot be compiled."""
+
+
+class CompiledWidget:
+    """A widget's query, built but not yet run."""
+
+    def __init__(self, queryset, value, grouped, renames=None):
+        self.queryset = queryset
+        self.value = value
+        self.grouped = grouped
+        self.renames = renames or {}
+
+    def rows(self):
+        if not self.grouped:
+            return [self.queryset.aggregate(value=self.value)]
+        return [
+            {self.renames.get(key, key): value for key, value in row.items()}
+            for row in self.queryset
+        ]
+
+
+class Dataset:
+    """
+    A queryable model. Only the listed fields may be grouped, filtered or
+    aggregated, which keeps widget configs from reaching arbitrary relations.
+    """
+
+    def __init__(self, model, tenant_field, time_field, dimensions, measures=()):
+        self.model_label = model
+        self.tenant_field = tenant_field
+        self.time_field = time_field
+        self.dimensions = dimensions    # public name -> ORM path
+        self.measures = dict(measures)  # public name -> ORM path
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    def tenant_id_of(self, instance):
+        """Tenant id of a row, following ``tenant_field`` (e.g. ``channel__tenant``)."""
+        *path, last = self.tenant_field.split('__')
+        for name in path:
+            instance = getattr(instance, name)
+        return getattr(instance, f'{last}_id')
+
+    def field(self, name, kind='dimension'):
+        fields = self.dimensions if kind == 'dimension' else self.measures
+        try:
+            return fields[name]
+        except KeyError:
+            raise WidgetConfigError(f"Unknown {kind} '{name}'")
+
+
+DATASETS = {
+    'messages': Dataset(
+        'communications.Message', 'channel__tenant', 'created_at',
+        dimensions={
+            'channel': 'channel__name', 'channel_type': 'channel__channel_type',
+            'direction': 'direction', 'status': 'status',
+        },
+    ),
+    'conversations': Dataset(
+        'communications.Conversation', 'tenant', 'created_at',
+        dimensions={
+            'channel': 'channel__name', 'channel_type': 'channel__channel_type',
+            'is_open': 'is_open',
+        },
+        measures={'inbound_count': 'inbound_count'},
+    ),
+    'calls': Dataset(
+        'communications.CallLog', 'channel__tenant', 'start_time',
+        dimensions={'channel': 'channel__name', 'direction': 'direction', 'status': 'status'},
+        measures={'duration': 'duration'},
+    ),
+}
+
+
+def compile_widget(config, tenant, now=None):
+    """
+    Build the aggregate query for a widget config.
+
+    Rows carry the dimensions, an optional ``bucket`` and the ``value``;
+    with no dimensions and no time bucket there is one row, the total.
+
+    Raises:
+        WidgetConfigError: if the config names unknown fields or operators
+    
+    """
+    if not isinstance(config, dict):
+        raise WidgetConfigError('data_config must be an object')
+    try:
+        dataset = DATASETS[config.get('dataset')]
+    except KeyError:
+        raise WidgetConfigError(f"Unknown dataset '{config.get('dataset')}'")
+
+    queryset = dataset.model.objects.filter(**{dataset.tenant_field: tenant})
+    now = now or timezone.now()
+
+    time_range = config.get('range') or {}
+    if 'last_days' in time_range:
+        queryset = queryset.filter(**{
+            f'{dataset.time_field}__gte': now - timedelta(days=int(time_range['last_days']))
+        })
+    for bound, lookup in (('start', 'gte'), ('end', 'lt')):
+        if time_range.get(bound):
+            queryset = queryset.filter(**{f'{dataset.time_field}__{lookup}': time_range[bound]})
+
+    for item in config.get('filters', []):
+        op = item.get('op', 'eq')
+        if op not in FILTER_OPS and op != 'ne':
+            raise WidgetConfigError(f"Unknown filter op '{op}'")
+        path = dataset.field(item.get('field'))
+        if op == 'ne':
+            queryset = queryset.exclude(**{path: item.get('value')})
+        else:
+            queryset = queryset.filter(**{f'{path}__{FILTER_OPS[op]}': item.get('value')})
+
+    group_by = {}
+    for name in config.get('dimensions', []):
+        group_by[name] = dataset.field(name)
+    bucket = config.get('time_bucket')
+    if bucket is not None and bucket not in TIME_BUCKETS:
+        raise WidgetConfigError(f"Unknown time bucket '{bucket}'")
+
+    # Group by ORM paths; rows are renamed to the public dimension names after
+    # the query, since annotations may not shadow model fields
+    renames = {path: name for name, path in group_by.items()}
+    annotations = {'bucket': Trunc(dataset.time_field, bucket)} if bucket else {}
+    grouped = bool(group_by or bucket)
+    if grouped:
+        queryset = queryset.values(*group_by.values(), **annotations)
+
+    metric = config.get('metric', 'count')
+    if isinstance(metric, str):
+        metric = {'agg': metric}
+    agg = metric.get('agg', 'count')
+    if agg not in AGGREGATES:
+        raise WidgetConfigError(f"Unknown aggregate '{agg}'")
+    target = 'pk' if agg == 'count' and not metric.get('field') else dataset.field(metric.get('field'), 'measure')
+
+    value = AGGREGATES[agg](target)
+    if not grouped:
+        return CompiledWidget(queryset, value, grouped=False)
+
+    ordering = ['bucket'] if bucket else ['-value']
+    limit = min(int(config.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+    return CompiledWidget(
+        queryset.annotate(value=value).order_by(*ordering)[:limit], value, grouped=True,
+        renames=renames,
+    )
+
+
+def validate_config(config):
+    """Check a data_config compiles; raises ``WidgetConfigError`` if not."""
+    compile_widget(config, tenant=None)
+
+
+def execute_widget(widget, tenant):
+    """Run a widget's query (uncached) and return JSON-serialisable data."""
+    rows = compile_widget(widget.data_config, tenant).rows()
+    for row in rows:
+        if row.get('bucket') is not None:
+            row['bucket'] = row['bucket'].isoformat()
+    return {'rows': rows, 'generated_at': timezone.now().isoformat()}
+
+
+# ---------------------------------------------------------------------------
+# Caching
+# ---------------------------------------------------------------------------
+
+def cache_ttl(config):
+    if 'cache_ttl' in config:
+        return int(config['cache_ttl'])
+    ttls = getattr(settings, 'ANALYTICS_WIDGET_TTLS', DEFAULT_TTLS)
+    return ttls.get(config.get('time_bucket'), DEFAULT_TTLS[None])
+
+
+def _version_key(widget_id):
+    return f'analytics:widget-version:{widget_id}'
+
+
+def _generation_key(tenant_id, dataset):
+    return f'analytics:dataset-generation:{tenant_id}:{dataset}'
+
+
+def invalidate_widget(widget_id):
+    """Forget cached results of a widget (call after its config changes)."""
+    try:
+        cache.incr(_version_key(widget_id))
+    except ValueError:
+        cache.set(_version_key(widget_id), 1, None)
+
+
+def invalidate_dataset(tenant_id, dataset):
+    """Forget every cached widget result over `dataset` for a tenant."""
+    key = _generation_key(tenant_id, dataset)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def _result_key(widget, tenant, versions, now):
+    config = widget.data_config if isinstance(widget.data_config, dict) else {}
+    ttl = max(1, cache_ttl(config))
+    window = int(now // ttl)
+    version = versions.get(_version_key(widget.pk), 0)
+    generation = versions.get(_generation_key(tenant.pk, config.get('dataset')), 0)
+    return f'analytics:widget:{widget.pk}:{tenant.pk}:{version}:{generation}:{window}', ttl
+
+
+def run_widgets(widgets, tenant, max_workers=None):
+    """
+    Return ``{widget_id: data}`` for `widgets`, from cache where possible.
+
+    Cache misses run concurrently, one database connection per worker.
+    Widgets with an invalid config get ``{'error': ...}`` instead of rows.
+    """
+    widgets = list(widgets)
+    if not widgets:
+        return {}
+    now = time.time()
+
+    version_keys = set()
+    for widget in widgets:
+        version_keys.add(_version_key(widget.pk))
+        if isinstance(widget.data_config, dict):
+            version_keys.add(_generation_key(tenant.pk, widget.data_config.get('dataset')))
+    versions = cache.get_many(list(version_keys))
+
+    keys = {widget.pk: _result_key(widget, tenant, versions, now) for widget in widgets}
+    cached = cache.get_many([key for key, _ in keys.values()])
+
+    results = {}
+    misses = []
+    for widget in widgets:
+        key, _ = keys[widget.pk]
+        if key in cached:
+            results[widget.pk] = {**cached[key], 'cached': True}
+        else:
+            misses.append(widget)
+    if not misses:
+        return results
+
+    workers = max_workers or getattr(settings, 'ANALYTICS_QUERY_WORKERS', 4)
+    if len(misses) == 1 or workers <= 1:
+        computed = [_run_safely(widget, tenant, close_connection=False) for widget in misses]
+    else:
+        with ThreadPoolExecutor(max_workers=min(workers, len(misses))) as pool:
+            computed = list(pool.map(lambda widget: _run_safely(widget, tenant), misses))
+
+    to_cache = {}
+    for widget, data in zip(misses, computed):
+        results[widget.pk] = {**data, 'cached': False}
+        if 'error' not in data:
+            key, ttl = keys[widget.pk]
+            to_cache.setdefault(ttl, {})[key] = data
+    for ttl, entries in to_cache.items():
+        cache.set_many(entries, ttl)
+    return {widget.pk: results[widget.pk] for widget in widgets}
+
+
+def _run_safely(widget, tenant, close_connection=True):
+    try:
+        return execute_widget(widget, tenant)
+    except WidgetConfigError as e:
+        return {'error': str(e)}
+    except Exception:
+        logger.exception("Widget %s query failed", widget.pk)
+        return {'error': 'Query failed'}
+    finally:
+        if close_connection:
+            # Worker threads get their own connection; release it
+            connection.close()
+
+
+def run_dashboard(dashboard, tenant):
+    return run_widgets(dashboard.widget_set.all(), tenant)
@@ -1,6 +1,7 @@
 # analytics/serializers.py
 from rest_framework import serializers
 from .models import Dashboard, Widget
+from .query_engine import WidgetConfigError, validate_config
 from tenants.serializers import TenantSerializer
 
 class WidgetSerializer(serializers.ModelSerializer):
@@ -9,8 +10,15 @@ class WidgetSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ('created_at', 'updated_at', 'created_by', 'updated_by')
 
+    def validate_data_config(self, value):
+        try:
+            validate_config(value)
+        except WidgetConfigError as e:
+            raise serializers.ValidationError(str(e))
+        return value
+
 class DashboardSerializer(serializers.ModelSerializer):
-    widgets = WidgetSerializer(many=True, read_only=True)
+    widgets = WidgetSerializer(many=True, read_only=True, source='widget_set')
     tenant = TenantSerializer(read_only=True)
 
     class Meta:
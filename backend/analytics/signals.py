@@ -0,0 +1,35 @@
+# analytics/signals.py
+"""
+Forget cached widget results when rows of their dataset change.
+
+Each dataset model gets post_save/post_delete receivers that bump the row
+tenant's dataset generation once the change commits. Bulk writes
+(``bulk_create``, ``update``) send no signals; their rows show up when the
+cached result's TTL window rolls over.
+"""
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .query_engine import DATASETS, invalidate_dataset
+
+
+def _dataset_receiver(name, dataset):
+    def dataset_changed(sender, instance, **kwargs):
+        try:
+            tenant_id = dataset.tenant_id_of(instance)
+        except ObjectDoesNotExist:
+            # Deleted together with its parent; the tenant's rows are going too
+            return
+        transaction.on_commit(lambda: invalidate_dataset(tenant_id, name))
+    return dataset_changed
+
+
+def connect_dataset_signals():
+    for name, dataset in DATASETS.items():
+        receiver = _dataset_receiver(name, dataset)
+        for signal in (post_save, post_delete):
+            signal.connect(
+                receiver, sender=dataset.model_label, weak=False,
+                dispatch_uid=f'analytics:invalidate:{name}',
+            )
@@ -1,3 +1,53 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from communications.models import Channel, Conversation, Message
+
+from .query_engine import WidgetConfigError, _generation_key, compile_widget, validate_config
+
+
+class WidgetConfigTests(SimpleTestCase):
+    """Widget configs compile only against the registered datasets and fields."""
+
+    def test_valid_config_compiles(self):
+        compiled = compile_widget({
+            'dataset': 'messages',
+            'dimensions': ['status'],
+            'filters': [{'field': 'direction', 'op': 'eq', 'value': 'IN'}],
+            'time_bucket': 'day',
+        }, tenant=None)
+
+        self.assertTrue(compiled.grouped)
+        self.assertEqual(compiled.renames, {'status': 'status'})
+
+    def test_unknown_dataset_is_rejected(self):
+        with self.assertRaisesMessage(WidgetConfigError, "Unknown dataset 'cases'"):
+            validate_config({'dataset': 'cases'})
+
+    def test_unknown_dimension_is_rejected(self):
+        with self.assertRaisesMessage(WidgetConfigError, "Unknown dimension 'tenant'"):
+            validate_config({'dataset': 'calls', 'dimensions': ['tenant']})
+
+
+class DatasetInvalidationTests(SimpleTestCase):
+    """Saving or deleting a dataset row drops that tenant's cached widget results."""
+
+    def generation(self, tenant_id, dataset):
+        return cache.get(_generation_key(tenant_id, dataset), 0)
+
+    def test_saved_conversation_bumps_its_tenant(self):
+        before = self.generation(3, 'conversations')
+
+        post_save.send(sender=Conversation, instance=Conversation(tenant_id=3), created=True)
+
+        self.assertEqual(self.generation(3, 'conversations'), before + 1)
+        self.assertEqual(self.generation(4, 'conversations'), 0)
+
+    def test_deleted_message_bumps_its_channel_tenant(self):
+        before = self.generation(3, 'messages')
+        message = Message(channel=Channel(pk=5, tenant_id=3))
+
+        post_delete.send(sender=Message, instance=message)
+
+        self.assertEqual(self.generation(3, 'messages'), before + 1)
@@ -4,15 +4,19 @@ from .views import (
     DashboardListCreateView,
     DashboardRetrieveUpdateDestroyView,
     WidgetListCreateView,
-    WidgetRetrieveUpdateDestroyView
+    WidgetRetrieveUpdateDestroyView,
+    DashboardDataView,
+    WidgetDataView
 )
 
 urlpatterns = [
     # Dashboards
     path('dashboards/', DashboardListCreateView.as_view(), name='dashboard-list-create'),
     path('dashboards/<int:pk>/', DashboardRetrieveUpdateDestroyView.as_view(), name='dashboard-retrieve-update-destroy'),
+    path('dashboards/<int:pk>/data/', DashboardDataView.as_view(), name='dashboard-data'),
     
     # Widgets (nested under dashboards)
     path('dashboards/<int:dashboard_id>/widgets/', WidgetListCreateView.as_view(), name='widget-list-create'),
     path('dashboards/<int:dashboard_id>/widgets/<int:widget_id>/', WidgetRetrieveUpdateDestroyView.as_view(), name='widget-retrieve-update-destroy'),
+    path('dashboards/<int:dashboard_id>/widgets/<int:widget_id>/data/', WidgetDataView.as_view(), name='widget-data'),
 ]
\ No newline at end of file
@@ -1,8 +1,10 @@
 # analytics/views.py
 from rest_framework import generics, permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from .models import Dashboard, Widget
+from .query_engine import invalidate_widget, run_dashboard, run_widgets
 from .serializers import DashboardSerializer, WidgetSerializer
-from core.models import BaseModel
 from django.shortcuts import get_object_or_404
 
 class DashboardListCreateView(generics.ListCreateAPIView):
@@ -53,4 +55,28 @@ class WidgetRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
         )
 
     def perform_update(self, serializer):
-        serializer.save(updated_by=self.request.user)
\ No newline at end of file
+        widget = serializer.save(updated_by=self.request.user)
+        invalidate_widget(widget.pk)
+
+    def perform_destroy(self, instance):
+        invalidate_widget(instance.pk)
+        instance.delete()
+
+class DashboardDataView(APIView):
+    """Results of every widget on a dashboard, keyed by widget id."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        tenant = request.user.tenant
+        dashboard = get_object_or_404(Dashboard, id=pk, tenant=tenant)
+        return Response(run_dashboard(dashboard, tenant))
+
+class WidgetDataView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, dashboard_id, widget_id):
+        tenant = request.user.tenant
+        widget = get_object_or_404(
+            Widget, id=widget_id, dashboard_id=dashboard_id, dashboard__tenant=tenant
+        )
+        return Response(run_widgets([widget], tenant)[widget.pk])
\ No newline at end of file
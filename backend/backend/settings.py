@@ -48,6 +48,7 @@ INSTALLED_APPS = [
     'tenants',   # your custom app for tenant management
     'admin_module',  # your custom app for admin features
     'communications',  # your custom app for communications features
+    'analytics',  # dashboards and widget queries
     'drf_spectacular',  # for OpenAPI schema generation
 ]
 
@@ -176,4 +177,20 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
     'UPDATE_LAST_LOGIN': True,
-}
\ No newline at end of file
+}
+# Outbound messages (communications.outbound): sender for channels whose
+# config names no 'provider'. 'log' only logs; production leaves this empty
+# so an unconfigured channel is paused instead of reported as sent.
+COMMUNICATIONS_DEFAULT_PROVIDER = 'log'
+
+# Asterisk ARI client (communications.asterisks.ari_client)
+ARI_CLIENT = {
+    'host': '54.238.49.155',
+    'port': 8088,
+    'use_ssl': False,  # 8088 is Asterisk's plain HTTP port; TLS is on 8089
+    'username': 'asterisk',
+    'password': 'asteriskpass',
+    'app_name': 'asterisk',
+    'pool_size': 20,
+    'shards': 8,
+}
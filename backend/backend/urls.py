@@ -23,4 +23,5 @@ urlpatterns = [
     path('api/admin/', include('admin_module.urls')),
     # path('api/tenants/', include('tenants.urls')),
     path('api/communications/', include('communications.urls')),
+    path('api/analytics/', include('analytics.urls')),
 ]
@@ -1,256 +1,350 @@
-import websocket
-import requests
+"""
+Asyncio client for the Asterisk REST Interface (ARI).
+
+- REST calls share one aiohttp session, i.e. a keep-alive connection pool,
+  instead of opening a new TCP/TLS connection per request.
+- Events from the ARI websocket are sharded by channel id onto a fixed set
+  of worker tasks. Events of one channel are always handled in order by
+  the same worker; different channels are handled concurrently.
+- Delayed actions (e.g. hangups) are event-loop timers, cancelled when the
+  channel goes away, rather than one thread per call.
+- Lifecycle is explicit: ``await client.start()`` / ``await client.stop()``,
+  or ``async with ARIClient(...) as client``.
+
+Django views are synchronous, so ``BackgroundARIClient`` runs a client on
+its own event loop thread and ``get_ari_client()`` returns a lazily started
+process-wide instance. That instance only makes REST calls: the Stasis
+event listener runs in one dedicated process (``manage.py
+run_ari_listener``), never in web workers, or every worker would answer
+every channel. Both are configured by ``settings.ARI_CLIENT``.
+"""
+
+import asyncio
 import json
-import time
 import logging
 import threading
-from queue import Queue
-from urllib.parse import quote
+import zlib
+
+import aiohttp
 
 logger = logging.getLogger(__name__)
 
+
+class ARIError(Exception):
+    """Raised when an ARI REST request fails."""
+
+    def __init__(self, method, endpoint, status=None, detail=''):
+        self.status = status
+        super().__init__(f"ARI {method.upper()} {endpoint} failed ({status}): {detail}")
+
+
 class ARIClient:
     def __init__(self, host='54.238.49.155', port=8088, username='asterisk',
-                 password='asteriskpass', app_name='asterisk'):
-        self.ws_url = f"wss://{host}:{port}/ari/events?api_key={username}:{password}&app={app_name}"
-        self.base_url = f"http://{host}:{port}/ari"
-        self.auth = (username, password)
-        self.event_queue = Queue()
-        self.ws = None
-        self.active = True
+                 password='asteriskpass', app_name='asterisk', use_ssl=False,
+                 verify_ssl=True, pool_size=20, shards=8, request_timeout=3, reconnect_delay=5,
+                 hangup_delay=5.0):
+        scheme = 'https' if use_ssl else 'http'
+        ws_scheme = 'wss' if use_ssl else 'ws'
+        self.base_url = f"{scheme}://{host}:{port}/ari"
+        self.ws_url = f"{ws_scheme}://{host}:{port}/ari/events"
+        self.auth = aiohttp.BasicAuth(username, password)
         self.app_name = app_name
-        self._initialize_logging()
+        self.api_key = f"{username}:{password}"
+        self.verify_ssl = verify_ssl
+        self.pool_size = pool_size
+        self.shard_count = shards
+        self.request_timeout = request_timeout
+        self.reconnect_delay = reconnect_delay
+        self.hangup_delay = hangup_delay
+
+        self.session = None
+        self.ws = None
         self.connected = False
-        self.reconnect_delay = 5
-    def _initialize_logging(self):
-        """Configure logging settings"""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.StreamHandler(),
-                logging.FileHandler('ari_client.log')
-            ]
-        )
+        self.active = False
+        self._shards = []
+        self._tasks = []
+        self._timers = {}
+        self._background = set()
+        self.stats = {'events': 0, 'requests': 0, 'request_errors': 0}
 
-    def start(self):
-        """Start the ARI client components"""
-        logger.info("Starting ARI Client")
-        
-        # Start WebSocket listener thread
-        ws_thread = threading.Thread(
-            target=self.start_websocket_listener,
-            daemon=True,
-            name="ARI-WebSocket-Thread"
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def start(self, listen=True):
+        """Open the connection pool, start shard workers and (optionally) the event listener."""
+        if self.active:
+            return
+        logger.info("Starting ARI client for %s", self.base_url)
+        self.active = True
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_size,
+            keepalive_timeout=60,
+            ssl=self.verify_ssl,
         )
-        ws_thread.start()
-        
-        # Start event processor thread
-        processor_thread = threading.Thread(
-            target=self.process_events,
-            daemon=True,
-            name="ARI-EventProcessor-Thread"
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            auth=self.auth,
+            timeout=aiohttp.ClientTimeout(total=self.request_timeout),
         )
-        processor_thread.start()
-
-    def start_websocket_listener(self):
-        """Initialize and maintain WebSocket connection"""
-        websocket.enableTrace(True)  # Keep True for debugging
-        
-        def on_message(ws, message):
-            try:
-                event = json.loads(message)
-                logger.debug(f"Received event: {event.get('type')}")
-                self.event_queue.put(event)
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON decode error: {e}")
-
-        def on_error(ws, error):
-            logger.error(f"WebSocket error: {error}")
-            self.connected = False
-
-        def on_close(ws, close_status_code, close_msg):
-            logger.warning(f"WebSocket closed ({close_status_code}): {close_msg}")
-            self.connected = False
-            if self.active:
-                time.sleep(self.reconnect_delay)
-                self._connect_websocket(on_message, on_error, on_close, on_open)
+        self._shards = [asyncio.Queue() for _ in range(self.shard_count)]
+        self._tasks = [
+            asyncio.create_task(self._run_shard(queue), name=f'ari-shard-{index}')
+            for index, queue in enumerate(self._shards)
+        ]
+        if listen:
+            self._tasks.append(asyncio.create_task(self._listen(), name='ari-websocket'))
 
-        def on_open(ws):
-            logger.info("WebSocket connected, subscribing to events")
-            self.connected = True
+    async def stop(self):
+        """Cancel timers and workers, close the websocket and the connection pool."""
+        if not self.active:
+            return
+        logger.info("Shutting down ARI client")
+        self.active = False
+        for handle in self._timers.values():
+            handle.cancel()
+        self._timers.clear()
+        if self.ws is not None:
+            await self.ws.close()
+        for task in self._tasks + list(self._background):
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._background, return_exceptions=True)
+        self._tasks = []
+        self._background.clear()
+        await self.session.close()
+        self.session = None
+        self.connected = False
+        logger.info("ARI client shutdown complete")
 
+    async def drain(self):
+        """Wait until every dispatched event has been handled."""
+        await asyncio.gather(*(queue.join() for queue in self._shards))
 
-        self._connect_websocket(on_message, on_error, on_close, on_open)
+    # ------------------------------------------------------------------
+    # Events
+    # ------------------------------------------------------------------
 
-    def _connect_websocket(self, on_message, on_error, on_close, on_open):
-        """Handle WebSocket connection with retry logic"""
+    async def _listen(self):
+        """Maintain the ARI websocket, reconnecting after failures."""
+        params = {'app': self.app_name, 'api_key': self.api_key}
         while self.active:
             try:
-                logger.info(f"Connecting to ARI WebSocket at {self.ws_url}")
-                
-                self.ws = websocket.WebSocketApp(
-                    self.ws_url,
-                    on_open=on_open,
-                    on_message=on_message,
-                    on_error=on_error,
-                    on_close=on_close,
-                    header=["Origin: http://localhost"]
-                )
-                
-                self.ws.run_forever(
-                    ping_interval=30,
-                    ping_timeout=10,
-                    sslopt={"cert_reqs": None},
-                )
-                
-            except websocket.WebSocketConnectionClosedException:
-                if self.active:
-                    logger.warning("WebSocket connection closed, reconnecting...")
-                    time.sleep(self.reconnect_delay)
+                logger.info("Connecting to ARI WebSocket at %s", self.ws_url)
+                async with self.session.ws_connect(
+                    self.ws_url, params=params, heartbeat=30, timeout=aiohttp.ClientWSTimeout(ws_close=10),
+                ) as ws:
+                    self.ws = ws
+                    self.connected = True
+                    async for message in ws:
+                        if message.type == aiohttp.WSMsgType.TEXT:
+                            try:
+                                self.dispatch(json.loads(message.data))
+                            except json.JSONDecodeError as e:
+                                logger.error("JSON decode error: %s", e)
+                        elif message.type == aiohttp.WSMsgType.ERROR:
+                            break
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
-                logger.error(f"WebSocket error: {str(e)}")
-                if self.active:
-                    time.sleep(self.reconnect_delay)
+                logger.error("WebSocket error: %s", e)
+            finally:
+                self.ws = None
+                self.connected = False
+            if self.active:
+                logger.warning("WebSocket closed, reconnecting in %ss", self.reconnect_delay)
+                await asyncio.sleep(self.reconnect_delay)
 
-  
+    @staticmethod
+    def event_channel_id(event):
+        """Return the channel an event belongs to, used as the shard key."""
+        channel = event.get('channel')
+        if channel:
+            return channel.get('id')
+        target = event.get('playback', {}).get('target_uri', '')
+        if target.startswith('channel:'):
+            return target[len('channel:'):]
+        return None
 
+    def dispatch(self, event):
+        """Queue an event on the shard owning its channel."""
+        channel_id = self.event_channel_id(event) or ''
+        shard = zlib.crc32(channel_id.encode()) % self.shard_count
+        self._shards[shard].put_nowait(event)
 
-    def process_events(self):
-        """Process events from the queue"""
-        logger.info("Event processor started")
-        while self.active:
+    async def _run_shard(self, queue):
+        while True:
+            event = await queue.get()
             try:
-                event = self.event_queue.get(timeout=1)
-                if event:
-                    self.handle_event(event)
-            except Exception as e:
-                if self.active:
-                    continue
+                await self.handle_event(event)
+            finally:
+                queue.task_done()
 
-    def handle_event(self, event):
+    async def handle_event(self, event):
         """Route incoming ARI events to appropriate handlers"""
+        event_type = event.get('type')
+        self.stats['events'] += 1
+        handler = {
+            'StasisStart': self._handle_stasis_start,
+            'StasisEnd': self._handle_stasis_end,
+            'ChannelDestroyed': self._handle_channel_destroyed,
+            'PlaybackFinished': self._handle_playback_finished,
+        }.get(event_type)
+        if handler is None:
+            return
         try:
-            event_type = event.get('type')
-            logger.debug(f"Handling {event_type} event")
-            
-            if event_type == 'StasisStart':
-                self._handle_stasis_start(event)
-            elif event_type == 'StasisEnd':
-                self._handle_stasis_end(event)
-            elif event_type == 'ChannelDestroyed':
-                self._handle_channel_destroyed(event)
-            elif event_type == 'PlaybackFinished':
-                self._handle_playback_finished(event)
-            # Add more event handlers as needed
-                
+            await handler(event)
         except Exception as e:
-            logger.error(f"Error handling {event_type} event: {str(e)}")
-            logger.debug(f"Event content: {json.dumps(event, indent=2)}")
+            logger.error("Error handling %s event: %s", event_type, e)
+            logger.debug("Event content: %s", json.dumps(event, indent=2))
 
-    def _handle_stasis_start(self, event):
-        """Handle StasisStart events"""
+    async def _handle_stasis_start(self, event):
         channel_id = event['channel']['id']
-        logger.info(f"Channel entered Stasis: {channel_id}")
-        
-        try:
-            # Answer the channel
-            self._ari_request(
-                'post',
-                f"channels/{channel_id}/answer",
-                timeout=3
-            )
-            
-            # Play greeting
-            self._ari_request(
-                'post',
-                f"channels/{channel_id}/play",
-                json={"media": "sound:hello-world"},
-                timeout=3
-            )
-            
-            # Schedule hangup
-            threading.Timer(5.0, self._hangup_channel, args=[channel_id]).start()
-            
-        except Exception as e:
-            logger.error(f"Error handling StasisStart: {str(e)}")
+        logger.info("Channel entered Stasis: %s", channel_id)
+        await self.request('post', f"channels/{channel_id}/answer")
+        await self.request('post', f"channels/{channel_id}/play", json={"media": "sound:hello-world"})
+        self.call_later(channel_id, self.hangup_delay, self.hangup_channel, channel_id)
 
-    def _handle_stasis_end(self, event):
-        """Handle StasisEnd events"""
+    async def _handle_stasis_end(self, event):
         channel_id = event['channel']['id']
-        logger.info(f"Channel left Stasis: {channel_id}")
+        logger.info("Channel left Stasis: %s", channel_id)
+        self.cancel_timer(channel_id)
 
-    def _handle_channel_destroyed(self, event):
-        """Handle ChannelDestroyed events"""
+    async def _handle_channel_destroyed(self, event):
         channel_id = event['channel']['id']
-        logger.info(f"Channel destroyed: {channel_id}")
+        logger.info("Channel destroyed: %s", channel_id)
+        self.cancel_timer(channel_id)
 
-    def _handle_playback_finished(self, event):
-        """Handle PlaybackFinished events"""
-        logger.info(f"Playback finished: {event.get('playback', {}).get('id')}")
+    async def _handle_playback_finished(self, event):
+        logger.info("Playback finished: %s", event.get('playback', {}).get('id'))
 
-    def _hangup_channel(self, channel_id):
-        """Hang up a channel"""
-        try:
-            self._ari_request(
-                'delete',
-                f"channels/{channel_id}",
-                timeout=3
-            )
-        except Exception as e:
-            logger.error(f"Error hanging up channel {channel_id}: {str(e)}")
-
-    def _ari_request(self, method, endpoint, **kwargs):
-        """Helper method for ARI requests"""
-        methods = {
-            'get': requests.get,
-            'post': requests.post,
-            'delete': requests.delete,
-            'put': requests.put
-        }
-        
+    # ------------------------------------------------------------------
+    # Timers
+    # ------------------------------------------------------------------
+
+    def call_later(self, key, delay, coroutine_function, *args):
+        """Schedule a coroutine on the loop; replaces any pending timer with the same key."""
+        self.cancel_timer(key)
+        loop = asyncio.get_running_loop()
+
+        def fire():
+            self._timers.pop(key, None)
+            self._spawn(coroutine_function(*args))
+
+        self._timers[key] = loop.call_later(delay, fire)
+
+    def cancel_timer(self, key):
+        handle = self._timers.pop(key, None)
+        if handle is not None:
+            handle.cancel()
+
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    # ------------------------------------------------------------------
+    # REST
+    # ------------------------------------------------------------------
+
+    async def request(self, method, endpoint, **kwargs):
+        """Send an ARI request over the pooled session; returns decoded JSON or None."""
         url = f"{self.base_url}/{endpoint}"
-        logger.debug(f"Making {method.upper()} request to {url}")
-        
+        self.stats['requests'] += 1
         try:
-            response = methods[method](
-                url,
-                auth=self.auth,
-                **kwargs
-            )
-            response.raise_for_status()
-            return response
-        except requests.exceptions.RequestException as e:
-            logger.error(f"ARI request failed: {str(e)}")
-            if hasattr(e, 'response') and e.response:
-                logger.error(f"Response: {e.response.status_code} - {e.response.text}")
+            async with self.session.request(method.upper(), url, **kwargs) as response:
+                body = await response.text()
+                if response.status >= 400:
+                    raise ARIError(method, endpoint, response.status, body[:200])
+                if body and response.content_type == 'application/json':
+                    return json.loads(body)
+                return None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.stats['request_errors'] += 1
+            raise ARIError(method, endpoint, detail=str(e)) from e
+        except ARIError:
+            self.stats['request_errors'] += 1
             raise
 
+    async def hangup_channel(self, channel_id):
+        """Hang up a channel"""
+        try:
+            await self.request('delete', f"channels/{channel_id}")
+        except ARIError as e:
+            logger.error("Error hanging up channel %s: %s", channel_id, e)
+
+    async def originate_call(self, endpoint, extension, context='default', caller_id=None):
+        """Originate a call from `endpoint` into this Stasis app."""
+        params = {
+            'endpoint': endpoint,
+            'extension': extension,
+            'context': context,
+            'app': self.app_name,
+        }
+        if caller_id:
+            params['callerId'] = caller_id
+        return await self.request('post', 'channels', params=params)
+
+
+class BackgroundARIClient:
+    """Runs an ARIClient on a dedicated event loop thread for synchronous callers."""
+
+    def __init__(self, listen=False, **client_kwargs):
+        self.listen = listen
+        self.client_kwargs = client_kwargs
+        self.client = None
+        self.loop = None
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name='ARI-EventLoop', daemon=True)
+        self._thread.start()
+
+        async def create():
+            client = ARIClient(**self.client_kwargs)
+            await client.start(listen=self.listen)
+            return client
+
+        self.client = self.run(create())
+
+    def run(self, coroutine, timeout=None):
+        """Run a coroutine on the client loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
     def stop(self):
-        """Gracefully shutdown the ARI client"""
-        logger.info("Shutting down ARI client")
-        self.active = False
-        
-        if self.ws:
-            self.ws.close()
-        
-        # Clear the event queue
-        while not self.event_queue.empty():
-            try:
-                self.event_queue.get_nowait()
-            except:
-                pass
-                
-        logger.info("ARI client shutdown complete")
+        if self._thread is None:
+            return
+        self.run(self.client.stop())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+        self._thread = None
+        self.client = None
 
 
-# Example usage
-if __name__ == "__main__":
-    client = ARIClient()
-    client.start()
-    
-    try:
-        while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
-        client.stop()
\ No newline at end of file
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_ari_client():
+    """Return the process-wide REST-only ARI client, starting it on first use."""
+    global _default_client
+    if _default_client is None:
+        from django.conf import settings
+
+        with _default_client_lock:
+            if _default_client is None:
+                client = BackgroundARIClient(listen=False, **getattr(settings, 'ARI_CLIENT', {}))
+                client.start()
+                _default_client = client
+    return _default_client
+
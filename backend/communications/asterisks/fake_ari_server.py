@@ -0,0 +1,185 @@
+"""
+Minimal in-process fake of the Asterisk ARI HTTP/websocket API.
+
+Implements just enough of ARI for ``ARIClient``: the ``/ari/events``
+websocket, originate, answer, play and hangup. Each simulated call emits
+StasisStart, and a hangup emits StasisEnd and ChannelDestroyed, like
+Asterisk does. The server records per-call timings, the number of TCP
+connections clients opened and any out-of-order operations, which the
+load test (``load_test.py``) reports.
+"""
+
+import asyncio
+import itertools
+import time
+
+from aiohttp import BasicAuth, WSMsgType, web
+
+
+class FakeARIServer:
+    def __init__(self, username='asterisk', password='asteriskpass', latency=0.0):
+        self.username = username
+        self.password = password
+        self.latency = latency
+
+        self.port = None
+        self.channels = {}
+        self.websockets = set()
+        self.connections = set()
+        self.requests = 0
+        self.order_violations = 0
+        self.completed = {}
+        self._ids = itertools.count(1)
+        self._all_done = None
+        self._expected = None
+        self._runner = None
+
+        self.app = web.Application(middlewares=[self._auth_middleware])
+        self.app.router.add_get('/ari/events', self.events)
+        self.app.router.add_post('/ari/channels', self.originate)
+        self.app.router.add_post('/ari/channels/{channel_id}/answer', self.answer)
+        self.app.router.add_post('/ari/channels/{channel_id}/play', self.play)
+        self.app.router.add_delete('/ari/channels/{channel_id}', self.hangup)
+
+    async def start(self, host='127.0.0.1', port=0):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        for ws in list(self.websockets):
+            await ws.close()
+        await self._runner.cleanup()
+
+    # ------------------------------------------------------------------
+    # Call simulation
+    # ------------------------------------------------------------------
+
+    async def wait_for_clients(self, count=1, timeout=5):
+        deadline = time.monotonic() + timeout
+        while len(self.websockets) < count:
+            if time.monotonic() > deadline:
+                raise TimeoutError('No ARI client connected to the fake server')
+            await asyncio.sleep(0.01)
+
+    def expect_calls(self, count):
+        """Arm ``wait_for_calls`` to resolve once `count` calls have hung up."""
+        self._expected = count
+        self._all_done = asyncio.Event()
+
+    async def wait_for_calls(self, timeout):
+        await asyncio.wait_for(self._all_done.wait(), timeout)
+
+    async def place_call(self):
+        """Simulate an inbound call entering the Stasis app."""
+        channel_id = self._new_channel()
+        await self._emit({'type': 'StasisStart', 'channel': self._channel_json(channel_id)})
+        return channel_id
+
+    # ------------------------------------------------------------------
+    # HTTP handlers
+    # ------------------------------------------------------------------
+
+    @web.middleware
+    async def _auth_middleware(self, request, handler):
+        self.connections.add(id(request.transport))
+        authorized = request.query.get('api_key') == f'{self.username}:{self.password}'
+        header = request.headers.get('Authorization')
+        if header:
+            try:
+                credentials = BasicAuth.decode(header)
+                authorized = (credentials.login, credentials.password) == (self.username, self.password)
+            except ValueError:
+                authorized = False
+        if not authorized:
+            return web.json_response({'message': 'Authentication required'}, status=401)
+        if request.path != '/ari/events':
+            self.requests += 1
+            if self.latency:
+                await asyncio.sleep(self.latency)
+        return await handler(request)
+
+    async def events(self, request):
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        self.websockets.add(ws)
+        try:
+            async for message in ws:
+                if message.type == WSMsgType.ERROR:
+                    break
+        finally:
+            self.websockets.discard(ws)
+        return ws
+
+    async def originate(self, request):
+        channel_id = self._new_channel()
+        # Asterisk replies to originate before the channel enters Stasis
+        asyncio.create_task(
+            self._emit({'type': 'StasisStart', 'channel': self._channel_json(channel_id)})
+        )
+        return web.json_response(self._channel_json(channel_id))
+
+    async def answer(self, request):
+        channel = self._step(request, 'answer', expected=[])
+        if channel is None:
+            return self._not_found()
+        channel['state'] = 'Up'
+        return web.Response(status=204)
+
+    async def play(self, request):
+        channel_id = request.match_info['channel_id']
+        channel = self._step(request, 'play', expected=['answer'])
+        if channel is None:
+            return self._not_found()
+        playback_id = f'playback-{next(self._ids)}'
+        await self._emit({
+            'type': 'PlaybackFinished',
+            'playback': {'id': playback_id, 'target_uri': f'channel:{channel_id}'},
+        })
+        return web.json_response({'id': playback_id, 'target_uri': f'channel:{channel_id}'}, status=201)
+
+    async def hangup(self, request):
+        channel_id = request.match_info['channel_id']
+        channel = self._step(request, 'hangup', expected=['answer', 'play'])
+        if channel is None:
+            return self._not_found()
+        del self.channels[channel_id]
+        self.completed[channel_id] = time.monotonic() - channel['started']
+        channel_json = self._channel_json(channel_id)
+        await self._emit({'type': 'StasisEnd', 'channel': channel_json})
+        await self._emit({'type': 'ChannelDestroyed', 'channel': channel_json})
+        if self._expected is not None and len(self.completed) >= self._expected:
+            self._all_done.set()
+        return web.Response(status=204)
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def _new_channel(self):
+        channel_id = f'fake-{next(self._ids)}'
+        self.channels[channel_id] = {'state': 'Ring', 'started': time.monotonic(), 'steps': []}
+        return channel_id
+
+    def _step(self, request, step, expected):
+        channel = self.channels.get(request.match_info['channel_id'])
+        if channel is None:
+            return None
+        if channel['steps'] != expected:
+            self.order_violations += 1
+        channel['steps'].append(step)
+        return channel
+
+    def _not_found(self):
+        return web.json_response({'message': 'Channel not found'}, status=404)
+
+    def _channel_json(self, channel_id):
+        state = self.channels.get(channel_id, {}).get('state', 'Down')
+        return {'id': channel_id, 'name': f'PJSIP/{channel_id}', 'state': state}
+
+    async def _emit(self, event):
+        for ws in list(self.websockets):
+            await ws.send_json(event)
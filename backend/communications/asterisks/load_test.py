@@ -0,0 +1,80 @@
+"""
+Concurrent-call load test for ARIClient against the local fake ARI server.
+
+Places N simultaneous calls. For every call the client answers, plays a
+greeting and hangs up after ``--hangup-delay`` seconds via an event-loop
+timer, exactly as it does against Asterisk. Reports throughput, the
+per-call overhead on top of the hangup delay, how many TCP connections
+the client opened, and whether any channel saw its operations out of order.
+
+Usage (from the backend directory):
+
+    python -m communications.asterisks.load_test --calls 2000 --latency 0.005
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+
+from .ari_client import ARIClient
+from .fake_ari_server import FakeARIServer
+
+
+async def run_load_test(calls=1000, shards=8, pool_size=20, latency=0.0,
+                        hangup_delay=0.5, timeout=120):
+    server = FakeARIServer(latency=latency)
+    port = await server.start()
+    client = ARIClient(
+        host='127.0.0.1', port=port, use_ssl=False,
+        shards=shards, pool_size=pool_size, hangup_delay=hangup_delay,
+    )
+    await client.start()
+    try:
+        await server.wait_for_clients()
+        server.expect_calls(calls)
+
+        started = time.monotonic()
+        await asyncio.gather(*(server.place_call() for _ in range(calls)))
+        await server.wait_for_calls(timeout)
+        elapsed = time.monotonic() - started
+    finally:
+        await client.stop()
+        await server.stop()
+
+    overheads = sorted(duration - hangup_delay for duration in server.completed.values())
+    return {
+        'calls': calls,
+        'elapsed_seconds': round(elapsed, 3),
+        'calls_per_second': round(calls / elapsed, 1),
+        'overhead_p50_ms': round(statistics.median(overheads) * 1000, 1),
+        'overhead_p95_ms': round(overheads[int(len(overheads) * 0.95) - 1] * 1000, 1),
+        'rest_requests': server.requests,
+        'tcp_connections': len(server.connections),
+        'order_violations': server.order_violations,
+        'request_errors': client.stats['request_errors'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--calls', type=int, default=1000)
+    parser.add_argument('--shards', type=int, default=8)
+    parser.add_argument('--pool-size', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Simulated ARI response latency in seconds')
+    parser.add_argument('--hangup-delay', type=float, default=0.5)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    result = asyncio.run(run_load_test(
+        calls=args.calls, shards=args.shards, pool_size=args.pool_size,
+        latency=args.latency, hangup_delay=args.hangup_delay,
+    ))
+    for key, value in result.items():
+        print(f"{key:>18}: {value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+# communications/inbox.py
+"""
+Conversation inbox read model.
+
+``Conversation`` carries denormalised inbox columns (``last_activity_at``,
+``last_message_preview`` and ``inbound_count``) so the inbox list never
+dereferences ``last_message``. Unread state is a per-(conversation, user)
+``ConversationReadCursor``; a user's unread count is the conversation's
+``inbound_count`` minus the cursor's ``read_count``. New messages therefore
+cost one counter increment, and the inbox list is one indexed query with a
+LEFT JOIN on the caller's cursors.
+"""
+from django.db.models import Case, F, FilteredRelation, IntegerField, Q, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Conversation, ConversationReadCursor
+
+PREVIEW_LENGTH = 100
+
+
+def record_activity(activity):
+    """
+    Apply new messages to their conversations with a single UPDATE.
+
+    Args:
+        activity: ``{conversation_id: (message_id, timestamp, content, inbound)}``
+            for the latest message of each conversation, where `inbound` is
+            the number of new inbound messages.
+    """
+    if not activity:
+        return
+    last_message, activity_at, preview, increment = [], [], [], []
+    for conversation_id, (message_id, timestamp, content, inbound) in activity.items():
+        when = Q(pk=conversation_id)
+        # UPDATE sees the row as it was, so this compares with the stored activity
+        newer = when & Q(last_activity_at__lte=timestamp)
+        last_message.append(When(newer, then=Value(message_id)))
+        activity_at.append(When(when, then=Value(timestamp)))
+        preview.append(When(newer, then=Value(content[:PREVIEW_LENGTH])))
+        if inbound:
+            increment.append(When(when, then=Value(inbound)))
+
+    # A late batch never moves the inbox backwards: the last message and its
+    # preview only change together with last_activity_at
+    updates = {
+        'last_message_id': Case(*last_message, default=F('last_message_id')),
+        'last_activity_at': Greatest(F('last_activity_at'), Case(*activity_at)),
+        'last_message_preview': Case(*preview, default=F('last_message_preview')),
+        'is_open': True,
+        'updated_at': timezone.now(),
+    }
+    if increment:
+        updates['inbound_count'] = F('inbound_count') + Case(
+            *increment, default=Value(0), output_field=IntegerField()
+        )
+    Conversation.objects.filter(pk__in=list(activity)).update(**updates)
+
+
+def record_message(message):
+    """Apply a single message created outside webhook ingestion (e.g. via the API)."""
+    if message.contact_id is None:
+        return
+    conversation_id = Conversation.objects.filter(
+        channel_id=message.channel_id, contact_id=message.contact_id
+    ).values_list('pk', flat=True).first()
+    if conversation_id is not None:
+        inbound = 1 if message.direction == message.Direction.INBOUND else 0
+        record_activity({
+            conversation_id: (message.pk, message.created_at, message.content, inbound)
+        })
+
+
+def inbox_queryset(user, tenant, open_only=True):
+    """
+    The user's inbox, newest activity first, annotated with ``unread_count``.
+
+    Served from the (tenant, is_open, last_activity_at, id) index; unread
+    counts and contact/channel names come from joins, so a page is a single
+    query (plus one prefetch for tags).
+    """
+    queryset = (
+        Conversation.objects
+        .filter(tenant=tenant)
+        .annotate(my_cursor=FilteredRelation('read_cursors', condition=Q(read_cursors__user=user)))
+        .annotate(unread_count=F('inbound_count') - Coalesce(F('my_cursor__read_count'), Value(0)))
+        .select_related('contact', 'channel')
+        .prefetch_related('tags')
+        .order_by('-last_activity_at', '-id')
+    )
+    if open_only:
+        queryset = queryset.filter(is_open=True)
+    return queryset
+
+
+def unread_count(conversation, user):
+    read = ConversationReadCursor.objects.filter(
+        conversation=conversation, user=user
+    ).values_list('read_count', flat=True).first()
+    return max(0, conversation.inbound_count - (read or 0))
+
+
+def mark_read(conversation, user):
+    """Move the user's cursor to the conversation's latest inbound message."""
+    cursor, _ = ConversationReadCursor.objects.update_or_create(
+        conversation=conversation, user=user,
+        defaults={'read_count': conversation.inbound_count},
+    )
+    return cursor
@@ -0,0 +1,37 @@
+# communications/management/commands/dispatch_outbound_messages.py
+from django.core.management.base import BaseCommand, CommandError
+
+from communications.outbound import DEFAULT_MAX_BATCH, DispatcherAlreadyRunning, OutboundDispatcher
+
+
+class Command(BaseCommand):
+    help = 'Send queued outbound messages within each channel\'s rate limit (one dispatcher per database)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_MAX_BATCH,
+                            help='Most messages sent per channel per round')
+        parser.add_argument('--loop', action='store_true', help='Keep draining queues until stopped')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Longest wait between rounds (with --loop)')
+
+    def handle(self, *args, **options):
+        dispatcher = OutboundDispatcher(max_batch=options['batch_size'])
+        try:
+            dispatcher.acquire_lock()
+        except DispatcherAlreadyRunning as e:
+            raise CommandError(str(e))
+
+        if options['loop']:
+            dispatcher.run(idle_interval=options['interval'])
+            return
+
+        total = 0
+        try:
+            while True:
+                sent, _ = dispatcher.run_once()
+                if not sent:
+                    break
+                total += sent
+        finally:
+            dispatcher.close()
+        self.stdout.write(self.style.SUCCESS(f'Sent {total} outbound message(s)'))
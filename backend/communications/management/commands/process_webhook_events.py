@@ -0,0 +1,38 @@
+# communications/management/commands/process_webhook_events.py
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from communications.models import WebhookEvent
+from communications.webhooks import DEFAULT_BATCH_SIZE, process_webhook_events
+
+
+class Command(BaseCommand):
+    help = 'Process queued provider webhooks into messages, contacts and conversations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new events')
+        parser.add_argument('--interval', type=float, default=0.5,
+                            help='Seconds to wait when the queue is empty (with --loop)')
+        parser.add_argument('--purge-after-days', type=int, default=7,
+                            help='Delete processed events older than this many days')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            processed = process_webhook_events(options['batch_size'])
+            total += processed
+            if processed:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        cutoff = timezone.now() - timedelta(days=options['purge_after_days'])
+        purged, _ = WebhookEvent.objects.filter(processed_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {total} webhook event(s), purged {purged} old event(s)'
+        ))
@@ -0,0 +1,24 @@
+# communications/management/commands/run_ari_listener.py
+import asyncio
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from communications.asterisks.ari_client import ARIClient
+
+
+class Command(BaseCommand):
+    help = 'Handle Stasis events of the ARI app (run exactly one listener per app)'
+
+    def handle(self, *args, **options):
+        async def listen():
+            async with ARIClient(**getattr(settings, 'ARI_CLIENT', {})):
+                while True:
+                    await asyncio.sleep(3600)
+
+        logging.basicConfig(level=logging.INFO)
+        try:
+            asyncio.run(listen())
+        except KeyboardInterrupt:
+            pass
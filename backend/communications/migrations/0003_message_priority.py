@@ -0,0 +1,29 @@
+# Generated by Django 5.2.2 on 2026-10-19 14:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communications', '0002_webhookevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='priority',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Urgent'), (5, 'Normal'), (9, 'Bulk')], default=5),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='send_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['channel', 'status', 'priority', 'created_at'], name='communicati_channel_f13123_idx'),
+        ),
+    ]
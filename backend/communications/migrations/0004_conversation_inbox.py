@@ -0,0 +1,78 @@
+# Generated by Django 5.2.2 on 2026-10-19 14:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Substr
+
+
+def backfill_inbox(apps, schema_editor):
+    Conversation = apps.get_model('communications', 'Conversation')
+    Message = apps.get_model('communications', 'Message')
+    inbound = (
+        Message.objects
+        .filter(channel=OuterRef('channel'), contact=OuterRef('contact'), direction='IN')
+        .order_by().values('contact').annotate(total=Count('pk')).values('total')
+    )
+    last = Message.objects.filter(pk=OuterRef('last_message'))
+    Conversation.objects.update(
+        inbound_count=Coalesce(Subquery(inbound), 0),
+        last_activity_at=Coalesce(Subquery(last.values('created_at')), 'created_at'),
+        last_message_preview=Coalesce(Subquery(last.values(preview=Substr('content', 1, 100))), models.Value('')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communications', '0003_message_priority'),
+        ('tenants', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationReadCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('read_count', models.PositiveIntegerField(default=0)),
+                ('read_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='inbound_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_preview',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['tenant', 'is_open', '-last_activity_at', '-id'], name='communicati_tenant__6c57d7_idx'),
+        ),
+        migrations.AddField(
+            model_name='conversationreadcursor',
+            name='conversation',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_cursors', to='communications.conversation'),
+        ),
+        migrations.AddField(
+            model_name='conversationreadcursor',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_read_cursors', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='conversationreadcursor',
+            constraint=models.UniqueConstraint(fields=('conversation', 'user'), name='unique_read_cursor_per_user'),
+        ),
+        migrations.RunPython(backfill_inbox, migrations.RunPython.noop),
+    ]
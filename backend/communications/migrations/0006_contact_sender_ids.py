@@ -0,0 +1,21 @@
+# Generated by Django 5.2.2 on 2026-10-19 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communications', '0005_message_sending_status'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='contact',
+            constraint=models.UniqueConstraint(condition=models.Q(models.Q(('whatsapp_id', ''), _negated=True), ('whatsapp_id__isnull', False)), fields=('tenant', 'whatsapp_id'), name='unique_contact_whatsapp_id'),
+        ),
+        migrations.AddConstraint(
+            model_name='contact',
+            constraint=models.UniqueConstraint(condition=models.Q(models.Q(('facebook_id', ''), _negated=True), ('facebook_id__isnull', False)), fields=('tenant', 'facebook_id'), name='unique_contact_facebook_id'),
+        ),
+    ]
@@ -1,6 +1,7 @@
 # core/models.py
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinLengthValidator
 from django_tenants.models import TenantMixin
@@ -75,6 +76,21 @@ class Contact(BaseModel):
     
     class Meta:
         unique_together = ('tenant', 'phone')
+        constraints = [
+            # Webhook senders are identified by these ids; concurrent batches
+            # must resolve to one contact per tenant. Blank ids (forms save
+            # '' rather than NULL) are not identities and may repeat.
+            models.UniqueConstraint(
+                fields=['tenant', 'whatsapp_id'],
+                condition=~models.Q(whatsapp_id='') & models.Q(whatsapp_id__isnull=False),
+                name='unique_contact_whatsapp_id',
+            ),
+            models.UniqueConstraint(
+                fields=['tenant', 'facebook_id'],
+                condition=~models.Q(facebook_id='') & models.Q(facebook_id__isnull=False),
+                name='unique_contact_facebook_id',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.phone or self.email})"
@@ -86,10 +102,16 @@ class Message(BaseModel):
     
     class MessageStatus(models.TextChoices):
         QUEUED = 'QUEUED', _('Queued')
+        SENDING = 'SENDING', _('Sending')
         SENT = 'SENT', _('Sent')
         DELIVERED = 'DELIVERED', _('Delivered')
         READ = 'READ', _('Read')
         FAILED = 'FAILED', _('Failed')
+
+    class Priority(models.IntegerChoices):
+        URGENT = 0, _('Urgent')
+        NORMAL = 5, _('Normal')
+        BULK = 9, _('Bulk')
     
     channel = models.ForeignKey(Channel, on_delete=models.CASCADE)
     contact = models.ForeignKey(Contact, on_delete=models.CASCADE, null=True, blank=True)
@@ -107,6 +129,10 @@ class Message(BaseModel):
     status_updated_at = models.DateTimeField(auto_now_add=True)
     metadata = models.JSONField(default=dict)  # Raw payload from provider
     error_reason = models.TextField(blank=True, null=True)
+
+    # Outbound scheduling (see communications.outbound)
+    priority = models.PositiveSmallIntegerField(choices=Priority.choices, default=Priority.NORMAL)
+    send_attempts = models.PositiveSmallIntegerField(default=0)
     
     # For calls
     call_duration = models.PositiveIntegerField(null=True, blank=True)  # in seconds
@@ -123,6 +149,16 @@ class Message(BaseModel):
             models.Index(fields=['contact']),
             models.Index(fields=['status']),
             models.Index(fields=['created_at']),
+            # Dispatcher queue scan: queued messages of a channel in send order
+            models.Index(fields=['channel', 'status', 'priority', 'created_at']),
+        ]
+        constraints = [
+            # Providers retry webhooks; an inbound message is stored once
+            models.UniqueConstraint(
+                fields=['channel', 'external_id'],
+                condition=models.Q(direction='IN'),
+                name='unique_inbound_message_per_channel'
+            ),
         ]
     
     def __str__(self):
@@ -140,13 +176,66 @@ class Conversation(BaseModel):
         blank=True
     )
     tags = models.ManyToManyField('Tag', blank=True)
+
+    # Inbox read model, maintained by communications.inbox as messages arrive
+    last_activity_at = models.DateTimeField(default=timezone.now)
+    last_message_preview = models.CharField(max_length=100, blank=True, default='')
+    inbound_count = models.PositiveIntegerField(default=0)  # Inbound messages ever received
     
     class Meta:
         unique_together = ('tenant', 'contact', 'channel')
+        indexes = [
+            # Inbox list: a tenant's open conversations by latest activity
+            models.Index(fields=['tenant', 'is_open', '-last_activity_at', '-id']),
+        ]
     
     def __str__(self):
         return f"Conversation with {self.contact} on {self.channel}"
 
+class ConversationReadCursor(models.Model):
+    """
+    How far a user has read a conversation.
+
+    Unread count is ``conversation.inbound_count - read_count``, so new
+    messages only bump one counter on the conversation, however many
+    agents can see it.
+    """
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='read_cursors')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversation_read_cursors')
+    read_count = models.PositiveIntegerField(default=0)
+    read_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['conversation', 'user'], name='unique_read_cursor_per_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} read {self.read_count} of {self.conversation}"
+
+class WebhookEvent(models.Model):
+    """
+    Raw provider webhook, stored as received and processed in batches.
+    
+    The table is the durable queue between the webhook endpoint and
+    ``communications.webhooks.process_webhook_events``.
+    """
+    provider = models.CharField(max_length=20)
+    channel = models.ForeignKey(Channel, on_delete=models.CASCADE, related_name='webhook_events')
+    event_type = models.CharField(max_length=50)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True, null=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['processed_at', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.provider} {self.event_type} webhook for {self.channel_id}"
+
 class Tag(BaseModel):
     tenant = models.ForeignKey('tenants.Tenant', on_delete=models.CASCADE)
     name = models.CharField(max_length=50)
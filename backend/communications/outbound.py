@@ -0,0 +1,526 @@
+# communications/outbound.py
+"""
+Outbound message dispatcher.
+
+Queued outbound ``Message`` rows are sent by ``OutboundDispatcher``
+(run with ``manage.py dispatch_outbound_messages --loop``):
+
+- Every channel has a token bucket refilled at ``Channel.rate_limit``
+  messages per hour. Its burst size defaults to one minute of traffic
+  (``config['burst']`` overrides it), so a 100k-message campaign drains
+  at the channel's sustained rate and never bursts past the provider limit.
+- Messages are claimed (QUEUED -> SENDING) in a short transaction and sent
+  outside it, so no row locks are held during provider calls and a crash
+  after the provider accepted a message cannot roll it back to QUEUED.
+- Channels with sendable messages are served in ``Channel.priority``
+  order (lower number first); within a channel, messages go out by
+  ``Message.priority`` and then age.
+- Senders that support it receive a whole batch per provider call.
+- The sender is named by ``config['provider']``, falling back to the
+  ``COMMUNICATIONS_DEFAULT_PROVIDER`` setting. A channel whose sender
+  cannot be built (missing or unknown provider, bad credentials config)
+  is paused for a cooldown; the other channels keep sending.
+- When a send fails with a retryable error, the channel is paused for a
+  cooldown and its messages fail over to another active channel of the
+  same tenant and type. Without a fallback they are retried until
+  ``MAX_SEND_ATTEMPTS``, then marked FAILED.
+
+Buckets live in the dispatcher process, so exactly one dispatcher may run
+per database: it holds a PostgreSQL advisory lock, and a second process
+refuses to start (``DispatcherAlreadyRunning``) rather than doubling the
+send rate. SENDING rows found when the lock is taken were left by a
+dispatcher that died mid-send; their delivery is unknown, so they are
+marked FAILED instead of being sent a second time.
+"""
+import logging
+import time
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Channel, Message
+from .webhooks import contact_lookup_field
+
+logger = logging.getLogger(__name__)
+
+MAX_SEND_ATTEMPTS = 5
+CHANNEL_COOLDOWN_SECONDS = 60
+DEFAULT_MAX_BATCH = 100
+DISPATCHER_LOCK_ID = 0x6d75726f  # pg advisory lock key of the dispatcher
+
+DEFAULT_SENDERS = {
+    'twilio': 'communications.outbound.TwilioSender',
+    'whatsapp_cloud': 'communications.outbound.WhatsAppCloudSender',
+    'http_batch': 'communications.outbound.HTTPBatchSender',
+    'log': 'communications.outbound.LogSender',
+}
+
+
+class DispatcherAlreadyRunning(Exception):
+    """Raised when another process already holds the dispatcher lock."""
+
+
+class TokenBucket:
+    """Classic token bucket; ``rate_per_hour`` tokens are added evenly over an hour."""
+
+    def __init__(self, rate_per_hour, burst=None, clock=time.monotonic):
+        self.rate = max(rate_per_hour, 1) / 3600.0
+        self.capacity = max(1, burst or rate_per_hour // 60)
+        self.tokens = float(self.capacity)
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, wanted):
+        """Take up to `wanted` whole tokens; returns how many were granted."""
+        self._refill()
+        granted = min(wanted, int(self.tokens))
+        self.tokens -= granted
+        return granted
+
+    def refund(self, count):
+        self.tokens = min(self.capacity, self.tokens + count)
+
+    def wait_time(self):
+        """Seconds until at least one token is available."""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class SendResult:
+    __slots__ = ('message_id', 'external_id', 'error', 'retryable')
+
+    def __init__(self, message_id, external_id=None, error=None, retryable=True):
+        self.message_id = message_id
+        self.external_id = external_id
+        self.error = error
+        self.retryable = retryable
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+# ---------------------------------------------------------------------------
+# Senders
+# ---------------------------------------------------------------------------
+
+class BaseSender:
+    """
+    Delivers messages for one channel.
+
+    ``max_batch`` > 1 means the provider accepts several messages per call;
+    ``send_batch`` is then called with up to that many messages.
+    """
+    max_batch = 1
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.config = channel.config or {}
+
+    def recipient(self, message):
+        if message.contact is None:
+            return None
+        if self.channel.channel_type == Channel.ChannelType.EMAIL:
+            return message.contact.email
+        field = contact_lookup_field(self.channel)
+        return getattr(message.contact, field) or message.contact.phone
+
+    def send_batch(self, messages):
+        return [self.send_one(message) for message in messages]
+
+    def send_one(self, message):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class LogSender(BaseSender):
+    """Development sender: logs messages and marks them sent."""
+    max_batch = DEFAULT_MAX_BATCH
+
+    def send_batch(self, messages):
+        for message in messages:
+            logger.info("Outbound via %s to %s: %s", self.channel, self.recipient(message), message.content[:80])
+        return [SendResult(message.pk, external_id=f'local-{message.pk}') for message in messages]
+
+
+class TwilioSender(BaseSender):
+    """Twilio Programmable Messaging (SMS, or WhatsApp for WHATSAPP channels)."""
+
+    def __init__(self, channel):
+        super().__init__(channel)
+        from twilio.rest import Client
+
+        self.client = Client(self.config['account_sid'], self.config['auth_token'])
+
+    def send_one(self, message):
+        from twilio.base.exceptions import TwilioRestException
+
+        to = self.recipient(message)
+        if not to:
+            return SendResult(message.pk, error='Contact has no address for this channel', retryable=False)
+        prefix = 'whatsapp:' if self.channel.channel_type == Channel.ChannelType.WHATSAPP else ''
+        params = {'to': f'{prefix}{to}', 'body': message.content}
+        if self.config.get('messaging_service_sid'):
+            params['messaging_service_sid'] = self.config['messaging_service_sid']
+        else:
+            params['from_'] = f"{prefix}{self.config['from_number']}"
+        if message.media_url:
+            params['media_url'] = [message.media_url]
+        try:
+            sent = self.client.messages.create(**params)
+        except TwilioRestException as e:
+            # 4xx other than rate limiting are permanent (bad number, blocked, ...)
+            retryable = e.status == 429 or e.status >= 500
+            return SendResult(message.pk, error=str(e.msg), retryable=retryable)
+        return SendResult(message.pk, external_id=sent.sid)
+
+
+class WhatsAppCloudSender(BaseSender):
+    """WhatsApp Cloud API over one keep-alive HTTP session."""
+
+    def __init__(self, channel):
+        super().__init__(channel)
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f"Bearer {self.config['access_token']}"
+        version = self.config.get('api_version', 'v19.0')
+        self.url = f"https://graph.facebook.com/{version}/{self.config['phone_number_id']}/messages"
+
+    def send_one(self, message):
+        to = self.recipient(message)
+        if not to:
+            return SendResult(message.pk, error='Contact has no WhatsApp id', retryable=False)
+        try:
+            response = self.session.post(self.url, json={
+                'messaging_product': 'whatsapp',
+                'to': to,
+                'type': 'text',
+                'text': {'body': message.content},
+            }, timeout=10)
+        except requests.RequestException as e:
+            return SendResult(message.pk, error=str(e))
+        if response.status_code >= 400:
+            retryable = response.status_code == 429 or response.status_code >= 500
+            return SendResult(message.pk, error=response.text[:500], retryable=retryable)
+        return SendResult(message.pk, external_id=response.json()['messages'][0]['id'])
+
+    def close(self):
+        self.session.close()
+
+
+class HTTPBatchSender(BaseSender):
+    """
+    Generic gateway that accepts many messages per request.
+
+    POSTs ``{"messages": [{"id", "to", "content", "media_url"}]}`` to
+    ``config['send_url']`` and expects ``{"results": [{"id", "external_id"
+    | "error"}]}`` back.
+    """
+
+    def __init__(self, channel):
+        super().__init__(channel)
+        self.max_batch = self.config.get('max_batch', DEFAULT_MAX_BATCH)
+        self.session = requests.Session()
+        self.session.headers.update(self.config.get('headers', {}))
+
+    def send_batch(self, messages):
+        body = {'messages': [
+            {'id': message.pk, 'to': self.recipient(message), 'content': message.content,
+             'media_url': message.media_url}
+            for message in messages
+        ]}
+        try:
+            response = self.session.post(self.config['send_url'], json=body, timeout=30)
+            response.raise_for_status()
+            results = {item['id']: item for item in response.json().get('results', [])}
+        except (requests.RequestException, ValueError) as e:
+            return [SendResult(message.pk, error=str(e)) for message in messages]
+        return [
+            SendResult(message.pk, external_id=results[message.pk].get('external_id'),
+                       error=results[message.pk].get('error'), retryable=False)
+            if message.pk in results else SendResult(message.pk, error='Missing from gateway response')
+            for message in messages
+        ]
+
+    def close(self):
+        self.session.close()
+
+
+def get_sender(channel):
+    """
+    Instantiate the sender named by ``config['provider']``.
+
+    Channels without a provider use ``COMMUNICATIONS_DEFAULT_PROVIDER``.
+    There is no built-in default, so a production channel that was never
+    configured is an error instead of being "sent" through ``LogSender``.
+
+    Raises:
+        ImproperlyConfigured: If the provider is missing or unknown
+    """
+    senders = {**DEFAULT_SENDERS, **getattr(settings, 'COMMUNICATIONS_SENDERS', {})}
+    provider = (
+        (channel.config or {}).get('provider')
+        or getattr(settings, 'COMMUNICATIONS_DEFAULT_PROVIDER', '')
+    )
+    if not provider:
+        raise ImproperlyConfigured(f"Channel {channel} has no outbound provider")
+    if provider not in senders:
+        raise ImproperlyConfigured(f"Channel {channel} names unknown outbound provider {provider!r}")
+    return import_string(senders[provider])(channel)
+
+
+# ---------------------------------------------------------------------------
+# Dispatcher
+# ---------------------------------------------------------------------------
+
+class OutboundDispatcher:
+    def __init__(self, max_batch=DEFAULT_MAX_BATCH, clock=time.monotonic):
+        self.max_batch = max_batch
+        self.clock = clock
+        self.buckets = {}
+        self.senders = {}
+        self.paused_until = {}
+        self.locked = False
+
+    def acquire_lock(self):
+        """
+        Become the only dispatcher of this database.
+
+        Raises:
+            DispatcherAlreadyRunning: another process holds the lock
+        """
+        if self.locked:
+            return
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_try_advisory_lock(%s)', [DISPATCHER_LOCK_ID])
+                if not cursor.fetchone()[0]:
+                    raise DispatcherAlreadyRunning('Another outbound dispatcher is running')
+        self.locked = True
+        self.fail_interrupted_sends()
+
+    def release_lock(self):
+        if self.locked and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [DISPATCHER_LOCK_ID])
+        self.locked = False
+
+    def fail_interrupted_sends(self):
+        """Mark messages a crashed dispatcher left in SENDING as FAILED."""
+        failed = Message.objects.filter(
+            direction=Message.Direction.OUTBOUND, status=Message.MessageStatus.SENDING,
+        ).update(
+            status=Message.MessageStatus.FAILED,
+            status_updated_at=timezone.now(),
+            error_reason='Dispatcher stopped while sending; delivery unknown',
+        )
+        if failed:
+            logger.warning("Marked %d interrupted outbound message(s) as failed", failed)
+        return failed
+
+    def bucket_for(self, channel):
+        bucket = self.buckets.get(channel.pk)
+        burst = (channel.config or {}).get('burst')
+        if bucket is None or bucket.rate != max(channel.rate_limit, 1) / 3600.0:
+            bucket = TokenBucket(channel.rate_limit, burst, clock=self.clock)
+            self.buckets[channel.pk] = bucket
+        return bucket
+
+    def sender_for(self, channel):
+        sender = self.senders.get(channel.pk)
+        if sender is None:
+            sender = self.senders[channel.pk] = get_sender(channel)
+        return sender
+
+    def close(self):
+        for sender in self.senders.values():
+            sender.close()
+        self.senders = {}
+        self.release_lock()
+
+    def pending_channels(self):
+        """Active channels with queued outbound messages, highest priority first."""
+        channel_ids = (
+            Message.objects
+            .filter(direction=Message.Direction.OUTBOUND, status=Message.MessageStatus.QUEUED)
+            .values_list('channel_id', flat=True).distinct()
+        )
+        now = self.clock()
+        return [
+            channel for channel in Channel.objects.filter(
+                pk__in=list(channel_ids), status=Channel.ChannelStatus.ACTIVE
+            ).order_by('priority', 'pk')
+            if self.paused_until.get(channel.pk, 0) <= now
+        ]
+
+    def run_once(self):
+        """
+        Send one round: at most one batch per channel, within its bucket.
+
+        Returns:
+            tuple: (messages sent, seconds until the next send is possible)
+        """
+        self.acquire_lock()
+        sent = 0
+        next_wait = None
+        for channel in self.pending_channels():
+            try:
+                sender = self.sender_for(channel)
+            except Exception:
+                # One misconfigured channel must not stop the others
+                logger.exception("Cannot build a sender for %s; pausing channel", channel)
+                self.paused_until[channel.pk] = self.clock() + CHANNEL_COOLDOWN_SECONDS
+                continue
+            bucket = self.bucket_for(channel)
+            granted = bucket.take(self.max_batch)
+            if granted:
+                delivered, claimed = self._send_batch(channel, sender, granted)
+                sent += delivered
+                bucket.refund(granted - claimed)
+            wait = bucket.wait_time()
+            next_wait = wait if next_wait is None else min(next_wait, wait)
+        return sent, next_wait
+
+    def run(self, idle_interval=1.0, stop=lambda: False):
+        """Drain queues continuously, sleeping exactly until the next token is due."""
+        try:
+            while not stop():
+                sent, wait = self.run_once()
+                if wait is None:
+                    wait = idle_interval
+                if not sent:
+                    time.sleep(min(max(wait, 0.01), idle_interval))
+        finally:
+            self.close()
+
+    def _claim(self, channel, limit):
+        """Move up to `limit` queued messages of a channel to SENDING and return them."""
+        with transaction.atomic():
+            messages = list(
+                Message.objects
+                .select_for_update(skip_locked=True, of=('self',))
+                .select_related('contact')
+                .filter(channel=channel, direction=Message.Direction.OUTBOUND,
+                        status=Message.MessageStatus.QUEUED)
+                .order_by('priority', 'created_at')[:limit]
+            )
+            if messages:
+                Message.objects.filter(pk__in=[message.pk for message in messages]).update(
+                    status=Message.MessageStatus.SENDING, status_updated_at=timezone.now(),
+                )
+        return messages
+
+    def _send_batch(self, channel, sender, limit):
+        messages = self._claim(channel, limit)
+        if not messages:
+            return 0, 0
+
+        # Provider calls run outside any transaction
+        sender_limit = max(1, sender.max_batch)
+        results = []
+        for start in range(0, len(messages), sender_limit):
+            chunk = messages[start:start + sender_limit]
+            try:
+                results.extend(sender.send_batch(chunk))
+            except Exception as e:
+                logger.exception("Sender for %s failed", channel)
+                results.extend(SendResult(message.pk, error=str(e)) for message in chunk)
+
+        delivered = self._record_results(channel, messages, results)
+        return delivered, len(messages)
+
+    def _record_results(self, channel, messages, results):
+        by_id = {message.pk: message for message in messages}
+        reported = {result.message_id for result in results}
+        results = list(results) + [
+            SendResult(message.pk, error='No result from sender')
+            for message in messages if message.pk not in reported
+        ]
+        now = timezone.now()
+        sent, retry, failed = [], [], []
+        for result in results:
+            message = by_id[result.message_id]
+            message.send_attempts += 1
+            if result.ok:
+                message.status = Message.MessageStatus.SENT
+                message.external_id = result.external_id or ''
+                message.status_updated_at = now
+                message.error_reason = None
+                sent.append(message)
+            elif result.retryable and message.send_attempts < MAX_SEND_ATTEMPTS:
+                message.status = Message.MessageStatus.QUEUED
+                message.error_reason = result.error
+                retry.append(message)
+            else:
+                message.status = Message.MessageStatus.FAILED
+                message.status_updated_at = now
+                message.error_reason = result.error
+                failed.append(message)
+
+        if retry:
+            fallback = self._failover_channel(channel)
+            logger.warning(
+                "%d message(s) failed on %s; %s", len(retry), channel,
+                f"failing over to {fallback}" if fallback else "pausing channel",
+            )
+            self.paused_until[channel.pk] = self.clock() + CHANNEL_COOLDOWN_SECONDS
+            if fallback is not None:
+                for message in retry:
+                    message.channel = fallback
+
+        Message.objects.bulk_update(
+            sent + retry + failed,
+            ['channel', 'status', 'external_id', 'status_updated_at', 'error_reason', 'send_attempts'],
+        )
+        return len(sent)
+
+    def _failover_channel(self, channel):
+        now = self.clock()
+        candidates = Channel.objects.filter(
+            tenant_id=channel.tenant_id,
+            channel_type=channel.channel_type,
+            status=Channel.ChannelStatus.ACTIVE,
+        ).exclude(pk=channel.pk).order_by('priority', 'pk')
+        for candidate in candidates:
+            if self.paused_until.get(candidate.pk, 0) <= now:
+                return candidate
+        return None
+
+
+def enqueue_bulk(channel, contacts, content, priority=None, created_by=None, batch_size=1000):
+    """
+    Queue one outbound message per contact (e.g. a campaign) with bulk inserts.
+
+    Returns:
+        int: number of messages queued
+    """
+    if priority is None:
+        priority = Message.Priority.BULK
+    total = 0
+    batch = []
+    for contact in contacts:
+        batch.append(Message(
+            channel=channel, contact=contact, content=content,
+            direction=Message.Direction.OUTBOUND, status=Message.MessageStatus.QUEUED,
+            priority=priority, created_by=created_by,
+        ))
+        if len(batch) >= batch_size:
+            Message.objects.bulk_create(batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        Message.objects.bulk_create(batch)
+        total += len(batch)
+    return total
@@ -1,6 +1,7 @@
 # core/serializers.py
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from .inbox import unread_count
 from .models import (
     Channel, Contact, Message, Conversation, 
     Tag, CallLog, Template
@@ -51,16 +52,19 @@ class MessageSerializer(serializers.ModelSerializer):
             'external_id', 'direction', 'direction_display', 'content',
             'status', 'status_display', 'status_updated_at', 'metadata',
             'error_reason', 'call_duration', 'call_record_url', 'media_url',
-            'media_type', 'created_at', 'updated_at'
+            'media_type', 'priority', 'send_attempts', 'created_at', 'updated_at'
         ]
         read_only_fields = [
             'status_display', 'direction_display', 'status_updated_at',
-            'channel_name', 'contact_name'
+            'channel_name', 'contact_name', 'send_attempts'
         ]
+        extra_kwargs = {
+            'external_id': {'required': False}  # Assigned by the provider on send
+        }
 
 class ConversationSerializer(serializers.ModelSerializer):
-    last_message_content = serializers.SerializerMethodField()
-    last_message_timestamp = serializers.SerializerMethodField()
+    last_message_content = serializers.CharField(source='last_message_preview', read_only=True)
+    last_message_timestamp = serializers.DateTimeField(source='last_activity_at', read_only=True)
     unread_count = serializers.SerializerMethodField()
     channel_name = serializers.CharField(source='channel.name', read_only=True)
     contact_name = serializers.CharField(source='contact.name', read_only=True)
@@ -73,23 +77,15 @@ class ConversationSerializer(serializers.ModelSerializer):
             'last_message_timestamp', 'unread_count', 'tags',
             'created_at', 'updated_at'
         ]
-    
-    def get_last_message_content(self, obj):
-        if obj.last_message:
-            return obj.last_message.content[:100]  # Return first 100 chars
-        return None
-    
-    def get_last_message_timestamp(self, obj):
-        if obj.last_message:
-            return obj.last_message.created_at
-        return None
+        read_only_fields = ['last_message']
     
     def get_unread_count(self, obj):
+        # Annotated by inbox_queryset; single objects fall back to a cursor lookup
+        if hasattr(obj, 'unread_count'):
+            return max(0, obj.unread_count)
         request = self.context.get('request')
-        if request and hasattr(request, 'user'):
-            # Implement your unread count logic here
-            # Example: return Message.objects.filter(conversation=obj, status='DELIVERED', read=False).count()
-            return 0
+        if request and request.user.is_authenticated and obj.pk:
+            return unread_count(obj, request.user)
         return 0
 
 class TagSerializer(serializers.ModelSerializer):
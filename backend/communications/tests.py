@@ -1,3 +1,570 @@
-from django.test import TestCase
+import base64
+import hashlib
+import hmac
+import json
+from contextlib import asynccontextmanager
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from tenants.models import Tenant
+from users.models import User
+
+from .asterisks.ari_client import ARIClient, ARIError, BackgroundARIClient
+from .asterisks.fake_ari_server import FakeARIServer
+from .inbox import inbox_queryset, mark_read, record_activity
+from .models import Channel, Contact, Conversation, ConversationReadCursor, Message, WebhookEvent
+from .outbound import (
+    CHANNEL_COOLDOWN_SECONDS, LogSender, OutboundDispatcher, SendResult, TokenBucket, get_sender,
+)
+from .webhooks import STATUS_RANK, process_webhook_events, verify_meta_signature, verify_twilio_signature
+
+
+@asynccontextmanager
+async def fake_ari(**client_kwargs):
+    """Yield a fake ARI server and a started, REST-only client pointed at it."""
+    server = FakeARIServer()
+    port = await server.start()
+    client = ARIClient(host='127.0.0.1', port=port, **client_kwargs)
+    await client.start(listen=False)
+    try:
+        yield server, client
+    finally:
+        await client.stop()
+        await server.stop()
+
+
+class ARIClientRESTTests(SimpleTestCase):
+    """The ARI REST wrapper decodes responses and maps failures to ARIError."""
+
+    def test_defaults_to_plain_http(self):
+        client = ARIClient(host='pbx', port=8088)
+        self.assertEqual(client.base_url, 'http://pbx:8088/ari')
+        self.assertEqual(client.ws_url, 'ws://pbx:8088/ari/events')
+
+    def test_ssl_is_opt_in(self):
+        client = ARIClient(host='pbx', port=8089, use_ssl=True)
+        self.assertEqual(client.base_url, 'https://pbx:8089/ari')
+        self.assertEqual(client.ws_url, 'wss://pbx:8089/ari/events')
+
+    async def test_originate_returns_decoded_json(self):
+        async with fake_ari() as (server, client):
+            channel = await client.originate_call('PJSIP/1000', '100')
+        self.assertTrue(channel['id'].startswith('fake-'))
+        self.assertEqual(server.requests, 1)
+        self.assertEqual(client.stats['requests'], 1)
+
+    async def test_empty_response_returns_none(self):
+        async with fake_ari() as (server, client):
+            channel = await client.originate_call('PJSIP/1000', '100')
+            result = await client.request('post', f"channels/{channel['id']}/answer")
+        self.assertIsNone(result)
+        self.assertEqual(server.channels[channel['id']]['state'], 'Up')
+
+    async def test_http_error_raises_ari_error(self):
+        async with fake_ari() as (server, client):
+            with self.assertRaises(ARIError) as raised:
+                await client.request('post', 'channels/missing/answer')
+        self.assertEqual(raised.exception.status, 404)
+        self.assertEqual(client.stats['request_errors'], 1)
+
+    async def test_bad_credentials_raise_ari_error(self):
+        async with fake_ari(password='wrong') as (server, client):
+            with self.assertRaises(ARIError) as raised:
+                await client.originate_call('PJSIP/1000', '100')
+        self.assertEqual(raised.exception.status, 401)
+
+    async def test_connection_failure_raises_ari_error(self):
+        server = FakeARIServer()
+        port = await server.start()
+        await server.stop()
+        client = ARIClient(host='127.0.0.1', port=port)
+        await client.start(listen=False)
+        try:
+            with self.assertRaises(ARIError) as raised:
+                await client.request('get', 'channels')
+        finally:
+            await client.stop()
+        self.assertIsNone(raised.exception.status)
+        self.assertEqual(client.stats['request_errors'], 1)
+
+    async def test_hangup_of_missing_channel_is_logged_not_raised(self):
+        async with fake_ari() as (server, client):
+            await client.hangup_channel('missing')
+        self.assertEqual(client.stats['request_errors'], 1)
+
+
+class BackgroundARIClientTests(SimpleTestCase):
+    """The client used by web workers must not subscribe to Stasis events."""
+
+    def test_does_not_listen_by_default(self):
+        background = BackgroundARIClient(host='127.0.0.1', port=1, shards=2)
+        background.start()
+        try:
+            task_names = [task.get_name() for task in background.client._tasks]
+        finally:
+            background.stop()
+        self.assertEqual(task_names, ['ari-shard-0', 'ari-shard-1'])
+
+
+class WebhookSignatureTests(SimpleTestCase):
+    """Provider signatures are checked against the raw request."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_meta_signature(self):
+        body = json.dumps({'object': 'whatsapp_business_account', 'entry': []})
+        digest = hmac.new(b'app-secret', body.encode(), hashlib.sha256).hexdigest()
+        request = self.factory.post(
+            '/hook/', body, content_type='application/json',
+            HTTP_X_HUB_SIGNATURE_256=f'sha256={digest}',
+        )
+
+        self.assertTrue(verify_meta_signature('app-secret', request))
+        self.assertFalse(verify_meta_signature('other-secret', request))
+
+    def test_twilio_signature(self):
+        params = {'MessageSid': 'SM1', 'From': '+254700000000', 'Body': 'hi'}
+        signed = 'http://testserver/hook/' + ''.join(key + params[key] for key in sorted(params))
+        signature = base64.b64encode(hmac.new(b'auth-token', signed.encode(), hashlib.sha1).digest()).decode()
+        request = self.factory.post('/hook/', params, HTTP_X_TWILIO_SIGNATURE=signature)
+
+        self.assertTrue(verify_twilio_signature('auth-token', request))
+        params['Body'] = 'tampered'
+        request = self.factory.post('/hook/', params, HTTP_X_TWILIO_SIGNATURE=signature)
+        self.assertFalse(verify_twilio_signature('auth-token', request))
+
+    def test_delivered_and_read_outrank_failed(self):
+        failed = STATUS_RANK[Message.MessageStatus.FAILED]
+        self.assertGreater(STATUS_RANK[Message.MessageStatus.DELIVERED], failed)
+        self.assertGreater(STATUS_RANK[Message.MessageStatus.READ], failed)
+        self.assertGreater(failed, STATUS_RANK[Message.MessageStatus.SENT])
+
+
+class WebhookIngestViewTests(SimpleTestCase):
+    """Unsigned requests are rejected and Meta's subscription handshake is answered."""
+
+    def setUp(self):
+        self.url = reverse('webhook-ingest', args=['whatsapp', 7])
+        cache.set('webhook_channel_auth:7', {
+            'channel_type': Channel.ChannelType.WHATSAPP,
+            'webhook_token': '', 'app_secret': 'app-secret', 'auth_token': '', 'verify_token': 'verify-me',
+        })
+        self.addCleanup(cache.delete, 'webhook_channel_auth:7')
+
+    def test_unsigned_post_is_rejected(self):
+        response = self.client.post(self.url, {'entry': []}, content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_channel_without_secret_rejects_everything(self):
+        cache.set('webhook_channel_auth:7', {
+            'channel_type': Channel.ChannelType.WHATSAPP,
+            'webhook_token': '', 'app_secret': '', 'auth_token': '', 'verify_token': '',
+        })
+        response = self.client.post(
+            self.url, {'entry': []}, content_type='application/json',
+            HTTP_X_HUB_SIGNATURE_256='sha256=' + hmac.new(b'', b'{"entry": []}', hashlib.sha256).hexdigest(),
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_subscription_handshake_echoes_challenge(self):
+        response = self.client.get(self.url, {
+            'hub.mode': 'subscribe', 'hub.verify_token': 'verify-me', 'hub.challenge': '1158201444',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'1158201444')
+
+    def test_subscription_handshake_rejects_wrong_token(self):
+        response = self.client.get(self.url, {
+            'hub.mode': 'subscribe', 'hub.verify_token': 'guess', 'hub.challenge': '1158201444',
+        })
+        self.assertEqual(response.status_code, 403)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class RecordingSender:
+    """Sender double that records batches and answers with `outcome`."""
+    max_batch = 100
+
+    def __init__(self, outcome='ok'):
+        self.outcome = outcome
+        self.batches = []
+
+    def send_batch(self, messages):
+        self.batches.append([message.pk for message in messages])
+        if self.outcome == 'raise':
+            raise RuntimeError('provider unreachable')
+        if self.outcome == 'retry':
+            return [SendResult(message.pk, error='rate limited') for message in messages]
+        return [SendResult(message.pk, external_id=f'ext-{message.pk}') for message in messages]
+
+    def close(self):
+        pass
+
+
+class InMemoryDispatcher(OutboundDispatcher):
+    """Dispatcher whose channels and queues live in memory instead of the database."""
+
+    def __init__(self, channels, queues, **kwargs):
+        super().__init__(**kwargs)
+        self.locked = True
+        self.channels = channels
+        self.queues = queues
+        self.claims = []
+
+    def pending_channels(self):
+        now = self.clock()
+        return [
+            channel for channel in self.channels
+            if self.queues.get(channel.pk) and self.paused_until.get(channel.pk, 0) <= now
+        ]
+
+    def _claim(self, channel, limit):
+        queue = self.queues[channel.pk]
+        claimed, self.queues[channel.pk] = queue[:limit], queue[limit:]
+        self.claims.append((channel.pk, len(claimed)))
+        return claimed
+
+
+def make_channel(pk, tenant_id=1, rate_limit=3600, **config):
+    return Channel(
+        pk=pk, tenant_id=tenant_id, name=f'channel {pk}', channel_type=Channel.ChannelType.SMS,
+        rate_limit=rate_limit, config={'burst': 10, **config},
+    )
+
+
+def make_messages(channel, count, first_pk=1):
+    return [
+        Message(pk=pk, channel=channel, content='hello', direction=Message.Direction.OUTBOUND)
+        for pk in range(first_pk, first_pk + count)
+    ]
+
+
+class TokenBucketTests(SimpleTestCase):
+    """Buckets hold one burst and refill at the hourly rate."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.bucket = TokenBucket(3600, burst=10, clock=self.clock)
+
+    def test_burst_then_hourly_rate(self):
+        self.assertEqual(self.bucket.take(100), 10)
+        self.assertEqual(self.bucket.take(1), 0)
+        self.assertEqual(self.bucket.wait_time(), 1.0)
+
+        self.clock.now += 5
+        self.assertEqual(self.bucket.take(100), 5)
+
+    def test_refund_is_capped_at_the_burst(self):
+        self.bucket.take(4)
+        self.bucket.refund(100)
+
+        self.assertEqual(self.bucket.take(100), 10)
+
+    def test_default_burst_is_one_minute_of_traffic(self):
+        self.assertEqual(TokenBucket(6000, clock=self.clock).capacity, 100)
+
+
+class OutboundSenderConfigTests(SimpleTestCase):
+    """Channels must name a known provider unless settings supply a default."""
+
+    @override_settings(COMMUNICATIONS_DEFAULT_PROVIDER='')
+    def test_missing_provider_is_an_error(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_sender(make_channel(1))
+
+    @override_settings(COMMUNICATIONS_DEFAULT_PROVIDER='log')
+    def test_unknown_provider_is_an_error(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_sender(make_channel(1, provider='carrier-pigeon'))
+
+    @override_settings(COMMUNICATIONS_DEFAULT_PROVIDER='log')
+    def test_default_provider_from_settings(self):
+        self.assertIsInstance(get_sender(make_channel(1)), LogSender)
+
+
+class OutboundDispatcherTests(SimpleTestCase):
+    """Rounds stay within each bucket, one batch per channel, and survive failures."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(Message.objects, 'bulk_update')
+        self.bulk_update = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def dispatcher(self, channels, queues, senders, max_batch=100):
+        dispatcher = InMemoryDispatcher(channels, queues, max_batch=max_batch, clock=self.clock)
+        dispatcher.senders.update(senders)
+        return dispatcher
+
+    def no_fallback(self):
+        return mock.patch.object(OutboundDispatcher, '_failover_channel', return_value=None)
+
+    def test_unclaimed_tokens_are_refunded(self):
+        channel = make_channel(1)
+        dispatcher = self.dispatcher([channel], {1: make_messages(channel, 4)}, {1: RecordingSender()})
+
+        sent, wait = dispatcher.run_once()
+
+        self.assertEqual(sent, 4)
+        self.assertEqual(wait, 0.0)
+        self.assertEqual(dispatcher.buckets[1].tokens, 6)
+
+    def test_one_batch_per_channel_per_round(self):
+        first, second = make_channel(1), make_channel(2)
+        senders = {1: RecordingSender(), 2: RecordingSender()}
+        dispatcher = self.dispatcher([first, second], {
+            1: make_messages(first, 5), 2: make_messages(second, 5, first_pk=10),
+        }, senders, max_batch=2)
+
+        sent, _ = dispatcher.run_once()
+
+        self.assertEqual(sent, 4)
+        self.assertEqual(dispatcher.claims, [(1, 2), (2, 2)])
+        self.assertEqual(senders[1].batches, [[1, 2]])
+        self.assertEqual(senders[2].batches, [[10, 11]])
+
+    def test_retryable_failure_fails_over_to_same_tenant_channel(self):
+        channel, backup = make_channel(1, tenant_id=7), make_channel(2, tenant_id=7)
+        messages = make_messages(channel, 2)
+        dispatcher = self.dispatcher([channel], {1: messages}, {1: RecordingSender('retry')})
+
+        with mock.patch.object(Channel.objects, 'filter') as candidates:
+            candidates.return_value.exclude.return_value.order_by.return_value = [backup]
+            sent, _ = dispatcher.run_once()
+
+        self.assertEqual(sent, 0)
+        candidates.assert_called_once_with(
+            tenant_id=7, channel_type=Channel.ChannelType.SMS, status=Channel.ChannelStatus.ACTIVE,
+        )
+        self.assertEqual([message.channel for message in messages], [backup, backup])
+        self.assertEqual({message.status for message in messages}, {Message.MessageStatus.QUEUED})
+        self.assertEqual(dispatcher.paused_until[1], self.clock.now + CHANNEL_COOLDOWN_SECONDS)
+
+    def test_raising_sender_requeues_and_pauses_its_channel(self):
+        channel = make_channel(1)
+        messages = make_messages(channel, 3)
+        dispatcher = self.dispatcher([channel], {1: messages}, {1: RecordingSender('raise')})
+
+        with self.no_fallback(), self.assertLogs('communications.outbound', 'ERROR'):
+            sent, _ = dispatcher.run_once()
+
+        self.assertEqual(sent, 0)
+        for message in messages:
+            self.assertEqual(message.status, Message.MessageStatus.QUEUED)
+            self.assertEqual(message.send_attempts, 1)
+            self.assertEqual(message.error_reason, 'provider unreachable')
+        self.assertEqual(self.bulk_update.call_args[0][0], messages)
+        self.assertIn(1, dispatcher.paused_until)
+
+    @override_settings(COMMUNICATIONS_DEFAULT_PROVIDER='')
+    def test_unbuildable_sender_pauses_only_its_channel(self):
+        broken, healthy = make_channel(1, provider='carrier-pigeon'), make_channel(2)
+        queues = {1: make_messages(broken, 2), 2: make_messages(healthy, 2, first_pk=10)}
+        dispatcher = self.dispatcher([broken, healthy], queues, {2: RecordingSender()})
+
+        with self.assertLogs('communications.outbound', 'ERROR'):
+            sent, _ = dispatcher.run_once()
+
+        self.assertEqual(sent, 2)
+        self.assertEqual(len(queues[1]), 2)
+        self.assertEqual(dispatcher.paused_until[1], self.clock.now + CHANNEL_COOLDOWN_SECONDS)
+        self.assertNotIn(1, dispatcher.senders)
+        self.assertEqual(dispatcher.run_once(), (0, None))
+
+
+def whatsapp_payload(messages=(), statuses=()):
+    """WhatsApp Cloud API webhook body with the given message and status items."""
+    return {'object': 'whatsapp_business_account', 'entry': [{'changes': [{'value': {
+        'contacts': [{'wa_id': item['from'], 'profile': {'name': 'Amina'}} for item in messages],
+        'messages': list(messages),
+        'statuses': list(statuses),
+    }}]}]}
+
+
+def whatsapp_text(message_id, sender, body, timestamp):
+    return {'id': message_id, 'from': sender, 'type': 'text', 'text': {'body': body},
+            'timestamp': str(timestamp)}
+
+
+def updates_of(queries, model):
+    table = f'"{model._meta.db_table}"'
+    return [query for query in queries if query['sql'].startswith(f'UPDATE {table}')]
+
+
+class WebhookConsumerTests(TestCase):
+    """Queued webhook events are ingested in batches with a fixed number of writes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(schema_name='acme', name='Acme', paid_until=date(2030, 1, 1))
+        cls.channel = Channel.objects.create(
+            tenant=cls.tenant, name='WhatsApp', channel_type=Channel.ChannelType.WHATSAPP,
+        )
+
+    def queue(self, payload):
+        WebhookEvent.objects.create(
+            provider='whatsapp', channel=self.channel, event_type='whatsapp_business_account',
+            payload=payload,
+        )
+
+    def test_duplicate_external_ids_are_stored_once(self):
+        text = whatsapp_text('wamid.1', '254700000001', 'Hello', 1700000000)
+        self.queue(whatsapp_payload([text]))
+        self.queue(whatsapp_payload([text]))  # provider retry
+
+        self.assertEqual(process_webhook_events(), 2)
+
+        self.assertEqual(Message.objects.filter(external_id='wamid.1').count(), 1)
+        self.assertEqual(Conversation.objects.get().inbound_count, 1)
+        self.assertFalse(WebhookEvent.objects.filter(processed_at__isnull=True).exists())
+
+    def test_new_sender_gets_one_contact_and_one_inbox_update(self):
+        self.queue(whatsapp_payload([
+            whatsapp_text('wamid.1', '254700000002', 'First', 1700000000),
+            whatsapp_text('wamid.3', '254700000002', 'Third', 1700000020),
+            whatsapp_text('wamid.2', '254700000002', 'Second', 1700000010),
+        ]))
+
+        with CaptureQueriesContext(connection) as queries:
+            process_webhook_events()
+
+        contact = Contact.objects.get()
+        self.assertEqual((contact.whatsapp_id, contact.phone, contact.name),
+                         ('254700000002', '254700000002', 'Amina'))
+        conversation = Conversation.objects.get()
+        self.assertEqual(conversation.contact, contact)
+        self.assertEqual(conversation.last_message.external_id, 'wamid.3')
+        self.assertEqual(conversation.last_message_preview, 'Third')
+        self.assertEqual(conversation.inbound_count, 3)
+        self.assertEqual(len(updates_of(queries.captured_queries, Conversation)), 1)
+
+    def test_known_sender_is_matched_by_phone(self):
+        known = Contact.objects.create(tenant=self.tenant, name='Known', phone='254700000003')
+        self.queue(whatsapp_payload([whatsapp_text('wamid.1', '254700000003', 'Hi', 1700000000)]))
+
+        process_webhook_events()
+
+        self.assertEqual(Contact.objects.count(), 1)
+        self.assertEqual(Message.objects.get().contact, known)
+
+    def test_blank_sender_ids_do_not_conflict(self):
+        Contact.objects.create(tenant=self.tenant, name='One', phone='1', whatsapp_id='', facebook_id='')
+        Contact.objects.create(tenant=self.tenant, name='Two', phone='2', whatsapp_id='', facebook_id='')
+
+        self.assertEqual(Contact.objects.filter(whatsapp_id='').count(), 2)
+
+    def test_delivered_and_read_collapse_into_one_update(self):
+        sent = Message.objects.create(
+            channel=self.channel, external_id='wamid.out', content='Reply',
+            direction=Message.Direction.OUTBOUND, status=Message.MessageStatus.SENT,
+        )
+        self.queue(whatsapp_payload(statuses=[{'id': 'wamid.out', 'status': 'delivered'}]))
+        self.queue(whatsapp_payload(statuses=[
+            {'id': 'wamid.out', 'status': 'read'},
+            {'id': 'wamid.out', 'status': 'delivered'},  # late
+        ]))
+
+        with CaptureQueriesContext(connection) as queries:
+            process_webhook_events()
+
+        sent.refresh_from_db()
+        self.assertEqual(sent.status, Message.MessageStatus.READ)
+        self.assertEqual(len(updates_of(queries.captured_queries, Message)), 1)
+
+
+class InboxTests(TestCase):
+    """Inbox columns and per-user unread counts follow new messages."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(schema_name='acme', name='Acme', paid_until=date(2030, 1, 1))
+        cls.channel = Channel.objects.create(tenant=cls.tenant, name='SMS', channel_type=Channel.ChannelType.SMS)
+        cls.alice = User.objects.create_user(username='alice', password='secret', tenant=cls.tenant)
+        cls.bob = User.objects.create_user(username='bob', password='secret', tenant=cls.tenant)
+        cls.start = timezone.now() - timedelta(hours=1)
+
+    def setUp(self):
+        contact = Contact.objects.create(tenant=self.tenant, name='Amina', phone='254700000001')
+        self.conversation = Conversation.objects.create(
+            tenant=self.tenant, contact=contact, channel=self.channel, last_activity_at=self.start,
+        )
+
+    def message(self, content):
+        return Message.objects.create(
+            channel=self.channel, contact=self.conversation.contact, content=content,
+            direction=Message.Direction.INBOUND, status=Message.MessageStatus.DELIVERED,
+        )
+
+    def test_record_activity_is_one_update(self):
+        message = self.message('Hello')
+        at = self.start + timedelta(minutes=5)
+
+        with self.assertNumQueries(1):
+            record_activity({self.conversation.pk: (message.pk, at, 'Hello', 2)})
+
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.last_message, message)
+        self.assertEqual(self.conversation.last_message_preview, 'Hello')
+        self.assertEqual(self.conversation.last_activity_at, at)
+        self.assertEqual(self.conversation.inbound_count, 2)
+
+    def test_late_batch_keeps_the_newest_last_message(self):
+        older, newer = self.message('First'), self.message('Second')
+        record_activity({self.conversation.pk: (newer.pk, self.start + timedelta(minutes=10), 'Second', 1)})
+
+        record_activity({self.conversation.pk: (older.pk, self.start + timedelta(minutes=5), 'First', 1)})
+
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.last_message, newer)
+        self.assertEqual(self.conversation.last_message_preview, 'Second')
+        self.assertEqual(self.conversation.last_activity_at, self.start + timedelta(minutes=10))
+        self.assertEqual(self.conversation.inbound_count, 2)
+
+    def test_unread_counts_are_per_user(self):
+        message = self.message('Hello')
+        record_activity({self.conversation.pk: (message.pk, timezone.now(), 'Hello', 3)})
+        self.conversation.refresh_from_db()
+        mark_read(self.conversation, self.alice)
+        record_activity({self.conversation.pk: (message.pk, timezone.now(), 'Hello', 2)})
+
+        with self.assertNumQueries(2):  # The page and its tags
+            alice = list(inbox_queryset(self.alice, self.tenant))
+        bob = list(inbox_queryset(self.bob, self.tenant))
+
+        self.assertEqual([row.unread_count for row in alice], [2])
+        self.assertEqual([row.unread_count for row in bob], [5])
+
+    def test_mark_read_moves_one_cursor(self):
+        record_activity({self.conversation.pk: (self.message('Hello').pk, timezone.now(), 'Hello', 1)})
+        self.conversation.refresh_from_db()
+        mark_read(self.conversation, self.alice)
+        record_activity({self.conversation.pk: (self.message('Again').pk, timezone.now(), 'Again', 1)})
+        self.conversation.refresh_from_db()
+
+        cursor = mark_read(self.conversation, self.alice)
+
+        self.assertEqual(cursor.read_count, 2)
+        self.assertEqual(ConversationReadCursor.objects.filter(user=self.alice).count(), 1)
+        self.assertEqual(inbox_queryset(self.alice, self.tenant).get().unread_count, 0)
+
+    def test_closed_conversations_leave_the_open_inbox(self):
+        Conversation.objects.filter(pk=self.conversation.pk).update(is_open=False)
+
+        self.assertFalse(inbox_queryset(self.alice, self.tenant).exists())
+        self.assertTrue(inbox_queryset(self.alice, self.tenant, open_only=False).exists())
@@ -5,9 +5,11 @@ from .views import (
     ContactListCreateAPIView, ContactRetrieveUpdateDestroyAPIView,
     MessageListCreateAPIView, MessageRetrieveUpdateDestroyAPIView,
     ConversationListCreateAPIView, ConversationRetrieveUpdateDestroyAPIView,
+    ConversationMarkReadAPIView,
     TagListCreateAPIView, TagRetrieveUpdateDestroyAPIView,
     CallLogListAPIView, CallLogRetrieveAPIView,
-    TemplateListCreateAPIView, TemplateRetrieveUpdateDestroyAPIView,originate_call
+    TemplateListCreateAPIView, TemplateRetrieveUpdateDestroyAPIView,originate_call,
+    WebhookIngestAPIView
 )
 
 urlpatterns = [
@@ -26,6 +28,7 @@ urlpatterns = [
     # Conversations
     path('conversations/', ConversationListCreateAPIView.as_view(), name='conversation-list'),
     path('conversations/<int:pk>/', ConversationRetrieveUpdateDestroyAPIView.as_view(), name='conversation-detail'),
+    path('conversations/<int:pk>/read/', ConversationMarkReadAPIView.as_view(), name='conversation-read'),
     
     # Tags
     path('tags/', TagListCreateAPIView.as_view(), name='tag-list'),
@@ -39,6 +42,8 @@ urlpatterns = [
     path('templates/', TemplateListCreateAPIView.as_view(), name='template-list'),
     path('templates/<int:pk>/', TemplateRetrieveUpdateDestroyAPIView.as_view(), name='template-detail'),
     
+    # Provider webhooks (inbound messages and status callbacks)
+    path('webhooks/<str:provider>/<int:channel_id>/', WebhookIngestAPIView.as_view(), name='webhook-ingest'),
     
     # ARI (Automated Response Interface) URLs
      path('originate_call/', originate_call, name='originate_call'),
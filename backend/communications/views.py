@@ -1,17 +1,27 @@
 # core/views.py
+import hmac
+
 from rest_framework import generics, permissions, status
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.core.cache import cache
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from .models import (
     Channel, Contact, Message, Conversation,
-    Tag, CallLog, Template
+    Tag, CallLog, Template, WebhookEvent
 )
 from .serializers import (
     ChannelSerializer, ContactSerializer, MessageSerializer,
     ConversationSerializer, TagSerializer, CallLogSerializer,
-    TemplateSerializer
+    TemplateSerializer, WebhookPayloadSerializer
 )
+from .inbox import inbox_queryset, mark_read, record_message
 from .permissions import IsTenantMember
+from .webhooks import (
+    PROVIDER_CHANNEL_TYPES, SIGNATURE_VERIFIERS, SUBSCRIPTION_PROVIDERS, detect_event_type
+)
 
 class ChannelListCreateAPIView(generics.ListCreateAPIView):
     serializer_class = ChannelSerializer
@@ -61,7 +71,12 @@ class MessageListCreateAPIView(generics.ListCreateAPIView):
             id=serializer.validated_data['channel'].id,
             tenant=self.request.user.tenant
         )
-        serializer.save(channel=channel)
+        if serializer.validated_data['direction'] == Message.Direction.OUTBOUND:
+            # Sent by the outbound dispatcher at the channel's rate limit
+            message = serializer.save(channel=channel, status=Message.MessageStatus.QUEUED, external_id='')
+        else:
+            message = serializer.save(channel=channel)
+        record_message(message)
 
 class MessageRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = MessageSerializer
@@ -70,12 +85,24 @@ class MessageRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView)
     def get_queryset(self):
         return Message.objects.filter(channel__tenant=self.request.user.tenant)
 
+class InboxPagination(CursorPagination):
+    # Keyset pages stay constant-time deep into a 100k-conversation inbox
+    ordering = ('-last_activity_at', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
 class ConversationListCreateAPIView(generics.ListCreateAPIView):
     serializer_class = ConversationSerializer
     permission_classes = [permissions.IsAuthenticated, IsTenantMember]
+    pagination_class = InboxPagination
     
     def get_queryset(self):
-        return Conversation.objects.filter(tenant=self.request.user.tenant)
+        # ?all=1 includes closed conversations
+        open_only = self.request.query_params.get('all') not in ('1', 'true')
+        return inbox_queryset(
+            self.request.user, self.request.user.tenant, open_only=open_only
+        )
     
     def perform_create(self, serializer):
         serializer.save(tenant=self.request.user.tenant)
@@ -87,6 +114,14 @@ class ConversationRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPI
     def get_queryset(self):
         return Conversation.objects.filter(tenant=self.request.user.tenant)
 
+class ConversationMarkReadAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsTenantMember]
+
+    def post(self, request, pk):
+        conversation = get_object_or_404(Conversation, pk=pk, tenant=request.user.tenant)
+        cursor = mark_read(conversation, request.user)
+        return Response({'read_count': cursor.read_count, 'unread_count': 0})
+
 class TagListCreateAPIView(generics.ListCreateAPIView):
     serializer_class = TagSerializer
     permission_classes = [permissions.IsAuthenticated, IsTenantMember]
@@ -135,26 +170,130 @@ class TemplateRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView
     def get_queryset(self):
         return Template.objects.filter(tenant=self.request.user.tenant)
     
+
+
+class WebhookIngestAPIView(APIView):
+    """
+    Receives provider webhooks for a channel and queues them for processing.
+    
+    Only validation and a single INSERT happen here; parsing, deduplication
+    and contact/conversation upserts run in batches in
+    ``communications.webhooks.process_webhook_events``.
+    
+    Every request must be authenticated by the provider:
+    - WhatsApp / Facebook: ``X-Hub-Signature-256`` signed with the channel
+      config's ``app_secret``,
+    - Twilio: ``X-Twilio-Signature`` signed with the channel's ``auth_token``,
+    - providers without request signing: the channel's ``webhook_token`` in
+      the ``X-Webhook-Token`` header.
+    
+    Meta confirms the callback URL with a GET carrying ``hub.challenge``,
+    which is echoed back when ``hub.verify_token`` matches the channel's
+    ``verify_token``.
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
     
+    CHANNEL_CACHE_TIMEOUT = 60
+    CHANNEL_SECRET_KEYS = ('webhook_token', 'app_secret', 'auth_token', 'verify_token')
     
+    def get(self, request, provider, channel_id):
+        provider = provider.lower()
+        channel = self.get_channel(channel_id)
+        if (
+            provider not in SUBSCRIPTION_PROVIDERS
+            or channel is None
+            or channel['channel_type'] not in PROVIDER_CHANNEL_TYPES[provider]
+        ):
+            return Response({'error': 'Unknown channel'}, status=status.HTTP_404_NOT_FOUND)
+        
+        verify_token = channel['verify_token']
+        if (
+            request.query_params.get('hub.mode') != 'subscribe'
+            or not verify_token
+            or not hmac.compare_digest(request.query_params.get('hub.verify_token', ''), verify_token)
+        ):
+            return Response({'error': 'Invalid verify token'}, status=status.HTTP_403_FORBIDDEN)
+        return HttpResponse(request.query_params.get('hub.challenge', ''), content_type='text/plain')
     
+    def post(self, request, provider, channel_id):
+        provider = provider.lower()
+        channel = self.get_channel(channel_id)
+        if (
+            provider not in PROVIDER_CHANNEL_TYPES
+            or channel is None
+            or channel['channel_type'] not in PROVIDER_CHANNEL_TYPES[provider]
+        ):
+            return Response({'error': 'Unknown channel'}, status=status.HTTP_404_NOT_FOUND)
+        
+        # Signatures cover the raw body, so check them before DRF parses it
+        if not self.is_authentic(request, provider, channel):
+            return Response({'error': 'Invalid webhook signature'}, status=status.HTTP_403_FORBIDDEN)
+        
+        serializer = WebhookPayloadSerializer(data={
+            'provider': provider,
+            'event_type': 'pending',
+            'payload': request.data.dict() if hasattr(request.data, 'dict') else request.data,
+        })
+        serializer.is_valid(raise_exception=True)
+        provider = serializer.validated_data['provider']
+        payload = serializer.validated_data['payload']
+        if not isinstance(payload, dict):
+            return Response({'error': 'Payload must be an object'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        WebhookEvent.objects.create(
+            provider=provider,
+            channel_id=channel_id,
+            event_type=detect_event_type(provider, payload),
+            payload=payload,
+        )
+        return Response(status=status.HTTP_202_ACCEPTED)
+    
+    def is_authentic(self, request, provider, channel):
+        """Check the provider signature (or shared token); a channel without a secret rejects everything."""
+        if provider in SIGNATURE_VERIFIERS:
+            secret_key, verify = SIGNATURE_VERIFIERS[provider]
+            secret = channel[secret_key]
+            return bool(secret) and verify(secret, request)
+        token = channel['webhook_token']
+        return bool(token) and hmac.compare_digest(request.headers.get('X-Webhook-Token', ''), token)
+    
+    def get_channel(self, channel_id):
+        """Active channel summary, cached briefly to keep the hot path to one INSERT."""
+        cache_key = f'webhook_channel_auth:{channel_id}'
+        channel = cache.get(cache_key)
+        if channel is None:
+            row = Channel.objects.filter(
+                pk=channel_id, status=Channel.ChannelStatus.ACTIVE
+            ).values('channel_type', 'config').first()
+            if row:
+                config = row['config'] or {}
+                channel = {key: config.get(key, '') for key in self.CHANNEL_SECRET_KEYS}
+                channel['channel_type'] = row['channel_type']
+            else:
+                channel = {}
+            cache.set(cache_key, channel, self.CHANNEL_CACHE_TIMEOUT)
+        return channel or None
 
 
 # Asterisks API
 
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from .asterisks.ari_client import ARIClient
-
-ari = ARIClient()
+from .asterisks.ari_client import ARIError, get_ari_client
 
 @csrf_exempt
 def originate_call(request):
     if request.method == 'POST':
         endpoint = request.POST.get('endpoint')  # e.g., "PJSIP/1001"
         extension = request.POST.get('extension')  # e.g., "1002"
-        result = ari.originate_call(endpoint, extension)
-        return JsonResponse(result)
+        # The ARI client is started on first use, not at import time
+        ari = get_ari_client()
+        try:
+            result = ari.run(ari.client.originate_call(endpoint, extension), timeout=10)
+        except ARIError as e:
+            return JsonResponse({'error': str(e)}, status=502)
+        return JsonResponse(result or {})
     return JsonResponse({'error': 'POST required'})
 
 def handle_ari_event(event):
@@ -0,0 +1,473 @@
+# communications/webhooks.py
+"""
+Inbound webhook ingestion for WhatsApp, SMS (Twilio) and Facebook Messenger.
+
+The webhook view only validates the request and stores the raw payload as a
+``WebhookEvent`` row (one INSERT), so providers get their acknowledgement
+within milliseconds and nothing is lost if processing falls behind.
+
+``process_webhook_events`` drains that queue in batches:
+- payloads are normalised into inbound messages and status callbacks,
+- inbound messages are deduplicated on ``(channel, external_id)``,
+- ``Contact`` and ``Conversation`` rows are looked up in bulk; missing ones
+  are bulk-inserted with ``ignore_conflicts`` (their sender ids are unique,
+  so concurrent consumers cannot duplicate them) and read back,
+- conversation inbox columns (last message, unread counter) are updated
+  with one UPDATE per batch (see ``inbox.record_activity``),
+- status callbacks (SENT/DELIVERED/READ/FAILED) collapse into one UPDATE.
+"""
+import base64
+import hashlib
+import hmac
+import logging
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from .inbox import record_activity
+from .models import Channel, Contact, Conversation, Message, WebhookEvent
+
+logger = logging.getLogger(__name__)
+
+# provider -> channel types it may post to
+PROVIDER_CHANNEL_TYPES = {
+    'whatsapp': {Channel.ChannelType.WHATSAPP},
+    'twilio': {Channel.ChannelType.SMS, Channel.ChannelType.WHATSAPP},
+    'facebook': {Channel.ChannelType.FACEBOOK},
+    'asterisk': {Channel.ChannelType.ASTERISK},
+}
+
+# Status callbacks never move a message backwards (e.g. a late DELIVERED after
+# READ). DELIVERED and READ are terminal: a stray FAILED for a message the
+# recipient already has must not overwrite them.
+STATUS_RANK = {
+    Message.MessageStatus.QUEUED: 0,
+    Message.MessageStatus.SENDING: 0,
+    Message.MessageStatus.SENT: 1,
+    Message.MessageStatus.FAILED: 2,
+    Message.MessageStatus.DELIVERED: 3,
+    Message.MessageStatus.READ: 4,
+}
+
+PROVIDER_STATUSES = {
+    'queued': Message.MessageStatus.QUEUED,
+    'accepted': Message.MessageStatus.QUEUED,
+    'sending': Message.MessageStatus.QUEUED,
+    'sent': Message.MessageStatus.SENT,
+    'delivered': Message.MessageStatus.DELIVERED,
+    'read': Message.MessageStatus.READ,
+    'failed': Message.MessageStatus.FAILED,
+    'undelivered': Message.MessageStatus.FAILED,
+}
+
+DEFAULT_BATCH_SIZE = 500
+
+
+class InboundMessage:
+    __slots__ = ('external_id', 'address', 'name', 'content', 'media_url', 'media_type', 'timestamp', 'raw')
+
+    def __init__(self, external_id, address, content='', name='', media_url=None,
+                 media_type=None, timestamp=None, raw=None):
+        self.external_id = external_id
+        self.address = address
+        self.name = name
+        self.content = content
+        self.media_url = media_url
+        self.media_type = media_type
+        self.timestamp = timestamp or timezone.now()
+        self.raw = raw or {}
+
+
+class StatusUpdate:
+    __slots__ = ('external_id', 'status', 'error')
+
+    def __init__(self, external_id, status, error=None):
+        self.external_id = external_id
+        self.status = status
+        self.error = error
+
+
+# ---------------------------------------------------------------------------
+# Request authentication
+# ---------------------------------------------------------------------------
+
+def verify_meta_signature(secret, request):
+    """WhatsApp Cloud API / Messenger: ``X-Hub-Signature-256`` is ``sha256=`` + HMAC of the raw body."""
+    expected = 'sha256=' + hmac.new(secret.encode(), request.body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(request.headers.get('X-Hub-Signature-256', ''), expected)
+
+
+def verify_twilio_signature(secret, request):
+    """Twilio: ``X-Twilio-Signature`` is base64 HMAC-SHA1 of the URL followed by the sorted form fields."""
+    signed = request.build_absolute_uri()
+    params = request.POST
+    for key in sorted(params):
+        for value in sorted(params.getlist(key)):
+            signed += key + value
+    expected = base64.b64encode(hmac.new(secret.encode(), signed.encode(), hashlib.sha1).digest()).decode()
+    return hmac.compare_digest(request.headers.get('X-Twilio-Signature', ''), expected)
+
+
+# provider -> (channel config key holding the signing secret, verifier)
+SIGNATURE_VERIFIERS = {
+    'whatsapp': ('app_secret', verify_meta_signature),
+    'facebook': ('app_secret', verify_meta_signature),
+    'twilio': ('auth_token', verify_twilio_signature),
+}
+
+# Providers that confirm the callback URL with a GET ``hub.challenge`` handshake
+SUBSCRIPTION_PROVIDERS = {'whatsapp', 'facebook'}
+
+
+def _from_epoch(value):
+    try:
+        return datetime.fromtimestamp(int(value), tz=dt_timezone.utc)
+    except (TypeError, ValueError):
+        return None
+
+
+def detect_event_type(provider, payload):
+    """Cheap classification stored with the raw event (no full parsing on the request path)."""
+    if provider == 'twilio':
+        if payload.get('MessageStatus') and 'Body' not in payload:
+            return 'status'
+        return 'message'
+    return str(payload.get('object') or payload.get('type') or 'event')[:50]
+
+
+# ---------------------------------------------------------------------------
+# Provider payload parsing
+# ---------------------------------------------------------------------------
+
+def parse_whatsapp(payload):
+    """WhatsApp Cloud API: entry[].changes[].value.{messages, contacts, statuses}."""
+    messages, statuses = [], []
+    for entry in payload.get('entry', []):
+        for change in entry.get('changes', []):
+            value = change.get('value', {})
+            names = {
+                contact.get('wa_id'): contact.get('profile', {}).get('name', '')
+                for contact in value.get('contacts', [])
+            }
+            for item in value.get('messages', []):
+                message_type = item.get('type', 'text')
+                body = item.get(message_type, {}) if isinstance(item.get(message_type), dict) else {}
+                messages.append(InboundMessage(
+                    external_id=item['id'],
+                    address=item['from'],
+                    name=names.get(item['from'], ''),
+                    content=item.get('text', {}).get('body') or body.get('caption', ''),
+                    media_url=body.get('link') if message_type != 'text' else None,
+                    media_type=body.get('mime_type') if message_type != 'text' else None,
+                    timestamp=_from_epoch(item.get('timestamp')),
+                    raw=item,
+                ))
+            for item in value.get('statuses', []):
+                status = PROVIDER_STATUSES.get(item.get('status'))
+                if status:
+                    errors = item.get('errors') or [{}]
+                    statuses.append(StatusUpdate(item['id'], status, errors[0].get('title')))
+    return messages, statuses
+
+
+def parse_twilio(payload):
+    """Twilio SMS/WhatsApp form posts: inbound message or MessageStatus callback."""
+    external_id = payload.get('MessageSid') or payload.get('SmsSid')
+    if not external_id:
+        return [], []
+    if 'Body' not in payload:
+        status = PROVIDER_STATUSES.get(payload.get('MessageStatus') or payload.get('SmsStatus'))
+        if not status:
+            return [], []
+        return [], [StatusUpdate(external_id, status, payload.get('ErrorCode'))]
+    address = payload.get('From', '').replace('whatsapp:', '')
+    return [InboundMessage(
+        external_id=external_id,
+        address=address,
+        name=payload.get('ProfileName', ''),
+        content=payload.get('Body', ''),
+        media_url=payload.get('MediaUrl0'),
+        media_type=payload.get('MediaContentType0'),
+        raw=payload,
+    )], []
+
+
+def parse_facebook(payload):
+    """Messenger Platform: entry[].messaging[] with message or delivery events."""
+    messages, statuses = [], []
+    for entry in payload.get('entry', []):
+        for item in entry.get('messaging', []):
+            sender = item.get('sender', {}).get('id')
+            if 'message' in item and not item['message'].get('is_echo'):
+                message = item['message']
+                attachment = (message.get('attachments') or [{}])[0]
+                messages.append(InboundMessage(
+                    external_id=message['mid'],
+                    address=sender,
+                    content=message.get('text', ''),
+                    media_url=attachment.get('payload', {}).get('url'),
+                    media_type=attachment.get('type'),
+                    timestamp=_from_epoch(item['timestamp'] // 1000) if item.get('timestamp') else None,
+                    raw=item,
+                ))
+            elif 'delivery' in item:
+                for mid in item['delivery'].get('mids', []):
+                    statuses.append(StatusUpdate(mid, Message.MessageStatus.DELIVERED))
+            # 'read' events carry a watermark rather than message ids and are not tracked here
+    return messages, statuses
+
+
+PARSERS = {
+    'whatsapp': parse_whatsapp,
+    'twilio': parse_twilio,
+    'facebook': parse_facebook,
+}
+
+
+def parse_event(event):
+    parser = PARSERS.get(event.provider)
+    if parser is None:
+        return [], []
+    return parser(event.payload)
+
+
+# ---------------------------------------------------------------------------
+# Batch processing
+# ---------------------------------------------------------------------------
+
+def contact_lookup_field(channel):
+    """Contact field that identifies a sender on this channel."""
+    if channel.channel_type == Channel.ChannelType.FACEBOOK:
+        return 'facebook_id'
+    if channel.channel_type == Channel.ChannelType.WHATSAPP:
+        return 'whatsapp_id'
+    return 'phone'
+
+
+def process_webhook_events(batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Process one batch of pending webhook events.
+
+    Returns:
+        int: number of events processed (0 when the queue is empty)
+    """
+    with transaction.atomic():
+        events = list(
+            WebhookEvent.objects
+            .select_for_update(skip_locked=True)
+            .filter(processed_at__isnull=True)
+            .select_related('channel')
+            .order_by('id')[:batch_size]
+        )
+        if not events:
+            return 0
+
+        inbound = []   # (channel, InboundMessage)
+        statuses = []  # (channel, StatusUpdate)
+        failed = {}
+        for event in events:
+            try:
+                messages, updates = parse_event(event)
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                failed[event.pk] = f"Unparseable payload: {e}"
+                continue
+            inbound.extend((event.channel, message) for message in messages)
+            statuses.extend((event.channel, update) for update in updates)
+
+        if inbound:
+            _ingest_messages(inbound)
+        if statuses:
+            _apply_statuses(statuses)
+
+        now = timezone.now()
+        WebhookEvent.objects.filter(pk__in=[e.pk for e in events if e.pk not in failed]).update(processed_at=now)
+        for pk, error in failed.items():
+            WebhookEvent.objects.filter(pk=pk).update(processed_at=now, error=error)
+
+    if failed:
+        logger.warning("Skipped %d unparseable webhook events", len(failed))
+    return len(events)
+
+
+def _ingest_messages(inbound):
+    # Deduplicate within the batch, then against stored messages
+    unique = {}
+    for channel, message in inbound:
+        unique.setdefault((channel.pk, message.external_id), (channel, message))
+
+    existing = set(
+        Message.objects.filter(
+            direction=Message.Direction.INBOUND,
+            channel_id__in={key[0] for key in unique},
+            external_id__in={key[1] for key in unique},
+        ).values_list('channel_id', 'external_id')
+    )
+    pending = [value for key, value in unique.items() if key not in existing]
+    if not pending:
+        return
+
+    contacts = _upsert_contacts(pending)
+    conversations = _upsert_conversations(pending, contacts)
+
+    Message.objects.bulk_create(
+        [
+            Message(
+                channel=channel,
+                contact_id=contacts[(channel.tenant_id, contact_lookup_field(channel), message.address)],
+                external_id=message.external_id,
+                direction=Message.Direction.INBOUND,
+                content=message.content,
+                status=Message.MessageStatus.DELIVERED,
+                media_url=message.media_url,
+                media_type=message.media_type,
+                metadata=message.raw,
+            )
+            for channel, message in pending
+        ],
+        batch_size=DEFAULT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+    # ignore_conflicts does not return ids; read them back in one query
+    stored = dict(
+        ((channel_id, external_id), pk)
+        for channel_id, external_id, pk in Message.objects.filter(
+            direction=Message.Direction.INBOUND,
+            channel_id__in={channel.pk for channel, _ in pending},
+            external_id__in={message.external_id for _, message in pending},
+        ).values_list('channel_id', 'external_id', 'pk')
+    )
+
+    # Latest message and inbound count per conversation, one UPDATE for the batch
+    activity = {}
+    for channel, message in pending:
+        message_id = stored.get((channel.pk, message.external_id))
+        if message_id is None:
+            continue
+        contact_id = contacts[(channel.tenant_id, contact_lookup_field(channel), message.address)]
+        conversation = conversations[(contact_id, channel.pk)]
+        current = activity.get(conversation.pk)
+        if current is None:
+            activity[conversation.pk] = (message_id, message.timestamp, message.content, 1)
+        elif message.timestamp >= current[1]:
+            activity[conversation.pk] = (message_id, message.timestamp, message.content, current[3] + 1)
+        else:
+            activity[conversation.pk] = current[:3] + (current[3] + 1,)
+    record_activity(activity)
+
+
+def _upsert_contacts(pending):
+    """Return ``{(tenant_id, field, address): contact_id}``, creating missing contacts in bulk."""
+    wanted = {}
+    for channel, message in pending:
+        key = (channel.tenant_id, contact_lookup_field(channel), message.address)
+        wanted.setdefault(key, message.name)
+
+    def load():
+        found = {}
+        by_field = {}
+        for tenant_id, field, address in wanted:
+            by_field.setdefault(field, set()).add((tenant_id, address))
+        for field, keys in by_field.items():
+            addresses = {address for _, address in keys}
+            match = Q(**{f'{field}__in': addresses})
+            if field == 'whatsapp_id':
+                # Also match contacts known by phone number (unique per tenant)
+                match |= Q(phone__in=addresses)
+            rows = Contact.objects.filter(
+                match, tenant_id__in={tenant_id for tenant_id, _ in keys}
+            ).values_list('tenant_id', field, 'phone', 'pk')
+            for tenant_id, identifier, phone, pk in rows:
+                address = identifier if identifier in addresses else phone
+                found.setdefault((tenant_id, field, address), pk)
+        return found
+
+    found = load()
+    missing = [key for key in wanted if key not in found]
+    if missing:
+        # (tenant, sender id) is unique, so rows a concurrent consumer created
+        # in the meantime are skipped here and picked up by the reload
+        Contact.objects.bulk_create(
+            [
+                Contact(
+                    tenant_id=tenant_id, name=wanted[(tenant_id, field, address)] or address,
+                    **{field: address}, **({'phone': address} if field == 'whatsapp_id' else {}),
+                )
+                for tenant_id, field, address in missing
+            ],
+            batch_size=DEFAULT_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        found = load()
+    return found
+
+
+def _upsert_conversations(pending, contacts):
+    """Return ``{(contact_id, channel_id): Conversation}``, creating missing ones in bulk."""
+    wanted = {}
+    for channel, message in pending:
+        contact_id = contacts[(channel.tenant_id, contact_lookup_field(channel), message.address)]
+        # New conversations start at their first message, not at ingestion time
+        tenant_id, started = wanted.get((contact_id, channel.pk), (channel.tenant_id, message.timestamp))
+        wanted[(contact_id, channel.pk)] = (tenant_id, min(started, message.timestamp))
+
+    def load():
+        rows = Conversation.objects.filter(
+            contact_id__in={contact_id for contact_id, _ in wanted},
+            channel_id__in={channel_id for _, channel_id in wanted},
+        )
+        return {(row.contact_id, row.channel_id): row for row in rows}
+
+    found = load()
+    missing = [key for key in wanted if key not in found]
+    if missing:
+        Conversation.objects.bulk_create(
+            [
+                Conversation(
+                    tenant_id=wanted[key][0], contact_id=key[0], channel_id=key[1],
+                    last_activity_at=wanted[key][1],
+                )
+                for key in missing
+            ],
+            batch_size=DEFAULT_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        found = load()
+    return found
+
+
+def _apply_statuses(statuses):
+    """Apply every status callback of the batch with a single UPDATE."""
+    final = {}
+    for channel, update in statuses:
+        key = (channel.pk, update.external_id)
+        current = final.get(key)
+        if current is None or STATUS_RANK[update.status] > STATUS_RANK[current.status]:
+            final[key] = update
+
+    now = timezone.now()
+    whens = []
+    time_whens = []
+    error_whens = []
+    for (channel_id, external_id), update in final.items():
+        lower = [status for status, rank in STATUS_RANK.items() if rank < STATUS_RANK[update.status]]
+        match = Q(channel_id=channel_id, external_id=external_id, status__in=lower)
+        whens.append(When(match, then=Value(update.status)))
+        time_whens.append(When(match, then=Value(now)))
+        if update.error:
+            error_whens.append(When(match, then=Value(str(update.error))))
+
+    updates = {
+        'status': Case(*whens, default=F('status')),
+        'status_updated_at': Case(*time_whens, default=F('status_updated_at')),
+    }
+    if error_whens:
+        updates['error_reason'] = Case(*error_whens, default=F('error_reason'))
+
+    Message.objects.filter(
+        direction=Message.Direction.OUTBOUND,
+        channel_id__in={key[0] for key in final},
+        external_id__in={key[1] for key in final},
+    ).update(**updates)
@@ -1,5 +1,5 @@
 # apps/accounts/models.py
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import RegexValidator
@@ -7,6 +7,7 @@ from django.utils import timezone as django_timezone
 from django.core.exceptions import ValidationError
 from apps.core.models import TimeStampedModel, SoftDeleteModel
 from .managers import UserManager
+from .presence import PresenceService
 
 
 class User(AbstractBaseUser, PermissionsMixin, TimeStampedModel):
@@ -357,6 +358,9 @@ class User(AbstractBaseUser, PermissionsMixin, TimeStampedModel):
             self.break_start_time = None
         
         self.save(update_fields=['agent_status', 'last_activity', 'break_start_time', 'last_break_time', 'last_break_type'])
+        
+        # Keep the routing presence store in step once the change is committed
+        transaction.on_commit(lambda: PresenceService.refresh_agent(self))
     
     def start_shift(self):
         """Mark the start of a shift"""
@@ -0,0 +1,463 @@
+# apps/accounts/presence.py
+"""
+Agent presence and workload store.
+
+Routing reads agent state from here instead of the User table. For each
+agent the store keeps one record (status, skills, languages, open case
+count and limit) plus membership in per-skill queues:
+
+- ``cases:<skill>``: agents who may take a new case, ordered by open case
+  count and then by when they were last given one,
+- ``calls:<skill>``: agents in the ``available`` status, ordered by how
+  long they have been waiting for a call.
+
+Every agent is also queued under ``ANY_SKILL``. Records are written in full
+by ``sync_agent`` (on status changes and by the periodic
+``sync_agent_presence`` task) and adjusted incrementally as cases are
+assigned, closed and reopened. An agent claimed for a call stays busy
+across periodic syncs until the call is released, the agent changes
+status, or ``AGENT_ROUTING['CALL_CLAIM_SECONDS']`` pass.
+
+The store lives in Redis, so every worker shares it. When Redis cannot be
+reached, or ``AGENT_ROUTING['BACKEND']`` is ``'local'``, a per-process store
+with the same behaviour is used instead.
+"""
+import heapq
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+ANY_SKILL = '*'
+OPEN_CASE_STATUSES = ['open', 'in_progress', 'pending', 'escalated']
+ROUTABLE_ROLES = ['agent', 'supervisor']
+CASE_STATUSES = ['available', 'busy']
+DEFAULT_CASE_LIMITS = {'agent': 20, 'supervisor': 30, 'manager': 50, 'admin': 100}
+DEFAULT_CALL_CLAIM_SECONDS = 4 * 60 * 60
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _setting(name, default=None):
+    return getattr(settings, 'AGENT_ROUTING', {}).get(name, default)
+
+
+class _Queue:
+    """Min-priority queue with O(log n) insert, update and removal (lazy deletion)."""
+
+    def __init__(self):
+        self.scores = {}
+        self.heap = []
+
+    def add(self, member, score):
+        self.scores[member] = score
+        heapq.heappush(self.heap, (score, member))
+        if len(self.heap) > 2 * len(self.scores) + 64:
+            self.heap = [(s, m) for m, s in self.scores.items()]
+            heapq.heapify(self.heap)
+
+    def remove(self, member):
+        return self.scores.pop(member, None) is not None
+
+    def first(self, limit):
+        # Pop the `limit` best live entries, discarding stale ones, then put
+        # the live ones back
+        found = []
+        while self.heap and len(found) < limit:
+            score, member = heapq.heappop(self.heap)
+            if self.scores.get(member) == score and member not in found:
+                found.append(member)
+        for member in found:
+            heapq.heappush(self.heap, (self.scores[member], member))
+        return found
+
+
+class LocalBackend:
+    """In-process store, used when Redis is unavailable and in tests."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records = {}
+        self._queues = {}
+
+    def get(self, key):
+        with self._lock:
+            return dict(self._records.get(key, {}))
+
+    def get_many(self, keys):
+        with self._lock:
+            return [dict(self._records.get(key, {})) for key in keys]
+
+    def set(self, key, mapping):
+        with self._lock:
+            self._records.setdefault(key, {}).update({k: str(v) for k, v in mapping.items()})
+
+    def incr(self, key, field, amount):
+        with self._lock:
+            record = self._records.setdefault(key, {})
+            value = int(record.get(field, 0)) + amount
+            record[field] = str(value)
+            return value
+
+    def delete(self, key):
+        with self._lock:
+            self._records.pop(key, None)
+
+    def queue_add(self, key, member, score):
+        with self._lock:
+            self._queues.setdefault(key, _Queue()).add(str(member), score)
+
+    def queue_remove(self, key, member):
+        with self._lock:
+            queue = self._queues.get(key)
+            return bool(queue and queue.remove(str(member)))
+
+    def queue_first(self, key, limit):
+        with self._lock:
+            queue = self._queues.get(key)
+            return queue.first(limit) if queue else []
+
+
+class RedisBackend:
+    """Shared store: a hash per agent and a sorted set per queue."""
+
+    def __init__(self, client):
+        self.client = client
+
+    @staticmethod
+    def _decode(record):
+        return {k.decode(): v.decode() for k, v in record.items()}
+
+    def get(self, key):
+        return self._decode(self.client.hgetall(key))
+
+    def get_many(self, keys):
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.hgetall(key)
+        return [self._decode(record) for record in pipe.execute()]
+
+    def set(self, key, mapping):
+        self.client.hset(key, mapping={k: str(v) for k, v in mapping.items()})
+
+    def incr(self, key, field, amount):
+        return self.client.hincrby(key, field, amount)
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def queue_add(self, key, member, score):
+        self.client.zadd(key, {str(member): score})
+
+    def queue_remove(self, key, member):
+        # ZREM is atomic, so exactly one caller wins a contended member
+        return bool(self.client.zrem(key, str(member)))
+
+    def queue_first(self, key, limit):
+        return [member.decode() for member in self.client.zrange(key, 0, limit - 1)]
+
+
+def get_backend():
+    """Return the process-wide store, connecting on first use."""
+    global _backend
+    if _backend is not None:
+        return _backend
+
+    with _backend_lock:
+        if _backend is None:
+            if _setting('BACKEND', 'redis') == 'redis':
+                try:
+                    from django_redis import get_redis_connection
+                    client = get_redis_connection('default')
+                    client.ping()
+                    _backend = RedisBackend(client)
+                except Exception as e:
+                    logger.warning(f"Agent presence falling back to the local store: {str(e)}")
+            if _backend is None:
+                _backend = LocalBackend()
+        return _backend
+
+
+class PresenceService:
+    """Reads and maintains agent presence and workload"""
+
+    @staticmethod
+    def _key(*parts):
+        schema = getattr(connection, 'schema_name', 'public')
+        return ':'.join(['presence', schema, *[str(part) for part in parts]])
+
+    @staticmethod
+    def agent_key(user_id):
+        return PresenceService._key('agent', user_id)
+
+    @staticmethod
+    def queue_key(kind, skill=None):
+        return PresenceService._key(kind, skill or ANY_SKILL)
+
+    @staticmethod
+    def case_limit(user) -> int:
+        """Maximum open cases for the user's role"""
+        limits = _setting('CASE_LIMITS', DEFAULT_CASE_LIMITS)
+        return limits.get(user.role, limits.get('agent', 20))
+
+    @staticmethod
+    def count_open_cases(user) -> int:
+        from apps.cases.models import Case
+        return Case.objects.filter(
+            assigned_to=user,
+            status__name__in=OPEN_CASE_STATUSES,
+            is_active=True
+        ).count()
+
+    @staticmethod
+    def get_agent(user_id) -> dict:
+        """
+        Return the stored state of an agent.
+
+        Returns:
+            dict: Empty if the agent is not in the store
+        """
+        record = get_backend().get(PresenceService.agent_key(user_id))
+        if not record:
+            return {}
+        return PresenceService._parse(record)
+
+    @staticmethod
+    def get_agents(user_ids) -> list:
+        """Stored state of several agents in one round trip, in the given order"""
+        keys = [PresenceService.agent_key(user_id) for user_id in user_ids]
+        return [PresenceService._parse(record) if record else {} for record in get_backend().get_many(keys)]
+
+    @staticmethod
+    def _parse(record):
+        return {
+            'status': record.get('status', 'offline'),
+            'routable': record.get('routable') == '1',
+            'skills': json.loads(record.get('skills', '[]')),
+            'languages': json.loads(record.get('languages', '[]')),
+            'open_cases': int(record.get('open_cases', 0)),
+            'case_limit': int(record.get('case_limit', 0)),
+            'last_assigned': float(record.get('last_assigned', 0)),
+            'idle_since': float(record.get('idle_since', 0)),
+            'call_claimed_at': float(record.get('call_claimed_at', 0)),
+        }
+
+    @staticmethod
+    def sync_agent(user, open_cases=None, release_claim=False) -> dict:
+        """
+        Write an agent's full state from the database and requeue them.
+
+        An available agent still claimed for a call is kept busy.
+
+        Args:
+            user: User to sync (its profile supplies skills and languages)
+            open_cases: Open case count, counted from cases if not given
+            release_claim: Drop any call claim (the agent set their status)
+
+        Returns:
+            dict: The stored state
+        """
+        from .models import UserProfile
+
+        profile = UserProfile.objects.filter(user=user).only('skills', 'languages_spoken').first()
+        skills = sorted({str(s).lower() for s in (profile.skills if profile else []) or []})
+        languages = sorted({str(l).lower() for l in (profile.languages_spoken if profile else []) or []})
+        if open_cases is None:
+            open_cases = PresenceService.count_open_cases(user)
+
+        previous = PresenceService.get_agent(user.id)
+        claimed_at = previous.get('call_claimed_at', 0)
+        claim_seconds = _setting('CALL_CLAIM_SECONDS', DEFAULT_CALL_CLAIM_SECONDS)
+        if release_claim or time.time() - claimed_at > claim_seconds:
+            claimed_at = 0
+        status = user.agent_status
+        if claimed_at and status == 'available':
+            status = 'busy'
+
+        state = {
+            'status': status,
+            'routable': bool(user.is_active and user.is_online and user.role in ROUTABLE_ROLES),
+            'skills': skills,
+            'languages': languages,
+            'open_cases': open_cases,
+            'case_limit': PresenceService.case_limit(user),
+            'last_assigned': previous.get('last_assigned', 0),
+            'idle_since': (
+                previous['idle_since']
+                if previous.get('status') == 'available' and status == 'available'
+                else time.time()
+            ),
+            'call_claimed_at': claimed_at,
+        }
+        get_backend().set(PresenceService.agent_key(user.id), {
+            **state,
+            'routable': int(state['routable']),
+            'skills': json.dumps(skills),
+            'languages': json.dumps(languages),
+        })
+
+        # Leave the queues of skills the agent no longer has
+        for skill in set(previous.get('skills', [])) - set(skills):
+            PresenceService._dequeue(user.id, skill)
+        PresenceService._requeue(user.id, state)
+        return state
+
+    @staticmethod
+    def refresh_agent(user):
+        """
+        ``sync_agent`` after the agent changed status, for callers that must
+        not fail when the store does
+        """
+        try:
+            PresenceService.sync_agent(user, release_claim=True)
+        except Exception as e:
+            logger.error(f"Error syncing presence of {user.username}: {str(e)}")
+
+    @staticmethod
+    def remove_agent(user_id):
+        state = PresenceService.get_agent(user_id)
+        for skill in [ANY_SKILL, *state.get('skills', [])]:
+            PresenceService._dequeue(user_id, skill)
+        get_backend().delete(PresenceService.agent_key(user_id))
+
+    @staticmethod
+    def get_open_cases(user) -> int:
+        """Open case count from the store, seeding the store on a miss"""
+        state = PresenceService.get_agent(user.id)
+        if not state:
+            state = PresenceService.sync_agent(user)
+        return state['open_cases']
+
+    @staticmethod
+    def adjust_open_cases(user_id, delta, assigned=False):
+        """
+        Move an agent's open case count by `delta` and reorder their queues.
+
+        Agents not yet in the store are left alone; they are counted from
+        the database when first synced.
+
+        Args:
+            user_id: Agent's user ID
+            delta: Change in open cases
+            assigned: Whether the agent was just given a case
+        """
+        backend = get_backend()
+        key = PresenceService.agent_key(user_id)
+        if not backend.get(key):
+            return
+        open_cases = backend.incr(key, 'open_cases', delta)
+        if open_cases < 0:
+            backend.set(key, {'open_cases': 0})
+        if assigned:
+            backend.set(key, {'last_assigned': time.time()})
+        PresenceService._requeue(user_id, PresenceService.get_agent(user_id), calls=False)
+
+    @staticmethod
+    def track_case_change(old_assignee_id, was_open, new_assignee_id, is_open):
+        """
+        Apply a change in a case's assignee or open state to workloads.
+
+        Args:
+            old_assignee_id: Assignee before the change, or None
+            was_open: Whether the case was open before the change
+            new_assignee_id: Assignee after the change, or None
+            is_open: Whether the case is open after the change
+        """
+        if old_assignee_id == new_assignee_id and was_open == is_open:
+            return
+        try:
+            if old_assignee_id and was_open:
+                PresenceService.adjust_open_cases(old_assignee_id, -1)
+            if new_assignee_id and is_open:
+                PresenceService.adjust_open_cases(
+                    new_assignee_id, 1, assigned=old_assignee_id != new_assignee_id
+                )
+        except Exception as e:
+            # The store is corrected by the next sync
+            logger.error(f"Error updating agent workload: {str(e)}")
+
+    @staticmethod
+    def queue_head(kind, skill, limit) -> list:
+        """
+        First members of a queue, best first.
+
+        Args:
+            kind: 'cases' or 'calls'
+            skill: Skill, or None for the queue of all agents
+            limit: Maximum members to return
+
+        Returns:
+            list: Member user IDs as strings
+        """
+        return get_backend().queue_first(PresenceService.queue_key(kind, skill), limit)
+
+    @staticmethod
+    def claim_for_call(user_id, skill=None) -> bool:
+        """
+        Atomically take an agent out of a call queue.
+
+        Returns:
+            bool: True if this caller claimed the agent
+        """
+        if not get_backend().queue_remove(PresenceService.queue_key('calls', skill), user_id):
+            return False
+        state = PresenceService.get_agent(user_id)
+        get_backend().set(PresenceService.agent_key(user_id), {
+            'status': 'busy', 'call_claimed_at': time.time(),
+        })
+        for other in [ANY_SKILL, *state.get('skills', [])]:
+            get_backend().queue_remove(PresenceService.queue_key('calls', other), user_id)
+        return True
+
+    @staticmethod
+    def release_from_call(user_id):
+        """Return a claimed agent to the call queues as available"""
+        state = PresenceService.get_agent(user_id)
+        if not state or not state['call_claimed_at']:
+            # Not claimed, or the agent has set their status since
+            return
+        state.update(status='available', idle_since=time.time(), call_claimed_at=0)
+        get_backend().set(PresenceService.agent_key(user_id), {
+            'status': state['status'], 'idle_since': state['idle_since'], 'call_claimed_at': 0,
+        })
+        PresenceService._requeue(user_id, state)
+
+    @staticmethod
+    def _dequeue(user_id, skill, cases=True, calls=True):
+        backend = get_backend()
+        if cases:
+            backend.queue_remove(PresenceService.queue_key('cases', skill), user_id)
+        if calls:
+            backend.queue_remove(PresenceService.queue_key('calls', skill), user_id)
+
+    @staticmethod
+    def _requeue(user_id, state, cases=True, calls=True):
+        backend = get_backend()
+        routable = state.get('routable')
+        takes_cases = (
+            routable and state['status'] in CASE_STATUSES
+            and state['open_cases'] < state['case_limit']
+        )
+        takes_calls = routable and state['status'] == 'available'
+        # Fewest open cases first, then longest since the last assignment
+        case_score = state.get('open_cases', 0) + state.get('last_assigned', 0) / 1e10
+
+        for skill in [ANY_SKILL, *state.get('skills', [])]:
+            if cases:
+                key = PresenceService.queue_key('cases', skill)
+                if takes_cases:
+                    backend.queue_add(key, user_id, case_score)
+                else:
+                    backend.queue_remove(key, user_id)
+            if calls:
+                key = PresenceService.queue_key('calls', skill)
+                if takes_calls:
+                    backend.queue_add(key, user_id, state['idle_since'])
+                else:
+                    backend.queue_remove(key, user_id)
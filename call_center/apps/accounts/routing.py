@@ -0,0 +1,144 @@
+# apps/accounts/routing.py
+"""
+Skills-based routing of new cases and calls to agents.
+
+Candidates come from the per-skill queues of the presence store (see
+``apps.accounts.presence``), which are kept ordered, so picking an agent
+reads the head of one queue instead of counting every agent's workload.
+Only the first ``AGENT_ROUTING['SCAN_DEPTH']`` agents of a queue are
+considered for a language match.
+"""
+import logging
+from typing import Iterable, Optional
+
+from django.core.exceptions import ValidationError
+
+from .presence import PresenceService, _setting
+
+logger = logging.getLogger(__name__)
+
+
+class RoutingService:
+    """Picks the best available agent for new work"""
+
+    @staticmethod
+    def _candidates(kind, skill, languages, exclude=()):
+        limit = _setting('SCAN_DEPTH', 20)
+        members = PresenceService.queue_head(kind, skill, limit)
+        user_ids = [int(member) for member in members if int(member) not in exclude]
+        wanted = {language.lower() for language in languages or [] if language}
+        for user_id, state in zip(user_ids, PresenceService.get_agents(user_ids)):
+            if not state:
+                continue
+            if skill and skill.lower() not in state['skills']:
+                continue
+            if wanted and not wanted & set(state['languages']):
+                continue
+            yield user_id, state
+
+    @staticmethod
+    def route_case(
+        skill: Optional[str] = None,
+        languages: Optional[Iterable[str]] = None,
+        exclude: Iterable[int] = ()
+    ) -> Optional[int]:
+        """
+        Pick the least loaded agent able to take a case.
+
+        Args:
+            skill: Required skill, or None for any agent
+            languages: Acceptable languages (any one suffices), or None
+            exclude: User IDs not to consider
+
+        Returns:
+            User ID, or None if no agent qualifies
+        """
+        exclude = set(exclude)
+        for user_id, state in RoutingService._candidates('cases', skill, languages, exclude):
+            if state['open_cases'] < state['case_limit']:
+                return user_id
+        return None
+
+    @staticmethod
+    def route_call(
+        skill: Optional[str] = None,
+        languages: Optional[Iterable[str]] = None
+    ) -> Optional[int]:
+        """
+        Claim the longest-waiting available agent for a call.
+
+        The agent leaves every call queue until ``release_call`` is called
+        or their status is set again, so concurrent callers never receive
+        the same agent.
+
+        Returns:
+            User ID of the claimed agent, or None if no agent qualifies
+        """
+        for user_id, _ in RoutingService._candidates('calls', skill, languages):
+            if PresenceService.claim_for_call(user_id, skill):
+                return user_id
+        return None
+
+    @staticmethod
+    def release_call(user_id: int):
+        """Make an agent claimed by ``route_call`` available for calls again"""
+        PresenceService.release_from_call(user_id)
+
+    @staticmethod
+    def case_requirements(case):
+        """
+        Routing skill and languages for a case.
+
+        The skill is the case type's ``metadata['routing_skill']``; the
+        languages are the reporter's primary language code and name.
+
+        Returns:
+            tuple: (skill or None, list of languages)
+        """
+        skill = (case.case_type.metadata or {}).get('routing_skill') if case.case_type else None
+        languages = []
+        language = case.reporter.language if case.reporter_id else None
+        if language:
+            languages = [language.code, language.name]
+        return skill, languages
+
+    @staticmethod
+    def auto_assign_case(case, assigned_by):
+        """
+        Assign a case to the agent picked by ``route_case``.
+
+        Falls back to any agent when nobody speaks the reporter's language.
+
+        Args:
+            case: Case to assign
+            assigned_by: User recorded as making the assignment
+
+        Returns:
+            The assigned User, or None if no agent is available
+        """
+        from apps.cases.services import CaseBusinessLogic
+        from .models import User
+
+        skill, languages = RoutingService.case_requirements(case)
+        exclude = {case.assigned_to_id} if case.assigned_to_id else set()
+        try:
+            user_id = (
+                RoutingService.route_case(skill, languages, exclude)
+                or (languages and RoutingService.route_case(skill, None, exclude))
+            )
+        except Exception as e:
+            logger.error(f"Error routing case {case.case_number}: {str(e)}")
+            return None
+        if not user_id:
+            logger.info(f"No agent available to route case {case.case_number}")
+            return None
+
+        agent = User.objects.get(id=user_id)
+        try:
+            CaseBusinessLogic.assign_case(
+                case, agent, assigned_by, reason='Assigned automatically by skills routing'
+            )
+        except ValidationError as e:
+            logger.warning(f"Automatic assignment of case {case.case_number} failed: {str(e)}")
+            return None
+        return agent
@@ -0,0 +1,66 @@
+# apps/accounts/tasks.py
+import logging
+
+from celery import shared_task
+from django.db.models import Count, Q
+from django_tenants.utils import get_public_schema_name, get_tenant_model, schema_context
+
+from .presence import OPEN_CASE_STATUSES, PresenceService
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def sync_agent_presence(schemas=None):
+    """
+    Rewrite every tenant's presence store from the database for every user.
+
+    Corrects drift in the incrementally maintained workloads (e.g. cases
+    closed outside CaseBusinessLogic). Agents claimed for a call stay busy.
+    Intended to run every few minutes from celery beat.
+
+    Args:
+        schemas: Optional list of tenant schemas (defaults to all tenants)
+
+    Returns:
+        dict: Number of agents synced per schema
+    """
+    if schemas is None:
+        schemas = list(
+            get_tenant_model().objects.exclude(schema_name=get_public_schema_name())
+            .values_list('schema_name', flat=True)
+        )
+
+    summaries = {}
+    for schema in schemas:
+        try:
+            with schema_context(schema):
+                summaries[schema] = _sync_schema_presence()
+        except Exception as e:
+            logger.error(f"Failed to sync agent presence for {schema}: {str(e)}")
+    return summaries
+
+
+def _sync_schema_presence():
+    from .models import User
+
+    # Users are shared; their cases live in the current tenant schema
+    users = User.objects.annotate(
+        open_case_count=Count(
+            'assigned_cases',
+            filter=Q(
+                assigned_cases__status__name__in=OPEN_CASE_STATUSES,
+                assigned_cases__is_active=True
+            )
+        )
+    )
+
+    synced = 0
+    for user in users.iterator():
+        try:
+            PresenceService.sync_agent(user, open_cases=user.open_case_count)
+            synced += 1
+        except Exception as e:
+            logger.error(f"Failed to sync presence of {user.username}: {str(e)}")
+
+    return synced
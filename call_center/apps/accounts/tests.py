@@ -1,3 +1,89 @@
+from unittest import mock
+
 from django.test import TestCase
 
-# Create your tests here.
+from . import presence
+from .models import User, UserProfile
+from .presence import LocalBackend, PresenceService
+from .routing import RoutingService
+
+
+class PresenceTestCase(TestCase):
+    """Runs every test against a fresh in-process presence store."""
+
+    def setUp(self):
+        patcher = mock.patch.object(presence, '_backend', LocalBackend())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_agent(self, username, skills=(), languages=(), open_cases=0, **fields):
+        user = User.objects.create_user(
+            username=username, password='secret', role='agent',
+            extension=str(1000 + User.objects.count()),
+            is_online=True, agent_status='available', **fields
+        )
+        UserProfile.objects.create(user=user, skills=list(skills), languages_spoken=list(languages))
+        PresenceService.sync_agent(user, open_cases=open_cases)
+        return user
+
+
+class RouteCaseTests(PresenceTestCase):
+    def test_picks_least_loaded_agent(self):
+        self.create_agent('busy', open_cases=5)
+        idle = self.create_agent('idle', open_cases=1)
+
+        self.assertEqual(RoutingService.route_case(), idle.id)
+
+    def test_matches_skill_and_language(self):
+        self.create_agent('generalist', languages=['english'])
+        counsellor = self.create_agent('counsellor', skills=['gbv'], languages=['swahili'])
+
+        self.assertEqual(RoutingService.route_case('gbv', ['Swahili']), counsellor.id)
+        self.assertIsNone(RoutingService.route_case('gbv', ['french']))
+
+    def test_skips_agents_at_their_case_limit(self):
+        self.create_agent('full', open_cases=PresenceService.case_limit(User(role='agent')))
+
+        self.assertIsNone(RoutingService.route_case())
+
+    def test_assignments_reorder_the_queue(self):
+        first = self.create_agent('first')
+        second = self.create_agent('second')
+        PresenceService.adjust_open_cases(first.id, 1, assigned=True)
+
+        self.assertEqual(RoutingService.route_case(), second.id)
+
+
+class RouteCallTests(PresenceTestCase):
+    def test_claims_each_agent_once(self):
+        first = self.create_agent('first')
+        second = self.create_agent('second')
+
+        self.assertEqual(RoutingService.route_call(), first.id)
+        self.assertEqual(RoutingService.route_call(), second.id)
+        self.assertIsNone(RoutingService.route_call())
+
+    def test_claim_survives_periodic_sync(self):
+        agent = self.create_agent('agent')
+        RoutingService.route_call()
+
+        PresenceService.sync_agent(agent)
+
+        self.assertEqual(PresenceService.get_agent(agent.id)['status'], 'busy')
+        self.assertIsNone(RoutingService.route_call())
+
+    def test_release_returns_agent_to_queue(self):
+        agent = self.create_agent('agent')
+        RoutingService.route_call()
+
+        RoutingService.release_call(agent.id)
+
+        self.assertEqual(RoutingService.route_call(), agent.id)
+
+    def test_status_change_drops_claim(self):
+        agent = self.create_agent('agent')
+        RoutingService.route_call()
+
+        PresenceService.refresh_agent(agent)
+
+        self.assertEqual(RoutingService.route_call(), agent.id)
@@ -1,7 +1,7 @@
 # apps/ai/admin.py
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
-from .models import AIInteraction, AIPromptTemplate
+from .models import AIInteraction, AIPromptTemplate, TranscriptionJob, TranscriptSegment
 
 
 @admin.register(AIInteraction)
@@ -59,4 +59,29 @@ class AIPromptTemplateAdmin(admin.ModelAdmin):
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
-    )
\ No newline at end of file
+    )
+
+
+class TranscriptSegmentInline(admin.TabularInline):
+    model = TranscriptSegment
+    extra = 0
+    fields = ['index', 'start_seconds', 'end_seconds', 'text', 'confidence']
+    readonly_fields = fields
+    can_delete = False
+
+
+@admin.register(TranscriptionJob)
+class TranscriptionJobAdmin(admin.ModelAdmin):
+    list_display = [
+        'call', 'status', 'engine', 'attempts', 'segment_count',
+        'audio_seconds', 'processing_time_ms', 'completed_at'
+    ]
+    list_filter = ['status', 'engine', 'completed_at']
+    search_fields = ['call__unique_id', 'error']
+    readonly_fields = ['created_at', 'updated_at', 'started_at', 'completed_at']
+    raw_id_fields = ['call']
+    inlines = [TranscriptSegmentInline]
+    ordering = ['-created_at']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('call')
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class AiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.ai'
+
+    def ready(self):
+        """Import signal handlers when app is ready"""
+        try:
+            import apps.ai.signals  # noqa F401
+        except ImportError:
+            pass
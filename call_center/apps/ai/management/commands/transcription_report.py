@@ -0,0 +1,30 @@
+# apps/ai/management/commands/transcription_report.py
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django_tenants.utils import schema_context
+
+from apps.ai.services.transcription_queue import TranscriptionQueueService
+
+
+class Command(BaseCommand):
+    help = 'Show hourly transcription throughput and the queue backlog of a tenant'
+
+    def add_arguments(self, parser):
+        parser.add_argument('schema', help='Tenant schema name')
+        parser.add_argument('--hours', type=int, default=24, help='Hours to report (default 24)')
+
+    def handle(self, *args, **options):
+        with schema_context(options['schema']):
+            report = TranscriptionQueueService.throughput(options['hours'])
+
+        self.stdout.write(f"{'Hour':<17} {'Jobs':>6} {'Failed':>6} {'Audio (h)':>10} {'Realtime x':>10}")
+        for row in report['hours']:
+            factor = row['realtime_factor']
+            self.stdout.write(
+                f"{timezone.localtime(row['hour']):%Y-%m-%d %H:%M} {row['jobs']:>6} {row['failures']:>6} "
+                f"{row['audio_seconds'] / 3600:>10.2f} {factor if factor is not None else '-':>10}"
+            )
+        backlog = report['backlog']
+        self.stdout.write(self.style.SUCCESS(
+            f"Backlog: {backlog['pending']} pending, {backlog['running']} running"
+        ))
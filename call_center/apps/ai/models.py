@@ -92,7 +92,7 @@ class AIPromptTemplate(TimeStampedModel):
     )
     prompt_template = models.TextField(
         verbose_name=_("Prompt Template"),
-        help_text=_("Template with placeholders like {variable_name}")
+        help_text=_("Django template with placeholders like {{ narrative }}")
     )
     interaction_type = models.CharField(
         max_length=20,
@@ -109,6 +109,12 @@ class AIPromptTemplate(TimeStampedModel):
         default=True,
         verbose_name=_("Is Active")
     )
+    version = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        verbose_name=_("Version"),
+        help_text=_("Incremented on every save; compiled templates are cached per version")
+    )
     
     class Meta:
         verbose_name = _("AI Prompt Template")
@@ -116,4 +122,137 @@ class AIPromptTemplate(TimeStampedModel):
         ordering = ['name']
     
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+    def save(self, *args, **kwargs):
+        """Bump the version so cached compilations of the old text are dropped"""
+        if self.pk:
+            self.version += 1
+            if 'update_fields' in kwargs and kwargs['update_fields'] is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        super().save(*args, **kwargs)
+
+class TranscriptionJob(TimeStampedModel):
+    """Offline transcription of one call recording"""
+
+    STATUS_CHOICES = [
+        ('pending', _('Pending')),
+        ('running', _('Running')),
+        ('completed', _('Completed')),
+        ('failed', _('Failed')),
+    ]
+
+    call = models.ForeignKey(
+        'calls.Call',
+        on_delete=models.CASCADE,
+        related_name='transcription_jobs',
+        verbose_name=_("Call")
+    )
+    recording_checksum = models.CharField(
+        max_length=64,
+        blank=True,
+        verbose_name=_("Recording Checksum"),
+        help_text=_("Checksum of the recording this job transcribes")
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending',
+        verbose_name=_("Status")
+    )
+    engine = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name=_("Engine"),
+        help_text=_("Transcription engine that produced the transcript")
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name=_("Attempts")
+    )
+    next_attempt_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_("Next Attempt At"),
+        help_text=_("Earliest time a failed job is retried")
+    )
+    started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_("Started At")
+    )
+    completed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_("Completed At")
+    )
+    segment_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("Segment Count")
+    )
+    audio_seconds = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name=_("Audio Seconds")
+    )
+    processing_time_ms = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name=_("Processing Time (ms)")
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name=_("Error"),
+        help_text=_("Error of the last failed attempt")
+    )
+
+    class Meta:
+        verbose_name = _("Transcription Job")
+        verbose_name_plural = _("Transcription Jobs")
+        ordering = ['-created_at']
+        unique_together = [['call', 'recording_checksum']]
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+            models.Index(fields=['completed_at']),
+        ]
+
+    def __str__(self):
+        return f"Transcription of {self.call.unique_id} ({self.get_status_display()})"
+
+
+class TranscriptSegment(models.Model):
+    """Transcript of one segment of a recording, kept so retries resume"""
+
+    job = models.ForeignKey(
+        TranscriptionJob,
+        on_delete=models.CASCADE,
+        related_name='segments',
+        verbose_name=_("Job")
+    )
+    index = models.PositiveIntegerField(
+        verbose_name=_("Index")
+    )
+    start_seconds = models.FloatField(
+        verbose_name=_("Start (seconds)")
+    )
+    end_seconds = models.FloatField(
+        verbose_name=_("End (seconds)")
+    )
+    text = models.TextField(
+        blank=True,
+        verbose_name=_("Text")
+    )
+    confidence = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name=_("Confidence")
+    )
+
+    class Meta:
+        verbose_name = _("Transcript Segment")
+        verbose_name_plural = _("Transcript Segments")
+        ordering = ['job', 'index']
+        unique_together = [['job', 'index']]
+
+    def __str__(self):
+        return f"{self.job_id} #{self.index}"
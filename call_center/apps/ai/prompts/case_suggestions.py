@@ -0,0 +1,14 @@
+# apps/ai/prompts/case_suggestions.py
+# Default for the 'case_suggestions' prompt; an active AIPromptTemplate
+# with that name overrides it.
+TEMPLATE = """Based on the following case information, provide:
+1. Potential case categories
+2. Suggested services to offer
+3. Potential referrals
+4. Questions to ask for further information
+
+Case Number: {{ case.case_number }}
+Reporter: {{ reporter.full_name|default:"Unknown" }}
+Category: {{ category.name|default:"Unknown" }}
+Narrative: {{ narrative }}
+"""
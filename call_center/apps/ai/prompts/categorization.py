@@ -0,0 +1,17 @@
+# apps/ai/prompts/categorization.py
+# Default for the 'case_categorization' prompt; an active AIPromptTemplate
+# with that name overrides it.
+TEMPLATE = """Based on the following case narrative, suggest the most appropriate category.
+Available categories: {{ categories }}
+
+Narrative:
+{{ narrative }}
+
+Return your answer in JSON format with the following structure:
+{
+    "primary_category": "The most appropriate category",
+    "confidence": 0.95,
+    "alternative_categories": ["Second best match", "Third best match"],
+    "reasoning": "Brief explanation of your categorization"
+}
+"""
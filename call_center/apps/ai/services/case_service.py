@@ -1,7 +1,6 @@
 # apps/ai/services/case_service.py
 # from .openai_service import OpenAIService # type: ignore
-from apps.ai.models import PromptTemplate
-from django.template import Template, Context
+from .prompt_registry import category_names, prompt_registry
 
 class CaseAIService:
     """AI services specific to case management."""
@@ -18,36 +17,14 @@ class CaseAIService:
         Returns:
             dict: Suggestions from AI
         """
-        # Get the appropriate template
-        template = PromptTemplate.objects.filter(
-            name='case_suggestions',
-            is_active=True
-        ).first()
-        
-        if not template:
-            # Fallback if no template in database
-            prompt_text = f"""
-            Based on the following case information, provide:
-            1. Potential case categories
-            2. Suggested services to offer
-            3. Potential referrals
-            4. Questions to ask for further information
-            
-            Case Number: {case.case_number}
-            Reporter: {case.reporter.full_name if case.reporter else 'Unknown'}
-            Category: {case.category.name if case.category else 'Unknown'}
-            Narrative: {case.narrative or ''}
-            """
-        else:
-            # Use the template from the database
-            django_template = Template(template.template)
-            context = Context({
-                'case': case,
-                'reporter': case.reporter,
-                'narrative': case.narrative,
-                'category': case.category,
-            })
-            prompt_text = django_template.render(context)
+        # Compiled once per template version; long narratives are cut to the budget
+        prompt = prompt_registry.render('case_suggestions', {
+            'case': case,
+            'reporter': case.reporter,
+            'narrative': case.narrative or '',
+            'category': case.category,
+        }, budget_field='narrative')
+        prompt_text = prompt.text
         
         # Initialize OpenAI service
         ai_service = OpenAIService()
@@ -76,7 +53,8 @@ class CaseAIService:
             'success': True,
             'text': assistant_message,
             'case_id': case.id,
-            'prompt': prompt_text
+            'prompt': prompt_text,
+            'narrative_truncated': prompt.truncated
         }
 
     @staticmethod
@@ -102,29 +80,12 @@ class CaseAIService:
                 'categories': []
             }
         
-        # Get available categories for reference
-        from apps.core.models import ReferenceData
-        categories = list(ReferenceData.objects.filter(
-            category='case_category',
-            is_active=True
-        ).values_list('name', flat=True))
-        
-        # Create the prompt
-        prompt_text = f"""
-        Based on the following case narrative, suggest the most appropriate category.
-        Available categories: {', '.join(categories)}
-        
-        Narrative:
-        {text_to_analyze}
-        
-        Return your answer in JSON format with the following structure:
-        {{
-            "primary_category": "The most appropriate category",
-            "confidence": 0.95,
-            "alternative_categories": ["Second best match", "Third best match"],
-            "reasoning": "Brief explanation of your categorization"
-        }}
-        """
+        # The category list is cached with the prompts until reference data changes
+        prompt = prompt_registry.render('case_categorization', {
+            'categories': category_names(),
+            'narrative': text_to_analyze,
+        }, budget_field='narrative')
+        prompt_text = prompt.text
         
         # Initialize OpenAI service
         ai_service = OpenAIService()
@@ -0,0 +1,276 @@
+# apps/ai/services/prompt_registry.py
+"""
+Compiled prompt templates and token budgeting for AI services.
+
+Each process keeps, per tenant, the compiled ``Template`` of every prompt
+keyed by its ``AIPromptTemplate.version``, plus static fragments such as
+the category list. Generation numbers in the shared cache are bumped after
+a change commits (see ``apps.ai.signals``): a per-tenant one for the
+tenant's templates, and a global one for prompt reference data, which lives
+in the public schema and feeds every tenant's fragments. A process that
+sees a new generation re-reads the template versions in one query and
+recompiles only the prompts whose version changed.
+
+Prompts without an active database template fall back to the defaults in
+``apps.ai.prompts``.
+"""
+import logging
+import math
+import threading
+import time
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.template import Context, Engine, TemplateSyntaxError
+
+from apps.ai.prompts import case_suggestions, categorization
+
+try:
+    import tiktoken  # type: ignore
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMPLATES = {
+    'case_suggestions': case_suggestions.TEMPLATE,
+    'case_categorization': categorization.TEMPLATE,
+}
+
+CHARS_PER_TOKEN = 4
+TRUNCATION_MARKER = ' [...]'
+
+# Prompts are plain text: no HTML escaping of narratives
+_engine = Engine(autoescape=False)
+
+
+def _setting(name, default=None):
+    return getattr(settings, 'AI_SETTINGS', {}).get(name, default)
+
+
+def _schema():
+    return getattr(connection, 'schema_name', 'public')
+
+
+def _generation_key(schema):
+    return f"ai:prompts:{schema}:generation"
+
+
+SHARED_GENERATION_KEY = "ai:prompts:shared:generation"
+
+
+def _read_generation(key):
+    value = cache.get(key)
+    if value is None:
+        # A fresh, unique value: processes holding the generation from
+        # before the key was evicted must reload too
+        cache.add(key, time.time_ns(), None)
+        value = cache.get(key)
+    return value
+
+
+def _bump_generation(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+_encodings = {}
+
+
+def _encoding():
+    if tiktoken is None:
+        return None
+    name = _setting('token_encoding', 'cl100k_base')
+    if name not in _encodings:
+        _encodings[name] = tiktoken.get_encoding(name)
+    return _encodings[name]
+
+
+def estimate_tokens(text):
+    """
+    Token count of `text`: exact with tiktoken installed, otherwise an
+    estimate of about four characters per token.
+    """
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_tokens(text, max_tokens):
+    """
+    Cut `text` to at most `max_tokens` tokens, keeping the beginning.
+
+    Returns:
+        str: `text` unchanged if it fits, else its start and a marker
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    budget = max(max_tokens - estimate_tokens(TRUNCATION_MARKER), 0)
+    encoding = _encoding()
+    if encoding is not None:
+        head = encoding.decode(encoding.encode(text)[:budget])
+    else:
+        head = text[:budget * CHARS_PER_TOKEN]
+        # Do not end on half a word
+        if ' ' in head:
+            head = head.rsplit(' ', 1)[0]
+    return head.rstrip() + TRUNCATION_MARKER
+
+
+class RenderedPrompt(NamedTuple):
+    text: str
+    tokens: int
+    # Whether the budgeted field was cut to fit
+    truncated: bool
+    # Version of the database template, 0 for the built-in default
+    version: int
+
+
+class PromptRegistry:
+    """Per-tenant cache of compiled prompt templates and static fragments"""
+
+    def __init__(self, defaults):
+        """
+        Args:
+            defaults: Prompt name -> template source used when no active
+                AIPromptTemplate has that name
+        """
+        self.defaults = defaults
+        self._tenants = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def generation(schema=None):
+        """Current prompt generation of the tenant, including shared data"""
+        return (
+            _read_generation(SHARED_GENERATION_KEY),
+            _read_generation(_generation_key(schema or _schema())),
+        )
+
+    @staticmethod
+    def invalidate(schema=None):
+        """Make every process reload the tenant's templates and fragments"""
+        _bump_generation(_generation_key(schema or _schema()))
+
+    @staticmethod
+    def invalidate_shared():
+        """Make every process reload all tenants' fragments built from shared data"""
+        _bump_generation(SHARED_GENERATION_KEY)
+
+    def _compile(self, name, source):
+        try:
+            return _engine.from_string(source)
+        except TemplateSyntaxError as e:
+            logger.error(f"Invalid prompt template {name}: {str(e)}")
+            return None
+
+    def _state(self, schema):
+        current = self.generation(schema)
+        state = self._tenants.get(schema)
+        if state and state['generation'] == current:
+            return state
+
+        from apps.ai.models import AIPromptTemplate
+
+        with self._lock:
+            state = self._tenants.get(schema)
+            if state and state['generation'] == current:
+                return state
+
+            previous = state['templates'] if state else {}
+            templates = {}
+            rows = AIPromptTemplate.objects.filter(is_active=True).values_list(
+                'name', 'version', 'prompt_template'
+            )
+            for name, version, source in rows:
+                cached = previous.get(name)
+                if cached and cached[0] == version:
+                    templates[name] = cached
+                    continue
+                compiled = self._compile(name, source)
+                if compiled is not None:
+                    templates[name] = (version, compiled)
+            for name, source in self.defaults.items():
+                if name not in templates:
+                    cached = previous.get(name)
+                    templates[name] = cached if cached and cached[0] == 0 else (0, self._compile(name, source))
+
+            state = {'generation': current, 'templates': templates, 'fragments': {}}
+            self._tenants[schema] = state
+            return state
+
+    def get(self, name, schema=None):
+        """
+        Compiled template of a prompt.
+
+        Returns:
+            tuple: (version, Template)
+
+        Raises:
+            KeyError: If there is no such prompt
+        """
+        return self._state(schema or _schema())['templates'][name]
+
+    def fragment(self, key, build, schema=None):
+        """
+        A static piece of prompt text, built once per generation.
+
+        Args:
+            key: Name of the fragment
+            build: Callable returning the text for the current tenant
+        """
+        fragments = self._state(schema or _schema())['fragments']
+        if key not in fragments:
+            fragments[key] = build()
+        return fragments[key]
+
+    def render(self, name, context, budget_field=None, max_tokens=None):
+        """
+        Render a prompt, truncating one field so the result fits the budget.
+
+        Args:
+            name: Prompt name
+            context: Template context
+            budget_field: Context key (e.g. 'narrative') to cut if the
+                prompt would exceed `max_tokens`
+            max_tokens: Prompt budget (defaults to AI_SETTINGS['max_prompt_tokens'])
+
+        Returns:
+            RenderedPrompt
+        """
+        version, template = self.get(name)
+        max_tokens = max_tokens or _setting('max_prompt_tokens', 6000)
+        truncated = False
+
+        value = context.get(budget_field) if budget_field else None
+        if value:
+            overhead = estimate_tokens(template.render(Context({**context, budget_field: ''})))
+            fitted = truncate_tokens(str(value), max(max_tokens - overhead, 0))
+            if fitted != value:
+                truncated = True
+                logger.info(f"Truncated {budget_field} of prompt {name} to fit {max_tokens} tokens")
+                context = {**context, budget_field: fitted}
+
+        text = template.render(Context(context))
+        return RenderedPrompt(text, estimate_tokens(text), truncated, version)
+
+
+prompt_registry = PromptRegistry(DEFAULT_TEMPLATES)
+
+
+def category_names():
+    """Active case categories as a comma separated list, cached with the prompts"""
+    from apps.core.models import ReferenceData
+
+    return prompt_registry.fragment('case_categories', lambda: ', '.join(
+        ReferenceData.objects.filter(category='case_category', is_active=True)
+        .order_by('sort_order', 'name')
+        .values_list('name', flat=True)
+    ))
@@ -0,0 +1,102 @@
+# apps/ai/services/transcription_engines.py
+"""
+Speech-to-text engines for offline transcription.
+
+The engine is chosen with ``TRANSCRIPTION['ENGINE']`` (a dotted path) and
+built once per worker process with ``TRANSCRIPTION['ENGINE_OPTIONS']``, so
+a local model is loaded once and then shared by every segment. There is no
+default: the stub engine is only configured by the development and test
+settings.
+"""
+import abc
+import logging
+import math
+import wave
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class BaseTranscriptionEngine(abc.ABC):
+    """Abstract base class for transcription engines."""
+
+    # Stored on the job, so transcripts can be traced to what produced them
+    name = ''
+
+    @abc.abstractmethod
+    def transcribe(self, path, language=None):
+        """
+        Transcribe one audio segment.
+
+        Args:
+            path: 16 kHz mono WAV file
+            language: Language code, or None to let the engine detect it
+
+        Returns:
+            dict: ``text`` and ``confidence`` (0.0 to 1.0, or None)
+        """
+        pass
+
+
+class StubTranscriptionEngine(BaseTranscriptionEngine):
+    """Engine for development and tests: describes the audio instead of transcribing it."""
+
+    name = 'stub'
+
+    def transcribe(self, path, language=None):
+        try:
+            with wave.open(str(path)) as audio:
+                seconds = audio.getnframes() / float(audio.getframerate())
+        except (wave.Error, EOFError, OSError):
+            seconds = 0.0
+        return {'text': f"[{seconds:.1f}s of audio]", 'confidence': None}
+
+
+class WhisperTranscriptionEngine(BaseTranscriptionEngine):
+    """Offline Whisper model via faster-whisper (optional dependency)."""
+
+    name = 'whisper'
+
+    def __init__(self, model='small', device='cpu', compute_type='int8', beam_size=1):
+        try:
+            from faster_whisper import WhisperModel  # type: ignore
+        except ImportError:
+            raise ImportError("WhisperTranscriptionEngine requires the faster-whisper package")
+
+        self.name = f"whisper-{model}"
+        self.beam_size = beam_size
+        self.model = WhisperModel(model, device=device, compute_type=compute_type)
+
+    def transcribe(self, path, language=None):
+        segments, _ = self.model.transcribe(str(path), language=language, beam_size=self.beam_size)
+        segments = list(segments)
+        if not segments:
+            return {'text': '', 'confidence': None}
+        text = ' '.join(segment.text.strip() for segment in segments)
+        # avg_logprob is per segment; exp() of the mean is a usable 0-1 score
+        mean_logprob = sum(segment.avg_logprob for segment in segments) / len(segments)
+        return {'text': text, 'confidence': round(math.exp(mean_logprob), 3)}
+
+
+@lru_cache(maxsize=None)
+def get_engine():
+    """
+    The configured transcription engine, built once per process.
+
+    Returns:
+        BaseTranscriptionEngine
+
+    Raises:
+        ImproperlyConfigured: If no engine is configured
+    """
+    config = getattr(settings, 'TRANSCRIPTION', {})
+    if not config.get('ENGINE'):
+        raise ImproperlyConfigured("TRANSCRIPTION['ENGINE'] must name a transcription engine")
+    engine_class = import_string(config['ENGINE'])
+    engine = engine_class(**config.get('ENGINE_OPTIONS', {}))
+    logger.info(f"Loaded transcription engine {engine.name}")
+    return engine
@@ -0,0 +1,385 @@
+# apps/ai/services/transcription_queue.py
+"""
+Batched offline transcription of call recordings.
+
+Jobs are rows in ``TranscriptionJob``, one per call and recording checksum,
+so enqueueing the same recording twice is a no-op and a re-ingested
+recording gets a fresh job. A scheduler run (see ``apps.ai.tasks``):
+
+1. returns jobs whose worker died (running longer than LEASE_SECONDS) to
+   the queue,
+2. enqueues calls that have a recording but no transcript,
+3. claims up to BATCH_SIZE due jobs with ``SKIP LOCKED`` and hands each
+   to a Celery worker.
+
+A worker fetches the recording, splits it into SEGMENT_SECONDS pieces of
+16 kHz mono audio and transcribes them SEGMENT_WORKERS at a time with the
+configured engine (see ``transcription_engines``). Every finished segment
+is saved immediately, so a retry only redoes the segments that were
+missing. The stitched transcript is written to ``Call.ai_transcript``.
+Failed jobs are retried with exponential backoff up to MAX_ATTEMPTS.
+"""
+import logging
+import shutil
+import subprocess
+import tempfile
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .transcription_engines import get_engine
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+
+def _setting(name, default=None):
+    return getattr(settings, 'TRANSCRIPTION', {}).get(name, default)
+
+
+class TranscriptionError(Exception):
+    """A recording could not be fetched, split or transcribed."""
+
+
+def _wav_seconds(path):
+    with wave.open(str(path)) as audio:
+        return audio.getnframes() / float(audio.getframerate())
+
+
+def _split_wav(source, workdir, segment_seconds):
+    # Without ffmpeg only WAV recordings can be split, frame-accurately
+    try:
+        audio = wave.open(str(source))
+    except (wave.Error, EOFError) as e:
+        raise TranscriptionError(f"ffmpeg is not installed and {source.name} is not a WAV file: {str(e)}")
+
+    paths = []
+    with audio:
+        frames_per_segment = int(audio.getframerate() * segment_seconds)
+        index = 0
+        while True:
+            frames = audio.readframes(frames_per_segment)
+            if not frames:
+                break
+            path = Path(workdir) / f"segment-{index:05d}.wav"
+            with wave.open(str(path), 'wb') as segment:
+                segment.setparams(audio.getparams())
+                segment.writeframes(frames)
+            paths.append(path)
+            index += 1
+    return paths
+
+
+def split_audio(source, workdir, segment_seconds, ffmpeg='ffmpeg'):
+    """
+    Split a recording into consecutive segments.
+
+    Args:
+        source: Path of the recording (any format ffmpeg reads)
+        workdir: Directory for the segment files
+        segment_seconds: Length of each segment; the last may be shorter
+        ffmpeg: ffmpeg binary
+
+    Returns:
+        list: dicts with ``index``, ``path``, ``start`` and ``end`` (seconds)
+
+    Raises:
+        TranscriptionError: If the audio cannot be decoded
+    """
+    if shutil.which(ffmpeg):
+        command = [
+            ffmpeg, '-nostdin', '-loglevel', 'error', '-y', '-i', str(source),
+            '-vn', '-ac', '1', '-ar', str(SAMPLE_RATE), '-c:a', 'pcm_s16le',
+            '-f', 'segment', '-segment_time', str(segment_seconds), '-reset_timestamps', '1',
+            str(Path(workdir) / 'segment-%05d.wav'),
+        ]
+        result = subprocess.run(command, capture_output=True, timeout=_setting('SPLIT_TIMEOUT', 600))
+        if result.returncode != 0:
+            raise TranscriptionError(
+                f"ffmpeg failed for {source.name}: {result.stderr.decode(errors='replace')[:500]}"
+            )
+        paths = sorted(Path(workdir).glob('segment-*.wav'))
+    else:
+        paths = _split_wav(source, workdir, segment_seconds)
+
+    segments = []
+    start = 0.0
+    for index, path in enumerate(paths):
+        end = start + _wav_seconds(path)
+        segments.append({'index': index, 'path': path, 'start': round(start, 3), 'end': round(end, 3)})
+        start = end
+    return segments
+
+
+def fetch_recording(name, workdir, chunk_size=1024 * 1024):
+    """Copy a recording from recordings storage to a local file, in chunks."""
+    from apps.calls.services.recording import get_storage
+
+    path = Path(workdir) / ('source' + Path(name).suffix)
+    with get_storage().open(name, 'rb') as stored, open(path, 'wb') as local:
+        for chunk in iter(lambda: stored.read(chunk_size), b''):
+            local.write(chunk)
+    return path
+
+
+class TranscriptionQueueService:
+    """Queues call recordings for offline transcription and runs the jobs"""
+
+    @staticmethod
+    def enqueue_pending(limit=None):
+        """
+        Create jobs for calls that have a recording but no transcript.
+
+        Args:
+            limit: Maximum calls to enqueue (defaults to ENQUEUE_LIMIT)
+
+        Returns:
+            int: Number of calls considered
+        """
+        from apps.ai.models import TranscriptionJob
+        from apps.calls.models import Call
+
+        existing = TranscriptionJob.objects.filter(
+            call=OuterRef('pk'), recording_checksum=OuterRef('recording_checksum')
+        )
+        calls = (
+            Call.objects.with_recordings()
+            .filter(ai_transcript='')
+            .exclude(Exists(existing))
+            .order_by('start_time')
+            .values_list('id', 'recording_checksum')[:limit or _setting('ENQUEUE_LIMIT', 1000)]
+        )
+        jobs = [
+            TranscriptionJob(call_id=call_id, recording_checksum=checksum)
+            for call_id, checksum in calls
+        ]
+        # A concurrent scheduler may have enqueued the same call
+        TranscriptionJob.objects.bulk_create(jobs, ignore_conflicts=True)
+        return len(jobs)
+
+    @staticmethod
+    def enqueue_call(call):
+        """
+        Queue one call for transcription, e.g. on demand from the UI.
+
+        Returns:
+            TranscriptionJob: The new or existing job for the current recording
+        """
+        from apps.ai.models import TranscriptionJob
+
+        job, _ = TranscriptionJob.objects.get_or_create(
+            call=call, recording_checksum=call.recording_checksum
+        )
+        return job
+
+    @staticmethod
+    def claim(limit=None):
+        """
+        Mark up to `limit` (default BATCH_SIZE) due jobs as running.
+
+        Returns:
+            list: IDs of the claimed jobs
+        """
+        from apps.ai.models import TranscriptionJob
+
+        now = timezone.now()
+        with transaction.atomic():
+            job_ids = list(
+                TranscriptionJob.objects.filter(status='pending')
+                .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+                .order_by('created_at')
+                .select_for_update(skip_locked=True)
+                .values_list('id', flat=True)[:limit or _setting('BATCH_SIZE', 50)]
+            )
+            TranscriptionJob.objects.filter(id__in=job_ids).update(
+                status='running', started_at=now, attempts=F('attempts') + 1
+            )
+        return job_ids
+
+    @staticmethod
+    def release_stale():
+        """
+        Return jobs whose worker disappeared to the queue (or fail them
+        once they have used up their attempts).
+
+        Returns:
+            int: Number of jobs released
+        """
+        from apps.ai.models import TranscriptionJob
+
+        cutoff = timezone.now() - timedelta(seconds=_setting('LEASE_SECONDS', 3600))
+        stale = TranscriptionJob.objects.filter(status='running', started_at__lt=cutoff)
+        failed = stale.filter(attempts__gte=_setting('MAX_ATTEMPTS', 3)).update(
+            status='failed', error='Worker did not finish the job'
+        )
+        return failed + stale.update(status='pending', error='Worker did not finish the job')
+
+    @staticmethod
+    def _fail(job, error):
+        max_attempts = _setting('MAX_ATTEMPTS', 3)
+        job.error = error[:2000]
+        if job.attempts >= max_attempts:
+            job.status = 'failed'
+        else:
+            job.status = 'pending'
+            delay = _setting('RETRY_DELAY_SECONDS', 300) * 2 ** (job.attempts - 1)
+            job.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+        job.save(update_fields=['status', 'error', 'next_attempt_at', 'updated_at'])
+
+    @staticmethod
+    def process(job_id):
+        """
+        Transcribe one claimed job and write the transcript to its call.
+
+        Args:
+            job_id: ID of a running TranscriptionJob
+
+        Returns:
+            str: The job's status afterwards
+        """
+        from apps.ai.models import TranscriptionJob, TranscriptSegment
+        from apps.calls.models import Call
+
+        job = TranscriptionJob.objects.select_related('call').get(pk=job_id)
+        if job.status != 'running':
+            # Finished by an earlier delivery of the same task
+            return job.status
+        call = job.call
+        if call.recording_checksum != job.recording_checksum or not call.recording_file:
+            job.status = 'failed'
+            job.error = 'The recording changed after the job was queued'
+            job.save(update_fields=['status', 'error', 'updated_at'])
+            return job.status
+
+        started = time.monotonic()
+        language = _setting('LANGUAGE')
+        try:
+            # A missing or broken engine fails the job like any other error
+            engine = get_engine()
+            with tempfile.TemporaryDirectory(prefix='transcription-') as workdir:
+                source = fetch_recording(call.recording_file, workdir)
+                segments = split_audio(
+                    source, workdir, _setting('SEGMENT_SECONDS', 30), _setting('FFMPEG', 'ffmpeg')
+                )
+
+                done = {segment.index: segment for segment in job.segments.all()}
+                if done and job.segment_count != len(segments):
+                    # Split differently than on the last attempt; start over
+                    job.segments.all().delete()
+                    done = {}
+                job.segment_count = len(segments)
+                job.save(update_fields=['segment_count', 'updated_at'])
+
+                missing = [segment for segment in segments if segment['index'] not in done]
+                with ThreadPoolExecutor(max_workers=_setting('SEGMENT_WORKERS', 2)) as pool:
+                    futures = {
+                        pool.submit(engine.transcribe, segment['path'], language): segment
+                        for segment in missing
+                    }
+                    for future in as_completed(futures):
+                        segment = futures[future]
+                        result = future.result()
+                        saved = TranscriptSegment(
+                            job=job,
+                            index=segment['index'],
+                            start_seconds=segment['start'],
+                            end_seconds=segment['end'],
+                            text=result['text'].strip(),
+                            confidence=result.get('confidence'),
+                        )
+                        TranscriptSegment.objects.bulk_create([saved], ignore_conflicts=True)
+                        done[segment['index']] = saved
+        except Exception as e:
+            logger.error(f"Transcription of call {call.unique_id} failed: {str(e)}")
+            TranscriptionQueueService._fail(job, str(e))
+            return job.status
+
+        transcript = '\n'.join(done[index].text for index in sorted(done) if done[index].text)
+        # Filter on the checksum so a recording replaced mid-job keeps its call untouched
+        Call.objects.filter(pk=call.pk, recording_checksum=job.recording_checksum).update(
+            ai_transcript=transcript
+        )
+
+        job.status = 'completed'
+        job.engine = engine.name
+        job.error = ''
+        job.completed_at = timezone.now()
+        job.audio_seconds = segments[-1]['end'] if segments else 0.0
+        job.processing_time_ms = int((time.monotonic() - started) * 1000)
+        job.save(update_fields=[
+            'status', 'engine', 'error', 'completed_at', 'audio_seconds',
+            'processing_time_ms', 'updated_at',
+        ])
+        return job.status
+
+    @staticmethod
+    def throughput(hours=24):
+        """
+        Transcription throughput of the current tenant per hour.
+
+        Args:
+            hours: How many hours back to report
+
+        Returns:
+            dict: ``hours`` (oldest first: hour, jobs, failures, audio and
+            processing seconds, realtime factor) and ``backlog`` (jobs by status)
+        """
+        from apps.ai.models import TranscriptionJob
+
+        since = timezone.now() - timedelta(hours=hours)
+        completed = (
+            TranscriptionJob.objects.filter(status='completed', completed_at__gte=since)
+            .annotate(hour=TruncHour('completed_at'))
+            .values('hour')
+            .annotate(
+                jobs=Count('id'),
+                audio_seconds=Sum('audio_seconds'),
+                processing_ms=Sum('processing_time_ms'),
+            )
+        )
+        failures = dict(
+            TranscriptionJob.objects.filter(status='failed', updated_at__gte=since)
+            .annotate(hour=TruncHour('updated_at'))
+            .values('hour')
+            .annotate(failures=Count('id'))
+            .values_list('hour', 'failures')
+        )
+
+        rows = {}
+        for row in completed:
+            audio_seconds = row['audio_seconds'] or 0.0
+            processing_seconds = (row['processing_ms'] or 0) / 1000
+            rows[row['hour']] = {
+                'hour': row['hour'],
+                'jobs': row['jobs'],
+                'failures': 0,
+                'audio_seconds': round(audio_seconds, 1),
+                'processing_seconds': round(processing_seconds, 1),
+                # Seconds of audio per second of job time (excludes queueing)
+                'realtime_factor': round(audio_seconds / processing_seconds, 2) if processing_seconds else None,
+            }
+        for hour, count in failures.items():
+            rows.setdefault(hour, {
+                'hour': hour, 'jobs': 0, 'failures': 0, 'audio_seconds': 0.0,
+                'processing_seconds': 0.0, 'realtime_factor': None,
+            })['failures'] = count
+
+        backlog = dict(
+            TranscriptionJob.objects.filter(status__in=['pending', 'running'])
+            .values('status')
+            .annotate(count=Count('id'))
+            .values_list('status', 'count')
+        )
+        return {
+            'hours': [rows[hour] for hour in sorted(rows)],
+            'backlog': {'pending': backlog.get('pending', 0), 'running': backlog.get('running', 0)},
+        }
@@ -0,0 +1,27 @@
+# apps/ai/signals.py
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.core.models import ReferenceData
+
+from .models import AIPromptTemplate
+from .services.prompt_registry import prompt_registry
+
+
+@receiver(post_save, sender=AIPromptTemplate)
+@receiver(post_delete, sender=AIPromptTemplate)
+def prompt_template_changed(sender, instance, **kwargs):
+    """Recompile the tenant's changed prompts on next use, once the change is visible"""
+    schema = getattr(connection, 'schema_name', 'public')
+    transaction.on_commit(lambda: prompt_registry.invalidate(schema))
+
+
+@receiver(post_save, sender=ReferenceData)
+@receiver(post_delete, sender=ReferenceData)
+def prompt_reference_data_changed(sender, instance, **kwargs):
+    """Rebuild cached fragments such as the category list in every tenant"""
+    categories = getattr(settings, 'AI_SETTINGS', {}).get('prompt_reference_categories', [])
+    if instance.category in categories:
+        transaction.on_commit(prompt_registry.invalidate_shared)
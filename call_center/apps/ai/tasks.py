@@ -1,7 +1,14 @@
 # apps/ai/tasks.py
+import logging
+
 from celery import shared_task
 from django.contrib.contenttypes.models import ContentType
+from django_tenants.utils import get_public_schema_name, get_tenant_model, schema_context
+
 from .services.case_service import CaseAIService
+from .services.transcription_queue import TranscriptionQueueService
+
+logger = logging.getLogger(__name__)
 
 @shared_task
 def analyze_case_background(case_id, user_id=None):
@@ -38,4 +45,56 @@ def analyze_case_background(case_id, user_id=None):
         'case_id': case_id,
         'suggestions': suggestions.get('success', False),
         'categories': categories.get('success', False)
-    }
\ No newline at end of file
+    }
+
+
+@shared_task
+def schedule_transcriptions(schemas=None):
+    """
+    Queue untranscribed recordings and dispatch due jobs to workers.
+
+    Intended to run every few minutes from celery beat.
+
+    Args:
+        schemas: Optional list of tenant schemas (defaults to all tenants)
+
+    Returns:
+        dict: Jobs enqueued and dispatched per schema
+    """
+    if schemas is None:
+        schemas = list(
+            get_tenant_model().objects.exclude(schema_name=get_public_schema_name())
+            .values_list('schema_name', flat=True)
+        )
+
+    summaries = {}
+    for schema in schemas:
+        try:
+            with schema_context(schema):
+                TranscriptionQueueService.release_stale()
+                enqueued = TranscriptionQueueService.enqueue_pending()
+                job_ids = TranscriptionQueueService.claim()
+        except Exception as e:
+            logger.error(f"Failed to schedule transcriptions for {schema}: {str(e)}")
+            continue
+        for job_id in job_ids:
+            transcribe_recording.delay(schema, job_id)
+        summaries[schema] = {'enqueued': enqueued, 'dispatched': len(job_ids)}
+    return summaries
+
+
+@shared_task
+def transcribe_recording(schema, job_id):
+    """
+    Run one claimed transcription job.
+
+    Args:
+        schema: Tenant schema of the job
+        job_id: ID of the TranscriptionJob
+
+    Returns:
+        dict: Job ID and resulting status
+    """
+    with schema_context(schema):
+        status = TranscriptionQueueService.process(job_id)
+    return {'job_id': job_id, 'status': status}
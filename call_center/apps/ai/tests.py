@@ -1,3 +1,166 @@
-from django.test import TestCase
+import tempfile
+import wave
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .models import AIPromptTemplate
+from .services import prompt_registry as registry_module
+from .services.prompt_registry import PromptRegistry, estimate_tokens, truncate_tokens
+from .services.transcription_engines import StubTranscriptionEngine, get_engine
+from .services.transcription_queue import TranscriptionError, split_audio
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@mock.patch.object(registry_module, 'tiktoken', None)
+class TruncateTokensTests(SimpleTestCase):
+    """Without tiktoken, tokens are estimated at four characters each."""
+
+    def test_text_within_budget_is_unchanged(self):
+        self.assertEqual(truncate_tokens('short narrative', 10), 'short narrative')
+
+    def test_long_text_keeps_its_start_on_a_word_boundary(self):
+        text = 'word ' * 100
+
+        truncated = truncate_tokens(text, 20)
+
+        self.assertTrue(truncated.endswith(registry_module.TRUNCATION_MARKER))
+        self.assertLessEqual(estimate_tokens(truncated), 20)
+        self.assertTrue(truncated.startswith('word word'))
+        self.assertNotIn('wor ' + registry_module.TRUNCATION_MARKER, truncated)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+@mock.patch.object(registry_module, 'tiktoken', None)
+class PromptRegistryTests(TestCase):
+    """Prompts render within budget and recompile only when their version changes."""
+
+    def setUp(self):
+        self.registry = PromptRegistry({'summary': 'Summarise: {{ narrative }}'})
+
+    def test_render_truncates_the_budgeted_field(self):
+        rendered = self.registry.render(
+            'summary', {'narrative': 'lorem ipsum ' * 200}, budget_field='narrative', max_tokens=50,
+        )
+
+        self.assertTrue(rendered.truncated)
+        self.assertLessEqual(rendered.tokens, 50)
+        self.assertTrue(rendered.text.startswith('Summarise: lorem ipsum'))
+        self.assertEqual(rendered.version, 0)
+
+    def test_render_leaves_short_fields_alone(self):
+        rendered = self.registry.render(
+            'summary', {'narrative': 'caller needs help'}, budget_field='narrative', max_tokens=50,
+        )
+
+        self.assertFalse(rendered.truncated)
+        self.assertEqual(rendered.text, 'Summarise: caller needs help')
+
+    def test_saved_template_is_recompiled_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            template = AIPromptTemplate.objects.create(
+                name='summary', prompt_template='v1 {{ narrative }}', interaction_type='summary',
+            )
+        version, compiled = self.registry.get('summary')
+        self.assertEqual(version, template.version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            template.prompt_template = 'v2 {{ narrative }}'
+            template.save()
+
+        new_version, recompiled = self.registry.get('summary')
+        self.assertEqual(new_version, version + 1)
+        self.assertIsNot(recompiled, compiled)
+        self.assertEqual(self.registry.render('summary', {'narrative': 'x'}).text, 'v2 x')
+
+    def test_unchanged_templates_keep_their_compilation(self):
+        _, compiled = self.registry.get('summary')
+
+        PromptRegistry.invalidate()
+
+        self.assertIs(self.registry.get('summary')[1], compiled)
+
+    def test_shared_invalidation_rebuilds_fragments(self):
+        builds = []
+
+        def build():
+            builds.append(1)
+            return 'Abuse, Neglect'
+
+        self.registry.fragment('case_categories', build)
+        self.registry.fragment('case_categories', build)
+        PromptRegistry.invalidate_shared()
+        self.registry.fragment('case_categories', build)
+
+        self.assertEqual(len(builds), 2)
+
+
+def write_wav(path, seconds, rate=16000):
+    with wave.open(str(path), 'wb') as audio:
+        audio.setnchannels(1)
+        audio.setsampwidth(2)
+        audio.setframerate(rate)
+        audio.writeframes(b'\x00\x00' * int(rate * seconds))
+    return path
+
+
+class SplitAudioTests(SimpleTestCase):
+    """Without ffmpeg, WAV recordings are split frame-accurately."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.workdir = Path(tmp.name)
+
+    def test_splits_wav_into_consecutive_segments(self):
+        source = write_wav(self.workdir / 'source.wav', 2.5)
+
+        segments = split_audio(source, self.workdir, 1, ffmpeg='no-such-ffmpeg')
+
+        self.assertEqual([segment['index'] for segment in segments], [0, 1, 2])
+        self.assertEqual(
+            [(segment['start'], segment['end']) for segment in segments],
+            [(0.0, 1.0), (1.0, 2.0), (2.0, 2.5)],
+        )
+        self.assertTrue(all(segment['path'].exists() for segment in segments))
+
+    def test_non_wav_without_ffmpeg_is_an_error(self):
+        source = self.workdir / 'source.mp3'
+        source.write_bytes(b'ID3 not really audio')
+
+        with self.assertRaises(TranscriptionError):
+            split_audio(source, self.workdir, 1, ffmpeg='no-such-ffmpeg')
+
+
+class TranscriptionEngineTests(SimpleTestCase):
+    """The stub engine describes audio; production must name a real engine."""
+
+    def setUp(self):
+        get_engine.cache_clear()
+        self.addCleanup(get_engine.cache_clear)
+
+    def test_stub_describes_audio_length(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            path = write_wav(Path(workdir) / 'segment.wav', 1.5)
+            result = StubTranscriptionEngine().transcribe(path)
+
+        self.assertEqual(result, {'text': '[1.5s of audio]', 'confidence': None})
+
+    def test_stub_tolerates_unreadable_audio(self):
+        result = StubTranscriptionEngine().transcribe('/nonexistent/segment.wav')
+
+        self.assertEqual(result['text'], '[0.0s of audio]')
+
+    @override_settings(TRANSCRIPTION={'ENGINE': ''})
+    def test_engine_is_required(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_engine()
+
+    @override_settings(TRANSCRIPTION={
+        'ENGINE': 'apps.ai.services.transcription_engines.StubTranscriptionEngine',
+    })
+    def test_engine_is_built_once(self):
+        self.assertIs(get_engine(), get_engine())
@@ -0,0 +1,96 @@
+# apps/analytics/services.py
+from datetime import datetime, time, timedelta
+
+from django.db.models import Avg, Count, Q, Sum
+from django.utils import timezone
+
+ANSWERED_STATUSES = ['answered', 'completed']
+MISSED_STATUSES = ['no_answer', 'abandoned', 'busy']
+
+
+class ReportingService:
+    """Aggregated reports over cases and calls."""
+
+    @staticmethod
+    def generate_daily_summaries(user_ids, day=None):
+        """
+        Build daily summaries for many users with two grouped queries.
+
+        Args:
+            user_ids: IDs of the users to summarise
+            day: Date to summarise (defaults to today)
+
+        Returns:
+            dict: ``{user_id: summary}``; users without activity get zeros
+        """
+        from apps.calls.models import Call
+        from apps.cases.models import Case
+
+        day = day or timezone.localdate()
+        day_start = timezone.make_aware(datetime.combine(day, time.min))
+        day_end = day_start + timedelta(days=1)
+        now = timezone.now()
+
+        summaries = {
+            user_id: ReportingService._empty_summary(day)
+            for user_id in user_ids
+        }
+
+        case_rows = (
+            Case.objects
+            .filter(assigned_to_id__in=user_ids, is_active=True)
+            .filter(Q(closed_date__isnull=True) | Q(closed_date__gte=day_start))
+            .values('assigned_to_id')
+            .annotate(
+                open=Count('id', filter=Q(closed_date__isnull=True)),
+                opened_today=Count('id', filter=Q(created_at__gte=day_start, created_at__lt=day_end)),
+                closed_today=Count('id', filter=Q(closed_date__gte=day_start, closed_date__lt=day_end)),
+                overdue=Count('id', filter=Q(closed_date__isnull=True, due_date__lt=now)),
+            )
+            .order_by()
+        )
+        for row in case_rows:
+            summaries[row.pop('assigned_to_id')]['cases'].update(row)
+
+        call_rows = (
+            Call.objects
+            .filter(agent_id__in=user_ids, call_date=day)
+            .values('agent_id')
+            .annotate(
+                total=Count('id'),
+                answered=Count('id', filter=Q(call_status__in=ANSWERED_STATUSES)),
+                missed=Count('id', filter=Q(call_status__in=MISSED_STATUSES)),
+                talk_time=Sum('talk_duration'),
+                average_talk_time=Avg('talk_duration'),
+            )
+            .order_by()
+        )
+        for row in call_rows:
+            summaries[row.pop('agent_id')]['calls'].update(row)
+
+        return summaries
+
+    @staticmethod
+    def generate_user_daily_summary(user, day=None):
+        """
+        Build the daily summary for a single user.
+
+        Args:
+            user: The User
+            day: Date to summarise (defaults to today)
+
+        Returns:
+            dict: Summary with 'cases' and 'calls' sections
+        """
+        return ReportingService.generate_daily_summaries([user.id], day)[user.id]
+
+    @staticmethod
+    def _empty_summary(day):
+        return {
+            'date': day,
+            'cases': {'open': 0, 'opened_today': 0, 'closed_today': 0, 'overdue': 0},
+            'calls': {
+                'total': 0, 'answered': 0, 'missed': 0,
+                'talk_time': None, 'average_talk_time': None,
+            },
+        }
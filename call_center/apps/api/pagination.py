@@ -1,5 +1,6 @@
 # apps/api/pagination.py
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 from rest_framework.response import Response
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -25,4 +26,29 @@ class LargeResultsSetPagination(PageNumberPagination):
     """Pagination for endpoints that need larger page sizes."""
     page_size = 100
     page_size_query_param = 'page_size'
-    max_page_size = 1000
\ No newline at end of file
+    max_page_size = 1000
+
+
+class TimelineCursorPagination(CursorPagination):
+    """
+    Cursor pagination for append-mostly feeds such as case activities:
+    no COUNT query, and every page is a range scan on (created_at, id).
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-created_at', '-id')
+
+
+class TimelineOrderingFilter(OrderingFilter):
+    """
+    OrderingFilter for cursor-paginated views: a client-chosen ordering always
+    ends on ``id``, so rows sharing a timestamp keep a fixed order and no row
+    is skipped or repeated between pages.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = list(super().get_ordering(request, queryset, view) or [])
+        if ordering and ordering[-1].lstrip('-') not in ('id', 'pk'):
+            ordering.append('-id' if ordering[-1].startswith('-') else 'id')
+        return ordering
@@ -250,28 +250,6 @@
 #             user=self.request.user
 #         ).order_by('-created_at')
     
-#     @action(detail=False, methods=['get'])
-#     def unread(self, request):
-#         """Get unread notifications."""
-#         from apps.notifications.services import NotificationService
-#         notifications = NotificationService.get_unread_notifications(request.user)
-        
-#         page = self.paginate_queryset(notifications)
-#         if page is not None:
-#             serializer = self.get_serializer(page, many=True)
-#             return self.get_paginated_response(serializer.data)
-            
-#         serializer = self.get_serializer(notifications, many=True)
-#         return Response(serializer.data)
-    
-#     @action(detail=True, methods=['post'])
-#     def mark_read(self, request, pk=None):
-#         """Mark a notification as read."""
-#         notification = self.get_object()
-#         notification.mark_as_read()
-#         serializer = self.get_serializer(notification)
-#         return Response(serializer.data)
-    
 #     @action(detail=False, methods=['post'])
 #     def mark_all_read(self, request):
 #         """Mark all notifications as read."""
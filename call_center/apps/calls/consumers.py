@@ -0,0 +1,37 @@
+# apps/calls/consumers.py
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from . import wallboard
+
+
+class WallboardConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Streams live queue and campaign metrics to a supervisor's wallboard.
+    See ``apps.calls.wallboard``.
+    """
+
+    async def connect(self):
+        self.user = self.scope.get('user')
+        self.schema = self.scope.get('schema_name')
+        if not self.schema or self.user is None or not self.user.is_authenticated:
+            await self.close(code=4401)
+            return
+        if not self.user.can_supervise:
+            await self.close(code=4403)
+            return
+
+        self.group = wallboard.wallboard_group(self.schema)
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.accept()
+        # Make sure the aggregator tracks this tenant even before its next call
+        await self.channel_layer.send(wallboard.WALLBOARD_CHANNEL, {
+            'type': 'tenant.subscribe',
+            'schema': self.schema,
+        })
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group'):
+            await self.channel_layer.group_discard(self.group, self.channel_name)
+
+    async def wallboard_snapshot(self, event):
+        await self.send_json({'event': 'wallboard', 'payload': event['snapshot']})
@@ -0,0 +1,23 @@
+# apps/calls/management/commands/run_wallboard.py
+import asyncio
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.calls.wallboard import WallboardAggregator
+
+
+class Command(BaseCommand):
+    help = 'Aggregate call events and publish live wallboard snapshots (run exactly one)'
+
+    def handle(self, *args, **options):
+        aggregator = WallboardAggregator()
+        if aggregator.channel_layer is None:
+            raise CommandError('No channel layer is configured')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Publishing wallboard snapshots every {aggregator.interval}s"
+        ))
+        try:
+            asyncio.run(aggregator.run())
+        except KeyboardInterrupt:
+            pass
@@ -359,13 +359,25 @@ class Call(TimeStampedModel):
         max_length=500,
         blank=True,
         verbose_name=_("Recording File"),
-        help_text=_("Path to call recording file")
+        help_text=_("Name of the call recording in recordings storage")
     )
     recording_duration = models.DurationField(
         null=True,
         blank=True,
         verbose_name=_("Recording Duration")
     )
+    recording_size = models.PositiveBigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name=_("Recording Size"),
+        help_text=_("Size of the stored recording in bytes")
+    )
+    recording_checksum = models.CharField(
+        max_length=64,
+        blank=True,
+        verbose_name=_("Recording Checksum"),
+        help_text=_("SHA-256 of the stored recording")
+    )
     
     # SLA and Performance Metrics
     sla_target_answer = models.PositiveIntegerField(
@@ -386,6 +398,11 @@ class Call(TimeStampedModel):
         verbose_name=_("SLA Met"),
         help_text=_("Whether call met SLA targets")
     )
+    stats_recorded = models.BooleanField(
+        default=False,
+        verbose_name=_("Statistics Recorded"),
+        help_text=_("Whether this completed call was counted in campaign statistics")
+    )
     
     # Date-based fields for reporting (calculated)
     call_date = models.DateField(
@@ -490,6 +507,7 @@ class Call(TimeStampedModel):
             models.Index(fields=['call_status', '-start_time']),
             models.Index(fields=['agent', '-start_time']),
             models.Index(fields=['campaign', '-start_time']),
+            models.Index(fields=['campaign', 'stats_recorded']),
             models.Index(fields=['contact', '-start_time']),
             # models.Index(fields=['case', '-start_time']),
             
@@ -672,7 +690,7 @@ class CallEvent(TimeStampedModel):
         verbose_name_plural = _("Call Events")
         ordering = ['call', 'event_time']
         indexes = [
-            models.Index(fields=['call', 'event_time']),
+            models.Index(fields=['call', 'event_time', 'id']),
             models.Index(fields=['event_type', 'event_time']),
             models.Index(fields=['agent', 'event_time']),
         ]
@@ -0,0 +1,8 @@
+# apps/calls/routing.py
+from django.urls import path
+
+from .consumers import WallboardConsumer
+
+websocket_urlpatterns = [
+    path('ws/wallboard/', WallboardConsumer.as_asgi()),
+]
@@ -89,6 +89,20 @@ class CallService:
             
         call.save()
         
+        # Live queue activity for consoles subscribed to this queue (or the whole tenant)
+        from apps.notifications import realtime
+        payload = {
+            'call_id': call.id,
+            'event_type': event_type,
+            'agent_id': agent.id if agent else None,
+            'event_time': event.event_time.isoformat(),
+        }
+        queue = (details or {}).get('queue')
+        if queue:
+            realtime.push_to_queue(queue, 'queue', {**payload, 'queue': queue})
+        else:
+            realtime.push_to_tenant('queue', payload)
+        
         return event
     
     @staticmethod
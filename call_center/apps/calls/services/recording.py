@@ -0,0 +1,439 @@
+# apps/calls/services/recording.py
+"""
+Call recording ingestion.
+
+Asterisk writes recordings into a spool directory per tenant
+(``CALL_RECORDINGS['SPOOL_DIR']/<schema>/``). Each ingest run:
+
+1. measures the spool backlog and claims up to BATCH_SIZE settled files
+   by renaming them into ``.processing/`` (atomic, so concurrent workers
+   never take the same file),
+2. matches each file to its Call by the Asterisk unique ID in its name,
+3. transcodes it with ffmpeg to a compact codec, at most
+   TRANSCODE_WORKERS at a time,
+4. streams the result into the ``recordings`` storage (local filesystem by
+   default, any Django storage backend such as object storage otherwise)
+   under a date-sharded name, hashing it in chunks on the way, then
+   re-reads it to verify the checksum,
+5. records name, size, checksum and duration on the Call and deletes the
+   spool copy.
+
+Files that fail go to ``.failed/``; files whose call is not known yet are
+left in the spool until ORPHAN_SECONDS have passed. Throughput counters and
+the backlog gauge are kept in the cache (see ``RecordingMetrics``).
+"""
+import hashlib
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import storages
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+RECORDINGS_STORAGE = 'recordings'
+PROCESSING_DIR = '.processing'
+FAILED_DIR = '.failed'
+METRICS_TIMEOUT = 60 * 60 * 24 * 7
+
+CODEC_EXTENSIONS = {
+    'libopus': '.opus',
+    'libmp3lame': '.mp3',
+    'pcm_s16le': '.wav',
+}
+
+
+def _setting(name, default=None):
+    return getattr(settings, 'CALL_RECORDINGS', {}).get(name, default)
+
+
+def _schema():
+    return getattr(connection, 'schema_name', 'public')
+
+
+def get_storage():
+    return storages[RECORDINGS_STORAGE]
+
+
+class RecordingError(Exception):
+    """A recording could not be transcoded, stored or verified."""
+
+
+class _HashingReader:
+    """File wrapper that hashes and counts the bytes read through it."""
+
+    def __init__(self, fileobj, size):
+        self.fileobj = fileobj
+        self.size = size
+        self.digest = hashlib.sha256()
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        self.digest.update(data)
+        self.bytes_read += len(data)
+        return data
+
+
+def checksum(fileobj, chunk_size):
+    """
+    SHA-256 of a file object, read in chunks.
+
+    Returns:
+        tuple: (size in bytes, hex digest)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: fileobj.read(chunk_size), b''):
+        digest.update(chunk)
+        size += len(chunk)
+    return size, digest.hexdigest()
+
+
+def transcode(source, destination_dir, codec, bitrate, ffmpeg='ffmpeg'):
+    """
+    Transcode a recording to mono `codec` at `bitrate` with ffmpeg.
+
+    Falls back to the original file when ffmpeg is not installed.
+
+    Returns:
+        Path: The transcoded file (inside destination_dir) or `source`
+    """
+    if not shutil.which(ffmpeg):
+        logger.warning(f"{ffmpeg} not found; storing {source.name} without transcoding")
+        return source
+
+    output = Path(destination_dir) / (source.stem + CODEC_EXTENSIONS.get(codec, '.' + codec))
+    command = [
+        ffmpeg, '-nostdin', '-loglevel', 'error', '-y', '-i', str(source),
+        '-vn', '-ac', '1', '-c:a', codec, '-b:a', bitrate, str(output),
+    ]
+    result = subprocess.run(command, capture_output=True, timeout=_setting('TRANSCODE_TIMEOUT', 600))
+    if result.returncode != 0:
+        raise RecordingError(f"ffmpeg failed for {source.name}: {result.stderr.decode(errors='replace')[:500]}")
+    return output
+
+
+def wav_duration(path):
+    """Duration of a WAV file from its header, or None for other formats."""
+    try:
+        with wave.open(str(path)) as audio:
+            return timedelta(seconds=audio.getnframes() / float(audio.getframerate()))
+    except (wave.Error, EOFError, OSError):
+        return None
+
+
+def recording_name(call, extension, schema=None):
+    """Date-sharded storage name: <schema>/<yyyy>/<mm>/<dd>/<call uuid><ext>"""
+    started = timezone.localtime(call.start_time) if call.start_time else timezone.localtime()
+    return f"{schema or _schema()}/{started:%Y/%m/%d}/{call.uuid}{extension}"
+
+
+def store_file(path, name, chunk_size):
+    """
+    Stream a file into recordings storage, hashing it in chunks, and verify
+    the stored copy against the hash.
+
+    Returns:
+        tuple: (stored name, size, hex digest)
+
+    Raises:
+        RecordingError: If the stored copy does not match
+    """
+    storage = get_storage()
+    with open(path, 'rb') as source:
+        reader = _HashingReader(source, os.path.getsize(path))
+        stored_name = storage.save(name, File(reader, name=name))
+    size, digest = reader.bytes_read, reader.digest.hexdigest()
+
+    if _setting('VERIFY', True):
+        with storage.open(stored_name, 'rb') as stored:
+            stored_size, stored_digest = checksum(stored, chunk_size)
+        if (stored_size, stored_digest) != (size, digest):
+            storage.delete(stored_name)
+            raise RecordingError(f"Checksum mismatch storing {name}")
+    return stored_name, size, digest
+
+
+def process_recording(path, name, options):
+    """
+    Transcode and store one claimed spool file. Runs in the worker pool, so
+    it must not touch the database.
+
+    Returns:
+        dict: name, size, checksum, duration and source_size
+    """
+    with tempfile.TemporaryDirectory(prefix='recording-') as workdir:
+        output = transcode(path, workdir, options['codec'], options['bitrate'], options['ffmpeg'])
+        stored_name, size, digest = store_file(output, name + output.suffix, options['chunk_size'])
+    return {
+        'name': stored_name,
+        'size': size,
+        'checksum': digest,
+        'duration': wav_duration(path),
+        'source_size': os.path.getsize(path),
+    }
+
+
+class RecordingMetrics:
+    """Throughput counters and backlog gauge for recording ingestion, per tenant"""
+
+    COUNTERS = ['files', 'failures', 'bytes_in', 'bytes_out', 'milliseconds']
+
+    @staticmethod
+    def _key(name, schema=None):
+        return f"recordings:metrics:{schema or _schema()}:{name}"
+
+    @staticmethod
+    def record_run(files, failures, bytes_in, bytes_out, seconds):
+        """Add one ingest run to the running totals"""
+        values = {
+            'files': files, 'failures': failures, 'bytes_in': bytes_in,
+            'bytes_out': bytes_out, 'milliseconds': int(seconds * 1000),
+        }
+        for name, value in values.items():
+            key = RecordingMetrics._key(name)
+            if not cache.add(key, value, METRICS_TIMEOUT):
+                try:
+                    cache.incr(key, value)
+                except ValueError:
+                    cache.set(key, value, METRICS_TIMEOUT)
+        cache.set(RecordingMetrics._key('last_run'), {
+            'at': timezone.now().isoformat(),
+            'files': files,
+            'failures': failures,
+            'files_per_second': round(files / seconds, 2) if seconds else None,
+            'megabytes_per_second': round(bytes_in / seconds / 1e6, 2) if seconds else None,
+        }, METRICS_TIMEOUT)
+
+    @staticmethod
+    def set_backlog(files, size, oldest_age):
+        cache.set(RecordingMetrics._key('backlog'), {
+            'files': files,
+            'bytes': size,
+            'oldest_age_seconds': round(oldest_age, 1),
+            'measured_at': timezone.now().isoformat(),
+        }, METRICS_TIMEOUT)
+
+    @staticmethod
+    def snapshot():
+        """
+        Current metrics of the tenant.
+
+        Returns:
+            dict: ``totals`` (files, failures, bytes in and out, processing
+            seconds and overall throughput), ``last_run`` and ``backlog``
+        """
+        keys = {name: RecordingMetrics._key(name) for name in RecordingMetrics.COUNTERS}
+        values = cache.get_many(list(keys.values()))
+        totals = {name: values.get(key, 0) for name, key in keys.items()}
+        seconds = totals.pop('milliseconds') / 1000
+        totals['processing_seconds'] = round(seconds, 1)
+        totals['files_per_second'] = round(totals['files'] / seconds, 2) if seconds else None
+        totals['compression_ratio'] = (
+            round(totals['bytes_in'] / totals['bytes_out'], 2) if totals['bytes_out'] else None
+        )
+        return {
+            'totals': totals,
+            'last_run': cache.get(RecordingMetrics._key('last_run')),
+            'backlog': cache.get(RecordingMetrics._key('backlog')),
+        }
+
+
+class RecordingIngestService:
+    """Moves recordings from the PBX spool into recordings storage"""
+
+    @staticmethod
+    def spool_dir(schema=None) -> Path:
+        return Path(_setting('SPOOL_DIR', '/var/spool/asterisk/monitor')) / (schema or _schema())
+
+    @staticmethod
+    def scan_backlog(spool=None):
+        """
+        List spool files ready for ingestion and update the backlog gauge.
+
+        Files modified in the last MIN_AGE_SECONDS are still being written
+        and are skipped.
+
+        Returns:
+            list: Paths of ready files, oldest first
+        """
+        spool = spool or RecordingIngestService.spool_dir()
+        if not spool.is_dir():
+            RecordingMetrics.set_backlog(0, 0, 0)
+            return []
+
+        now = time.time()
+        settle = _setting('MIN_AGE_SECONDS', 10)
+        entries = []
+        with os.scandir(spool) as scan:
+            for entry in scan:
+                if not entry.is_file() or entry.name.startswith('.'):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, Path(entry.path)))
+        entries.sort()
+
+        RecordingMetrics.set_backlog(
+            len(entries), sum(size for _, size, _ in entries),
+            now - entries[0][0] if entries else 0,
+        )
+        return [path for mtime, _, path in entries if now - mtime >= settle]
+
+    @staticmethod
+    def claim(path):
+        """
+        Move a spool file into .processing; returns its new path, or None if taken.
+
+        The file's mtime is set to the claim time first (rename keeps it), so
+        ``release_stale_claims`` measures how long the claim is held rather
+        than how old the recording is.
+        """
+        processing = path.parent / PROCESSING_DIR
+        processing.mkdir(exist_ok=True)
+        claimed = processing / path.name
+        try:
+            os.utime(path)
+            os.rename(path, claimed)
+        except FileNotFoundError:
+            return None
+        return claimed
+
+    @staticmethod
+    def _move(path, directory):
+        target = path.parent.parent / directory if path.parent.name == PROCESSING_DIR else path.parent / directory
+        target.mkdir(exist_ok=True)
+        os.replace(path, target / path.name)
+
+    @staticmethod
+    def release_stale_claims(spool=None, max_age=3600):
+        """Return files claimed more than `max_age` seconds ago (a crashed worker's) to the spool"""
+        processing = (spool or RecordingIngestService.spool_dir()) / PROCESSING_DIR
+        if not processing.is_dir():
+            return 0
+        released = 0
+        for path in processing.iterdir():
+            if path.is_file() and time.time() - path.stat().st_mtime > max_age:
+                os.replace(path, processing.parent / path.name)
+                released += 1
+        return released
+
+    @staticmethod
+    def match_calls(paths):
+        """
+        Map spool files to calls by the Asterisk unique ID in the file name.
+
+        Returns:
+            dict: Path -> Call, for the files whose call exists
+        """
+        from apps.calls.models import Call
+
+        pattern = re.compile(_setting('FILENAME_PATTERN', r'(?P<unique_id>\d+\.\d+)'))
+        unique_ids = {}
+        for path in paths:
+            match = pattern.search(path.stem)
+            if match:
+                unique_ids[path] = match.group('unique_id')
+        calls = Call.objects.filter(unique_id__in=set(unique_ids.values())).only(
+            'id', 'uuid', 'unique_id', 'start_time'
+        )
+        by_unique_id = {call.unique_id: call for call in calls}
+        return {
+            path: by_unique_id[unique_id]
+            for path, unique_id in unique_ids.items() if unique_id in by_unique_id
+        }
+
+    @staticmethod
+    def ingest_batch(limit=None):
+        """
+        Ingest up to `limit` (default BATCH_SIZE) recordings of the current tenant.
+
+        Returns:
+            dict: files ingested, failures, orphans left for later, bytes in/out, seconds
+        """
+        from apps.calls.models import Call
+
+        started = time.monotonic()
+        spool = RecordingIngestService.spool_dir()
+        RecordingIngestService.release_stale_claims(spool)
+        ready = RecordingIngestService.scan_backlog(spool)[:limit or _setting('BATCH_SIZE', 200)]
+
+        calls = RecordingIngestService.match_calls(ready)
+        orphan_seconds = _setting('ORPHAN_SECONDS', 3600)
+        summary = {'files': 0, 'failures': 0, 'orphans': 0, 'bytes_in': 0, 'bytes_out': 0}
+
+        claimed = {}
+        for path in ready:
+            call = calls.get(path)
+            if call is None:
+                # The call may not be saved yet; give up on it eventually
+                if time.time() - path.stat().st_mtime > orphan_seconds:
+                    logger.warning(f"No call found for recording {path.name}")
+                    RecordingIngestService._move(path, FAILED_DIR)
+                    summary['failures'] += 1
+                else:
+                    summary['orphans'] += 1
+                continue
+            claimed_path = RecordingIngestService.claim(path)
+            if claimed_path:
+                claimed[claimed_path] = call
+
+        options = {
+            'codec': _setting('CODEC', 'libopus'),
+            'bitrate': _setting('BITRATE', '16k'),
+            'ffmpeg': _setting('FFMPEG', 'ffmpeg'),
+            'chunk_size': _setting('CHUNK_SIZE', 1024 * 1024),
+        }
+        schema = _schema()
+        # ffmpeg does the work in its own processes; the pool bounds how many
+        # run at once, so a burst at shift change cannot starve the host
+        with ThreadPoolExecutor(max_workers=_setting('TRANSCODE_WORKERS', 2)) as pool:
+            futures = {
+                pool.submit(process_recording, path, recording_name(call, '', schema), options): (path, call)
+                for path, call in claimed.items()
+            }
+            for future in as_completed(futures):
+                path, call = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to ingest recording {path.name}: {str(e)}")
+                    RecordingIngestService._move(path, FAILED_DIR)
+                    summary['failures'] += 1
+                    continue
+
+                fields = {
+                    'recording_file': result['name'],
+                    'recording_size': result['size'],
+                    'recording_checksum': result['checksum'],
+                }
+                if result['duration'] is not None:
+                    fields['recording_duration'] = result['duration']
+                # update() so call signals (wallboard, statistics) do not fire again
+                Call.objects.filter(pk=call.pk).update(**fields)
+                path.unlink()
+                summary['files'] += 1
+                summary['bytes_in'] += result['source_size']
+                summary['bytes_out'] += result['size']
+
+        summary['seconds'] = round(time.monotonic() - started, 3)
+        RecordingMetrics.record_run(
+            summary['files'], summary['failures'], summary['bytes_in'],
+            summary['bytes_out'], summary['seconds'],
+        )
+        # Refresh the gauge after the batch
+        RecordingIngestService.scan_backlog(spool)
+        return summary
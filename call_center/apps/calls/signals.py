@@ -1,6 +1,7 @@
 # apps/calls/signals.py
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
+from . import wallboard
 from .models import Call, CallEvent
 
 
@@ -44,4 +45,19 @@ def call_post_save(sender, instance, created, **kwargs):
                 event_time=instance.end_time,
                 description=f'Call ended: {instance.hangup_reason}',
                 agent=instance.agent
-            )
\ No newline at end of file
+            )
+    
+    # Stream inbound call progress to the live wallboard
+    wallboard.publish_call(instance)
+    
+    # Keep the dialer lease of a campaign contact whose call is still live
+    if instance.campaign_id and instance.contact_id and not instance.end_time:
+        from apps.campaigns.services import DialerService
+        DialerService.renew_lease(
+            instance.campaign_id, instance.contact_id, answered=bool(instance.answer_time)
+        )
+    
+    # Count completed campaign calls in the campaign's running statistics
+    if instance.end_time and instance.campaign_id and not instance.stats_recorded:
+        from apps.campaigns.services import CampaignStatisticsService
+        CampaignStatisticsService.record_call(instance)
@@ -0,0 +1,40 @@
+# apps/calls/tasks.py
+import logging
+
+from celery import shared_task
+from django_tenants.utils import get_public_schema_name, get_tenant_model, schema_context
+
+from .services.recording import RecordingIngestService
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def ingest_call_recordings(schemas=None, limit=None):
+    """
+    Ingest spooled call recordings for every tenant.
+
+    Intended to run every minute from celery beat; runs overlap safely
+    because spool files are claimed atomically.
+
+    Args:
+        schemas: Optional list of tenant schemas (defaults to all tenants)
+        limit: Optional maximum files per tenant (defaults to BATCH_SIZE)
+
+    Returns:
+        dict: Ingest summary per schema
+    """
+    if schemas is None:
+        schemas = list(
+            get_tenant_model().objects.exclude(schema_name=get_public_schema_name())
+            .values_list('schema_name', flat=True)
+        )
+
+    summaries = {}
+    for schema in schemas:
+        try:
+            with schema_context(schema):
+                summaries[schema] = RecordingIngestService.ingest_batch(limit)
+        except Exception as e:
+            logger.error(f"Failed to ingest recordings for {schema}: {str(e)}")
+    return summaries
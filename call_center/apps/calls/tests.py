@@ -1,3 +1,143 @@
-from django.test import TestCase
+import os
+import tempfile
+import time
+from pathlib import Path
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from .services.recording import PROCESSING_DIR, RecordingIngestService
+from .wallboard import STALE_WAIT_SECONDS, SlidingWindow, TenantMetrics
+
+
+class RecordingClaimTests(SimpleTestCase):
+    """Claims are aged from when they were taken, not from the recording's mtime."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.spool = Path(directory.name)
+
+    def spool_file(self, name, age):
+        path = self.spool / name
+        path.write_bytes(b'RIFF')
+        then = time.time() - age
+        os.utime(path, (then, then))
+        return path
+
+    def test_fresh_claim_of_old_recording_is_not_stale(self):
+        path = self.spool_file('1700000000.1.wav', age=2 * 3600)
+        claimed = RecordingIngestService.claim(path)
+
+        released = RecordingIngestService.release_stale_claims(self.spool, max_age=3600)
+
+        self.assertEqual(released, 0)
+        self.assertTrue(claimed.exists())
+        self.assertEqual(claimed.parent.name, PROCESSING_DIR)
+
+    def test_abandoned_claim_is_released(self):
+        claimed = RecordingIngestService.claim(self.spool_file('1700000000.2.wav', age=0))
+        then = time.time() - 2 * 3600
+        os.utime(claimed, (then, then))
+
+        released = RecordingIngestService.release_stale_claims(self.spool, max_age=3600)
+
+        self.assertEqual(released, 1)
+        self.assertTrue((self.spool / '1700000000.2.wav').exists())
+
+    def test_claim_of_taken_file_returns_none(self):
+        path = self.spool_file('1700000000.3.wav', age=60)
+        RecordingIngestService.claim(path)
+
+        self.assertIsNone(RecordingIngestService.claim(path))
+
+
+def call_update(call_id, start, answer=None, end=None, campaign_id=None, status='ringing', sla_met=None):
+    return {
+        'type': 'call.update', 'schema': 'tenant_a', 'call_id': call_id, 'campaign_id': campaign_id,
+        'start': start, 'answer': answer, 'end': end, 'status': status, 'sla_met': sla_met,
+    }
+
+
+class SlidingWindowTests(SimpleTestCase):
+    """Counters cover exactly the calls inside the window."""
+
+    def test_expired_calls_leave_the_counters(self):
+        window = SlidingWindow(60)
+        window.add(100, True, speed=10, sla_met=True)
+        window.add(130, False)
+        window.add(150, True, speed=30, sla_met=False)
+
+        window.expire(170)
+
+        self.assertEqual((window.answered, window.abandoned), (1, 1))
+        self.assertEqual((window.speed_total, window.sla_met), (30, 0))
+
+        window.expire(300)
+
+        self.assertEqual((window.answered, window.abandoned, window.speed_total), (0, 0, 0))
+
+
+class TenantMetricsTests(SimpleTestCase):
+    """Call updates fold into tenant, queue and campaign metrics once per call."""
+
+    def setUp(self):
+        self.metrics = TenantMetrics(60, sla_seconds=20, queue_names={7: 'support'})
+
+    def test_repeated_updates_count_once(self):
+        self.metrics.apply(call_update(1, start=100), now=100)
+        self.metrics.apply(call_update(1, start=100), now=101)
+        self.assertEqual(self.metrics.snapshot(105)['totals']['waiting'], 1)
+
+        answered = call_update(1, start=100, answer=110, status='answered')
+        self.metrics.apply(answered, now=110)
+        self.metrics.apply(answered, now=111)
+
+        totals = self.metrics.snapshot(115)['totals']
+        self.assertEqual((totals['waiting'], totals['answered']), (0, 1))
+        self.assertEqual(totals['average_speed_of_answer'], 10)
+
+    def test_late_updates_do_not_reopen_or_recount(self):
+        self.metrics.apply(call_update(1, start=100, answer=105, status='answered'), now=105)
+        # Delivered after the answer
+        self.metrics.apply(call_update(1, start=100), now=106)
+        self.metrics.apply(call_update(1, start=100, answer=105, end=200, status='completed'), now=200)
+
+        totals = self.metrics.snapshot(200)['totals']
+        self.assertEqual((totals['waiting'], totals['answered'], totals['abandoned']), (0, 1, 0))
+
+    def test_window_expiry(self):
+        self.metrics.apply(call_update(1, start=100, answer=105, status='answered'), now=105)
+        self.metrics.apply(call_update(2, start=100, end=150, status='abandoned'), now=150)
+
+        self.metrics.expire(180)
+        totals = self.metrics.snapshot(180)['totals']
+        self.assertEqual((totals['answered'], totals['abandoned']), (0, 1))
+        self.assertEqual(totals['sla_percentage'], 0)
+
+        self.metrics.expire(300)
+        self.assertIsNone(self.metrics.snapshot(300)['totals']['sla_percentage'])
+        self.assertEqual(self.metrics.calls, {})
+
+    def test_stale_waiting_calls_are_dropped(self):
+        self.metrics.apply(call_update(1, start=100), now=100)
+
+        self.metrics.expire(100 + STALE_WAIT_SECONDS + 1)
+
+        self.assertEqual(self.metrics.snapshot(100 + STALE_WAIT_SECONDS + 1)['totals']['waiting'], 0)
+
+    def test_queue_and_campaign_scopes(self):
+        self.metrics.apply(call_update(1, start=100, answer=105, campaign_id=7, status='answered'), now=105)
+        self.metrics.apply(call_update(2, start=100, answer=150, campaign_id=8, status='answered'), now=150)
+        self.metrics.apply(call_update(3, start=140, campaign_id=7), now=140)
+
+        snapshot = self.metrics.snapshot(150)
+
+        self.assertEqual(snapshot['totals']['answered'], 2)
+        self.assertEqual(snapshot['totals']['sla_percentage'], 50)
+        self.assertEqual(list(snapshot['queues']), ['support'])
+        self.assertEqual(snapshot['queues']['support']['answered'], 1)
+        self.assertEqual(snapshot['queues']['support']['waiting'], 1)
+        self.assertEqual(snapshot['queues']['support']['longest_wait'], 10)
+        self.assertEqual(snapshot['campaigns']['8']['answered'], 1)
+        self.assertEqual(snapshot['campaigns']['8']['average_speed_of_answer'], 50)
+        self.assertEqual(snapshot['campaigns']['8']['waiting'], 0)
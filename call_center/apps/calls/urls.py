@@ -0,0 +1,11 @@
+# apps/calls/urls.py
+from django.urls import path
+
+from . import views
+
+app_name = 'calls'
+
+urlpatterns = [
+    path('api/v1/calls/<int:call_id>/recording/', views.CallRecordingView.as_view(), name='call-recording'),
+    path('api/v1/calls/recordings/metrics/', views.RecordingMetricsView.as_view(), name='recording-metrics'),
+]
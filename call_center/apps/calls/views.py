@@ -1,3 +1,111 @@
-from django.shortcuts import render
+# apps/calls/views.py
+import mimetypes
+import re
 
-# Create your views here.
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from apps.core.permissions import IsAuthenticated
+
+from .models import Call
+from .services.recording import RecordingMetrics, get_storage
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_CHUNK_SIZE = 64 * 1024
+
+mimetypes.add_type('audio/ogg', '.opus')
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range ``Range`` header.
+
+    Returns:
+        tuple: (start, end) inclusive, None when there is no usable header,
+        or False when the range cannot be satisfied
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if start == '':
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _stream(fileobj, start, length):
+    try:
+        fileobj.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = fileobj.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+class CallRecordingView(APIView):
+    """
+    Stream a call's recording, honouring HTTP range requests so players can
+    seek without downloading the whole file.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, call_id):
+        calls = Call.objects.all()
+        if not request.user.can_supervise:
+            calls = calls.filter(agent=request.user)
+        call = get_object_or_404(calls, id=call_id)
+        if not call.has_recording:
+            return Response({'error': 'Call has no recording'}, status=status.HTTP_404_NOT_FOUND)
+
+        storage = get_storage()
+        if not storage.exists(call.recording_file):
+            return Response({'error': 'Recording not found'}, status=status.HTTP_404_NOT_FOUND)
+        size = call.recording_size or storage.size(call.recording_file)
+        content_type = mimetypes.guess_type(call.recording_file)[0] or 'application/octet-stream'
+
+        byte_range = parse_range(request.headers.get('Range'), size)
+        if byte_range is False:
+            response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+        start, end = byte_range or (0, size - 1)
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            _stream(storage.open(call.recording_file, 'rb'), start, length),
+            status=status.HTTP_206_PARTIAL_CONTENT if byte_range else status.HTTP_200_OK,
+            content_type=content_type,
+        )
+        response['Content-Length'] = str(length)
+        response['Accept-Ranges'] = 'bytes'
+        if byte_range:
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        if call.recording_checksum:
+            response['ETag'] = f'"{call.recording_checksum}"'
+        return response
+
+
+class RecordingMetricsView(APIView):
+    """Recording ingestion throughput and spool backlog, for supervisors"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not request.user.can_supervise:
+            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        return Response(RecordingMetrics.snapshot())
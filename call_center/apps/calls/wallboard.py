@@ -0,0 +1,350 @@
+# apps/calls/wallboard.py
+"""
+Live wallboard metrics for supervisors.
+
+Inbound call saves are streamed (through the channel layer, see
+``publish_call``) to a single aggregator process, ``manage.py
+run_wallboard``, which keeps per-tenant metrics in memory:
+
+- calls waiting and the longest current wait,
+- answered and abandoned calls, average speed of answer and SLA
+  percentage over a sliding window of WALLBOARD['WINDOW_SECONDS'],
+
+for the whole tenant, for each queue (``Campaign.queue_name``) and for each
+campaign. Every WALLBOARD['PUBLISH_INTERVAL'] seconds it publishes one
+snapshot per tenant to the ``wallboard`` group, which every subscribed
+wallboard (``WallboardConsumer``) receives; the cost of a snapshot does not
+depend on how many supervisors are watching.
+
+On start, and when a tenant is first seen, the aggregator seeds its state
+from the database, so restarts only lose the events in flight.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django_tenants.utils import schema_context
+
+logger = logging.getLogger(__name__)
+
+WALLBOARD_CHANNEL = 'wallboard'
+
+# Unanswered calls older than this are treated as lost, not waiting
+STALE_WAIT_SECONDS = 60 * 60 * 4
+
+
+def _setting(name, default=None):
+    return getattr(settings, 'WALLBOARD', {}).get(name, default)
+
+
+def _schema():
+    return getattr(connection, 'schema_name', 'public')
+
+
+def wallboard_group(schema=None):
+    return f"wallboard.{schema or _schema()}"
+
+
+def _timestamp(value):
+    return value.timestamp() if value else None
+
+
+def call_event(call):
+    """The state of an inbound call as sent to the aggregator."""
+    return {
+        'type': 'call.update',
+        'schema': _schema(),
+        'call_id': call.id,
+        'campaign_id': call.campaign_id,
+        'start': _timestamp(call.start_time),
+        'answer': _timestamp(call.answer_time),
+        'end': _timestamp(call.end_time),
+        'status': call.call_status,
+        'sla_met': call.sla_met,
+    }
+
+
+def publish_call(call):
+    """Stream an inbound call's new state to the aggregator once committed."""
+    if call.call_direction != 'inbound' or not call.start_time:
+        return
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    message = call_event(call)
+
+    def send():
+        try:
+            async_to_sync(channel_layer.send)(WALLBOARD_CHANNEL, message)
+        except Exception as e:
+            # Best effort; the aggregator reseeds from the database on restart
+            logger.warning(f"Failed to stream call {call.id} to the wallboard: {str(e)}")
+
+    transaction.on_commit(send)
+
+
+class SlidingWindow:
+    """Answered and abandoned call counters over the last `seconds` seconds."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.events = deque()
+        self.answered = 0
+        self.abandoned = 0
+        self.sla_met = 0
+        self.speed_total = 0.0
+
+    def add(self, timestamp, answered, speed=0.0, sla_met=False):
+        self.events.append((timestamp, answered, speed, sla_met))
+        self._count(answered, speed, sla_met, 1)
+
+    def expire(self, now):
+        cutoff = now - self.seconds
+        while self.events and self.events[0][0] < cutoff:
+            _, answered, speed, sla_met = self.events.popleft()
+            self._count(answered, speed, sla_met, -1)
+
+    def _count(self, answered, speed, sla_met, sign):
+        if answered:
+            self.answered += sign
+            self.speed_total += sign * speed
+            self.sla_met += sign * bool(sla_met)
+        else:
+            self.abandoned += sign
+
+
+class ScopeMetrics:
+    """Waiting calls and windowed counters for one tenant, queue or campaign."""
+
+    def __init__(self, window_seconds):
+        self.window = SlidingWindow(window_seconds)
+        self.waiting = {}
+
+    def snapshot(self, now):
+        window = self.window
+        offered = window.answered + window.abandoned
+        return {
+            'waiting': len(self.waiting),
+            'longest_wait': round(now - min(self.waiting.values()), 1) if self.waiting else 0,
+            'answered': window.answered,
+            'abandoned': window.abandoned,
+            'average_speed_of_answer': (
+                round(window.speed_total / window.answered, 1) if window.answered else 0
+            ),
+            # Answered within target, out of all answered and abandoned calls
+            'sla_percentage': round(100.0 * window.sla_met / offered, 1) if offered else None,
+        }
+
+
+class TenantMetrics:
+    """All wallboard state of one tenant, updated one call event at a time."""
+
+    def __init__(self, window_seconds, sla_seconds, queue_names=None):
+        self.window_seconds = window_seconds
+        self.sla_seconds = sla_seconds
+        self.queue_names = queue_names or {}
+        self.scopes = {}
+        # call ID -> (outcome, scope keys, last update); outcome is
+        # 'waiting', 'answered' or 'abandoned'
+        self.calls = {}
+
+    def _scope(self, key):
+        scope = self.scopes.get(key)
+        if scope is None:
+            scope = self.scopes[key] = ScopeMetrics(self.window_seconds)
+        return scope
+
+    def scope_keys(self, campaign_id):
+        keys = [('all', None)]
+        if campaign_id:
+            keys.append(('campaign', campaign_id))
+            queue = self.queue_names.get(campaign_id)
+            if queue:
+                keys.append(('queue', queue))
+        return tuple(keys)
+
+    def apply(self, event, now=None):
+        """
+        Fold one call update into the metrics.
+
+        Updates may repeat or arrive out of order; each call is counted as
+        waiting, then answered or abandoned, at most once.
+        """
+        now = now or time.time()
+        call_id = event['call_id']
+        outcome, keys, _ = self.calls.get(call_id, (None, None, None))
+        keys = keys or self.scope_keys(event.get('campaign_id'))
+
+        if event.get('answer'):
+            new_outcome = 'answered'
+        elif event.get('end') or event.get('status') in ('abandoned', 'no_answer', 'failed'):
+            new_outcome = 'abandoned'
+        else:
+            new_outcome = 'waiting'
+
+        if outcome in ('answered', 'abandoned') or outcome == new_outcome:
+            return
+
+        for key in keys:
+            scope = self._scope(key)
+            if new_outcome == 'waiting':
+                scope.waiting[call_id] = event['start']
+                continue
+            scope.waiting.pop(call_id, None)
+            if new_outcome == 'answered':
+                speed = max(0.0, event['answer'] - event['start'])
+                sla_met = event.get('sla_met')
+                if sla_met is None:
+                    sla_met = speed <= self.sla_seconds
+                scope.window.add(event['answer'], True, speed, sla_met)
+            else:
+                scope.window.add(event.get('end') or now, False)
+        self.calls[call_id] = (new_outcome, keys, now)
+
+    def expire(self, now):
+        for scope in self.scopes.values():
+            scope.window.expire(now)
+            stale = [call_id for call_id, start in scope.waiting.items() if start < now - STALE_WAIT_SECONDS]
+            for call_id in stale:
+                del scope.waiting[call_id]
+        # Finished calls only need remembering while a late update could arrive
+        cutoff = now - self.window_seconds
+        for call_id in [
+            call_id for call_id, (outcome, _, updated) in self.calls.items()
+            if (outcome != 'waiting' and updated < cutoff) or updated < now - STALE_WAIT_SECONDS
+        ]:
+            del self.calls[call_id]
+
+    def snapshot(self, now):
+        snapshot = {
+            'generated_at': now,
+            'window_seconds': self.window_seconds,
+            'totals': None,
+            'queues': {},
+            'campaigns': {},
+        }
+        for (kind, name), scope in self.scopes.items():
+            metrics = scope.snapshot(now)
+            if kind == 'all':
+                snapshot['totals'] = metrics
+            elif kind == 'queue':
+                snapshot['queues'][name] = metrics
+            else:
+                snapshot['campaigns'][str(name)] = metrics
+        if snapshot['totals'] is None:
+            snapshot['totals'] = ScopeMetrics(self.window_seconds).snapshot(now)
+        return snapshot
+
+
+def load_tenant(schema, window_seconds, sla_seconds):
+    """
+    Build a tenant's metrics from the database.
+
+    Args:
+        schema: Tenant schema name
+        window_seconds: Sliding window length
+        sla_seconds: Default answer target for calls without one
+
+    Returns:
+        TenantMetrics
+    """
+    from apps.calls.models import Call
+    from apps.campaigns.models import Campaign
+
+    with schema_context(schema):
+        metrics = TenantMetrics(
+            window_seconds, sla_seconds,
+            dict(Campaign.objects.values_list('id', 'queue_name')),
+        )
+        now = timezone.now()
+        since = now - timedelta(seconds=window_seconds)
+        calls = Call.objects.filter(
+            # Waiting now, or answered or ended within the window
+            Q(answer_time__isnull=True, end_time__isnull=True)
+            | Q(answer_time__gte=since)
+            | Q(end_time__gte=since),
+            call_direction='inbound',
+            start_time__gte=now - timedelta(seconds=STALE_WAIT_SECONDS),
+        ).order_by('start_time')
+        for call in calls.only(
+            'id', 'campaign_id', 'start_time', 'answer_time', 'end_time', 'call_status', 'sla_met'
+        ).iterator():
+            event = call_event(call)
+            metrics.apply(event, now=(event['answer'] or event['end'] or event['start']))
+    return metrics
+
+
+def refresh_queue_names(schema):
+    from apps.campaigns.models import Campaign
+
+    with schema_context(schema):
+        return dict(Campaign.objects.values_list('id', 'queue_name'))
+
+
+class WallboardAggregator:
+    """
+    Consumes the wallboard channel and publishes snapshots.
+
+    Run exactly one per deployment (``manage.py run_wallboard``); the
+    metrics of a tenant live in this process only.
+    """
+
+    def __init__(self):
+        self.channel_layer = get_channel_layer()
+        self.window_seconds = _setting('WINDOW_SECONDS', 900)
+        self.sla_seconds = _setting('SLA_SECONDS', 20)
+        self.interval = _setting('PUBLISH_INTERVAL', 1.0)
+        self.tenants = {}
+
+    async def tenant(self, schema):
+        metrics = self.tenants.get(schema)
+        if metrics is None:
+            metrics = await sync_to_async(load_tenant)(schema, self.window_seconds, self.sla_seconds)
+            self.tenants[schema] = metrics
+        return metrics
+
+    async def handle(self, message):
+        schema = message.get('schema')
+        if not schema:
+            return
+        metrics = await self.tenant(schema)
+        if message.get('type') != 'call.update':
+            return
+        campaign_id = message.get('campaign_id')
+        if campaign_id and campaign_id not in metrics.queue_names:
+            metrics.queue_names = await sync_to_async(refresh_queue_names)(schema)
+        metrics.apply(message)
+
+    async def consume(self):
+        while True:
+            message = await self.channel_layer.receive(WALLBOARD_CHANNEL)
+            try:
+                await self.handle(message)
+            except Exception as e:
+                logger.error(f"Failed to apply wallboard event {message}: {str(e)}")
+
+    async def publish(self):
+        while True:
+            started = time.monotonic()
+            now = time.time()
+            for schema, metrics in list(self.tenants.items()):
+                metrics.expire(now)
+                try:
+                    await self.channel_layer.group_send(wallboard_group(schema), {
+                        'type': 'wallboard.snapshot',
+                        'snapshot': metrics.snapshot(now),
+                    })
+                except Exception as e:
+                    logger.warning(f"Failed to publish wallboard of {schema}: {str(e)}")
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    async def run(self):
+        await asyncio.gather(self.consume(), self.publish())
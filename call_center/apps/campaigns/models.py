@@ -258,6 +258,43 @@ class Campaign(SoftDeleteModel):
         help_text=_("Percentage of calls meeting SLA targets")
     )
     
+    # Running totals behind the averages above, maintained as calls complete
+    # (see apps.campaigns.services.CampaignStatisticsService)
+    sla_met_calls = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("SLA Met Calls")
+    )
+    total_talk_time = models.DurationField(
+        default=timedelta,
+        verbose_name=_("Total Talk Time")
+    )
+    talk_time_calls = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("Calls With Talk Time")
+    )
+    total_wait_time = models.DurationField(
+        default=timedelta,
+        verbose_name=_("Total Wait Time")
+    )
+    wait_time_calls = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("Calls With Wait Time")
+    )
+    total_hold_time = models.DurationField(
+        default=timedelta,
+        verbose_name=_("Total Hold Time")
+    )
+    hold_time_calls = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("Calls With Hold Time")
+    )
+    stats_reconciled_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_("Statistics Reconciled At"),
+        help_text=_("Last time statistics were recomputed from calls")
+    )
+    
     # Migration Helper Fields
     legacy_campaign_id = models.IntegerField(
         null=True,
@@ -368,44 +405,15 @@ class Campaign(SoftDeleteModel):
         return self.get_agent_count() < self.max_agents
     
     def update_statistics(self):
-        """Update campaign statistics from related calls"""
-        from django.db.models import Count, Avg, Q
+        """
+        Recompute campaign statistics from its calls.
         
-        # Import here to avoid circular imports
-        try:
-            from apps.calls.models import Call
-            calls = Call.objects.filter(campaign=self)
-            
-            # Update call counts
-            self.total_calls = calls.count()
-            self.answered_calls = calls.filter(call_status__in=['answered', 'completed']).count()
-            self.abandoned_calls = calls.filter(call_status='abandoned').count()
-            
-            # Calculate averages
-            stats = calls.aggregate(
-                avg_talk=Avg('talk_duration'),
-                avg_wait=Avg('wait_duration'),
-                avg_hold=Avg('hold_duration')
-            )
-            
-            self.avg_talk_time = stats['avg_talk']
-            self.avg_wait_time = stats['avg_wait']
-            self.avg_hold_time = stats['avg_hold']
-            
-            # Calculate SLA compliance
-            if self.sla_target_answer:
-                sla_met_calls = calls.filter(sla_met=True).count()
-                if self.total_calls > 0:
-                    self.sla_compliance_rate = (sla_met_calls / self.total_calls) * 100
-            
-            self.save(update_fields=[
-                'total_calls', 'answered_calls', 'abandoned_calls',
-                'avg_talk_time', 'avg_wait_time', 'avg_hold_time',
-                'sla_compliance_rate'
-            ])
-        except ImportError:
-            # Calls app not ready yet
-            pass
+        Statistics are normally maintained incrementally as calls complete;
+        this full recomputation corrects any drift.
+        """
+        from .services import CampaignStatisticsService
+        CampaignStatisticsService.reconcile_campaign(self)
+        self.refresh_from_db()
 
 
 class CampaignMember(TimeStampedModel):
@@ -483,6 +491,11 @@ class CampaignMember(TimeStampedModel):
         blank=True,
         verbose_name=_("Average Talk Time")
     )
+    talk_time_calls = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("Calls With Talk Time"),
+        help_text=_("Number of calls contributing to the talk time totals")
+    )
     
     # Quality metrics
     quality_score = models.FloatField(
@@ -521,40 +534,15 @@ class CampaignMember(TimeStampedModel):
         return 0
     
     def update_statistics(self):
-        """Update agent statistics for this campaign"""
-        from django.db.models import Count, Avg, Sum
+        """
+        Recompute this agent's campaign statistics from calls.
         
-        try:
-            from apps.calls.models import Call
-            calls = Call.objects.filter(campaign=self.campaign, agent=self.agent)
-            
-            # Update call counts
-            self.calls_handled = calls.count()
-            self.calls_answered = calls.filter(call_status__in=['answered', 'completed']).count()
-            
-            # Calculate time statistics
-            time_stats = calls.aggregate(
-                total_talk=Sum('talk_duration'),
-                avg_talk=Avg('talk_duration')
-            )
-            
-            self.total_talk_time = time_stats['total_talk']
-            self.avg_talk_time = time_stats['avg_talk']
-            
-            # Calculate quality score
-            qa_scores = calls.filter(
-                quality_assessment__isnull=False
-            ).aggregate(avg_quality=Avg('quality_assessment__overall_score'))
-            
-            self.quality_score = qa_scores['avg_quality']
-            
-            self.save(update_fields=[
-                'calls_handled', 'calls_answered', 'calls_successful',
-                'total_talk_time', 'avg_talk_time', 'quality_score'
-            ])
-        except ImportError:
-            # Calls app not ready yet
-            pass
+        Statistics are normally maintained incrementally as calls complete;
+        this full recomputation corrects any drift.
+        """
+        from .services import CampaignStatisticsService
+        CampaignStatisticsService.reconcile_members(self.campaign, agent_ids=[self.agent_id])
+        self.refresh_from_db()
 
 
 class CampaignContact(TimeStampedModel):
@@ -565,6 +553,7 @@ class CampaignContact(TimeStampedModel):
     
     CONTACT_STATUSES = [
         ('pending', _('Pending')),
+        ('dialing', _('Dialing')),
         ('attempted', _('Attempted')),
         ('contacted', _('Contacted')),
         ('completed', _('Completed')),
@@ -621,6 +610,20 @@ class CampaignContact(TimeStampedModel):
         help_text=_("Scheduled time for next attempt")
     )
     
+    # Dialer lease
+    lease_expires = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_("Lease Expires"),
+        help_text=_("When a dialer worker's claim on this contact lapses")
+    )
+    leased_by = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name=_("Leased By"),
+        help_text=_("Dialer worker currently dialing this contact")
+    )
+    
     # Assignment
     assigned_agent = models.ForeignKey(
         'accounts.User',
@@ -652,6 +655,7 @@ class CampaignContact(TimeStampedModel):
         ordering = ['priority', 'next_attempt']
         indexes = [
             models.Index(fields=['campaign', 'status']),
+            models.Index(fields=['campaign', 'status', 'next_attempt']),
             models.Index(fields=['status', 'next_attempt']),
             models.Index(fields=['assigned_agent', 'status']),
             models.Index(fields=['priority', 'next_attempt']),
@@ -691,6 +695,8 @@ class CampaignContact(TimeStampedModel):
         self.attempts_made += 1
         self.last_attempt = timezone.now()
         self.status = 'attempted'
+        self.lease_expires = None
+        self.leased_by = ''
         
         if result:
             self.result = result
@@ -704,20 +710,3 @@ class CampaignContact(TimeStampedModel):
             self.schedule_next_attempt()
         
         self.save()
-
-
-# Signal handlers
-from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
-
-@receiver(post_save, sender=CampaignMember)
-def campaign_member_post_save(sender, instance, created, **kwargs):
-    """Update campaign member count when member is added/changed"""
-    if created or not instance.is_active:
-        # Update campaign statistics
-        instance.campaign.save()  # This will trigger recalculation if needed
-
-@receiver(post_delete, sender=CampaignMember)
-def campaign_member_post_delete(sender, instance, **kwargs):
-    """Update campaign when member is removed"""
-    instance.campaign.save()  # Trigger recalculation
\ No newline at end of file
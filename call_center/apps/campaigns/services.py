@@ -0,0 +1,570 @@
+# apps/campaigns/services.py
+"""
+Outbound dialer engine and campaign statistics.
+
+Dialer workers lease due ``CampaignContact`` rows in batches with
+``SELECT ... FOR UPDATE SKIP LOCKED`` over the (campaign, status,
+next_attempt) index and flip them to ``dialing`` with a lease expiry in the
+same transaction. Concurrent workers skip each other's locked rows and no
+longer see leased ones afterwards, so a contact is never dialed twice.
+The lease covers ringing; while the call is in progress it is renewed
+(``DialerService.renew_lease``, called as the call is saved) up to the
+maximum call duration once answered, so a live call is never released.
+Leases left behind by a crashed worker are released by
+``DialerService.release_expired_leases``. Outcomes are matched by contact
+and attempt number, not by lease, so a late outcome is still recorded.
+
+How many contacts a campaign dials per tick is paced to its available
+agents: predictive campaigns over-dial by the inverse of the recent answer
+rate, other campaign types dial one line per free agent.
+
+Campaign and agent statistics are maintained incrementally: every
+completed campaign call is claimed once (``Call.stats_recorded``) and
+applied to running counters and duration totals with single ``F()``
+UPDATEs, so dashboards read precomputed values. A periodic
+reconciliation recomputes them from the calls to correct drift.
+"""
+import logging
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Avg, Case, Count, DurationField, ExpressionWrapper, F, FloatField, Q, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DIALABLE_STATUSES = ['pending', 'attempted']
+ANSWERED_STATUSES = ['answered', 'completed']
+ABANDONED_STATUSES = ['abandoned']
+FINAL_STATUSES = ['contacted', 'completed', 'do_not_call', 'invalid']
+REACHED_STATUSES = ['contacted', 'completed']
+
+DEFAULT_LEASE_SECONDS = 120
+DEFAULT_MAX_CALL_SECONDS = 4 * 60 * 60
+DEFAULT_ANSWER_RATE = 0.3
+ANSWER_RATE_WINDOW_MINUTES = 30
+MIN_ANSWER_RATE_SAMPLES = 20
+MAX_DIAL_RATIO = 3.0
+
+
+def _setting(name, default):
+    return getattr(settings, 'CAMPAIGN_DIALER', {}).get(name, default)
+
+
+class DialerService:
+    """Service for leasing, pacing and recording outbound campaign dials."""
+
+    @staticmethod
+    def due_contacts(campaign, now=None):
+        """
+        Contacts of a campaign that may be dialed now.
+
+        Args:
+            campaign: Campaign object
+            now: Optional reference time
+
+        Returns:
+            QuerySet of CampaignContact, highest priority first
+        """
+        from apps.campaigns.models import CampaignContact
+
+        now = now or timezone.now()
+        return (
+            CampaignContact.objects
+            .filter(campaign=campaign, status__in=DIALABLE_STATUSES)
+            .filter(Q(next_attempt__isnull=True) | Q(next_attempt__lte=now))
+            .filter(attempts_made__lt=F('max_attempts'))
+            .order_by('priority', 'next_attempt')
+        )
+
+    @staticmethod
+    def lease_contacts(campaign, limit, worker_id, lease_seconds=None):
+        """
+        Claim up to `limit` due contacts for a dialer worker.
+
+        Rows locked by other workers are skipped rather than waited on, and
+        claimed rows move to ``dialing`` before the lock is released.
+
+        Args:
+            campaign: Campaign object
+            limit: Maximum number of contacts to lease
+            worker_id: Identifier of the leasing worker
+            lease_seconds: How long the lease is held before it may be reclaimed
+
+        Returns:
+            list: Leased CampaignContact objects with their contacts loaded
+        """
+        from apps.campaigns.models import CampaignContact
+
+        if limit <= 0:
+            return []
+
+        now = timezone.now()
+        lease_seconds = lease_seconds or _setting('LEASE_SECONDS', DEFAULT_LEASE_SECONDS)
+
+        with transaction.atomic():
+            contact_ids = list(
+                DialerService.due_contacts(campaign, now)
+                .select_for_update(skip_locked=True)
+                .values_list('pk', flat=True)[:limit]
+            )
+            if not contact_ids:
+                return []
+            CampaignContact.objects.filter(pk__in=contact_ids).update(
+                status='dialing',
+                lease_expires=now + timedelta(seconds=lease_seconds),
+                leased_by=worker_id,
+                updated_at=now,
+            )
+
+        return list(
+            CampaignContact.objects
+            .filter(pk__in=contact_ids, leased_by=worker_id)
+            .select_related('contact')
+            .order_by('priority', 'next_attempt')
+        )
+
+    @staticmethod
+    def renew_lease(campaign_id, contact_id, answered=False, now=None):
+        """
+        Keep the lease of a contact whose call is still in progress.
+
+        Ringing calls are extended by LEASE_SECONDS, answered calls by
+        MAX_CALL_SECONDS, so the lease never lapses under a live call.
+
+        Args:
+            campaign_id: ID of the call's campaign
+            contact_id: ID of the dialed contact
+            answered: Whether the call has been answered
+            now: Optional reference time
+
+        Returns:
+            int: Number of leases renewed (0 or 1)
+        """
+        from apps.campaigns.models import CampaignContact
+
+        now = now or timezone.now()
+        if answered:
+            seconds = _setting('MAX_CALL_SECONDS', DEFAULT_MAX_CALL_SECONDS)
+        else:
+            seconds = _setting('LEASE_SECONDS', DEFAULT_LEASE_SECONDS)
+        expires = now + timedelta(seconds=seconds)
+        return CampaignContact.objects.filter(
+            campaign_id=campaign_id, contact_id=contact_id, status='dialing',
+        ).filter(
+            Q(lease_expires__isnull=True) | Q(lease_expires__lt=expires)
+        ).update(lease_expires=expires)
+
+    @staticmethod
+    def release_expired_leases(now=None):
+        """
+        Return contacts whose lease lapsed (e.g. the worker died) to the queue.
+
+        Returns:
+            int: Number of contacts released
+        """
+        from apps.campaigns.models import CampaignContact
+
+        now = now or timezone.now()
+        return CampaignContact.objects.filter(
+            status='dialing', lease_expires__lt=now
+        ).update(
+            status=Case(
+                When(attempts_made=0, then=Value('pending')),
+                default=Value('attempted'),
+            ),
+            lease_expires=None,
+            leased_by='',
+            updated_at=now,
+        )
+
+    @staticmethod
+    def answer_rate(campaign, now=None):
+        """
+        Recent answer rate of a campaign's outbound calls.
+
+        Falls back to the configured default until enough calls were placed
+        in the window to be meaningful.
+
+        Returns:
+            float: Answer rate between 0 and 1
+        """
+        from apps.calls.models import Call
+
+        now = now or timezone.now()
+        since = now - timedelta(minutes=_setting('ANSWER_RATE_WINDOW_MINUTES', ANSWER_RATE_WINDOW_MINUTES))
+        stats = Call.objects.filter(
+            campaign=campaign, call_direction='outbound', start_time__gte=since
+        ).aggregate(
+            total=Count('id'),
+            answered=Count('id', filter=Q(call_status__in=ANSWERED_STATUSES)),
+        )
+        if stats['total'] < _setting('MIN_ANSWER_RATE_SAMPLES', MIN_ANSWER_RATE_SAMPLES):
+            return _setting('DEFAULT_ANSWER_RATE', DEFAULT_ANSWER_RATE)
+        return max(stats['answered'] / stats['total'], 0.01)
+
+    @staticmethod
+    def available_agents(campaign):
+        """
+        Number of the campaign's agents that are online and free.
+
+        Returns:
+            int: Available agent count (capped at the campaign's max_agents)
+        """
+        count = campaign.members.filter(
+            is_active=True,
+            agent__is_active=True,
+            agent__is_online=True,
+            agent__agent_status='available',
+        ).count()
+        return min(count, campaign.max_agents) if campaign.max_agents else count
+
+    @staticmethod
+    def dial_capacity(campaign, now=None):
+        """
+        How many new calls the campaign should place right now.
+
+        Predictive campaigns dial ``agents / answer_rate`` lines (capped by
+        MAX_DIAL_RATIO); other types dial one line per available agent. Calls
+        already in flight (contacts still ``dialing``) count against the target.
+
+        Returns:
+            int: Number of contacts to lease
+        """
+        from apps.campaigns.models import CampaignContact
+
+        now = now or timezone.now()
+        agents = DialerService.available_agents(campaign)
+        if not agents:
+            return 0
+
+        if campaign.campaign_type == 'predictive':
+            ratio = min(
+                1 / DialerService.answer_rate(campaign, now),
+                _setting('MAX_DIAL_RATIO', MAX_DIAL_RATIO),
+            )
+        else:
+            ratio = 1
+
+        in_flight = CampaignContact.objects.filter(campaign=campaign, status='dialing').count()
+        return max(0, math.floor(agents * ratio) - in_flight)
+
+    @staticmethod
+    def next_batch(campaign, worker_id):
+        """
+        Pace and lease the next batch of contacts for a campaign.
+
+        Args:
+            campaign: Campaign object
+            worker_id: Identifier of the leasing worker
+
+        Returns:
+            list: Leased CampaignContact objects
+        """
+        if not campaign.is_current:
+            return []
+        return DialerService.lease_contacts(
+            campaign, DialerService.dial_capacity(campaign), worker_id
+        )
+
+    @staticmethod
+    def record_attempts(outcomes):
+        """
+        Record the results of many dial attempts with one bulk update.
+
+        Outcomes are accepted whether or not the contact is still leased,
+        e.g. for a call that outlived its lease. An outcome carrying
+        ``attempt`` is only applied if that attempt was not recorded yet,
+        so redelivered outcomes are not counted twice.
+
+        Args:
+            outcomes: Iterable of dicts with ``contact_id`` and optionally
+                ``attempt`` (the contact's ``attempts_made + 1`` when it was
+                leased), ``reached`` (bool), ``status`` (a final contact
+                status), ``result_id``, ``agent_id``, ``notes`` and
+                ``retry_in`` (seconds until the next attempt)
+
+        Returns:
+            int: Number of contacts updated
+        """
+        from apps.campaigns.models import Campaign, CampaignContact
+
+        outcomes = {outcome['contact_id']: outcome for outcome in outcomes}
+        if not outcomes:
+            return 0
+
+        now = timezone.now()
+        fields = [
+            'status', 'attempts_made', 'last_attempt', 'next_attempt',
+            'result', 'assigned_agent', 'notes', 'lease_expires', 'leased_by',
+            'updated_at',
+        ]
+
+        with transaction.atomic():
+            contacts = [
+                campaign_contact
+                for campaign_contact in CampaignContact.objects
+                .select_for_update(of=('self',))
+                .filter(pk__in=list(outcomes))
+                .select_related('campaign')
+                if outcomes[campaign_contact.pk].get('attempt') in (None, campaign_contact.attempts_made + 1)
+            ]
+
+            # campaign_id -> [newly attempted, newly reached]
+            progress = {}
+            for campaign_contact in contacts:
+                outcome = outcomes[campaign_contact.pk]
+                counts = progress.setdefault(campaign_contact.campaign_id, [0, 0])
+                if campaign_contact.attempts_made == 0:
+                    counts[0] += 1
+                was_reached = campaign_contact.status in REACHED_STATUSES
+                campaign_contact.attempts_made += 1
+                campaign_contact.last_attempt = now
+                campaign_contact.lease_expires = None
+                campaign_contact.leased_by = ''
+                campaign_contact.updated_at = now
+
+                status = outcome.get('status')
+                if status not in FINAL_STATUSES:
+                    status = 'contacted' if outcome.get('reached') else 'attempted'
+                campaign_contact.status = status
+                if status in REACHED_STATUSES and not was_reached:
+                    counts[1] += 1
+
+                if outcome.get('result_id'):
+                    campaign_contact.result_id = outcome['result_id']
+                if outcome.get('agent_id'):
+                    campaign_contact.assigned_agent_id = outcome['agent_id']
+                if outcome.get('notes'):
+                    campaign_contact.notes = outcome['notes']
+
+                if campaign_contact.can_attempt:
+                    retry_in = outcome.get('retry_in', campaign_contact.campaign.retry_interval)
+                    campaign_contact.next_attempt = now + timedelta(seconds=retry_in)
+                else:
+                    campaign_contact.next_attempt = None
+
+            CampaignContact.objects.bulk_update(contacts, fields, batch_size=500)
+
+            for campaign_id, (attempted, reached) in progress.items():
+                if attempted or reached:
+                    Campaign.objects.filter(pk=campaign_id).update(
+                        contacts_attempted=F('contacts_attempted') + attempted,
+                        contacts_reached=F('contacts_reached') + reached,
+                    )
+
+        return len(contacts)
+
+
+def _running_average(updates, total, count, average, value, total_expression=None):
+    """Add a duration to a running total and refresh its average in the same UPDATE."""
+    if value is None:
+        return
+    new_total = (total_expression or F(total)) + Value(value, output_field=DurationField())
+    updates[total] = new_total
+    updates[count] = F(count) + 1
+    updates[average] = ExpressionWrapper(new_total / (F(count) + 1), output_field=DurationField())
+
+
+class CampaignStatisticsService:
+    """Service for maintaining campaign and agent statistics."""
+
+    @staticmethod
+    def record_call(call):
+        """
+        Apply a completed call to its campaign's and agent's statistics.
+
+        The call is claimed by flipping ``stats_recorded``, so a call is
+        counted once however often it is saved.
+
+        Args:
+            call: Completed Call object with a campaign
+
+        Returns:
+            bool: Whether the call was counted by this invocation
+        """
+        from apps.calls.models import Call
+        from apps.campaigns.models import Campaign, CampaignMember
+
+        if not call.campaign_id or not call.end_time:
+            return False
+
+        with transaction.atomic():
+            claimed = Call.objects.filter(pk=call.pk, stats_recorded=False).update(stats_recorded=True)
+            if not claimed:
+                return False
+            call.stats_recorded = True
+
+            answered = int(call.call_status in ANSWERED_STATUSES)
+            sla_met = int(bool(call.sla_met))
+
+            updates = {
+                'total_calls': F('total_calls') + 1,
+                'answered_calls': F('answered_calls') + answered,
+                'abandoned_calls': F('abandoned_calls') + int(call.call_status in ABANDONED_STATUSES),
+                'sla_met_calls': F('sla_met_calls') + sla_met,
+                'sla_compliance_rate': Case(
+                    When(
+                        sla_target_answer__gt=0,
+                        then=ExpressionWrapper(
+                            (F('sla_met_calls') + sla_met) * 100.0 / (F('total_calls') + 1),
+                            output_field=FloatField(),
+                        ),
+                    ),
+                    default=F('sla_compliance_rate'),
+                ),
+            }
+            _running_average(updates, 'total_talk_time', 'talk_time_calls', 'avg_talk_time', call.talk_duration)
+            _running_average(updates, 'total_wait_time', 'wait_time_calls', 'avg_wait_time', call.wait_duration)
+            _running_average(updates, 'total_hold_time', 'hold_time_calls', 'avg_hold_time', call.hold_duration)
+            Campaign.objects.filter(pk=call.campaign_id).update(**updates)
+
+            if call.agent_id:
+                member_updates = {
+                    'calls_handled': F('calls_handled') + 1,
+                    'calls_answered': F('calls_answered') + answered,
+                }
+                _running_average(
+                    member_updates, 'total_talk_time', 'talk_time_calls', 'avg_talk_time',
+                    call.talk_duration,
+                    total_expression=Coalesce(
+                        F('total_talk_time'), Value(timedelta(0), output_field=DurationField())
+                    ),
+                )
+                CampaignMember.objects.filter(
+                    campaign_id=call.campaign_id, agent_id=call.agent_id
+                ).update(**member_updates)
+
+        return True
+
+    @staticmethod
+    def record_pending_calls(campaign):
+        """
+        Count completed calls of a campaign that were never recorded
+        (e.g. written with ``update()`` or bulk operations).
+
+        Returns:
+            int: Number of calls recorded
+        """
+        from apps.calls.models import Call
+
+        pending = Call.objects.filter(
+            campaign=campaign, stats_recorded=False, end_time__isnull=False
+        ).only(
+            'id', 'campaign_id', 'agent_id', 'end_time', 'call_status', 'sla_met',
+            'talk_duration', 'wait_duration', 'hold_duration', 'stats_recorded',
+        )
+        return sum(
+            CampaignStatisticsService.record_call(call)
+            for call in pending.iterator(chunk_size=500)
+        )
+
+    @staticmethod
+    def reconcile_campaign(campaign):
+        """
+        Recompute a campaign's statistics, and its agents', from scratch.
+
+        Only recorded calls are aggregated, under a lock on the campaign row,
+        so calls being recorded concurrently are neither lost nor counted
+        twice.
+
+        Args:
+            campaign: Campaign object
+        """
+        from apps.calls.models import Call
+        from apps.campaigns.models import Campaign, CampaignContact
+
+        CampaignStatisticsService.record_pending_calls(campaign)
+
+        with transaction.atomic():
+            locked = Campaign.objects.select_for_update().only('id', 'sla_target_answer').get(pk=campaign.pk)
+            stats = Call.objects.filter(campaign=campaign, stats_recorded=True).aggregate(
+                total_calls=Count('id'),
+                answered_calls=Count('id', filter=Q(call_status__in=ANSWERED_STATUSES)),
+                abandoned_calls=Count('id', filter=Q(call_status__in=ABANDONED_STATUSES)),
+                sla_met_calls=Count('id', filter=Q(sla_met=True)),
+                total_talk_time=Sum('talk_duration'),
+                talk_time_calls=Count('talk_duration'),
+                avg_talk_time=Avg('talk_duration'),
+                total_wait_time=Sum('wait_duration'),
+                wait_time_calls=Count('wait_duration'),
+                avg_wait_time=Avg('wait_duration'),
+                total_hold_time=Sum('hold_duration'),
+                hold_time_calls=Count('hold_duration'),
+                avg_hold_time=Avg('hold_duration'),
+            )
+            contacts = CampaignContact.objects.filter(campaign=campaign).aggregate(
+                contacts_attempted=Count('id', filter=Q(attempts_made__gt=0)),
+                contacts_reached=Count('id', filter=Q(status__in=REACHED_STATUSES)),
+            )
+            for total in ('total_talk_time', 'total_wait_time', 'total_hold_time'):
+                stats[total] = stats[total] or timedelta(0)
+
+            sla_compliance_rate = None
+            if locked.sla_target_answer and stats['total_calls']:
+                sla_compliance_rate = stats['sla_met_calls'] / stats['total_calls'] * 100
+
+            Campaign.objects.filter(pk=campaign.pk).update(
+                **stats,
+                **contacts,
+                sla_compliance_rate=sla_compliance_rate,
+                stats_reconciled_at=timezone.now(),
+            )
+            CampaignStatisticsService.reconcile_members(campaign)
+
+    @staticmethod
+    def reconcile_members(campaign, agent_ids=None):
+        """
+        Recompute agents' statistics for a campaign from its recorded calls.
+
+        Args:
+            campaign: Campaign object
+            agent_ids: Optional agent IDs to restrict to (defaults to all members)
+        """
+        from apps.calls.models import Call
+        from apps.campaigns.models import CampaignMember
+
+        with transaction.atomic():
+            members = CampaignMember.objects.select_for_update().filter(campaign=campaign)
+            if agent_ids is not None:
+                members = members.filter(agent_id__in=agent_ids)
+            members = list(members)
+            if not members:
+                return
+
+            rows = (
+                Call.objects
+                .filter(
+                    campaign=campaign, stats_recorded=True,
+                    agent_id__in=[member.agent_id for member in members],
+                )
+                .values('agent_id')
+                .annotate(
+                    calls_handled=Count('id'),
+                    calls_answered=Count('id', filter=Q(call_status__in=ANSWERED_STATUSES)),
+                    total_talk_time=Sum('talk_duration'),
+                    talk_time_calls=Count('talk_duration'),
+                    avg_talk_time=Avg('talk_duration'),
+                    quality_score=Avg('quality_assessment__overall_score'),
+                )
+                .order_by()
+            )
+            stats = {row.pop('agent_id'): row for row in rows}
+
+            fields = [
+                'calls_handled', 'calls_answered', 'total_talk_time',
+                'talk_time_calls', 'avg_talk_time', 'quality_score',
+            ]
+            empty = {
+                'calls_handled': 0, 'calls_answered': 0, 'total_talk_time': None,
+                'talk_time_calls': 0, 'avg_talk_time': None, 'quality_score': None,
+            }
+            for member in members:
+                for field, value in stats.get(member.agent_id, empty).items():
+                    setattr(member, field, value)
+            CampaignMember.objects.bulk_update(members, fields, batch_size=500)
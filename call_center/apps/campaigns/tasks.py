@@ -0,0 +1,155 @@
+# apps/campaigns/tasks.py
+import logging
+import socket
+import uuid
+
+from celery import shared_task
+from django.conf import settings
+from django.utils.module_loading import import_string
+from django_tenants.utils import get_public_schema_name, get_tenant_model, schema_context
+
+from .services import CampaignStatisticsService, DialerService
+
+logger = logging.getLogger(__name__)
+
+DIALER_CAMPAIGN_TYPES = ['outbound', 'blended', 'predictive', 'progressive']
+
+
+@shared_task
+def run_dialer(campaign_ids=None, schemas=None):
+    """
+    Run one dialer tick for every tenant: release lapsed leases, then pace,
+    lease and originate calls for every active outbound campaign.
+
+    Safe to run from many workers at once; each leases disjoint contacts.
+
+    Args:
+        campaign_ids: Optional list of campaign IDs to restrict the tick to
+        schemas: Optional list of tenant schemas (defaults to all tenants)
+
+    Returns:
+        dict: Number of contacts leased per campaign ID, per schema
+    """
+    if schemas is None:
+        schemas = list(
+            get_tenant_model().objects.exclude(schema_name=get_public_schema_name())
+            .values_list('schema_name', flat=True)
+        )
+
+    worker_id = f"{socket.gethostname()}:{uuid.uuid4().hex[:8]}"
+    originate = _get_originator()
+    summaries = {}
+    for schema in schemas:
+        try:
+            with schema_context(schema):
+                summaries[schema] = _run_dialer_tick(worker_id, originate, campaign_ids)
+        except Exception as e:
+            logger.error(f"Dialer tick failed for {schema}: {str(e)}")
+    return summaries
+
+
+def _run_dialer_tick(worker_id, originate, campaign_ids):
+    from apps.campaigns.models import Campaign
+
+    released = DialerService.release_expired_leases()
+    if released:
+        logger.info(f"Released {released} expired dialer leases")
+
+    campaigns = Campaign.objects.current().filter(
+        is_active=True, campaign_type__in=DIALER_CAMPAIGN_TYPES
+    )
+    if campaign_ids:
+        campaigns = campaigns.filter(id__in=campaign_ids)
+
+    leased = {}
+    for campaign in campaigns:
+        contacts = DialerService.next_batch(campaign, worker_id)
+        if not contacts:
+            continue
+        leased[campaign.id] = len(contacts)
+        if originate is None:
+            logger.warning(
+                f"No dialer originator configured; {len(contacts)} contacts of "
+                f"campaign {campaign.id} will be released when their lease expires"
+            )
+            continue
+        try:
+            originate(campaign, contacts)
+        except Exception as e:
+            # Leased contacts return to the queue once the lease expires
+            logger.error(f"Failed to originate calls for campaign {campaign.id}: {str(e)}")
+
+    return leased
+
+
+@shared_task
+def record_dial_attempts(outcomes, schema=None):
+    """
+    Record dial outcomes reported by the telephony layer in bulk.
+
+    Args:
+        outcomes: List of outcome dicts (see DialerService.record_attempts)
+        schema: Tenant schema of the campaign contacts
+
+    Returns:
+        int: Number of contacts updated
+    """
+    if schema is None:
+        return DialerService.record_attempts(outcomes)
+    with schema_context(schema):
+        return DialerService.record_attempts(outcomes)
+
+
+@shared_task
+def reconcile_campaign_statistics(campaign_ids=None, schemas=None):
+    """
+    Recompute running campaign and agent statistics from calls to correct drift.
+
+    Intended to run periodically (e.g. nightly) from celery beat.
+
+    Args:
+        campaign_ids: Optional list of campaign IDs (defaults to all
+            active, paused and scheduled campaigns)
+        schemas: Optional list of tenant schemas (defaults to all tenants)
+
+    Returns:
+        dict: Number of campaigns reconciled per schema
+    """
+    from apps.campaigns.models import Campaign
+
+    if schemas is None:
+        schemas = list(
+            get_tenant_model().objects.exclude(schema_name=get_public_schema_name())
+            .values_list('schema_name', flat=True)
+        )
+
+    summaries = {}
+    for schema in schemas:
+        reconciled = 0
+        try:
+            with schema_context(schema):
+                campaigns = Campaign.objects.filter(is_active=True)
+                if campaign_ids:
+                    campaigns = campaigns.filter(id__in=campaign_ids)
+                else:
+                    campaigns = campaigns.filter(status__in=['active', 'paused', 'scheduled'])
+
+                for campaign in campaigns.iterator():
+                    try:
+                        CampaignStatisticsService.reconcile_campaign(campaign)
+                        reconciled += 1
+                    except Exception as e:
+                        logger.error(
+                            f"Failed to reconcile statistics for campaign {campaign.id} "
+                            f"in {schema}: {str(e)}"
+                        )
+        except Exception as e:
+            logger.error(f"Failed to reconcile campaign statistics for {schema}: {str(e)}")
+        summaries[schema] = reconciled
+
+    return summaries
+
+
+def _get_originator():
+    path = getattr(settings, 'CAMPAIGN_DIALER', {}).get('ORIGINATOR')
+    return import_string(path) if path else None
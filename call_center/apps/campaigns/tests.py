@@ -1,3 +1,109 @@
+from datetime import timedelta
+
 from django.test import TestCase
+from django.utils import timezone
+
+from apps.accounts.models import User
+from apps.calls.models import Call
+from apps.contacts.models import Contact
+
+from .models import Campaign, CampaignContact, CampaignMember
+from .services import DialerService
+
+
+class CampaignMemberStatisticsTests(TestCase):
+    """Member statistics can be recomputed from the campaign's recorded calls."""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.agent = User.objects.create_user(
+            username='agent', password='secret', role='agent', extension='1001',
+        )
+        cls.other = User.objects.create_user(
+            username='other', password='secret', role='agent', extension='1002',
+        )
+        cls.campaign = Campaign.objects.create(
+            name='Outreach', queue_name='outreach', caller_id='1000',
+            campaign_type='outbound', start_date=now, end_date=now + timedelta(days=7),
+        )
+        cls.member = CampaignMember.objects.create(campaign=cls.campaign, agent=cls.agent)
+        cls.other_member = CampaignMember.objects.create(
+            campaign=cls.campaign, agent=cls.other, calls_handled=7,
+        )
+
+    def create_call(self, unique_id, status, agent, talk_seconds=0):
+        start = timezone.now() - timedelta(minutes=10)
+        answer = start + timedelta(seconds=5) if talk_seconds else None
+        return Call.objects.create(
+            unique_id=unique_id, caller_number='1000', called_number='0700000000',
+            call_direction='outbound', campaign=self.campaign, agent=agent,
+            start_time=start, answer_time=answer,
+            end_time=(answer or start) + timedelta(seconds=talk_seconds),
+            call_status=status, stats_recorded=True,
+        )
+
+    def test_update_statistics_recomputes_only_this_member(self):
+        self.create_call('call-1', 'completed', self.agent, talk_seconds=60)
+        self.create_call('call-2', 'no_answer', self.agent)
+
+        self.member.update_statistics()
+
+        self.assertEqual(self.member.calls_handled, 2)
+        self.assertEqual(self.member.calls_answered, 1)
+        self.assertEqual(self.member.total_talk_time, timedelta(seconds=60))
+        self.other_member.refresh_from_db()
+        self.assertEqual(self.other_member.calls_handled, 7)
+
+
+class DialerLeaseTests(TestCase):
+    """Leases outlive live calls and outcomes are accepted regardless of the lease."""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.agent = User.objects.create_user(
+            username='agent', password='secret', role='agent', extension='1001',
+            is_online=True, agent_status='available',
+        )
+        cls.campaign = Campaign.objects.create(
+            name='Dialer', queue_name='dialer', caller_id='1000', status='active',
+            campaign_type='progressive', start_date=now - timedelta(days=1),
+            end_date=now + timedelta(days=7),
+        )
+        CampaignMember.objects.create(campaign=cls.campaign, agent=cls.agent)
+        cls.contact = Contact.objects.create(full_name='Callee')
+
+    def setUp(self):
+        self.campaign_contact = CampaignContact.objects.create(
+            campaign=self.campaign, contact=self.contact,
+        )
+        [leased] = DialerService.lease_contacts(self.campaign, 1, 'worker-1')
+        self.assertEqual(leased.status, 'dialing')
+
+    def test_answered_call_keeps_its_lease(self):
+        DialerService.renew_lease(self.campaign.id, self.contact.id, answered=True)
+
+        released = DialerService.release_expired_leases(now=timezone.now() + timedelta(minutes=30))
+
+        self.assertEqual(released, 0)
+        self.campaign_contact.refresh_from_db()
+        self.assertEqual(self.campaign_contact.status, 'dialing')
+
+    def test_in_flight_calls_count_after_lease_lapses(self):
+        CampaignContact.objects.filter(pk=self.campaign_contact.pk).update(
+            lease_expires=timezone.now() - timedelta(minutes=1)
+        )
+
+        self.assertEqual(DialerService.dial_capacity(self.campaign), 0)
+
+    def test_outcome_after_lease_released_is_recorded_once(self):
+        DialerService.release_expired_leases(now=timezone.now() + timedelta(minutes=30))
+        outcome = {'contact_id': self.campaign_contact.pk, 'attempt': 1, 'reached': True}
+
+        self.assertEqual(DialerService.record_attempts([outcome]), 1)
+        self.assertEqual(DialerService.record_attempts([outcome]), 0)
 
-# Create your tests here.
+        self.campaign_contact.refresh_from_db()
+        self.assertEqual(self.campaign_contact.status, 'contacted')
+        self.assertEqual(self.campaign_contact.attempts_made, 1)
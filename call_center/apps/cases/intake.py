@@ -0,0 +1,208 @@
+# apps/cases/intake.py
+"""
+Fast-path case intake.
+
+``CaseBusinessLogic.create_case`` resolves its defaults (case type by
+keyword, open status, medium priority) from an ``IntakeProfile`` instead of
+running ``icontains`` queries per case. A profile is built from a single
+ReferenceData query and cached in the process; it holds:
+
+- the default status, priority and general case type,
+- an Aho-Corasick automaton over every classification keyword, so a
+  narrative is scanned once regardless of how many keywords exist.
+
+Keywords come from a case type's ``metadata['intake_keywords']``. The GBV
+and child protection types fall back to the built-in keyword sets below.
+ReferenceData lives in the public schema and is shared by every tenant, so
+there is one profile per process. Once a change to intake reference data
+commits, a generation number in the shared cache is bumped and every
+process rebuilds its profile on next use.
+"""
+import threading
+import time
+from collections import deque
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.core.models import ReferenceData
+
+INTAKE_GENERATION_KEY = 'cases:intake:generation'
+INTAKE_CATEGORIES = ('case_type', 'case_status', 'case_priority')
+
+VIOLENCE_KEYWORDS = ['violence', 'abuse', 'assault', 'rape', 'sexual', 'domestic']
+CHILD_KEYWORDS = ['child', 'minor', 'underage', 'school', 'orphan']
+
+_profile = None  # (generation, IntakeProfile)
+_lock = threading.Lock()
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton reporting the labels of all keywords found in a text."""
+
+    def __init__(self, keywords):
+        """
+        Args:
+            keywords: Iterable of ``(keyword, label)`` pairs; matching is
+                case-insensitive and on substrings
+        """
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [frozenset()]
+
+        for keyword, label in keywords:
+            keyword = keyword.strip().lower()
+            if not keyword:
+                continue
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(frozenset())
+                state = next_state
+            self._output[state] = self._output[state] | {label}
+
+        # Breadth-first, so every failure link points at a shallower state
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = (
+                    self._output[next_state] | self._output[self._fail[next_state]]
+                )
+
+    def search(self, text):
+        """Return the set of labels whose keywords occur in `text`."""
+        goto, fail, output = self._goto, self._fail, self._output
+        found = set()
+        state = 0
+        for char in text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found |= output[state]
+        return found
+
+
+class IntakeProfile:
+    """Resolved intake defaults and keyword classifier for one tenant."""
+
+    def __init__(self, reference_data):
+        """
+        Args:
+            reference_data: Active ReferenceData of the intake categories,
+                in the model's default ordering
+        """
+        by_category = {category: [] for category in INTAKE_CATEGORIES}
+        for item in reference_data:
+            by_category[item.category].append(item)
+
+        def first(category, fragment):
+            # Mirrors filter(name__icontains=fragment).first()
+            return next(
+                (item for item in by_category[category] if fragment in item.name.lower()),
+                None,
+            )
+
+        self.status = first('case_status', 'open')
+        self.priority = first('case_priority', 'medium')
+        self.general_type = first('case_type', 'general')
+        self.gbv_type = first('case_type', 'gbv')
+        self.child_type = first('case_type', 'child')
+
+        # Rules in precedence order: built-in GBV, built-in child, then any
+        # other case type that declares intake keywords
+        self.rules = []
+        for case_type, default_keywords in (
+            (self.gbv_type, VIOLENCE_KEYWORDS),
+            (self.child_type, CHILD_KEYWORDS),
+        ):
+            if case_type:
+                self.rules.append(
+                    (case_type, (case_type.metadata or {}).get('intake_keywords') or default_keywords)
+                )
+        for case_type in by_category['case_type']:
+            keywords = (case_type.metadata or {}).get('intake_keywords')
+            if keywords and case_type not in (self.gbv_type, self.child_type):
+                self.rules.append((case_type, keywords))
+
+        self.automaton = KeywordAutomaton(
+            (keyword, index)
+            for index, (_, keywords) in enumerate(self.rules)
+            for keyword in keywords
+        )
+
+    def classify(self, narrative, case_data):
+        """
+        Pick the case type for a new case.
+
+        Args:
+            narrative: Case narrative
+            case_data: Additional case fields (``is_gbv_related`` is honoured)
+
+        Returns:
+            ReferenceData case type, or None if none is configured
+        """
+        if case_data.get('is_gbv_related') and self.gbv_type:
+            return self.gbv_type
+        matches = self.automaton.search(narrative or '')
+        if matches:
+            return self.rules[min(matches)][0]
+        return self.general_type
+
+
+def _generation():
+    generation = cache.get(INTAKE_GENERATION_KEY)
+    if generation is None:
+        # A fresh value, so processes that built a profile before the key
+        # was evicted rebuild it too
+        cache.add(INTAKE_GENERATION_KEY, time.time_ns(), None)
+        generation = cache.get(INTAKE_GENERATION_KEY)
+    return generation
+
+
+def get_profile():
+    """Return the intake profile, rebuilding it after reference data changed."""
+    global _profile
+    generation = _generation()
+    cached = _profile
+    if cached and cached[0] == generation:
+        return cached[1]
+
+    with _lock:
+        if _profile and _profile[0] == generation:
+            return _profile[1]
+        profile = IntakeProfile(
+            ReferenceData.objects.filter(category__in=INTAKE_CATEGORIES, is_active=True)
+        )
+        _profile = (generation, profile)
+        return profile
+
+
+def invalidate_profile():
+    """Make every process rebuild its intake profile."""
+    global _profile
+    _profile = None
+    try:
+        cache.incr(INTAKE_GENERATION_KEY)
+    except ValueError:
+        cache.set(INTAKE_GENERATION_KEY, time.time_ns(), None)
+
+
+@receiver(post_save, sender=ReferenceData)
+@receiver(post_delete, sender=ReferenceData)
+def reference_data_changed(sender, instance, **kwargs):
+    if instance.category in INTAKE_CATEGORIES:
+        transaction.on_commit(invalidate_profile)
@@ -0,0 +1,127 @@
+# apps/cases/management/commands/benchmark_case_intake.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django_tenants.utils import schema_context
+
+from apps.accounts.models import User
+from apps.cases import intake
+from apps.cases.models import Case, CaseActivity
+from apps.cases.services import CaseAIService, CaseBusinessLogic
+from apps.contacts.models import Contact, ContactRole
+from apps.core.models import ReferenceData
+
+NARRATIVES = [
+    "Caller reports domestic violence at home and needs urgent support.",
+    "A child has not attended school for two weeks and the family cannot be reached.",
+    "Request for general information about available counselling services.",
+    "Neighbour reports an orphan living alone after the guardian moved away.",
+]
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _legacy_create_case(reporter, narrative, created_by, **kwargs):
+    """
+    The intake path before the fast path, kept here as the benchmark baseline:
+    per-case reference data lookups, a separate due date save and activity
+    from case_post_save, and synchronous AI analysis.
+    """
+    with transaction.atomic():
+        narrative_lower = narrative.lower()
+        case_type = None
+        if any(k in narrative_lower for k in intake.VIOLENCE_KEYWORDS):
+            case_type = ReferenceData.objects.filter(
+                category='case_type', name__icontains='gbv', is_active=True
+            ).first()
+        if not case_type and any(k in narrative_lower for k in intake.CHILD_KEYWORDS):
+            case_type = ReferenceData.objects.filter(
+                category='case_type', name__icontains='child', is_active=True
+            ).first()
+        if not case_type:
+            case_type = ReferenceData.objects.filter(
+                category='case_type', name__icontains='general', is_active=True
+            ).first()
+        status = ReferenceData.objects.filter(
+            category='case_status', name__icontains='open', is_active=True
+        ).first()
+        priority = ReferenceData.objects.filter(
+            category='case_priority', name__icontains='medium', is_active=True
+        ).first()
+
+        case = Case.objects.create(
+            case_type=case_type, reporter=reporter, narrative=narrative,
+            status=status, priority=priority, created_by=created_by,
+            updated_by=created_by,
+            title=CaseBusinessLogic._generate_title(narrative, case_type),
+            **kwargs
+        )
+        # What case_post_save did for every case
+        CaseActivity.objects.create(
+            case=case, activity_type='created', user=created_by,
+            description=f"Case {case.case_number} created",
+        )
+        case.due_date = CaseBusinessLogic._calculate_due_date(priority)
+        case.save(update_fields=['due_date'])
+
+        ContactRole.objects.create(contact=reporter, case=case, role='reporter', is_primary=True)
+        CaseActivity.objects.create(
+            case=case, activity_type='created', user=created_by,
+            title='Case Created', description=f"Case {case.case_number} created",
+        )
+        CaseAIService.queue_analysis(case)
+    return case
+
+
+class Command(BaseCommand):
+    help = 'Measure case intake throughput (cases/sec per worker) before and after the fast path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('schema', help='Tenant schema to run against')
+        parser.add_argument('--cases', type=int, default=200, help='Cases to create per run')
+        parser.add_argument('--user', help='Username to create cases as (defaults to the first superuser)')
+
+    def handle(self, *args, **options):
+        with schema_context(options['schema']):
+            user = (
+                User.objects.filter(username=options['user']).first() if options['user']
+                else User.objects.filter(is_superuser=True).first()
+            )
+            if user is None:
+                raise CommandError('No user to create cases as')
+
+            results = [
+                ('before', self._run(_legacy_create_case, user, options['cases'])),
+                ('after', self._run(CaseBusinessLogic.create_case, user, options['cases'])),
+            ]
+
+        self.stdout.write(f"{'path':<8}{'cases/sec':>12}{'queries/case':>15}")
+        for label, (rate, queries) in results:
+            self.stdout.write(f"{label:<8}{rate:>12.1f}{queries:>15.1f}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Speed-up: {results[1][1][0] / results[0][1][0]:.1f}x (all cases rolled back)"
+        ))
+
+    def _run(self, create_case, user, count):
+        """Create `count` cases inside a transaction that is rolled back."""
+        intake.invalidate_profile()
+        try:
+            with transaction.atomic():
+                reporter = Contact.objects.create(full_name='Benchmark Reporter')
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    for i in range(count):
+                        create_case(
+                            reporter=reporter,
+                            narrative=NARRATIVES[i % len(NARRATIVES)],
+                            created_by=user,
+                        )
+                    elapsed = time.perf_counter() - started
+                raise _Rollback
+        except _Rollback:
+            pass
+        return count / elapsed, len(queries) / count
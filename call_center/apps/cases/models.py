@@ -460,6 +460,11 @@ class Case(SoftDeleteModel):
             # Composite indexes for common queries
             models.Index(fields=['is_active', 'status', '-created_at']),
             models.Index(fields=['assigned_to', 'is_active', 'status']),
+            
+            # Row-level visibility (see apps.cases.visibility)
+            models.Index(fields=['assigned_to', 'is_active', '-created_at']),
+            models.Index(fields=['escalated_to', 'is_active', '-created_at']),
+            models.Index(fields=['created_by', 'is_active', '-created_at']),
         ]
         constraints = [
             models.CheckConstraint(
@@ -577,11 +582,12 @@ class Case(SoftDeleteModel):
         self.escalation_date = timezone.now()
         
         # Create activity log
-        CaseActivity.objects.create(
-            case=self,
-            activity_type='escalated',
+        from .timeline import log_activity
+        log_activity(
+            self, 'escalated',
+            f"Case escalated to {user.get_full_name()}. Reason: {reason}",
             user=escalated_by,
-            description=f"Case escalated to {user.get_full_name()}. Reason: {reason}",
+            key=str(user.id),
             data={'escalated_to': user.id, 'reason': reason}
         )
         
@@ -593,11 +599,12 @@ class Case(SoftDeleteModel):
         self.assigned_to = user
         
         # Create activity log
-        CaseActivity.objects.create(
-            case=self,
-            activity_type='assigned',
+        from .timeline import log_activity
+        log_activity(
+            self, 'assigned',
+            f"Case assigned to {user.get_full_name()}",
             user=assigned_by,
-            description=f"Case assigned to {user.get_full_name()}",
+            key=f"{old_assignee.id if old_assignee else None}->{user.id}",
             data={
                 'assigned_to': user.id,
                 'previous_assignee': old_assignee.id if old_assignee else None
@@ -621,11 +628,10 @@ class Case(SoftDeleteModel):
             self.resolution_summary = resolution_summary
         
         # Create activity log
-        CaseActivity.objects.create(
-            case=self,
-            activity_type='closed',
+        from .timeline import log_activity
+        log_activity(
+            self, 'closed', "Case closed",
             user=closed_by,
-            description="Case closed",
             data={'resolution_summary': resolution_summary}
         )
         
@@ -786,6 +792,14 @@ class CaseActivity(TimeStampedModel):
         help_text=_("Reference to source (call ID, email, etc.)")
     )
     
+    # Deduplication (see apps.cases.timeline.log_activity)
+    dedupe_key = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name=_("Dedupe Key"),
+        help_text=_("Identifies the logged event; repeated logs of it are merged")
+    )
+    
     # Migration fields
     legacy_activity_id = models.IntegerField(
         null=True,
@@ -799,7 +813,8 @@ class CaseActivity(TimeStampedModel):
         verbose_name_plural = _("Case Activities")
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['case', '-created_at']),
+            # Timeline keyset pagination
+            models.Index(fields=['case', '-created_at', '-id']),
             models.Index(fields=['user', '-created_at']),
             models.Index(fields=['activity_type', '-created_at']),
             models.Index(fields=['is_important', '-created_at']),
@@ -1092,7 +1107,7 @@ class CaseNote(TimeStampedModel):
         verbose_name_plural = _("Case Notes")
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['case', '-created_at']),
+            models.Index(fields=['case', '-created_at', '-id']),
             models.Index(fields=['author', '-created_at']),
             models.Index(fields=['note_type', '-created_at']),
             models.Index(fields=['is_important', '-created_at']),
@@ -1318,7 +1333,7 @@ class CaseUpdate(TimeStampedModel):
         verbose_name_plural = _("Case Updates")
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['case', '-created_at']),
+            models.Index(fields=['case', '-created_at', '-id']),
             models.Index(fields=['updated_by', '-created_at']),
             models.Index(fields=['next_update_due', 'case']),
             models.Index(fields=['legacy_update_id']),
@@ -1,12 +1,12 @@
 # apps/cases/serializers.py
 from rest_framework import serializers
 from django.utils.translation import gettext_lazy as _
-from django.db import models
 from django.utils import timezone
 from .models import (
     Case, CaseCategory, CaseActivity, CaseService, CaseReferral,
     CaseNote, CaseAttachment, CaseUpdate
 )
+from . import visibility
 from apps.core.serializers import ReferenceDataSerializer
 from apps.contacts.serializers import ContactSerializer
 from apps.accounts.serializers import UserListSerializer
@@ -206,7 +206,7 @@ class CaseDetailSerializer(CaseSerializer):
     
     def get_activities(self, obj):
         """Get recent activities (last 10)"""
-        activities = obj.activities.order_by('-created_at')[:10]
+        activities = obj.activities.select_related('user').order_by('-created_at', '-id')[:10]
         return CaseActivitySerializer(activities, many=True).data
     
     def get_services(self, obj):
@@ -224,11 +224,9 @@ class CaseDetailSerializer(CaseSerializer):
         user = self.context.get('request').user if self.context.get('request') else None
         notes = obj.notes.order_by('-created_at')
         
-        # Filter private notes based on user permissions
-        if user and not user.is_staff and user.role not in ['admin', 'supervisor']:
-            notes = notes.filter(
-                models.Q(is_private=False) | models.Q(author=user)
-            )
+        # Filter private notes based on the case visibility policy
+        if user:
+            notes = notes.filter(visibility.note_q(user))
         
         return CaseNoteSerializer(notes, many=True).data
     
@@ -237,11 +235,9 @@ class CaseDetailSerializer(CaseSerializer):
         user = self.context.get('request').user if self.context.get('request') else None
         attachments = obj.attachments.order_by('-created_at')
         
-        # Filter confidential attachments based on user permissions
-        if user and not user.is_staff and user.role not in ['admin', 'supervisor']:
-            attachments = attachments.filter(
-                models.Q(is_confidential=False) | models.Q(uploaded_by=user)
-            )
+        # Filter confidential attachments based on the case visibility policy
+        if user:
+            attachments = attachments.filter(visibility.attachment_q(user))
         
         return CaseAttachmentSerializer(attachments, many=True).data
     
@@ -252,6 +248,132 @@ class CaseDetailSerializer(CaseSerializer):
         return ContactRoleSerializer(contact_roles, many=True).data
 
 
+class CaseActivityListSerializer(serializers.ModelSerializer):
+    """Flat activity row for expanded case lists"""
+    user_name = serializers.CharField(source='user.get_full_name', read_only=True)
+    
+    class Meta:
+        model = CaseActivity
+        fields = [
+            'id', 'activity_type', 'title', 'description', 'user_name',
+            'is_important', 'created_at'
+        ]
+
+
+class CaseServiceListSerializer(serializers.ModelSerializer):
+    """Flat service row for expanded case lists"""
+    service_name = serializers.CharField(source='service.name', read_only=True)
+    provided_by_name = serializers.CharField(source='provided_by.get_full_name', read_only=True)
+    
+    class Meta:
+        model = CaseService
+        fields = [
+            'id', 'service_name', 'provided_by_name', 'service_date',
+            'is_completed', 'created_at'
+        ]
+
+
+class CaseReferralListSerializer(serializers.ModelSerializer):
+    """Flat referral row for expanded case lists"""
+    referral_type_name = serializers.CharField(source='referral_type.name', read_only=True)
+    urgency_name = serializers.CharField(source='urgency.name', read_only=True)
+    
+    class Meta:
+        model = CaseReferral
+        fields = [
+            'id', 'referral_type_name', 'organization', 'urgency_name',
+            'status', 'referral_date', 'follow_up_date'
+        ]
+
+
+class CaseNoteListSerializer(serializers.ModelSerializer):
+    """Flat note row for expanded case lists"""
+    author_name = serializers.CharField(source='author.get_full_name', read_only=True)
+    
+    class Meta:
+        model = CaseNote
+        fields = [
+            'id', 'note_type', 'title', 'content', 'author_name',
+            'is_private', 'is_important', 'created_at'
+        ]
+
+
+class CaseAttachmentListSerializer(serializers.ModelSerializer):
+    """Flat attachment row for expanded case lists"""
+    uploaded_by_name = serializers.CharField(source='uploaded_by.get_full_name', read_only=True)
+    
+    class Meta:
+        model = CaseAttachment
+        fields = [
+            'id', 'attachment_type', 'file_name', 'title', 'mime_type',
+            'file_size', 'uploaded_by_name', 'is_confidential', 'created_at'
+        ]
+
+
+class CaseCategoryListSerializer(serializers.ModelSerializer):
+    """Flat category row for expanded case lists"""
+    category_name = serializers.CharField(source='category.name', read_only=True)
+    
+    class Meta:
+        model = CaseCategory
+        fields = ['id', 'category', 'category_name', 'is_primary', 'confidence_score']
+
+
+class CaseListSerializer(serializers.ModelSerializer):
+    """
+    Flat case projection for list pages.
+    
+    Names of related records come from the list query's joins. Related
+    collections are only included when requested with ``?expand=``, and are
+    read from the prefetched ``recent_<name>`` attributes (see
+    ``CaseViewSet.get_list_queryset``).
+    """
+    EXPANSIONS = {
+        'activities': CaseActivityListSerializer,
+        'services': CaseServiceListSerializer,
+        'referrals': CaseReferralListSerializer,
+        'notes': CaseNoteListSerializer,
+        'attachments': CaseAttachmentListSerializer,
+        'categories': CaseCategoryListSerializer,
+    }
+    
+    case_type_name = serializers.CharField(source='case_type.name', read_only=True)
+    status_name = serializers.CharField(source='status.name', read_only=True)
+    priority_name = serializers.CharField(source='priority.name', read_only=True)
+    reporter_name = serializers.CharField(source='reporter.full_name', read_only=True)
+    assigned_to_name = serializers.CharField(source='assigned_to.get_full_name', read_only=True)
+    age_in_days = serializers.IntegerField(read_only=True)
+    is_overdue = serializers.BooleanField(read_only=True)
+    
+    class Meta:
+        model = Case
+        fields = [
+            'id', 'uuid', 'case_number', 'title', 'case_type', 'case_type_name',
+            'status', 'status_name', 'priority', 'priority_name', 'reporter',
+            'reporter_name', 'assigned_to', 'assigned_to_name', 'is_gbv_related',
+            'ai_risk_score', 'age_in_days', 'is_overdue', 'due_date',
+            'closed_date', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+    
+    # Columns loaded for the list projection; everything else is deferred
+    PROJECTION = [
+        'id', 'uuid', 'case_number', 'title', 'is_gbv_related', 'ai_risk_score',
+        'due_date', 'closed_date', 'created_at', 'updated_at',
+        'case_type', 'case_type__name', 'status', 'status__name',
+        'priority', 'priority__name', 'reporter', 'reporter__full_name',
+        'assigned_to', 'assigned_to__first_name', 'assigned_to__last_name',
+        'assigned_to__username',
+    ]
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in self.context.get('expand', ()):
+            self.fields[name] = self.EXPANSIONS[name](
+                source=f'recent_{name}', many=True, read_only=True
+            )
+
+
 class CaseCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating new cases with validation"""
     case_type_id = serializers.IntegerField()
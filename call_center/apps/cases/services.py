@@ -1,5 +1,5 @@
 # apps/cases/services.py
-from django.db import transaction
+from django.db import connection, transaction
 from django.utils import timezone
 from django.conf import settings
 from django.core.exceptions import ValidationError
@@ -12,14 +12,19 @@ import json
 from decimal import Decimal
 
 from .models import (
-    Case, CaseActivity, CaseService, CaseReferral, 
+    Case, CaseService, CaseReferral, 
     CaseNote, CaseAttachment, CaseUpdate, CaseCategory
 )
 from apps.core.models import ReferenceData
 from apps.contacts.models import Contact, ContactRole
 from apps.accounts.models import User
+from apps.accounts.presence import OPEN_CASE_STATUSES, PresenceService
+from apps.accounts.routing import RoutingService
 from apps.campaigns.models import Campaign
 
+from . import intake
+from .timeline import log_activity
+
 logger = logging.getLogger(__name__)
 
 
@@ -56,24 +61,15 @@ class CaseBusinessLogic:
         """
         try:
             with transaction.atomic():
-                # Auto-determine case type if not provided
+                # Defaults and keyword classification come from the cached
+                # intake profile rather than per-case reference data queries
+                profile = intake.get_profile()
                 if not case_type:
-                    case_type = CaseBusinessLogic._determine_case_type(narrative, kwargs)
-                
-                # Set default status and priority
+                    case_type = profile.classify(narrative, kwargs)
                 if not status:
-                    status = ReferenceData.objects.filter(
-                        category='case_status', 
-                        name__icontains='open',
-                        is_active=True
-                    ).first()
-                    
+                    status = profile.status
                 if not priority:
-                    priority = ReferenceData.objects.filter(
-                        category='case_priority', 
-                        name__icontains='medium',
-                        is_active=True
-                    ).first()
+                    priority = profile.priority
                 
                 # Validate required reference data
                 if not case_type:
@@ -102,6 +98,7 @@ class CaseBusinessLogic:
                     updated_by=created_by,
                     **kwargs
                 )
+                CaseBusinessLogic._track_workload(case, None, False)
                 
                 # Create reporter role entry
                 ContactRole.objects.create(
@@ -116,12 +113,11 @@ class CaseBusinessLogic:
                 )
                 
                 # Log case creation
-                CaseActivity.objects.create(
-                    case=case,
-                    activity_type='created',
+                log_activity(
+                    case, 'created', f"Case {case.case_number} created",
                     user=created_by,
+                    key=str(case.pk),
                     title='Case Created',
-                    description=f"Case {case.case_number} created",
                     data={
                         'case_type': case_type.name,
                         'priority': priority.name,
@@ -130,9 +126,13 @@ class CaseBusinessLogic:
                     }
                 )
                 
-                # Trigger AI analysis if enabled
+                # Route unassigned cases to an agent during peak hours
+                if not case.assigned_to_id and getattr(settings, 'AGENT_ROUTING', {}).get('AUTO_ASSIGN_CASES'):
+                    RoutingService.auto_assign_case(case, created_by)
+                
+                # Run AI analysis in the background once the case is committed
                 if getattr(settings, 'ENABLE_AI_ANALYSIS', True):
-                    CaseAIService.queue_analysis(case)
+                    transaction.on_commit(lambda: CaseAIService.queue_background_analysis(case))
                 
                 logger.info(f"Case {case.case_number} created by {created_by.username}")
                 return case
@@ -144,47 +144,7 @@ class CaseBusinessLogic:
     @staticmethod
     def _determine_case_type(narrative: str, case_data: Dict) -> Optional[ReferenceData]:
         """Auto-determine case type based on content and flags"""
-        # Check for GBV indicators
-        if case_data.get('is_gbv_related'):
-            gbv_type = ReferenceData.objects.filter(
-                category='case_type', 
-                name__icontains='gbv',
-                is_active=True
-            ).first()
-            if gbv_type:
-                return gbv_type
-        
-        # Check narrative for keywords
-        narrative_lower = narrative.lower()
-        
-        # Violence indicators
-        violence_keywords = ['violence', 'abuse', 'assault', 'rape', 'sexual', 'domestic']
-        if any(keyword in narrative_lower for keyword in violence_keywords):
-            gbv_type = ReferenceData.objects.filter(
-                category='case_type',
-                name__icontains='gbv',
-                is_active=True
-            ).first()
-            if gbv_type:
-                return gbv_type
-        
-        # Child protection indicators
-        child_keywords = ['child', 'minor', 'underage', 'school', 'orphan']
-        if any(keyword in narrative_lower for keyword in child_keywords):
-            child_type = ReferenceData.objects.filter(
-                category='case_type',
-                name__icontains='child',
-                is_active=True
-            ).first()
-            if child_type:
-                return child_type
-        
-        # Default to general case type
-        return ReferenceData.objects.filter(
-            category='case_type',
-            name__icontains='general',
-            is_active=True
-        ).first()
+        return intake.get_profile().classify(narrative, case_data)
     
     @staticmethod
     def _calculate_due_date(priority: ReferenceData) -> datetime:
@@ -256,14 +216,17 @@ class CaseBusinessLogic:
                 case.assigned_to = assigned_to
                 case.updated_by = assigned_by
                 case.save(update_fields=['assigned_to', 'updated_by', 'updated_at'])
+                CaseBusinessLogic._track_workload(
+                    case, old_assignee.id if old_assignee else None, CaseBusinessLogic._is_open(case.status)
+                )
                 
                 # Log activity
-                CaseActivity.objects.create(
-                    case=case,
-                    activity_type='assigned',
+                log_activity(
+                    case, 'assigned',
+                    f"Case assigned from {old_assignee_name} to {assigned_to.get_full_name()}",
                     user=assigned_by,
+                    key=f"{old_assignee.id if old_assignee else None}->{assigned_to.id}",
                     title='Case Assigned',
-                    description=f"Case assigned from {old_assignee_name} to {assigned_to.get_full_name()}",
                     data={
                         'assigned_to': assigned_to.id,
                         'assigned_to_name': assigned_to.get_full_name(),
@@ -324,6 +287,7 @@ class CaseBusinessLogic:
                 case.updated_by = escalated_by
                 
                 # Auto-assign if not assigned or assigned to someone without escalation rights
+                previous_assignee_id = case.assigned_to_id
                 if not case.assigned_to or not CaseBusinessLogic._can_user_handle_escalations(case.assigned_to):
                     case.assigned_to = escalated_to
                 
@@ -331,14 +295,16 @@ class CaseBusinessLogic:
                     'escalated_to', 'escalated_by', 'escalation_date', 
                     'assigned_to', 'updated_by', 'updated_at'
                 ])
+                CaseBusinessLogic._track_workload(
+                    case, previous_assignee_id, CaseBusinessLogic._is_open(case.status)
+                )
                 
                 # Log activity
-                CaseActivity.objects.create(
-                    case=case,
-                    activity_type='escalated',
+                log_activity(
+                    case, 'escalated', f"Case escalated to {escalated_to.get_full_name()}",
                     user=escalated_by,
+                    key=str(escalated_to.id),
                     title='Case Escalated',
-                    description=f"Case escalated to {escalated_to.get_full_name()}",
                     data={
                         'escalated_to': escalated_to.id,
                         'escalated_to_name': escalated_to.get_full_name(),
@@ -408,14 +374,16 @@ class CaseBusinessLogic:
                     CaseBusinessLogic._handle_status_change_actions(case, old_status, new_status, updated_by)
                 
                 case.save(update_fields=['status', 'closed_date', 'updated_by', 'updated_at'])
+                CaseBusinessLogic._track_workload(
+                    case, case.assigned_to_id, CaseBusinessLogic._is_open(old_status)
+                )
                 
                 # Log activity
-                CaseActivity.objects.create(
-                    case=case,
-                    activity_type='status_changed',
+                log_activity(
+                    case, 'status_changed', f"Status changed from {old_status.name} to {new_status.name}",
                     user=updated_by,
+                    key=f"{old_status.id}->{new_status.id}",
                     title='Status Changed',
-                    description=f"Status changed from {old_status.name} to {new_status.name}",
                     data={
                         'old_status': old_status.name,
                         'new_status': new_status.name,
@@ -510,22 +478,29 @@ class CaseBusinessLogic:
     @staticmethod
     def _check_user_workload(user: User) -> bool:
         """Check if user workload is reasonable"""
-        active_cases = Case.objects.filter(
-            assigned_to=user,
-            status__name__in=['open', 'in_progress', 'pending', 'escalated'],
-            is_active=True
-        ).count()
-        
-        # Define workload limits by role
-        limits = {
-            'agent': 20,
-            'supervisor': 30,
-            'manager': 50,
-            'admin': 100
-        }
+        try:
+            # Maintained incrementally in the presence store
+            active_cases = PresenceService.get_open_cases(user)
+        except Exception as e:
+            logger.warning(f"Presence store unavailable, counting cases of {user.username}: {str(e)}")
+            active_cases = PresenceService.count_open_cases(user)
         
-        limit = limits.get(user.role, 20)
-        return active_cases < limit
+        # Workload limits by role come from AGENT_ROUTING['CASE_LIMITS']
+        return active_cases < PresenceService.case_limit(user)
+    
+    @staticmethod
+    def _is_open(status: Optional[ReferenceData]) -> bool:
+        """Whether a case in this status counts towards its assignee's workload"""
+        return bool(status) and status.name in OPEN_CASE_STATUSES
+    
+    @staticmethod
+    def _track_workload(case: Case, old_assignee_id: Optional[int], was_open: bool):
+        """Apply a change in a case's assignee or status to agent workloads once committed"""
+        new_assignee_id = case.assigned_to_id
+        is_open = CaseBusinessLogic._is_open(case.status)
+        transaction.on_commit(lambda: PresenceService.track_case_change(
+            old_assignee_id, was_open, new_assignee_id, is_open
+        ))
 
 
 class CaseDataService:
@@ -763,21 +738,27 @@ class CaseNotificationService:
     def send_assignment_notification(case: Case, assigned_to: User, assigned_by: User):
         """Send notification when case is assigned"""
         try:
-            from apps.notifications.models import Notification
-            
-            Notification.objects.create(
-                user=assigned_to,
+            from apps.notifications import realtime
+            from apps.notifications.services import NotificationService
+            
+            data = {
+                'case_id': case.id,
+                'case_number': case.case_number,
+                'assigned_by': assigned_by.id,
+                'priority': case.priority.name if case.priority else None,
+                'due_date': case.due_date.isoformat() if case.due_date else None,
+            }
+            NotificationService.notify_users(
+                [assigned_to],
                 title=f'Case Assigned: {case.case_number}',
-                content=f'Case {case.case_number} has been assigned to you by {assigned_by.get_full_name()}.',
-                notification_type='case_assignment',
-                data={
-                    'case_id': case.id,
-                    'case_number': case.case_number,
-                    'assigned_by': assigned_by.id,
-                    'priority': case.priority.name if case.priority else None,
-                    'due_date': case.due_date.isoformat() if case.due_date else None,
-                }
+                message=f'Case {case.case_number} has been assigned to you by {assigned_by.get_full_name()}.',
+                notification_type='case_assigned',
+                content_object=case,
+                sender=assigned_by,
+                data=data
             )
+            # Lets the agent console refresh its case list without polling
+            realtime.push_to_users([assigned_to.id], 'case_assignment', data)
             
         except Exception as e:
             logger.error(f"Error sending assignment notification: {str(e)}")
@@ -786,22 +767,27 @@ class CaseNotificationService:
     def send_escalation_notification(case: Case, escalated_to: User, escalated_by: User, reason: str):
         """Send notification when case is escalated"""
         try:
-            from apps.notifications.models import Notification
-            
-            Notification.objects.create(
-                user=escalated_to,
+            from apps.notifications import realtime
+            from apps.notifications.services import NotificationService
+            
+            data = {
+                'case_id': case.id,
+                'case_number': case.case_number,
+                'escalated_by': escalated_by.id,
+                'reason': reason,
+                'original_assignee': case.assigned_to.id if case.assigned_to else None,
+            }
+            NotificationService.notify_users(
+                [escalated_to],
                 title=f'Case Escalated: {case.case_number}',
-                content=f'Case {case.case_number} has been escalated to you by {escalated_by.get_full_name()}.\n\nReason: {reason}',
-                notification_type='case_escalation',
+                message=f'Case {case.case_number} has been escalated to you by {escalated_by.get_full_name()}.\n\nReason: {reason}',
+                notification_type='case_escalated',
                 priority='high',
-                data={
-                    'case_id': case.id,
-                    'case_number': case.case_number,
-                    'escalated_by': escalated_by.id,
-                    'reason': reason,
-                    'original_assignee': case.assigned_to.id if case.assigned_to else None,
-                }
+                content_object=case,
+                sender=escalated_by,
+                data=data
             )
+            realtime.push_to_users([escalated_to.id], 'case_assignment', data)
             
         except Exception as e:
             logger.error(f"Error sending escalation notification: {str(e)}")
@@ -882,6 +868,16 @@ class CaseAIService:
         except Exception as e:
             logger.error(f"Error queuing AI analysis for case {case.case_number}: {str(e)}")
     
+    @staticmethod
+    def queue_background_analysis(case: Case):
+        """Hand a case to the background worker for AI analysis"""
+        try:
+            from .tasks import analyze_case_task
+            # Workers have no tenant of their own; analyse in this one
+            analyze_case_task.delay(case.id, getattr(connection, 'schema_name', None))
+        except Exception as e:
+            logger.error(f"Error queuing AI analysis for case {case.case_number}: {str(e)}")
+    
     @staticmethod
     def analyze_case(case: Case) -> Dict[str, Any]:
         """Perform AI analysis on a case (placeholder implementation)"""
@@ -913,11 +909,9 @@ class CaseAIService:
             ])
             
             # Log AI analysis completion
-            CaseActivity.objects.create(
-                case=case,
-                activity_type='ai_analysis',
+            log_activity(
+                case, 'ai_analysis', 'Automated AI analysis completed',
                 title='AI Analysis Completed',
-                description='Automated AI analysis completed',
                 data=analysis_results,
                 is_internal=True
             )
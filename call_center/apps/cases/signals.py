@@ -1,6 +1,7 @@
 # Import ContactRole from contacts app for case-contact relationships
 from datetime import timedelta, timezone
-from apps.cases.models import Case, CaseActivity, CaseAttachment, CaseNote, CaseReferral, CaseService
+from apps.cases.models import Case, CaseAttachment, CaseNote, CaseReferral, CaseService
+from apps.cases.timeline import log_activity
 from apps.contacts.models import ContactRole
 
 # Update ContactRole to include case foreign key (this will be uncommented in contacts/models.py)
@@ -14,12 +15,12 @@ from django.dispatch import receiver
 def case_post_save(sender, instance, created, **kwargs):
     """Handle case post-save operations"""
     if created:
-        # Create initial activity
-        CaseActivity.objects.create(
-            case=instance,
-            activity_type='created',
+        # Create initial activity; shares its dedupe key with the one
+        # CaseBusinessLogic.create_case logs, so the two merge
+        log_activity(
+            instance, 'created', f"Case {instance.case_number} created",
             user=instance.created_by,
-            description=f"Case {instance.case_number} created",
+            key=str(instance.pk),
             data={
                 'case_type': instance.case_type.name if instance.case_type else None,
                 'priority': instance.priority.name if instance.priority else None,
@@ -42,11 +43,11 @@ def case_pre_save(sender, instance, **kwargs):
             
             # Track status changes
             if old_instance.status != instance.status:
-                CaseActivity.objects.create(
-                    case=instance,
-                    activity_type='status_changed',
+                log_activity(
+                    instance, 'status_changed',
+                    f"Status changed from {old_instance.status.name} to {instance.status.name}",
                     user=instance.updated_by,
-                    description=f"Status changed from {old_instance.status.name} to {instance.status.name}",
+                    key=f"{old_instance.status_id}->{instance.status_id}",
                     data={
                         'old_status': old_instance.status.name,
                         'new_status': instance.status.name,
@@ -55,11 +56,11 @@ def case_pre_save(sender, instance, **kwargs):
             
             # Track priority changes
             if old_instance.priority != instance.priority:
-                CaseActivity.objects.create(
-                    case=instance,
-                    activity_type='priority_changed',
+                log_activity(
+                    instance, 'priority_changed',
+                    f"Priority changed from {old_instance.priority.name} to {instance.priority.name}",
                     user=instance.updated_by,
-                    description=f"Priority changed from {old_instance.priority.name} to {instance.priority.name}",
+                    key=f"{old_instance.priority_id}->{instance.priority_id}",
                     data={
                         'old_priority': old_instance.priority.name,
                         'new_priority': instance.priority.name,
@@ -71,11 +72,11 @@ def case_pre_save(sender, instance, **kwargs):
                 old_name = old_instance.assigned_to.get_full_name() if old_instance.assigned_to else 'Unassigned'
                 new_name = instance.assigned_to.get_full_name() if instance.assigned_to else 'Unassigned'
                 
-                CaseActivity.objects.create(
-                    case=instance,
-                    activity_type='assigned',
+                log_activity(
+                    instance, 'assigned',
+                    f"Assignment changed from {old_name} to {new_name}",
                     user=instance.updated_by,
-                    description=f"Assignment changed from {old_name} to {new_name}",
+                    key=f"{old_instance.assigned_to_id}->{instance.assigned_to_id}",
                     data={
                         'old_assignee': old_instance.assigned_to.id if old_instance.assigned_to else None,
                         'new_assignee': instance.assigned_to.id if instance.assigned_to else None,
@@ -90,11 +91,10 @@ def case_pre_save(sender, instance, **kwargs):
 def case_service_post_save(sender, instance, created, **kwargs):
     """Log service addition"""
     if created:
-        CaseActivity.objects.create(
-            case=instance.case,
-            activity_type='service_added',
+        log_activity(
+            instance.case, 'service_added', f"Service added: {instance.service.name}",
             user=instance.provided_by,
-            description=f"Service added: {instance.service.name}",
+            key=str(instance.pk),
             data={
                 'service': instance.service.name,
                 'service_date': instance.service_date.isoformat(),
@@ -107,11 +107,10 @@ def case_service_post_save(sender, instance, created, **kwargs):
 def case_referral_post_save(sender, instance, created, **kwargs):
     """Log referral addition"""
     if created:
-        CaseActivity.objects.create(
-            case=instance.case,
-            activity_type='referral_added',
+        log_activity(
+            instance.case, 'referral_added', f"Referral made to: {instance.organization}",
             user=instance.referred_by,
-            description=f"Referral made to: {instance.organization}",
+            key=str(instance.pk),
             data={
                 'organization': instance.organization,
                 'referral_type': instance.referral_type.name,
@@ -124,11 +123,10 @@ def case_referral_post_save(sender, instance, created, **kwargs):
 def case_note_post_save(sender, instance, created, **kwargs):
     """Log note addition"""
     if created:
-        CaseActivity.objects.create(
-            case=instance.case,
-            activity_type='note_added',
+        log_activity(
+            instance.case, 'note_added', f"Note added: {instance.title or instance.content[:50]}",
             user=instance.author,
-            description=f"Note added: {instance.title or instance.content[:50]}",
+            key=str(instance.pk),
             data={
                 'note_type': instance.note_type,
                 'title': instance.title,
@@ -141,11 +139,10 @@ def case_note_post_save(sender, instance, created, **kwargs):
 def case_attachment_post_save(sender, instance, created, **kwargs):
     """Log attachment upload"""
     if created:
-        CaseActivity.objects.create(
-            case=instance.case,
-            activity_type='document_uploaded',
+        log_activity(
+            instance.case, 'document_uploaded', f"Document uploaded: {instance.file_name}",
             user=instance.uploaded_by,
-            description=f"Document uploaded: {instance.file_name}",
+            key=str(instance.pk),
             data={
                 'file_name': instance.file_name,
                 'attachment_type': instance.attachment_type,
@@ -0,0 +1,35 @@
+# apps/cases/tasks.py
+import logging
+
+from contextlib import nullcontext
+
+from celery import shared_task
+from django_tenants.utils import schema_context
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def analyze_case_task(case_id, schema=None):
+    """
+    Run AI analysis for a newly created case.
+    
+    Args:
+        case_id: ID of the case to analyze
+        schema: Tenant schema of the case
+        
+    Returns:
+        dict: Analysis results (empty if the case no longer exists)
+    """
+    from apps.cases.models import Case
+    from apps.cases.services import CaseAIService
+    
+    with schema_context(schema) if schema else nullcontext():
+        case = Case.objects.filter(id=case_id).first()
+        if case is None:
+            logger.warning(f"Case {case_id} not found for AI analysis in {schema}")
+            return {}
+        if case.ai_analysis_completed:
+            return {}
+        
+        return CaseAIService.analyze_case(case)
@@ -1,3 +1,315 @@
-from django.test import TestCase
+from contextlib import contextmanager
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.api.pagination import TimelineOrderingFilter
+
+from apps.accounts.models import User
+from apps.contacts.models import Contact
+from apps.core.models import ReferenceData
+
+from . import intake, tasks, timeline, visibility
+from .models import Case, CaseActivity, CaseNote
+from .services import CaseAIService
+from .views import CaseActivityViewSet, CaseViewSet
+
+
+class CaseListQueryCountTests(TestCase):
+    """List pages must cost a constant number of queries, whatever their size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='supervisor', password='secret', role='supervisor'
+        )
+        cls.reporter = Contact.objects.create(full_name='Reporter')
+        cls.case_type = ReferenceData.objects.create(category='case_type', name='General')
+        cls.status = ReferenceData.objects.create(category='case_status', name='Open')
+        cls.priority = ReferenceData.objects.create(category='case_priority', name='Medium')
+
+    def create_cases(self, count):
+        for i in range(count):
+            case = Case.objects.create(
+                case_type=self.case_type, status=self.status, priority=self.priority,
+                reporter=self.reporter, narrative=f'Narrative {i}',
+                created_by=self.user, assigned_to=self.user,
+            )
+            for j in range(12):
+                CaseActivity.objects.create(
+                    case=case, activity_type='note_added', user=self.user,
+                    description=f'Activity {j}',
+                )
+            CaseNote.objects.create(case=case, author=self.user, content='Note')
+
+    def list_queries(self, query=''):
+        request = APIRequestFactory().get(f'/cases/{query}')
+        force_authenticate(request, user=self.user)
+        view = CaseViewSet.as_view({'get': 'list'})
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request)
+            response.render()
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data
+
+    def test_list_is_constant(self):
+        self.create_cases(2)
+        small, _ = self.list_queries()
+        self.create_cases(23)
+        large, data = self.list_queries()
+
+        self.assertEqual(len(data['results']), 25)
+        self.assertEqual(small, large)
+        # Count and page
+        self.assertLessEqual(large, 2)
+
+    def test_expansions_add_one_query_each(self):
+        self.create_cases(2)
+        small, _ = self.list_queries('?expand=activities,notes')
+        self.create_cases(23)
+        large, data = self.list_queries('?expand=activities,notes')
+
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 4)
+        row = data['results'][0]
+        self.assertEqual(len(row['activities']), 10)
+        self.assertEqual(len(row['notes']), 1)
+        self.assertNotIn('services', row)
+
+    def test_unknown_expansions_are_ignored(self):
+        self.create_cases(1)
+        _, data = self.list_queries('?expand=secrets')
+        self.assertNotIn('secrets', data['results'][0])
+
+
+class CaseVisibilityTests(TestCase):
+    """The visibility policy filters in SQL and agrees with the object-level checks."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.lead = User.objects.create_user(username='lead', password='secret')
+        cls.agent = User.objects.create_user(username='agent', password='secret', manager=cls.lead)
+        cls.other = User.objects.create_user(username='other', password='secret')
+        cls.supervisor = User.objects.create_user(
+            username='supervisor', password='secret', role='supervisor'
+        )
+        reporter = Contact.objects.create(full_name='Reporter')
+        refs = {
+            category: ReferenceData.objects.create(category=category, name=name)
+            for category, name in (
+                ('case_type', 'General'), ('case_status', 'Open'), ('case_priority', 'Medium'),
+            )
+        }
+
+        def case(**kwargs):
+            return Case.objects.create(
+                case_type=refs['case_type'], status=refs['case_status'],
+                priority=refs['case_priority'], reporter=reporter, narrative='Narrative',
+                created_by=cls.supervisor, **kwargs
+            )
+
+        cls.assigned = case(assigned_to=cls.agent)
+        cls.escalated = case(assigned_to=cls.other, escalated_to=cls.agent)
+        cls.unrelated = case(assigned_to=cls.other)
+        CaseNote.objects.create(case=cls.assigned, author=cls.other, content='Private', is_private=True)
+        CaseNote.objects.create(case=cls.assigned, author=cls.other, content='Public')
+        CaseNote.objects.create(case=cls.unrelated, author=cls.other, content='Hidden')
+
+    def test_cases(self):
+        cases = {
+            user.username: set(visibility.visible_cases(user).values_list('pk', flat=True))
+            for user in (self.agent, self.lead, self.other, self.supervisor)
+        }
+        self.assertEqual(cases['agent'], {self.assigned.pk, self.escalated.pk})
+        self.assertEqual(cases['lead'], {self.assigned.pk})
+        self.assertEqual(cases['other'], {self.escalated.pk, self.unrelated.pk})
+        self.assertEqual(len(cases['supervisor']), 3)
+
+        for user in (self.agent, self.lead, self.other):
+            for case in (self.assigned, self.escalated, self.unrelated):
+                self.assertEqual(
+                    visibility.can_view_case(user, case), case.pk in cases[user.username]
+                )
+
+    def test_notes(self):
+        contents = set(visibility.visible_notes(self.agent).values_list('content', flat=True))
+        self.assertEqual(contents, {'Public'})
+        self.assertEqual(visibility.visible_notes(self.supervisor).count(), 3)
+
+
+class CaseTimelineTests(TestCase):
+    """Keyset pages cover the merged timeline exactly once, at a constant cost."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='supervisor', password='secret', role='supervisor'
+        )
+        cls.case = Case.objects.create(
+            case_type=ReferenceData.objects.create(category='case_type', name='General'),
+            status=ReferenceData.objects.create(category='case_status', name='Open'),
+            priority=ReferenceData.objects.create(category='case_priority', name='Medium'),
+            reporter=Contact.objects.create(full_name='Reporter'),
+            narrative='Narrative', created_by=cls.user, assigned_to=cls.user,
+        )
+        start = timezone.now() - timedelta(days=1)
+        for i in range(90):
+            activity = CaseActivity.objects.create(
+                case=cls.case, activity_type='other', user=cls.user, description=f'Activity {i}',
+            )
+            note = CaseNote.objects.create(case=cls.case, author=cls.user, content=f'Note {i}')
+            # Groups of three share a timestamp, across both sources
+            moment = start + timedelta(seconds=i // 3)
+            CaseActivity.objects.filter(pk=activity.pk).update(created_at=moment)
+            CaseNote.objects.filter(pk=note.pk).update(created_at=moment)
+
+    def read_all(self, limit):
+        entries, queries, cursor = [], [], None
+        while True:
+            with CaptureQueriesContext(connection) as captured:
+                page = timeline.timeline_page(self.case, self.user, cursor=cursor, limit=limit)
+            queries.append(len(captured))
+            entries.extend((e['timestamp'], e['kind'], e['id']) for e in page['results'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                return entries, queries
+
+    def test_pages_cover_timeline_in_order(self):
+        entries, _ = self.read_all(limit=25)
+
+        self.assertEqual(len(entries), CaseActivity.objects.filter(case=self.case).count() + 90)
+        self.assertEqual(len(set(entries)), len(entries))
+        self.assertEqual(
+            entries,
+            sorted(entries, key=lambda e: (e[0], timeline.KINDS.index(e[1]), e[2]), reverse=True),
+        )
+
+    def test_page_cost_is_constant(self):
+        _, queries = self.read_all(limit=20)
+        self.assertEqual(len(set(queries)), 1)
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(timeline.InvalidCursor):
+            timeline.timeline_page(self.case, self.user, cursor='not-a-cursor')
+
+    def test_repeated_logs_are_merged(self):
+        first = timeline.log_activity(
+            self.case, 'status_changed', 'Status changed', key='1->2', data={'new_status': 'Closed'},
+        )
+        second = timeline.log_activity(
+            self.case, 'status_changed', 'Status changed', user=self.user, key='1->2',
+            title='Status Changed', data={'notes': 'Resolved'},
+        )
+        timeline.log_activity(self.case, 'status_changed', 'Status changed', key='2->1')
+
+        self.assertEqual(first.pk, second.pk)
+        first.refresh_from_db()
+        self.assertEqual(first.data, {'new_status': 'Closed', 'notes': 'Resolved'})
+        self.assertEqual(first.user, self.user)
+        self.assertEqual(first.title, 'Status Changed')
+        self.assertEqual(
+            CaseActivity.objects.filter(case=self.case, activity_type='status_changed').count(), 2
+        )
+
+
+class ActivityOrderingTests(SimpleTestCase):
+    """Client-chosen activity orderings always end on id, so cursor pages are stable."""
+
+    def ordering(self, query):
+        request = Request(APIRequestFactory().get('/activities/', query))
+        return TimelineOrderingFilter().get_ordering(request, CaseActivity.objects.none(), CaseActivityViewSet())
+
+    def test_default_ordering(self):
+        self.assertEqual(self.ordering({}), ['-created_at', '-id'])
+
+    def test_id_is_appended_in_the_same_direction(self):
+        self.assertEqual(self.ordering({'ordering': 'created_at'}), ['created_at', 'id'])
+        self.assertEqual(self.ordering({'ordering': '-created_at'}), ['-created_at', '-id'])
+
+    def test_activity_type_is_not_orderable(self):
+        self.assertEqual(self.ordering({'ordering': 'activity_type'}), ['-created_at', '-id'])
+
+
+class CaseAnalysisTaskTests(TestCase):
+    """Background analysis looks the case up inside the tenant that queued it."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='supervisor', password='secret', role='supervisor')
+        cls.case = Case.objects.create(
+            case_type=ReferenceData.objects.create(category='case_type', name='General'),
+            status=ReferenceData.objects.create(category='case_status', name='Open'),
+            priority=ReferenceData.objects.create(category='case_priority', name='Medium'),
+            reporter=Contact.objects.create(full_name='Reporter'),
+            narrative='Narrative', created_by=user,
+        )
+
+    def test_queue_passes_the_current_schema(self):
+        connection.schema_name = 'tenant_a'
+        self.addCleanup(delattr, connection, 'schema_name')
+        with mock.patch.object(tasks.analyze_case_task, 'delay') as delay:
+            CaseAIService.queue_background_analysis(self.case)
+
+        delay.assert_called_once_with(self.case.id, 'tenant_a')
+
+    def test_task_resolves_the_case_in_its_schema(self):
+        entered = []
+
+        @contextmanager
+        def fake_schema_context(schema):
+            entered.append(schema)
+            yield
+            entered.append(None)
+
+        def analyze(case):
+            # Still inside the tenant when the case is analysed
+            self.assertEqual(entered, ['tenant_a'])
+            return {'case': case.id}
+
+        with mock.patch.object(tasks, 'schema_context', fake_schema_context), \
+                mock.patch.object(CaseAIService, 'analyze_case', side_effect=analyze):
+            result = tasks.analyze_case_task(self.case.id, 'tenant_a')
+
+        self.assertEqual(result, {'case': self.case.id})
+        self.assertEqual(entered, ['tenant_a', None])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class IntakeProfileTests(TestCase):
+    """One intake profile serves every tenant until shared reference data changes."""
+
+    def setUp(self):
+        intake.invalidate_profile()
+        self.addCleanup(intake.invalidate_profile)
+
+    def test_profile_is_shared_across_schemas(self):
+        connection.schema_name = 'tenant_a'
+        self.addCleanup(delattr, connection, 'schema_name')
+        profile = intake.get_profile()
+
+        connection.schema_name = 'tenant_b'
+        self.assertIs(intake.get_profile(), profile)
+
+    def test_change_rebuilds_every_process_after_commit(self):
+        profile = intake.get_profile()
+        generation = intake._profile[0]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            fraud = ReferenceData.objects.create(
+                category='case_type', name='Fraud', metadata={'intake_keywords': ['fraud']},
+            )
+            self.assertIs(intake.get_profile(), profile)
+
+        rebuilt = intake.get_profile()
+        self.assertIsNot(rebuilt, profile)
+        self.assertEqual(rebuilt.classify('Reported bank fraud', {}), fraud)
+
+        # Another process still holding the old generation rebuilds as well
+        intake._profile = (generation, profile)
+        self.assertIsNot(intake.get_profile(), profile)
@@ -0,0 +1,275 @@
+# apps/cases/timeline.py
+"""
+Case activity timeline.
+
+Writing: every ``CaseActivity`` goes through ``log_activity``. The same
+change is often logged twice, e.g. ``CaseBusinessLogic.assign_case`` logs
+an assignment and the ``case_pre_save`` signal logs it again. Callers pass
+a ``key`` naming the logical event (such as the status transition), and a
+second log of the same key on the same case within DEDUPE_SECONDS is merged
+into the first row instead of creating another.
+
+Reading: ``timeline_page`` returns one page of a case's activities, notes,
+updates and call events, newest first, merged into a single stream. Pages
+are addressed by an opaque cursor, the ``(timestamp, kind, id)`` of the
+last entry, instead of a page number. Each source is read with a range
+scan on its ``(case, created_at, id)`` index starting at the cursor, and
+nothing is counted. So a page costs the same few queries whether it is the
+first page or the last of a 5,000-event timeline.
+"""
+import base64
+import binascii
+from datetime import datetime, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from . import visibility
+from .models import CaseActivity, CaseNote, CaseUpdate
+
+DEDUPE_SECONDS = 10
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Order of the sources among entries with the same timestamp (highest first)
+KINDS = ('call_event', 'update', 'note', 'activity')
+
+
+class InvalidCursor(ValueError):
+    """The cursor was not produced by ``timeline_page``."""
+
+
+def log_activity(case, activity_type, description, user=None, key=None, **fields):
+    """
+    Record an activity on a case, merging repeated logs of the same event.
+
+    Args:
+        case: Case the activity belongs to
+        activity_type: One of CaseActivity.ACTIVITY_TYPES
+        description: What happened
+        user: User who did it
+        key: Identifies the event within its type (e.g. "<old>-><new>"
+            for a status change); without a key nothing is merged
+        **fields: Other CaseActivity fields (title, data, is_important, ...)
+
+    Returns:
+        CaseActivity: The new activity, or the earlier one it was merged into
+    """
+    dedupe_key = f"{activity_type}:{key}" if key is not None else ''
+    if dedupe_key:
+        existing = CaseActivity.objects.filter(
+            case=case,
+            dedupe_key=dedupe_key,
+            created_at__gte=timezone.now() - timedelta(seconds=DEDUPE_SECONDS),
+        ).order_by('-created_at', '-id').first()
+        if existing is not None:
+            return _merge(existing, user, fields)
+
+    return CaseActivity.objects.create(
+        case=case,
+        activity_type=activity_type,
+        description=description,
+        user=user,
+        dedupe_key=dedupe_key,
+        **fields
+    )
+
+
+def _merge(activity, user, fields):
+    # The later log usually comes from the service and carries more context
+    # (reason, notes), so its data wins; the first description is kept
+    changed = []
+    if fields.get('data'):
+        activity.data = {**activity.data, **fields['data']}
+        changed.append('data')
+    if user is not None and activity.user_id is None:
+        activity.user = user
+        changed.append('user')
+    if fields.get('title') and not activity.title:
+        activity.title = fields['title']
+        changed.append('title')
+    if fields.get('is_important') and not activity.is_important:
+        activity.is_important = True
+        changed.append('is_important')
+    if changed:
+        activity.save(update_fields=changed + ['updated_at'])
+    return activity
+
+
+# ---------------------------------------------------------------------------
+# Cursors
+# ---------------------------------------------------------------------------
+
+def encode_cursor(entry):
+    raw = f"{entry['timestamp'].isoformat()}|{entry['kind']}|{entry['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Returns:
+        tuple: (timestamp, kind, id)
+
+    Raises:
+        InvalidCursor
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, kind, pk = raw.split('|')
+        timestamp = datetime.fromisoformat(timestamp)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor('Invalid timeline cursor')
+    if kind not in KINDS or timezone.is_naive(timestamp):
+        raise InvalidCursor('Invalid timeline cursor')
+    return timestamp, kind, pk
+
+
+def _after(kind, time_field, cursor):
+    """
+    Rows of `kind` that come after the cursor in (timestamp, kind rank, id)
+    descending order.
+    """
+    timestamp, cursor_kind, cursor_id = cursor
+    rank, cursor_rank = KINDS.index(kind), KINDS.index(cursor_kind)
+    older = Q(**{f'{time_field}__lt': timestamp})
+    if rank < cursor_rank:
+        return older | Q(**{time_field: timestamp})
+    if rank == cursor_rank:
+        return older | Q(**{time_field: timestamp, 'id__lt': cursor_id})
+    return older
+
+
+# ---------------------------------------------------------------------------
+# Sources
+# ---------------------------------------------------------------------------
+
+def _user_name(user):
+    return user.get_full_name() or user.username if user else None
+
+
+def _activities(case, user):
+    return CaseActivity.objects.filter(case=case).select_related('user'), 'created_at', lambda a: {
+        'type': a.activity_type,
+        'title': a.title or a.get_activity_type_display(),
+        'description': a.description,
+        'user': _user_name(a.user),
+        'data': a.data,
+        'is_important': a.is_important,
+    }
+
+
+def _notes(case, user):
+    queryset = CaseNote.objects.filter(case=case).filter(visibility.note_q(user)).select_related('author')
+    return queryset, 'created_at', lambda n: {
+        'type': n.note_type,
+        'title': n.title,
+        'description': n.content,
+        'user': _user_name(n.author),
+        'data': {'is_private': n.is_private},
+        'is_important': n.is_important,
+    }
+
+
+def _updates(case, user):
+    queryset = CaseUpdate.objects.filter(case=case).select_related(
+        'updated_by', 'status_at_update', 'priority_at_update'
+    )
+    return queryset, 'created_at', lambda u: {
+        'type': 'update',
+        'title': u.summary,
+        'description': u.details,
+        'user': _user_name(u.updated_by),
+        'data': {
+            'status': u.status_at_update.name,
+            'priority': u.priority_at_update.name,
+            'progress_percentage': u.progress_percentage,
+            'next_actions': u.next_actions,
+        },
+        'is_important': False,
+    }
+
+
+def case_call_ids(case):
+    """IDs of the calls linked to a case: its source call and logged calls."""
+    from apps.calls.models import Call
+
+    references = set(
+        CaseActivity.objects.filter(case=case, activity_type='call_logged')
+        .exclude(source_reference='')
+        .values_list('source_reference', flat=True)
+    )
+    if case.source_type == 'call' and case.source_reference:
+        references.add(case.source_reference)
+    if not references:
+        return []
+    return list(Call.objects.filter(unique_id__in=references).values_list('id', flat=True))
+
+
+def _call_events(case, user):
+    from apps.calls.models import CallEvent
+
+    queryset = CallEvent.objects.filter(call_id__in=case_call_ids(case)).select_related('call', 'agent')
+    return queryset, 'event_time', lambda e: {
+        'type': e.event_type,
+        'title': e.get_event_type_display(),
+        'description': e.description,
+        'user': _user_name(e.agent),
+        'data': {'call': e.call.unique_id, **e.data},
+        'is_important': False,
+    }
+
+
+SOURCES = {
+    'activity': _activities,
+    'note': _notes,
+    'update': _updates,
+    'call_event': _call_events,
+}
+
+
+def timeline_page(case, user, cursor=None, limit=None, kinds=None):
+    """
+    One page of a case's merged timeline, newest first.
+
+    Args:
+        case: Case whose timeline to read
+        user: User reading it (private notes are filtered for them)
+        cursor: ``next_cursor`` of the previous page, or None for the first
+        limit: Entries per page (PAGE_SIZE by default, at most MAX_PAGE_SIZE)
+        kinds: Sources to include (default: all of KINDS)
+
+    Returns:
+        dict: ``results`` (entries with kind, id, timestamp, type, title,
+        description, user, data, is_important) and ``next_cursor`` (None
+        on the last page)
+
+    Raises:
+        InvalidCursor: If `cursor` cannot be decoded
+    """
+    limit = min(limit or PAGE_SIZE, MAX_PAGE_SIZE)
+    position = decode_cursor(cursor) if cursor else None
+
+    entries = []
+    for kind in KINDS:
+        if kinds and kind not in kinds:
+            continue
+        queryset, time_field, serialize = SOURCES[kind](case, user)
+        if position:
+            queryset = queryset.filter(_after(kind, time_field, position))
+        # limit + 1 from each source is enough to fill the page and see if
+        # anything follows it
+        for obj in queryset.order_by(f'-{time_field}', '-id')[:limit + 1]:
+            entries.append({
+                'kind': kind,
+                'id': obj.id,
+                'timestamp': getattr(obj, time_field),
+                **serialize(obj),
+            })
+
+    entries.sort(key=lambda e: (e['timestamp'], KINDS.index(e['kind']), e['id']), reverse=True)
+    page = entries[:limit]
+    return {
+        'results': page,
+        'next_cursor': encode_cursor(page[-1]) if len(entries) > limit else None,
+    }
@@ -27,6 +27,7 @@ urlpatterns = [
     path('api/v1/cases/<int:case_id>/reopen/', views.ReopenCaseView.as_view(), name='reopen-case'),
     path('api/v1/cases/<int:case_id>/add-contact/', views.AddCaseContactView.as_view(), name='add-case-contact'),
     path('api/v1/cases/<int:case_id>/statistics/', views.CaseStatisticsView.as_view(), name='case-statistics'),
+    path('api/v1/cases/<int:case_id>/timeline/', views.CaseTimelineView.as_view(), name='case-timeline'),
     
     # Search and analytics
     path('api/v1/cases/search/', views.CaseSearchView.as_view(), name='case-search'),
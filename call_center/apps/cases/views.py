@@ -5,7 +5,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import Prefetch
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 import logging
@@ -15,13 +15,15 @@ from .models import (
     CaseNote, CaseAttachment, CaseUpdate, CaseCategory
 )
 from .serializers import (
-    CaseSerializer, CaseDetailSerializer, CaseActivitySerializer,
+    CaseSerializer, CaseDetailSerializer, CaseListSerializer, CaseActivitySerializer,
     CaseServiceSerializer, CaseReferralSerializer, CaseNoteSerializer,
     CaseAttachmentSerializer, CaseUpdateSerializer, CaseCategorySerializer
 )
 from .services import CaseService as CaseServiceLogic, CaseSearchService, CaseAnalyticsService
 from .filters import CaseFilter, CaseActivityFilter
-from apps.core.permissions import IsAuthenticated
+from . import timeline, visibility
+from apps.api.pagination import TimelineCursorPagination, TimelineOrderingFilter
+from apps.core.permissions import CanModifyCase, IsAuthenticated
 
 logger = logging.getLogger(__name__)
 
@@ -34,31 +36,82 @@ class CaseViewSet(viewsets.ModelViewSet):
         'case_type', 'status', 'priority', 'reporter', 
         'assigned_to', 'escalated_to', 'source_channel'
     ).prefetch_related('categories', 'contact_roles')
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, CanModifyCase]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_class = CaseFilter
     search_fields = ['case_number', 'title', 'narrative', 'reporter__full_name']
     ordering_fields = ['created_at', 'due_date', 'case_number', 'priority']
     ordering = ['-created_at']
     
+    # Related items returned per case for each ?expand= collection
+    EXPANSION_LIMIT = 10
+    
     def get_serializer_class(self):
-        """Use detailed serializer for retrieve and list actions"""
-        if self.action in ['retrieve', 'list']:
+        """Use the flat list projection for lists and the detailed serializer for retrieve"""
+        if self.action == 'list':
+            return CaseListSerializer
+        if self.action == 'retrieve':
             return CaseDetailSerializer
         return CaseSerializer
     
-    def get_queryset(self):
-        """Filter queryset based on user permissions"""
-        queryset = super().get_queryset()
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == 'list':
+            context['expand'] = self.get_expansions()
+        return context
+    
+    def get_expansions(self):
+        """Related collections requested with ?expand=activities,notes,..."""
+        requested = self.request.query_params.get('expand', '')
+        return [
+            name for name in dict.fromkeys(part.strip() for part in requested.split(','))
+            if name in CaseListSerializer.EXPANSIONS
+        ]
+    
+    def get_list_queryset(self):
+        """
+        Projection for list pages: only the listed columns plus joined names,
+        and one windowed prefetch (latest EXPANSION_LIMIT per case) per
+        requested expansion, so a page costs a constant number of queries.
+        """
         user = self.request.user
+        limit = self.EXPANSION_LIMIT
+        
+        expansions = {
+            'activities': lambda: CaseActivity.objects.select_related('user').order_by('-created_at'),
+            'services': lambda: CaseService.objects.select_related(
+                'service', 'provided_by'
+            ).order_by('-service_date'),
+            'referrals': lambda: CaseReferral.objects.select_related(
+                'referral_type', 'urgency'
+            ).order_by('-referral_date'),
+            'notes': lambda: CaseNote.objects.select_related('author').filter(
+                visibility.note_q(user)
+            ).order_by('-created_at'),
+            'attachments': lambda: CaseAttachment.objects.select_related('uploaded_by').filter(
+                visibility.attachment_q(user)
+            ).order_by('-created_at'),
+            'categories': lambda: CaseCategory.objects.select_related('category').order_by(
+                '-is_primary', '-created_at'
+            ),
+        }
         
-        # If user is not admin/supervisor, only show assigned cases or cases they created
-        if not user.is_staff and user.role not in ['admin', 'supervisor']:
-            queryset = queryset.filter(
-                Q(assigned_to=user) | Q(created_by=user)
+        queryset = Case.objects.select_related(
+            'case_type', 'status', 'priority', 'reporter', 'assigned_to'
+        ).only(*CaseListSerializer.PROJECTION)
+        for name in self.get_expansions():
+            queryset = queryset.prefetch_related(
+                Prefetch(name, queryset=expansions[name]()[:limit], to_attr=f'recent_{name}')
             )
-        
-        return queryset.filter(is_active=True)
+        return queryset
+    
+    def get_queryset(self):
+        """Filter queryset based on user permissions"""
+        if self.action == 'list':
+            queryset = self.get_list_queryset()
+        else:
+            queryset = super().get_queryset()
+        return visibility.visible_cases(self.request.user, queryset)
     
     def perform_create(self, serializer):
         """Set created_by when creating a case"""
@@ -154,19 +207,52 @@ class CaseActivityViewSet(viewsets.ModelViewSet):
     """ViewSet for Case Activities"""
     serializer_class = CaseActivitySerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    pagination_class = TimelineCursorPagination
+    filter_backends = [DjangoFilterBackend, SearchFilter, TimelineOrderingFilter]
     filterset_class = CaseActivityFilter
     search_fields = ['description', 'title']
-    ordering_fields = ['created_at', 'activity_type']
-    ordering = ['-created_at']
+    # Cursor pages need a selective ordering (ties fall back to id); filter
+    # by activity_type instead of ordering by it
+    ordering_fields = ['created_at']
+    ordering = ['-created_at', '-id']
     
     def get_queryset(self):
-        return CaseActivity.objects.select_related('case', 'user').all()
+        return visibility.visible_case_records(
+            self.request.user, CaseActivity.objects.select_related('case', 'user')
+        )
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
 
+class CaseTimelineView(APIView):
+    """
+    Merged timeline of a case (activities, notes, updates, call events),
+    newest first. Pass ``next_cursor`` back as ?cursor= for the next page;
+    ?kinds=activity,note restricts the sources and ?limit= sets the page size.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, case_id):
+        case = get_object_or_404(visibility.visible_cases(request.user), id=case_id)
+        kinds = [k for k in request.query_params.get('kinds', '').split(',') if k in timeline.KINDS]
+        try:
+            limit = int(request.query_params.get('limit', timeline.PAGE_SIZE))
+        except ValueError:
+            limit = timeline.PAGE_SIZE
+        
+        try:
+            page = timeline.timeline_page(
+                case, request.user,
+                cursor=request.query_params.get('cursor') or None,
+                limit=max(limit, 1),
+                kinds=kinds or None,
+            )
+        except timeline.InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(page)
+
+
 class CaseServiceViewSet(viewsets.ModelViewSet):
     """ViewSet for Case Services"""
     serializer_class = CaseServiceSerializer
@@ -176,7 +262,9 @@ class CaseServiceViewSet(viewsets.ModelViewSet):
     ordering = ['-service_date']
     
     def get_queryset(self):
-        return CaseService.objects.select_related('case', 'service', 'provided_by').all()
+        return visibility.visible_case_records(
+            self.request.user, CaseService.objects.select_related('case', 'service', 'provided_by')
+        )
     
     def perform_create(self, serializer):
         serializer.save(provided_by=self.request.user)
@@ -191,9 +279,10 @@ class CaseReferralViewSet(viewsets.ModelViewSet):
     ordering = ['-referral_date']
     
     def get_queryset(self):
-        return CaseReferral.objects.select_related(
-            'case', 'referral_type', 'urgency', 'referred_by'
-        ).all()
+        return visibility.visible_case_records(
+            self.request.user,
+            CaseReferral.objects.select_related('case', 'referral_type', 'urgency', 'referred_by')
+        )
     
     def perform_create(self, serializer):
         serializer.save(referred_by=self.request.user)
@@ -209,16 +298,9 @@ class CaseNoteViewSet(viewsets.ModelViewSet):
     ordering = ['-created_at']
     
     def get_queryset(self):
-        queryset = CaseNote.objects.select_related('case', 'author').all()
-        
-        # Filter private notes based on user permissions
-        user = self.request.user
-        if not user.is_staff and user.role not in ['admin', 'supervisor']:
-            queryset = queryset.filter(
-                Q(is_private=False) | Q(author=user)
-            )
-        
-        return queryset
+        return visibility.visible_notes(
+            self.request.user, CaseNote.objects.select_related('case', 'author')
+        )
     
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -233,16 +315,9 @@ class CaseAttachmentViewSet(viewsets.ModelViewSet):
     ordering = ['-created_at']
     
     def get_queryset(self):
-        queryset = CaseAttachment.objects.select_related('case', 'uploaded_by').all()
-        
-        # Filter confidential attachments based on user permissions
-        user = self.request.user
-        if not user.is_staff and user.role not in ['admin', 'supervisor']:
-            queryset = queryset.filter(
-                Q(is_confidential=False) | Q(uploaded_by=user)
-            )
-        
-        return queryset
+        return visibility.visible_attachments(
+            self.request.user, CaseAttachment.objects.select_related('case', 'uploaded_by')
+        )
     
     def perform_create(self, serializer):
         serializer.save(uploaded_by=self.request.user)
@@ -257,9 +332,12 @@ class CaseUpdateViewSet(viewsets.ModelViewSet):
     ordering = ['-created_at']
     
     def get_queryset(self):
-        return CaseUpdate.objects.select_related(
-            'case', 'updated_by', 'status_at_update', 'priority_at_update'
-        ).all()
+        return visibility.visible_case_records(
+            self.request.user,
+            CaseUpdate.objects.select_related(
+                'case', 'updated_by', 'status_at_update', 'priority_at_update'
+            )
+        )
     
     def perform_create(self, serializer):
         serializer.save(updated_by=self.request.user)
@@ -272,7 +350,9 @@ class CaseCategoryViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend]
     
     def get_queryset(self):
-        return CaseCategory.objects.select_related('case', 'category', 'added_by').all()
+        return visibility.visible_case_records(
+            self.request.user, CaseCategory.objects.select_related('case', 'category', 'added_by')
+        )
     
     def perform_create(self, serializer):
         serializer.save(added_by=self.request.user)
@@ -284,7 +364,7 @@ class AssignCaseView(APIView):
     permission_classes = [IsAuthenticated]
     
     def post(self, request, case_id):
-        case = get_object_or_404(Case, id=case_id)
+        case = get_object_or_404(visibility.visible_cases(request.user), id=case_id)
         assigned_to_id = request.data.get('assigned_to')
         
         if not assigned_to_id:
@@ -318,7 +398,7 @@ class EscalateCaseView(APIView):
     permission_classes = [IsAuthenticated]
     
     def post(self, request, case_id):
-        case = get_object_or_404(Case, id=case_id)
+        case = get_object_or_404(visibility.visible_cases(request.user), id=case_id)
         escalated_to_id = request.data.get('escalated_to')
         reason = request.data.get('reason', '')
         
@@ -353,7 +433,7 @@ class CloseCaseView(APIView):
     permission_classes = [IsAuthenticated]
     
     def post(self, request, case_id):
-        case = get_object_or_404(Case, id=case_id)
+        case = get_object_or_404(visibility.visible_cases(request.user), id=case_id)
         resolution_summary = request.data.get('resolution_summary', '')
         
         try:
@@ -373,7 +453,7 @@ class ReopenCaseView(APIView):
     permission_classes = [IsAuthenticated]
     
     def post(self, request, case_id):
-        case = get_object_or_404(Case, id=case_id)
+        case = get_object_or_404(visibility.visible_cases(request.user), id=case_id)
         reason = request.data.get('reason', '')
         
         try:
@@ -393,7 +473,7 @@ class AddCaseContactView(APIView):
     permission_classes = [IsAuthenticated]
     
     def post(self, request, case_id):
-        case = get_object_or_404(Case, id=case_id)
+        case = get_object_or_404(visibility.visible_cases(request.user), id=case_id)
         contact_id = request.data.get('contact_id')
         role = request.data.get('role')
         is_primary = request.data.get('is_primary', False)
@@ -444,7 +524,7 @@ class CaseStatisticsView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request, case_id):
-        case = get_object_or_404(Case, id=case_id)
+        case = get_object_or_404(visibility.visible_cases(request.user), id=case_id)
         stats = CaseServiceLogic.get_case_statistics(case)
         return Response(stats)
 
@@ -602,7 +682,7 @@ class BulkAssignCasesView(APIView):
             
             for case_id in case_ids:
                 try:
-                    case = Case.objects.get(id=case_id)
+                    case = visibility.visible_cases(request.user).get(id=case_id)
                     CaseServiceLogic.assign_case(case, assigned_to, request.user)
                     success_count += 1
                 except Case.DoesNotExist:
@@ -642,7 +722,7 @@ class BulkCloseCasesView(APIView):
         
         for case_id in case_ids:
             try:
-                case = Case.objects.get(id=case_id)
+                case = visibility.visible_cases(request.user).get(id=case_id)
                 CaseServiceLogic.close_case(case, request.user, resolution_summary)
                 success_count += 1
             except Case.DoesNotExist:
@@ -675,7 +755,7 @@ class CaseAIAnalysisView(APIView):
     permission_classes = [IsAuthenticated]
     
     def post(self, request, case_id):
-        case = get_object_or_404(Case, id=case_id)
+        case = get_object_or_404(visibility.visible_cases(request.user), id=case_id)
         
         # Mark case for AI analysis
         case.ai_analysis_completed = False
@@ -694,7 +774,7 @@ class CaseAISuggestionsView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request, case_id):
-        case = get_object_or_404(Case, id=case_id)
+        case = get_object_or_404(visibility.visible_cases(request.user), id=case_id)
         
         # Return AI suggestions if available
         suggestions = {
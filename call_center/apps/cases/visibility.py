@@ -0,0 +1,136 @@
+# apps/cases/visibility.py
+"""
+Row-level case visibility.
+
+One policy decides which cases, and which of their notes, attachments and
+other records, a user may see. It compiles to ``Q`` objects so list
+endpoints filter in SQL; the object-level helpers used by the permission
+classes in ``apps.core.permissions`` apply the same rules to a single
+instance.
+
+A user sees a case when any of these holds:
+
+- they are staff, a superuser, or have a full-access role,
+- the case is assigned to them, escalated to them or created by them,
+- the case is assigned to someone who reports to them (their team).
+
+Each branch is served by an ``(<user column>, is_active, created_at)``
+index on Case. Inside a visible case, restricted users additionally only
+see private notes they wrote and confidential attachments they uploaded.
+"""
+from django.db.models import Q
+
+FULL_ACCESS_ROLES = ('supervisor', 'manager', 'admin')
+
+
+def has_full_access(user):
+    """Whether the user sees every case, note and attachment."""
+    return bool(
+        user.is_superuser or user.is_staff or getattr(user, 'role', None) in FULL_ACCESS_ROLES
+    )
+
+
+def _team_subquery(user):
+    from apps.accounts.models import User
+    return User.objects.filter(manager=user).values('pk')
+
+
+def case_q(user, prefix=''):
+    """
+    Filter for the cases visible to `user`.
+
+    Args:
+        user: The requesting user
+        prefix: Lookup path from the filtered model to Case, e.g. ``'case__'``
+
+    Returns:
+        Q: Empty for full-access users
+    """
+    if has_full_access(user):
+        return Q()
+    return (
+        Q(**{f'{prefix}assigned_to': user})
+        | Q(**{f'{prefix}escalated_to': user})
+        | Q(**{f'{prefix}created_by': user})
+        | Q(**{f'{prefix}assigned_to__in': _team_subquery(user)})
+    )
+
+
+def note_q(user):
+    """Filter for the notes `user` may read within a visible case."""
+    if has_full_access(user):
+        return Q()
+    return Q(is_private=False) | Q(author=user)
+
+
+def attachment_q(user):
+    """Filter for the attachments `user` may read within a visible case."""
+    if has_full_access(user):
+        return Q()
+    return Q(is_confidential=False) | Q(uploaded_by=user)
+
+
+def visible_cases(user, queryset=None):
+    """Active cases visible to `user`."""
+    from .models import Case
+    queryset = Case.objects.all() if queryset is None else queryset
+    return queryset.filter(case_q(user), is_active=True)
+
+
+def visible_case_records(user, queryset):
+    """
+    Restrict a queryset of case-owned records (activities, services, ...)
+    to those belonging to cases visible to `user`.
+    """
+    return queryset.filter(case_q(user, prefix='case__'), case__is_active=True)
+
+
+def visible_notes(user, queryset=None):
+    from .models import CaseNote
+    queryset = CaseNote.objects.all() if queryset is None else queryset
+    return visible_case_records(user, queryset).filter(note_q(user))
+
+
+def visible_attachments(user, queryset=None):
+    from .models import CaseAttachment
+    queryset = CaseAttachment.objects.all() if queryset is None else queryset
+    return visible_case_records(user, queryset).filter(attachment_q(user))
+
+
+# ---------------------------------------------------------------------------
+# Single objects
+# ---------------------------------------------------------------------------
+
+def _team_ids(user):
+    # Cached on the user instance, i.e. for the duration of a request
+    if not hasattr(user, '_case_team_ids'):
+        user._case_team_ids = set(_team_subquery(user).values_list('pk', flat=True))
+    return user._case_team_ids
+
+
+def can_view_case(user, case):
+    """Object-level equivalent of ``case_q``."""
+    if has_full_access(user):
+        return True
+    if user.pk in (case.assigned_to_id, case.escalated_to_id, case.created_by_id):
+        return True
+    return case.assigned_to_id is not None and case.assigned_to_id in _team_ids(user)
+
+
+def can_modify_case(user, case):
+    """Only the assignee, the escalation target and full-access users may modify a case."""
+    return has_full_access(user) or user.pk in (case.assigned_to_id, case.escalated_to_id)
+
+
+def can_view_record(user, obj):
+    """Object-level visibility for a case or a record that belongs to one."""
+    case = getattr(obj, 'case', obj)
+    if not can_view_case(user, case):
+        return False
+    if has_full_access(user):
+        return True
+    if getattr(obj, 'is_private', False) and obj.author_id != user.pk:
+        return False
+    if getattr(obj, 'is_confidential', False) and obj.uploaded_by_id != user.pk:
+        return False
+    return True
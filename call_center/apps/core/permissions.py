@@ -194,7 +194,8 @@ class CanAccessConfidentialData(BasePermission):
 
 class IsAssignedToCase(BasePermission):
     """
-    Permission that checks if user is assigned to a specific case.
+    Permission that checks if user may see a specific case.
+    Uses the case visibility policy (apps.cases.visibility).
     """
     message = _('You are not assigned to this case.')
     
@@ -202,23 +203,16 @@ class IsAssignedToCase(BasePermission):
         if not request.user or not request.user.is_authenticated:
             return False
         
-        # Check if user is assigned to the case or escalated to
-        if hasattr(obj, 'assigned_to') and obj.assigned_to == request.user:
-            return True
-        if hasattr(obj, 'escalated_to') and obj.escalated_to == request.user:
-            return True
-        if hasattr(obj, 'created_by') and obj.created_by == request.user:
-            return True
-        
-        # Supervisors and above can access all cases
-        allowed_roles = ['supervisor', 'manager', 'admin']
-        return request.user.role in allowed_roles
+        from apps.cases.visibility import can_view_case
+        return can_view_case(request.user, getattr(obj, 'case', obj))
 
 
 class CanViewCaseDetails(BasePermission):
     """
     Permission for viewing detailed case information.
-    Combines multiple checks for case access.
+    
+    Object-level counterpart of the case visibility policy; list endpoints
+    apply the same policy as a queryset filter (apps.cases.visibility).
     """
     message = _('You are not authorized to view this case details.')
     
@@ -226,27 +220,8 @@ class CanViewCaseDetails(BasePermission):
         if not request.user or not request.user.is_authenticated:
             return False
         
-        # Case object
-        case = obj
-        if hasattr(obj, 'case'):
-            case = obj.case
-        
-        # Check assignment
-        if case.assigned_to == request.user:
-            return True
-        if case.escalated_to == request.user:
-            return True
-        if case.created_by == request.user:
-            return True
-        
-        # Check if user has role permissions
-        if request.user.role in ['supervisor', 'manager', 'admin']:
-            return True
-        
-        # Check if user is in the same team/department (if implemented)
-        # This could be extended based on organizational structure
-        
-        return False
+        from apps.cases.visibility import can_view_record
+        return can_view_record(request.user, obj)
 
 
 class CanModifyCase(BasePermission):
@@ -260,24 +235,14 @@ class CanModifyCase(BasePermission):
         if not request.user or not request.user.is_authenticated:
             return False
         
-        # Case object
-        case = obj
-        if hasattr(obj, 'case'):
-            case = obj.case
+        from apps.cases.visibility import can_modify_case, can_view_record
         
         # Read permissions
         if request.method in permissions.SAFE_METHODS:
-            return CanViewCaseDetails().has_object_permission(request, view, obj)
+            return can_view_record(request.user, obj)
         
         # Write permissions - must be assigned or have supervisor+ role
-        if case.assigned_to == request.user:
-            return True
-        if case.escalated_to == request.user:
-            return True
-        
-        # Supervisors and above can modify any case
-        allowed_roles = ['supervisor', 'manager', 'admin']
-        return request.user.role in allowed_roles
+        return can_modify_case(request.user, getattr(obj, 'case', obj))
 
 
 class TenantPermission(BasePermission):
@@ -1,3 +1,29 @@
+# apps/ivr/admin.py
 from django.contrib import admin
 
-# Register your models here.
+from .models import IVRMenu, IVRMenuOption, IVRPrompt
+
+
+class IVRMenuOptionInline(admin.TabularInline):
+    """Inline for menu options"""
+    model = IVRMenuOption
+    fk_name = 'menu'
+    extra = 0
+    fields = ('digit', 'action', 'target_menu', 'target', 'skill', 'prompt')
+
+
+@admin.register(IVRMenu)
+class IVRMenuAdmin(admin.ModelAdmin):
+    """Admin interface for IVR menus"""
+    list_display = ['name', 'is_entry', 'prompt', 'timeout_seconds', 'max_retries', 'is_active']
+    list_filter = ['is_entry', 'is_active']
+    search_fields = ['name', 'description']
+    inlines = [IVRMenuOptionInline]
+
+
+@admin.register(IVRPrompt)
+class IVRPromptAdmin(admin.ModelAdmin):
+    """Admin interface for IVR prompts"""
+    list_display = ['name', 'language', 'audio_file', 'is_active']
+    list_filter = ['language', 'is_active']
+    search_fields = ['name', 'audio_file', 'text']
@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.utils.translation import gettext_lazy as _
 
 
 class IvrConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.ivr'
+    verbose_name = _('IVR')
+
+    def ready(self):
+        """Import signal handlers when app is ready"""
+        try:
+            import apps.ivr.signals  # noqa F401
+        except ImportError:
+            pass
@@ -0,0 +1,248 @@
+# apps/ivr/asterisk/agi.py
+"""
+Async FastAGI adapter for the IVR engine.
+
+Asterisk hands a call to the IVR with ``AGI(agi://<host>:<port>/ivr/<schema>)``
+(see ``apps.ivr.asterisk.dialplan``). For each connection the server runs
+an ``IVRSession`` over the AGI protocol: prompts are streamed with the menu
+keys as escape digits, so callers can barge in, and the result is handed
+back to the dialplan in channel variables:
+
+- ``IVR_ACTION``: queue, dial, transfer, voicemail or hangup,
+- ``IVR_TARGET``: queue name, agent extension, extension or mailbox,
+- ``IVR_QUEUE``: for queue steps, the queue to fall back to if dialing
+  the routed agent fails,
+- ``IVR_AGENT``: for dial, the user ID of the agent claimed by routing,
+- ``IVR_PATH``: keys pressed, for reporting.
+
+A claimed agent is out of routing until released. The dialplan releases
+them through ``agi://<host>:<port>/ivr/<schema>/release`` (arguments: agent
+ID and ``DIALSTATUS``) as soon as the Dial returns, or from a hangup
+handler if the caller hangs up first.
+
+One asyncio worker serves many concurrent calls; the only database access
+is loading a tenant's graph and prompts when they are not cached.
+"""
+import asyncio
+import logging
+import re
+
+from asgiref.sync import sync_to_async
+from django_tenants.utils import schema_context
+
+from apps.ivr.services.menu import DIGITS, IVRSession, get_graph
+from apps.ivr.services.prompts import get_catalog
+from apps.ivr.services.queue import QueueHandoff
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_RE = re.compile(r'^(\d{3})(?: result=(-?\d+))?(?: \((.*)\))?')
+
+
+class AGIError(Exception):
+    """Asterisk rejected a command or the channel hung up."""
+
+
+class AGIChannel:
+    """One AGI conversation with Asterisk over a stream pair."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.environment = {}
+
+    async def read_environment(self):
+        """Read the ``agi_*`` variables Asterisk sends when the call arrives."""
+        while True:
+            line = (await self.reader.readline()).decode().rstrip('\n')
+            if not line:
+                break
+            key, _, value = line.partition(':')
+            self.environment[key.strip()] = value.strip()
+        return self.environment
+
+    async def command(self, *args):
+        """
+        Send one AGI command.
+
+        Returns:
+            tuple: (result code, data in parentheses or '')
+
+        Raises:
+            AGIError: On hangup or an error response
+        """
+        self.writer.write((' '.join(str(a) for a in args) + '\n').encode())
+        await self.writer.drain()
+        line = (await self.reader.readline()).decode().strip()
+        if not line or line.startswith('HANGUP'):
+            raise AGIError('Channel hung up')
+        match = RESPONSE_RE.match(line)
+        if not match or match.group(1) != '200':
+            raise AGIError(f"AGI command {args[0]} failed: {line}")
+        result = int(match.group(2) or 0)
+        if result == -1:
+            raise AGIError('Channel hung up')
+        return result, match.group(3) or ''
+
+    async def stream_file(self, audio, escape_digits=''):
+        """Play a sound; returns the key that interrupted it, or ''."""
+        result, _ = await self.command('STREAM FILE', audio, f'"{escape_digits}"')
+        return chr(result) if result else ''
+
+    async def wait_for_digit(self, timeout_ms):
+        """Wait for a key; returns it, or '' on timeout."""
+        result, _ = await self.command('WAIT FOR DIGIT', timeout_ms)
+        return chr(result) if result else ''
+
+    async def set_variable(self, name, value):
+        await self.command('SET VARIABLE', name, f'"{value}"')
+
+    def close(self):
+        self.writer.close()
+
+
+async def run_session(channel, session):
+    """
+    Drive one IVR session over an AGI channel until a terminal step.
+
+    Returns:
+        Step: The terminal step
+    """
+    step = session.start()
+    while not step.action:
+        digit = ''
+        for audio in step.prompts:
+            digit = await channel.stream_file(audio, DIGITS)
+            if digit:
+                break
+        if not digit:
+            digit = await channel.wait_for_digit(step.timeout * 1000)
+        step = session.press(digit) if digit else session.timeout()
+
+    for audio in step.prompts:
+        await channel.stream_file(audio)
+    return step
+
+
+def _load_tenant(schema):
+    with schema_context(schema):
+        return get_graph(schema), get_catalog(schema)
+
+
+def _release_agent(schema, agent_id):
+    from apps.accounts.routing import RoutingService
+
+    with schema_context(schema):
+        RoutingService.release_call(agent_id)
+
+
+class FastAGIServer:
+    """asyncio FastAGI server running the IVR for every connected channel."""
+
+    def __init__(self, host='0.0.0.0', port=4573, load_tenant=None, release_agent=None):
+        """
+        Args:
+            host: Address to listen on
+            port: Port to listen on (4573 is the FastAGI default)
+            load_tenant: Async callable(schema) -> (MenuGraph, PromptCatalog);
+                defaults to the cached graph and prompts of the tenant
+            release_agent: Async callable(schema, agent_id) returning a
+                claimed agent to routing; defaults to RoutingService.release_call
+        """
+        self.host = host
+        self.port = port
+        self.load_tenant = load_tenant or sync_to_async(_load_tenant)
+        self.release_agent = release_agent or sync_to_async(_release_agent)
+        self.active_sessions = 0
+        self.completed_sessions = 0
+        self.server = None
+
+    @staticmethod
+    def schema_from_request(environment):
+        # agi_network_script is the path of the agi:// URL, e.g. "ivr/acme"
+        script = environment.get('agi_network_script', '').strip('/')
+        parts = script.split('/')
+        return parts[1] if len(parts) > 1 and parts[0] == 'ivr' else None
+
+    @staticmethod
+    def is_release_request(environment):
+        script = environment.get('agi_network_script', '').strip('/')
+        return script.split('/')[2:3] == ['release']
+
+    async def handle(self, reader, writer):
+        channel = AGIChannel(reader, writer)
+        self.active_sessions += 1
+        claimed_agent = None
+        try:
+            environment = await channel.read_environment()
+            schema = self.schema_from_request(environment)
+            if not schema:
+                logger.warning(f"IVR request without a tenant: {environment.get('agi_request')}")
+                await channel.command('HANGUP')
+                return
+            if self.is_release_request(environment):
+                await self.handle_release(schema, environment)
+                return
+
+            graph, catalog = await self.load_tenant(schema)
+            language = environment.get('agi_language') or None
+            session = IVRSession(graph, catalog, language)
+            step = await run_session(channel, session)
+
+            if step.action == 'queue' and step.skill:
+                destination = await sync_to_async(self._handoff)(schema, step, language)
+            else:
+                destination = {'action': step.action, 'target': step.target}
+            claimed_agent = destination.get('agent_id')
+            await channel.set_variable('IVR_ACTION', destination['action'])
+            await channel.set_variable('IVR_TARGET', destination['target'])
+            if step.action == 'queue':
+                await channel.set_variable('IVR_QUEUE', step.target)
+            if claimed_agent:
+                await channel.set_variable('IVR_AGENT', claimed_agent)
+            await channel.set_variable('IVR_PATH', ','.join(d or 't' for d in session.path))
+            # From here the dialplan releases the agent
+            claimed_agent = None
+            self.completed_sessions += 1
+        except (AGIError, ConnectionError) as e:
+            logger.debug(f"IVR session ended early: {str(e)}")
+        except Exception as e:
+            logger.error(f"IVR session failed: {str(e)}")
+        finally:
+            if claimed_agent:
+                # The caller left before the dial was handed to the dialplan
+                await self._release(schema, claimed_agent)
+            self.active_sessions -= 1
+            channel.close()
+
+    async def handle_release(self, schema, environment):
+        """Return the agent of a finished or failed dial to routing."""
+        agent_id = environment.get('agi_arg_1', '')
+        if not agent_id.isdigit():
+            return
+        logger.debug(
+            f"Releasing agent {agent_id} of {schema} (dial status "
+            f"{environment.get('agi_arg_2') or 'unknown'})"
+        )
+        await self._release(schema, int(agent_id))
+
+    async def _release(self, schema, agent_id):
+        try:
+            await self.release_agent(schema, agent_id)
+        except Exception as e:
+            # The claim lapses after AGENT_ROUTING['CALL_CLAIM_SECONDS']
+            logger.error(f"Failed to release agent {agent_id} of {schema}: {str(e)}")
+
+    @staticmethod
+    def _handoff(schema, step, language):
+        with schema_context(schema):
+            return QueueHandoff.resolve(step, language)
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        return self.server
+
+    async def serve_forever(self):
+        server = self.server or await self.start()
+        async with server:
+            await server.serve_forever()
@@ -0,0 +1,55 @@
+# apps/ivr/asterisk/dialplan.py
+from django.conf import settings
+
+CONTEXT_TEMPLATE = """[{context}]
+; Generated by apps.ivr.asterisk.dialplan for tenant {schema}
+exten => s,1,Answer()
+ same => n,AGI(agi://{host}:{port}/ivr/{schema})
+ same => n,Set(CDR(userfield)=ivr:${{IVR_PATH}})
+ same => n,GotoIf($["${{IVR_ACTION}}" = "queue"]?queue)
+ same => n,GotoIf($["${{IVR_ACTION}}" = "dial"]?dial)
+ same => n,GotoIf($["${{IVR_ACTION}}" = "transfer"]?transfer)
+ same => n,GotoIf($["${{IVR_ACTION}}" = "voicemail"]?voicemail)
+ same => n,Hangup()
+ same => n(queue),Queue(${{IVR_TARGET}})
+ same => n,Hangup()
+ same => n(dial),Set(CHANNEL(hangup_handler_push)={context},release,1)
+ same => n,Dial({technology}/${{IVR_TARGET}},30)
+ same => n,Set(CHANNEL(hangup_handler_pop)=)
+ same => n,Gosub(release,1)
+ same => n,GotoIf($["${{IVR_QUEUE}}" = ""]?hangup)
+ same => n,Queue(${{IVR_QUEUE}})
+ same => n,Hangup()
+ same => n(transfer),Dial({technology}/${{IVR_TARGET}},30)
+ same => n,Hangup()
+ same => n(voicemail),VoiceMail(${{IVR_TARGET}},u)
+ same => n(hangup),Hangup()
+
+; Return the routed agent to the queues once their dial is over
+exten => release,1,AGI(agi://{host}:{port}/ivr/{schema}/release,${{IVR_AGENT}},${{DIALSTATUS}})
+ same => n,Return()
+"""
+
+
+def render_ivr_context(schema, context=None, host=None, port=None, technology='PJSIP'):
+    """
+    Dialplan context that sends a tenant's callers through the IVR.
+
+    Args:
+        schema: Tenant schema name
+        context: Context name (defaults to ``ivr-<schema>``)
+        host: FastAGI host (defaults to IVR['AGI_PUBLIC_HOST'])
+        port: FastAGI port (defaults to IVR['AGI_PORT'])
+        technology: Channel technology used to dial agents and extensions
+
+    Returns:
+        str: extensions.conf snippet
+    """
+    ivr_settings = getattr(settings, 'IVR', {})
+    return CONTEXT_TEMPLATE.format(
+        context=context or f'ivr-{schema}',
+        schema=schema,
+        host=host or ivr_settings.get('AGI_PUBLIC_HOST', '127.0.0.1'),
+        port=port or ivr_settings.get('AGI_PORT', 4573),
+        technology=technology,
+    )
@@ -0,0 +1,145 @@
+# apps/ivr/management/commands/benchmark_ivr.py
+import asyncio
+import random
+import statistics
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand
+
+from apps.ivr.asterisk.agi import FastAGIServer, _load_tenant
+from apps.ivr.services.menu import compile_menus
+from apps.ivr.services.prompts import PromptCatalog
+
+# A small three-level tree used when no tenant schema is given
+SAMPLE_MENUS = [
+    {'id': 1, 'name': 'Main', 'is_entry': True, 'prompt': 'main', 'invalid_prompt': 'invalid',
+     'timeout_prompt': 'timeout', 'timeout_seconds': 5, 'max_retries': 2, 'options': [
+         {'digit': '1', 'action': 'menu', 'target_menu': 2},
+         {'digit': '2', 'action': 'queue', 'target': 'general'},
+         {'digit': '3', 'action': 'repeat'},
+         {'digit': '9', 'action': 'hangup', 'prompt': 'goodbye'},
+         {'digit': 'i', 'action': 'queue', 'target': 'general'},
+     ]},
+    {'id': 2, 'name': 'Support', 'prompt': 'support', 'invalid_prompt': 'invalid',
+     'timeout_seconds': 5, 'max_retries': 2, 'options': [
+         {'digit': '1', 'action': 'queue', 'target': 'support'},
+         {'digit': '2', 'action': 'menu', 'target_menu': 3},
+         {'digit': '*', 'action': 'back'},
+     ]},
+    {'id': 3, 'name': 'Other', 'prompt': 'other', 'timeout_seconds': 5, 'max_retries': 2, 'options': [
+        {'digit': '1', 'action': 'transfer', 'target': '1000'},
+        {'digit': '2', 'action': 'voicemail', 'target': '2000'},
+        {'digit': '*', 'action': 'back'},
+    ]},
+]
+
+CALLER_KEYS = '1112223*9#'
+
+
+class Command(BaseCommand):
+    help = 'Measure how many concurrent IVR sessions one FastAGI worker sustains, using simulated callers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=2000, help='Total calls to simulate')
+        parser.add_argument('--concurrency', type=int, default=500, help='Calls in progress at once')
+        parser.add_argument('--prompt-ms', type=int, default=50, help='Simulated playback time per prompt')
+        parser.add_argument('--timeout-rate', type=float, default=0.1, help='Share of menus the caller ignores')
+        parser.add_argument('--schema', help='Use this tenant\'s menus instead of the sample tree')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        results = asyncio.run(self._run(options))
+
+        latencies = sorted(results['latencies'])
+        self.stdout.write(f"Sessions completed:      {results['completed']}/{options['sessions']}")
+        self.stdout.write(f"Elapsed:                 {results['elapsed']:.2f}s")
+        self.stdout.write(f"Sessions/sec:            {results['completed'] / results['elapsed']:.1f}")
+        self.stdout.write(f"Peak concurrent:         {results['peak']}")
+        if latencies:
+            self.stdout.write(f"Keypress latency p50:    {statistics.median(latencies) * 1000:.2f}ms")
+            self.stdout.write(f"Keypress latency p99:    {latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f}ms")
+        self.stdout.write(self.style.SUCCESS(
+            f"{results['peak']} concurrent sessions sustained by one worker "
+            f"(callers simulated in the same process, so this is a lower bound)"
+        ))
+
+    async def _run(self, options):
+        schema = options['schema']
+        if schema:
+            loaded = await sync_to_async(_load_tenant)(schema)
+        else:
+            loaded = (compile_menus(SAMPLE_MENUS), PromptCatalog([]))
+
+        async def load_tenant(schema):
+            return loaded
+
+        server = FastAGIServer('127.0.0.1', 0, load_tenant=load_tenant)
+        await server.start()
+        port = server.server.sockets[0].getsockname()[1]
+
+        latencies = []
+        peak = 0
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        async def caller(number):
+            async with semaphore:
+                await self._call(port, schema or 'benchmark', number, options, latencies)
+
+        async def sample():
+            nonlocal peak
+            while True:
+                peak = max(peak, server.active_sessions)
+                await asyncio.sleep(0.01)
+
+        sampler = asyncio.create_task(sample())
+        started = time.perf_counter()
+        await asyncio.gather(*(caller(n) for n in range(options['sessions'])))
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+        server.server.close()
+        await server.server.wait_closed()
+
+        return {
+            'completed': server.completed_sessions,
+            'elapsed': elapsed,
+            'peak': peak,
+            'latencies': latencies,
+        }
+
+    async def _call(self, port, schema, number, options, latencies):
+        """Play the Asterisk side of one call, answering AGI commands like a caller."""
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write((
+            f"agi_network_script: ivr/{schema}\n"
+            f"agi_channel: PJSIP/sim-{number}\n"
+            "agi_language: en\n\n"
+        ).encode())
+        await writer.drain()
+
+        replied_at = None
+        while True:
+            line = (await reader.readline()).decode()
+            if not line:
+                break
+            if replied_at is not None:
+                latencies.append(time.perf_counter() - replied_at)
+
+            if line.startswith('STREAM FILE'):
+                await asyncio.sleep(options['prompt_ms'] / 1000)
+                # Callers who know the menu press a key during the prompt
+                barge_in = '""' not in line and random.random() < 0.3
+                result = ord(random.choice(CALLER_KEYS)) if barge_in else 0
+                reply = f"200 result={result} endpos=8000"
+            elif line.startswith('WAIT FOR DIGIT'):
+                await asyncio.sleep(options['prompt_ms'] / 1000)
+                ignore = random.random() < options['timeout_rate']
+                reply = f"200 result={0 if ignore else ord(random.choice(CALLER_KEYS))}"
+            else:
+                reply = "200 result=1"
+            writer.write((reply + '\n').encode())
+            await writer.drain()
+            replied_at = time.perf_counter()
+
+        writer.close()
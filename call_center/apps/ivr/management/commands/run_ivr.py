@@ -0,0 +1,26 @@
+# apps/ivr/management/commands/run_ivr.py
+import asyncio
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.ivr.asterisk.agi import FastAGIServer
+
+
+class Command(BaseCommand):
+    help = 'Run the FastAGI server that drives IVR menus for Asterisk'
+
+    def add_arguments(self, parser):
+        ivr_settings = getattr(settings, 'IVR', {})
+        parser.add_argument('--host', default=ivr_settings.get('AGI_HOST', '0.0.0.0'))
+        parser.add_argument('--port', type=int, default=ivr_settings.get('AGI_PORT', 4573))
+
+    def handle(self, *args, **options):
+        server = FastAGIServer(options['host'], options['port'])
+        self.stdout.write(self.style.SUCCESS(
+            f"IVR FastAGI server listening on {options['host']}:{options['port']}"
+        ))
+        try:
+            asyncio.run(server.serve_forever())
+        except KeyboardInterrupt:
+            pass
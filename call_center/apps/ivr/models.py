@@ -1,3 +1,185 @@
+# apps/ivr/models.py
 from django.db import models
+from django.utils.translation import gettext_lazy as _
+from django.core.exceptions import ValidationError
+from apps.core.models import TimeStampedModel, SoftDeleteModel
 
-# Create your models here.
+
+class IVRPrompt(SoftDeleteModel):
+    """
+    A named recording played by IVR menus, optionally per language.
+    """
+
+    name = models.SlugField(
+        max_length=100,
+        verbose_name=_("Name"),
+        help_text=_("Name menus refer to this prompt by")
+    )
+    language = models.ForeignKey(
+        'core.Language',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='ivr_prompts',
+        verbose_name=_("Language"),
+        help_text=_("Leave empty for the default recording")
+    )
+    audio_file = models.CharField(
+        max_length=255,
+        verbose_name=_("Audio File"),
+        help_text=_("Asterisk sound path without extension, e.g. custom/main-menu")
+    )
+    text = models.TextField(
+        blank=True,
+        verbose_name=_("Text"),
+        help_text=_("Transcript of the recording")
+    )
+
+    class Meta:
+        verbose_name = _("IVR Prompt")
+        verbose_name_plural = _("IVR Prompts")
+        ordering = ['name']
+        unique_together = [['name', 'language']]
+
+    def __str__(self):
+        return f"{self.name} ({self.language.code if self.language else 'default'})"
+
+
+class IVRMenu(SoftDeleteModel):
+    """
+    One level of the IVR: a prompt and the actions its keys lead to.
+    """
+
+    name = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name=_("Name")
+    )
+    description = models.TextField(
+        blank=True,
+        verbose_name=_("Description")
+    )
+    is_entry = models.BooleanField(
+        default=False,
+        verbose_name=_("Is Entry Menu"),
+        help_text=_("Callers start at the entry menu")
+    )
+    prompt = models.SlugField(
+        max_length=100,
+        verbose_name=_("Prompt"),
+        help_text=_("IVR prompt listing the options")
+    )
+    invalid_prompt = models.SlugField(
+        max_length=100,
+        blank=True,
+        verbose_name=_("Invalid Prompt"),
+        help_text=_("Played when the caller presses an unassigned key")
+    )
+    timeout_prompt = models.SlugField(
+        max_length=100,
+        blank=True,
+        verbose_name=_("Timeout Prompt"),
+        help_text=_("Played when the caller presses nothing")
+    )
+    timeout_seconds = models.PositiveSmallIntegerField(
+        default=5,
+        verbose_name=_("Timeout (seconds)")
+    )
+    max_retries = models.PositiveSmallIntegerField(
+        default=3,
+        verbose_name=_("Max Retries"),
+        help_text=_("Invalid or missing input allowed before the 'i'/'t' option (or hangup)")
+    )
+
+    class Meta:
+        verbose_name = _("IVR Menu")
+        verbose_name_plural = _("IVR Menus")
+        ordering = ['name']
+        indexes = [
+            models.Index(fields=['is_entry', 'is_active']),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class IVRMenuOption(TimeStampedModel):
+    """
+    What a key (or the invalid/timeout event) does in a menu.
+    """
+
+    DIGIT_CHOICES = [
+        *[(str(d), str(d)) for d in range(10)],
+        ('*', '*'),
+        ('#', '#'),
+        ('i', _('Invalid input')),
+        ('t', _('Timeout')),
+    ]
+
+    ACTION_CHOICES = [
+        ('menu', _('Go to Menu')),
+        ('back', _('Previous Menu')),
+        ('repeat', _('Repeat Menu')),
+        ('queue', _('Send to Queue')),
+        ('transfer', _('Transfer to Extension')),
+        ('voicemail', _('Voicemail')),
+        ('hangup', _('Hang Up')),
+    ]
+
+    menu = models.ForeignKey(
+        IVRMenu,
+        on_delete=models.CASCADE,
+        related_name='options',
+        verbose_name=_("Menu")
+    )
+    digit = models.CharField(
+        max_length=1,
+        choices=DIGIT_CHOICES,
+        verbose_name=_("Digit")
+    )
+    action = models.CharField(
+        max_length=20,
+        choices=ACTION_CHOICES,
+        verbose_name=_("Action")
+    )
+    target_menu = models.ForeignKey(
+        IVRMenu,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='entry_options',
+        verbose_name=_("Target Menu")
+    )
+    target = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name=_("Target"),
+        help_text=_("Queue name, extension or mailbox")
+    )
+    skill = models.CharField(
+        max_length=50,
+        blank=True,
+        verbose_name=_("Routing Skill"),
+        help_text=_("For queues: route to an available agent with this skill first")
+    )
+    prompt = models.SlugField(
+        max_length=100,
+        blank=True,
+        verbose_name=_("Prompt"),
+        help_text=_("Played before the action")
+    )
+
+    class Meta:
+        verbose_name = _("IVR Menu Option")
+        verbose_name_plural = _("IVR Menu Options")
+        ordering = ['menu', 'digit']
+        unique_together = [['menu', 'digit']]
+
+    def __str__(self):
+        return f"{self.menu.name} [{self.digit}] -> {self.get_action_display()}"
+
+    def clean(self):
+        if self.action == 'menu' and not self.target_menu:
+            raise ValidationError(_("A target menu is required"))
+        if self.action in ['queue', 'transfer', 'voicemail'] and not self.target:
+            raise ValidationError(_("A target is required"))
@@ -0,0 +1,46 @@
+# apps/ivr/services/cache.py
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+
+def _schema():
+    return getattr(connection, 'schema_name', 'public')
+
+
+class TenantCache:
+    """
+    Per-tenant, in-process cache of one value built from the database.
+
+    Values are rebuilt after IVR['CACHE_SECONDS'], or at once when
+    ``invalidate`` is called (from model signals in this process).
+    """
+
+    def __init__(self, build):
+        """
+        Args:
+            build: Callable returning the value for the current schema
+        """
+        self._build = build
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, schema=None):
+        schema = schema or _schema()
+        cached = self._values.get(schema)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        with self._lock:
+            cached = self._values.get(schema)
+            if cached and cached[0] > time.monotonic():
+                return cached[1]
+            value = self._build()
+            timeout = getattr(settings, 'IVR', {}).get('CACHE_SECONDS', 300)
+            self._values[schema] = (time.monotonic() + timeout, value)
+            return value
+
+    def invalidate(self, schema=None):
+        self._values.pop(schema or _schema(), None)
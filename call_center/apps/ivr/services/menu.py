@@ -0,0 +1,234 @@
+# apps/ivr/services/menu.py
+"""
+IVR menu engine.
+
+A tenant's menus are compiled into an immutable ``MenuGraph`` (one query
+for menus and options), cached in the process and shared by every call.
+An ``IVRSession`` walks the graph for one caller: each keypress or timeout
+is a dict lookup that returns the next ``Step``, so navigation never touches
+the database. A session keeps the graph it started with, so recompiling
+menus mid-call cannot leave a caller on a node that no longer exists.
+
+Each menu may define the special keys ``i`` (invalid input) and ``t``
+(timeout), as in Asterisk dialplans; they are followed once the caller
+has used up the menu's retries, and the call hangs up if they are absent.
+"""
+import logging
+from types import MappingProxyType
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+
+from .cache import TenantCache
+from .prompts import get_catalog
+
+logger = logging.getLogger(__name__)
+
+DIGITS = '0123456789*#'
+TERMINAL_ACTIONS = ('queue', 'transfer', 'voicemail', 'hangup')
+
+
+class Option(NamedTuple):
+    action: str
+    target_menu: Optional[int] = None
+    target: str = ''
+    skill: str = ''
+    prompt: str = ''
+
+
+class Menu(NamedTuple):
+    id: int
+    name: str
+    prompt: str
+    invalid_prompt: str
+    timeout_prompt: str
+    timeout: int
+    max_retries: int
+    # digit -> Option
+    options: MappingProxyType
+
+
+class MenuGraph(NamedTuple):
+    entry: Optional[int]
+    # menu ID -> Menu
+    menus: MappingProxyType
+
+    def __len__(self):
+        return len(self.menus)
+
+
+class Step(NamedTuple):
+    """What the channel does next."""
+    # Audio references to play, in order
+    prompts: tuple
+    # Wait up to `timeout` seconds for a key after the prompts
+    collect: bool
+    timeout: int = 0
+    # For terminal steps: one of TERMINAL_ACTIONS and its target
+    action: str = ''
+    target: str = ''
+    skill: str = ''
+
+
+def compile_menus(definitions):
+    """
+    Compile menu definitions into a graph.
+
+    Options pointing at unknown menus, or missing a required target, are
+    dropped with a warning rather than failing the whole graph.
+
+    Args:
+        definitions: Iterable of dicts with the IVRMenu fields (``id``,
+            ``name``, ``is_entry``, ``prompt``, ``invalid_prompt``,
+            ``timeout_prompt``, ``timeout_seconds``, ``max_retries``) and
+            ``options``, a list of dicts with the IVRMenuOption fields
+
+    Returns:
+        MenuGraph
+    """
+    definitions = list(definitions)
+    known = {definition['id'] for definition in definitions}
+    entry = None
+    menus = {}
+    for definition in definitions:
+        options = {}
+        for option in definition.get('options', []):
+            action = option['action']
+            target_menu = option.get('target_menu')
+            if action == 'menu' and target_menu not in known:
+                logger.warning(f"IVR menu {definition['name']} option {option['digit']} has no valid target menu")
+                continue
+            if action in ('queue', 'transfer', 'voicemail') and not option.get('target'):
+                logger.warning(f"IVR menu {definition['name']} option {option['digit']} has no target")
+                continue
+            options[option['digit']] = Option(
+                action=action,
+                target_menu=target_menu if action == 'menu' else None,
+                target=option.get('target') or '',
+                skill=option.get('skill') or '',
+                prompt=option.get('prompt') or '',
+            )
+        menus[definition['id']] = Menu(
+            id=definition['id'],
+            name=definition['name'],
+            prompt=definition['prompt'],
+            invalid_prompt=definition.get('invalid_prompt') or '',
+            timeout_prompt=definition.get('timeout_prompt') or '',
+            timeout=definition.get('timeout_seconds') or 5,
+            max_retries=definition.get('max_retries', 3),
+            options=MappingProxyType(options),
+        )
+        if entry is None and definition.get('is_entry'):
+            entry = definition['id']
+
+    if entry is None and definitions:
+        entry = definitions[0]['id']
+    return MenuGraph(entry=entry, menus=MappingProxyType(menus))
+
+
+def _load_graph():
+    from apps.ivr.models import IVRMenu, IVRMenuOption
+
+    definitions = {
+        menu['id']: {**menu, 'options': []}
+        for menu in IVRMenu.objects.filter(is_active=True).order_by('-is_entry', 'name').values(
+            'id', 'name', 'is_entry', 'prompt', 'invalid_prompt', 'timeout_prompt',
+            'timeout_seconds', 'max_retries',
+        )
+    }
+    for option in IVRMenuOption.objects.filter(menu__is_active=True).values(
+        'menu_id', 'digit', 'action', 'target_menu', 'target', 'skill', 'prompt'
+    ):
+        definitions[option['menu_id']]['options'].append(option)
+    return compile_menus(definitions.values())
+
+
+graph_cache = TenantCache(_load_graph)
+
+
+def get_graph(schema=None):
+    """The current tenant's compiled menu graph."""
+    return graph_cache.get(schema)
+
+
+class IVRSession:
+    """One caller's walk through a menu graph."""
+
+    def __init__(self, graph, catalog=None, language=None):
+        """
+        Args:
+            graph: MenuGraph to navigate
+            catalog: PromptCatalog resolving prompt names (defaults to the tenant's)
+            language: Caller's language code for prompt selection
+        """
+        self.graph = graph
+        self.catalog = catalog if catalog is not None else get_catalog()
+        self.language = language
+        self.menu = None
+        self.history = []
+        self.retries = 0
+        self.transitions = 0
+        # Keys pressed, '' for timeouts; stored on the call for reporting
+        self.path = []
+        self.max_transitions = getattr(settings, 'IVR', {}).get('MAX_TRANSITIONS', 50)
+
+    def _audio(self, *names):
+        return tuple(audio for audio in (self.catalog.resolve(n, self.language) for n in names) if audio)
+
+    def _enter(self, menu_id, *before):
+        self.menu = self.graph.menus[menu_id]
+        self.retries = 0
+        return Step(self._audio(*before, self.menu.prompt), True, self.menu.timeout)
+
+    def _finish(self, action, option=None, *before):
+        self.menu = None
+        return Step(
+            self._audio(*before), False,
+            action=action,
+            target=option.target if option else '',
+            skill=option.skill if option else '',
+        )
+
+    def start(self):
+        """Step for a new caller: the entry menu, or hang up if there are no menus."""
+        self.transitions += 1
+        if self.graph.entry is None:
+            return self._finish('hangup')
+        return self._enter(self.graph.entry)
+
+    def press(self, digit):
+        """Step after the caller pressed `digit`."""
+        self.path.append(digit)
+        option = self.menu.options.get(digit) if digit in DIGITS else None
+        if option is None:
+            return self._retry('i', self.menu.invalid_prompt)
+        return self._follow(option)
+
+    def timeout(self):
+        """Step after the caller pressed nothing."""
+        self.path.append('')
+        return self._retry('t', self.menu.timeout_prompt)
+
+    def _retry(self, special_key, prompt):
+        self.retries += 1
+        if self.retries <= self.menu.max_retries:
+            return Step(self._audio(prompt, self.menu.prompt), True, self.menu.timeout)
+        option = self.menu.options.get(special_key)
+        if option is None:
+            return self._finish('hangup')
+        return self._follow(option)
+
+    def _follow(self, option):
+        self.transitions += 1
+        if self.transitions > self.max_transitions:
+            logger.warning(f"IVR session exceeded {self.max_transitions} transitions, hanging up")
+            return self._finish('hangup')
+
+        if option.action == 'menu':
+            self.history.append(self.menu.id)
+            return self._enter(option.target_menu, option.prompt)
+        if option.action == 'back':
+            return self._enter(self.history.pop() if self.history else self.menu.id, option.prompt)
+        if option.action == 'repeat':
+            return self._enter(self.menu.id, option.prompt)
+        return self._finish(option.action, option, option.prompt)
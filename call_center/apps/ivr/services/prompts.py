@@ -0,0 +1,64 @@
+# apps/ivr/services/prompts.py
+"""
+Prompt audio lookup for IVR sessions.
+
+A tenant's prompts are loaded in one query into a ``PromptCatalog`` that
+is cached in the process, so resolving a prompt during a call is a dict
+lookup. Names without a recording resolve to themselves, which lets menus
+use Asterisk's built-in sounds (e.g. ``vm-goodbye``) directly.
+"""
+from types import MappingProxyType
+
+from .cache import TenantCache
+
+
+class PromptCatalog:
+    """Maps prompt names to audio references, per language."""
+
+    def __init__(self, prompts):
+        """
+        Args:
+            prompts: Iterable of ``(name, language code or None, audio file)``
+        """
+        recordings = {}
+        for name, language, audio_file in prompts:
+            recordings[(name, (language or '').lower())] = audio_file
+        self._recordings = MappingProxyType(recordings)
+
+    def resolve(self, name, language=None):
+        """
+        Audio reference for a prompt.
+
+        Args:
+            name: Prompt name
+            language: Caller's language code; falls back to the default recording
+
+        Returns:
+            str: Asterisk sound path, or '' for an empty name
+        """
+        if not name:
+            return ''
+        if language:
+            audio = self._recordings.get((name, language.lower()))
+            if audio:
+                return audio
+        return self._recordings.get((name, ''), name)
+
+    def __len__(self):
+        return len(self._recordings)
+
+
+def _load_catalog():
+    from apps.ivr.models import IVRPrompt
+
+    return PromptCatalog(
+        IVRPrompt.objects.filter(is_active=True).values_list('name', 'language__code', 'audio_file')
+    )
+
+
+catalog_cache = TenantCache(_load_catalog)
+
+
+def get_catalog(schema=None):
+    """The current tenant's prompt catalog."""
+    return catalog_cache.get(schema)
@@ -0,0 +1,53 @@
+# apps/ivr/services/queue.py
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class QueueHandoff:
+    """Turns the terminal step of an IVR session into a dialplan destination"""
+
+    @staticmethod
+    def resolve(step, language=None):
+        """
+        Decide where the channel goes when the IVR ends.
+
+        Queue steps with a routing skill first try to claim an available
+        agent with that skill (see ``apps.accounts.routing``) and dial them
+        directly; otherwise the caller joins the Asterisk queue. The claimed
+        agent is released by the dialplan once the dial is over (see
+        ``apps.ivr.asterisk.agi``).
+
+        Args:
+            step: Terminal Step of an IVRSession
+            language: Caller's language code
+
+        Returns:
+            dict: ``action`` ('queue', 'dial', 'transfer', 'voicemail' or
+            'hangup'), ``target`` and, for 'dial', ``agent_id``
+        """
+        if step.action == 'queue' and step.skill:
+            agent = QueueHandoff._claim_agent(step.skill, language)
+            if agent:
+                return {'action': 'dial', 'target': agent[1], 'agent_id': agent[0]}
+        return {'action': step.action, 'target': step.target}
+
+    @staticmethod
+    def _claim_agent(skill, language):
+        from apps.accounts.models import User
+        from apps.accounts.routing import RoutingService
+
+        try:
+            user_id = RoutingService.route_call(skill, [language] if language else None)
+        except Exception as e:
+            logger.warning(f"Skills routing unavailable for IVR handoff: {str(e)}")
+            return None
+        if not user_id:
+            return None
+
+        extension = User.objects.filter(id=user_id).values_list('extension', flat=True).first()
+        if not extension:
+            # Claimed but undialable; put the agent back for the next caller
+            RoutingService.release_call(user_id)
+            return None
+        return user_id, extension
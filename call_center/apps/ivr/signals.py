@@ -0,0 +1,23 @@
+# apps/ivr/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import IVRMenu, IVRMenuOption, IVRPrompt
+from .services.menu import graph_cache
+from .services.prompts import catalog_cache
+
+
+@receiver(post_save, sender=IVRMenu)
+@receiver(post_delete, sender=IVRMenu)
+@receiver(post_save, sender=IVRMenuOption)
+@receiver(post_delete, sender=IVRMenuOption)
+def menu_changed(sender, instance, **kwargs):
+    """Recompile the tenant's menu graph on next use"""
+    graph_cache.invalidate()
+
+
+@receiver(post_save, sender=IVRPrompt)
+@receiver(post_delete, sender=IVRPrompt)
+def prompt_changed(sender, instance, **kwargs):
+    """Reload the tenant's prompt catalog on next use"""
+    catalog_cache.invalidate()
@@ -1,3 +1,82 @@
-from django.test import TestCase
+import asyncio
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from .asterisk.agi import FastAGIServer
+from .asterisk.dialplan import render_ivr_context
+from .services.menu import compile_menus
+from .services.prompts import PromptCatalog
+
+GRAPH = compile_menus([{
+    'id': 1, 'name': 'Main', 'is_entry': True, 'prompt': 'welcome',
+    'options': [{'digit': '1', 'action': 'queue', 'target': 'support', 'skill': 'gbv'}],
+}])
+
+
+def fake_asterisk(environment, *responses):
+    """Reader replaying an AGI environment and command responses, and a writer."""
+    reader = asyncio.StreamReader()
+    lines = [f'{key}: {value}' for key, value in environment.items()]
+    reader.feed_data(('\n'.join(lines) + '\n\n').encode())
+    for response in responses:
+        reader.feed_data(f'{response}\n'.encode())
+    reader.feed_eof()
+    writer = mock.Mock(drain=mock.AsyncMock())
+    return reader, writer
+
+
+class AgentReleaseTests(SimpleTestCase):
+    """Agents claimed for an IVR dial go back to routing when the dial is over."""
+
+    def setUp(self):
+        self.release_agent = mock.AsyncMock()
+
+        async def load_tenant(schema):
+            return GRAPH, PromptCatalog([])
+
+        self.server = FastAGIServer(load_tenant=load_tenant, release_agent=self.release_agent)
+        patcher = mock.patch.object(
+            FastAGIServer, '_handoff',
+            return_value={'action': 'dial', 'target': '1001', 'agent_id': 7},
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_release_request_releases_agent(self):
+        reader, writer = fake_asterisk({
+            'agi_network_script': 'ivr/acme/release', 'agi_arg_1': '7', 'agi_arg_2': 'NOANSWER',
+        })
+        await self.server.handle(reader, writer)
+        self.release_agent.assert_awaited_once_with('acme', 7)
+
+    async def test_release_request_without_agent_is_ignored(self):
+        reader, writer = fake_asterisk({'agi_network_script': 'ivr/acme/release', 'agi_arg_1': ''})
+        await self.server.handle(reader, writer)
+        self.release_agent.assert_not_awaited()
+
+    async def test_handed_over_dial_is_left_to_dialplan(self):
+        # Caller presses 1, then every SET VARIABLE succeeds
+        reader, writer = fake_asterisk(
+            {'agi_network_script': 'ivr/acme'}, '200 result=49', *['200 result=1'] * 5,
+        )
+        await self.server.handle(reader, writer)
+        self.assertEqual(self.server.completed_sessions, 1)
+        self.release_agent.assert_not_awaited()
+
+    async def test_caller_hanging_up_before_handover_releases_agent(self):
+        reader, writer = fake_asterisk({'agi_network_script': 'ivr/acme'}, '200 result=49', 'HANGUP')
+        await self.server.handle(reader, writer)
+        self.assertEqual(self.server.completed_sessions, 0)
+        self.release_agent.assert_awaited_once_with('acme', 7)
+
+
+class DialplanTests(SimpleTestCase):
+    def test_dial_releases_agent_after_dial_and_on_hangup(self):
+        dialplan = render_ivr_context('acme', host='agi.local', port=4573)
+        self.assertIn('Set(CHANNEL(hangup_handler_push)=ivr-acme,release,1)', dialplan)
+        self.assertIn('Set(CHANNEL(hangup_handler_pop)=)', dialplan)
+        self.assertIn(
+            'exten => release,1,AGI(agi://agi.local:4573/ivr/acme/release,${IVR_AGENT},${DIALSTATUS})',
+            dialplan,
+        )
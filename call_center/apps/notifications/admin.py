@@ -14,7 +14,7 @@ class NotificationAdmin(admin.ModelAdmin):
         'notification_type', 'priority', 'is_read', 'email_sent', 'created_at'
     ]
     search_fields = ['title', 'message', 'recipient__username', 'sender__username']
-    readonly_fields = ['created_at', 'updated_at', 'read_at', 'email_sent_at']
+    readonly_fields = ['created_at', 'updated_at', 'read_at', 'email_sent_at', 'sms_sent_at']
     ordering = ['-created_at']
     
     fieldsets = (
@@ -29,7 +29,7 @@ class NotificationAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
         (_('Status'), {
-            'fields': ('is_read', 'read_at', 'email_sent', 'email_sent_at')
+            'fields': ('is_read', 'read_at', 'email_sent', 'email_sent_at', 'sms_sent', 'sms_sent_at')
         }),
         (_('Additional Data'), {
             'fields': ('data', 'expires_at'),
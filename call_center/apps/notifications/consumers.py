@@ -0,0 +1,101 @@
+# apps/notifications/consumers.py
+from urllib.parse import parse_qs
+
+from channels.auth import AuthMiddlewareStack
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django_tenants.utils import get_tenant_domain_model, schema_context
+
+from . import realtime
+
+
+@database_sync_to_async
+def _get_schema_for_host(host):
+    domain = get_tenant_domain_model().objects.select_related('tenant').filter(domain=host).first()
+    return domain.tenant.schema_name if domain else None
+
+
+@database_sync_to_async
+def _get_token_user(key):
+    from rest_framework.authtoken.models import Token
+
+    token = Token.objects.select_related('user').filter(key=key).first()
+    if token is None or not token.user.is_active:
+        return AnonymousUser()
+    return token.user
+
+
+class TenantTokenAuthMiddleware(BaseMiddleware):
+    """
+    Resolve the tenant schema from the Host header (as TenantMainMiddleware
+    does for HTTP) and authenticate ``?token=<api token>`` connections;
+    browser sessions are handled by the wrapped AuthMiddlewareStack.
+    """
+
+    async def __call__(self, scope, receive, send):
+        headers = dict(scope.get('headers', []))
+        host = headers.get(b'host', b'').decode().split(':')[0]
+        scope['schema_name'] = await _get_schema_for_host(host)
+
+        token = parse_qs(scope.get('query_string', b'').decode()).get('token')
+        if token:
+            scope['user'] = await _get_token_user(token[0])
+        return await super().__call__(scope, receive, send)
+
+
+def NotificationAuthStack(inner):
+    return AuthMiddlewareStack(TenantTokenAuthMiddleware(inner))
+
+
+class NotificationConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Pushes notifications, case assignments, unread counts and queue events
+    to an agent console. See ``apps.notifications.realtime``.
+    """
+
+    async def connect(self):
+        self.user = self.scope.get('user')
+        self.schema = self.scope.get('schema_name')
+        if not self.schema or self.user is None or not self.user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        self.groups_joined = {
+            realtime.user_group(self.user.id, self.schema),
+            realtime.tenant_group(self.schema),
+        }
+        for group in self.groups_joined:
+            await self.channel_layer.group_add(group, self.channel_name)
+        await self.accept()
+        await self.send_json({
+            'event': 'unread_count',
+            'payload': {'count': await self._unread_count()},
+        })
+
+    async def disconnect(self, code):
+        for group in getattr(self, 'groups_joined', ()):
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        action = content.get('action')
+        queue = content.get('queue')
+        if action == 'subscribe_queue' and queue:
+            group = realtime.queue_group(queue, self.schema)
+            self.groups_joined.add(group)
+            await self.channel_layer.group_add(group, self.channel_name)
+        elif action == 'unsubscribe_queue' and queue:
+            group = realtime.queue_group(queue, self.schema)
+            self.groups_joined.discard(group)
+            await self.channel_layer.group_discard(group, self.channel_name)
+        elif action == 'ping':
+            await self.send_json({'event': 'pong', 'payload': {}})
+
+    async def push_event(self, event):
+        await self.send_json({'event': event['event'], 'payload': event['payload']})
+
+    @database_sync_to_async
+    def _unread_count(self):
+        with schema_context(self.schema):
+            return realtime.get_unread_count(self.user.id)
@@ -94,6 +94,20 @@ class Notification(TimeStampedModel):
         blank=True,
         verbose_name=_("Email Sent At")
     )
+    email_digest_pending = models.BooleanField(
+        default=False,
+        verbose_name=_("Pending Digest Email"),
+        help_text=_("Will be emailed in the recipient's next digest")
+    )
+    sms_sent = models.BooleanField(
+        default=False,
+        verbose_name=_("SMS Sent")
+    )
+    sms_sent_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_("SMS Sent At")
+    )
     
     # Additional data
     data = models.JSONField(
@@ -120,6 +134,7 @@ class Notification(TimeStampedModel):
             models.Index(fields=['notification_type', '-created_at']),
             models.Index(fields=['priority', '-created_at']),
             models.Index(fields=['expires_at']),
+            models.Index(fields=['email_digest_pending', 'recipient']),
         ]
     
     def __str__(self):
@@ -132,6 +147,9 @@ class Notification(TimeStampedModel):
             self.is_read = True
             self.read_at = timezone.now()
             self.save(update_fields=['is_read', 'read_at'])
+            
+            from .realtime import unread_changed
+            unread_changed(self.recipient_id)
 
 
 class NotificationTemplate(TimeStampedModel):
@@ -201,6 +219,26 @@ class NotificationPreference(TimeStampedModel):
         verbose_name=_("Email Digest"),
         help_text=_("Receive summary emails instead of individual notifications")
     )
+    email_daily_summary = models.BooleanField(
+        default=False,
+        verbose_name=_("Daily Summary Email")
+    )
+    daily_summary_sent_for = models.DateField(
+        null=True,
+        blank=True,
+        verbose_name=_("Daily Summary Sent For"),
+        help_text=_("Date of the last daily summary sent; lets an interrupted run resume")
+    )
+    digest_window_minutes = models.PositiveIntegerField(
+        default=60,
+        verbose_name=_("Digest Window (minutes)"),
+        help_text=_("How often digest emails are sent")
+    )
+    last_digest_sent_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_("Last Digest Sent At")
+    )
     
     # Browser preferences
     browser_enabled = models.BooleanField(
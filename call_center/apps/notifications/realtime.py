@@ -0,0 +1,146 @@
+# apps/notifications/realtime.py
+"""
+Real-time push to agent consoles over WebSockets (Django Channels).
+
+Every connected console joins three kinds of channel-layer groups, all
+scoped to the tenant schema so tenants never see each other's events:
+
+- ``user`` groups: notifications, case assignments and unread counters
+  for one agent,
+- the ``tenant`` group: broadcasts to every console of the tenant,
+- ``queue`` groups: call queue activity, joined on request by consoles
+  that show a queue (``{"action": "subscribe_queue", "queue": "..."}``).
+
+Unread notification counts live in the cache; they are initialised from
+the database once and then adjusted as notifications are created or read,
+so consoles no longer poll the notification list.
+"""
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+UNREAD_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _schema():
+    return getattr(connection, 'schema_name', 'public')
+
+
+def user_group(user_id, schema=None):
+    return f"notifications.{schema or _schema()}.user.{user_id}"
+
+
+def tenant_group(schema=None):
+    return f"notifications.{schema or _schema()}.tenant"
+
+
+def queue_group(queue, schema=None):
+    # Group names only allow ASCII alphanumerics, hyphens, underscores and periods
+    safe_queue = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in str(queue))
+    return f"notifications.{schema or _schema()}.queue.{safe_queue}"
+
+
+def _send(groups, event_type, payload):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    message = {'type': 'push.event', 'event': event_type, 'payload': payload}
+    send = async_to_sync(channel_layer.group_send)
+    for group in groups:
+        try:
+            send(group, message)
+        except Exception as e:
+            # Pushing is best effort; clients resync on reconnect
+            logger.warning(f"Failed to push {event_type} to {group}: {str(e)}")
+
+
+def push_after_commit(groups, event_type, payload):
+    """Push an event once the current transaction commits (immediately if none)."""
+    groups = list(groups)
+    transaction.on_commit(lambda: _send(groups, event_type, payload))
+
+
+def push_to_users(user_ids, event_type, payload):
+    schema = _schema()
+    push_after_commit([user_group(user_id, schema) for user_id in user_ids], event_type, payload)
+
+
+def push_to_tenant(event_type, payload):
+    push_after_commit([tenant_group()], event_type, payload)
+
+
+def push_to_queue(queue, event_type, payload):
+    push_after_commit([queue_group(queue)], event_type, payload)
+
+
+# ---------------------------------------------------------------------------
+# Unread counters
+# ---------------------------------------------------------------------------
+
+def _unread_key(user_id, schema=None):
+    return f"notifications:unread:{schema or _schema()}:{user_id}"
+
+
+def get_unread_count(user_id):
+    """Cached unread notification count, loaded from the database on a miss."""
+    key = _unread_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        from .models import Notification
+
+        count = Notification.objects.filter(recipient_id=user_id, is_read=False).count()
+        cache.add(key, count, UNREAD_CACHE_TIMEOUT)
+    return count
+
+
+def notifications_created(notifications):
+    """
+    Bump unread counters and push new notifications to their recipients.
+
+    Args:
+        notifications: Newly created Notification objects
+    """
+    schema = _schema()
+
+    def publish():
+        for notification in notifications:
+            key = _unread_key(notification.recipient_id, schema)
+            try:
+                count = cache.incr(key)
+            except ValueError:
+                # Not cached yet; the next read loads it from the database
+                count = None
+            _send([user_group(notification.recipient_id, schema)], 'notification', {
+                'id': notification.id,
+                'title': notification.title,
+                'message': notification.message,
+                'notification_type': notification.notification_type,
+                'priority': notification.priority,
+                'data': notification.data,
+                'created_at': notification.created_at.isoformat() if notification.created_at else None,
+                'unread_count': count,
+            })
+
+    transaction.on_commit(publish)
+
+
+def unread_changed(user_id, count=None):
+    """
+    Reset a user's cached counter after notifications were read and push it.
+
+    Args:
+        user_id: ID of the user
+        count: New unread count, if known
+    """
+    key = _unread_key(user_id)
+    if count is None:
+        cache.delete(key)
+        count = get_unread_count(user_id)
+    else:
+        cache.set(key, count, UNREAD_CACHE_TIMEOUT)
+    push_to_users([user_id], 'unread_count', {'count': count})
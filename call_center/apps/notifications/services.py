@@ -1,15 +1,29 @@
 # apps/notifications/services.py
-from django.db import transaction
+from django.db import connection, transaction
 from django.utils import timezone
 from django.contrib.contenttypes.models import ContentType
+from . import realtime
 from .models import Notification, NotificationPreference
-from .tasks import send_email_notification, send_sms_notification
+from .tasks import send_bulk_email_notifications, send_bulk_sms_notifications
+
+BULK_BATCH_SIZE = 500
+
+
+def _type_allows(preferences, notification_type, channel):
+    """
+    Per-type opt-outs from ``NotificationPreference.notification_types``,
+    e.g. ``{"case_assigned": {"email": false}}``.
+    """
+    setting = preferences.notification_types.get(notification_type, True)
+    if isinstance(setting, dict):
+        return setting.get(channel, True)
+    return bool(setting)
+
 
 class NotificationService:
     """Service for creating and sending notifications."""
     
     @staticmethod
-    @transaction.atomic
     def create_notification(user, title, message, notification_type, 
                            content_object=None, send_email=False, send_sms=False):
         """
@@ -27,52 +41,130 @@ class NotificationService:
         Returns:
             Notification: The created notification
         """
-        # Check user preferences
-        try:
-            preferences = NotificationPreference.objects.get(user=user)
-        except NotificationPreference.DoesNotExist:
-            # Create default preferences if none exists
-            preferences = NotificationPreference.objects.create(user=user)
+        return NotificationService.notify_users(
+            [user],
+            title=title,
+            message=message,
+            notification_type=notification_type,
+            content_object=content_object,
+            send_email=send_email,
+            send_sms=send_sms
+        )[0]
+    
+    @staticmethod
+    @transaction.atomic
+    def notify_users(recipients, title, message, notification_type='info',
+                     priority='normal', content_object=None, sender=None,
+                     data=None, send_email=False, send_sms=False):
+        """
+        Create the same notification for many users at once.
+        
+        Preferences are loaded in one query (defaults are created in bulk
+        for users without any), notifications are inserted with
+        ``bulk_create`` and deliveries are handed to one email task and one
+        SMS task for the whole recipient set, after commit. Users with
+        ``email_digest`` enabled get their emails from
+        ``send_notification_digests`` instead.
+        
+        Args:
+            recipients: Users or user IDs to notify
+            title: Notification title
+            message: Notification message
+            notification_type: Type of notification
+            priority: Priority level
+            content_object: Optional related object (case, call, etc.)
+            sender: Optional User sending the notification
+            data: Optional additional data stored on each notification
+            send_email: Whether to send email notifications
+            send_sms: Whether to send SMS notifications
+            
+        Returns:
+            list: The created notifications, in recipient order
+        """
+        user_ids = list(dict.fromkeys(
+            getattr(recipient, 'pk', recipient) for recipient in recipients
+        ))
+        if not user_ids:
+            return []
+        
+        preferences = NotificationService.get_preferences(user_ids)
         
-        # Create notification object
         content_type = None
         object_id = None
-        
-        if content_object:
+        if content_object is not None:
             content_type = ContentType.objects.get_for_model(content_object)
-            object_id = content_object.id
+            object_id = content_object.pk
         
-        notification = Notification.objects.create(
-            user=user,
-            title=title,
-            message=message,
-            notification_type=notification_type,
-            content_type=content_type,
-            object_id=object_id
+        wants_email = {
+            user_id for user_id, prefs in preferences.items()
+            if send_email and prefs.email_enabled and _type_allows(prefs, notification_type, 'email')
+        }
+        notifications = Notification.objects.bulk_create(
+            [
+                Notification(
+                    recipient_id=user_id,
+                    sender=sender,
+                    title=title,
+                    message=message,
+                    notification_type=notification_type,
+                    priority=priority,
+                    content_type=content_type,
+                    object_id=object_id,
+                    data=data or {},
+                    email_digest_pending=user_id in wants_email and preferences[user_id].email_digest
+                )
+                for user_id in user_ids
+            ],
+            batch_size=BULK_BATCH_SIZE
         )
         
-        # Check if email should be sent
-        should_send_email = send_email and preferences.email_enabled
-        if notification_type == 'case_update' and not preferences.email_case_updates:
-            should_send_email = False
-        elif notification_type == 'case_assignment' and not preferences.email_case_assignments:
-            should_send_email = False
-        # Add checks for other notification types
-        
-        # Check if SMS should be sent
-        should_send_sms = send_sms and preferences.sms_enabled
-        if notification_type == 'case_escalation' and not preferences.sms_case_escalations:
-            should_send_sms = False
-        # Add checks for other notification types
-        
-        # Send notifications asynchronously
-        if should_send_email:
-            send_email_notification.delay(notification.id)
-            
-        if should_send_sms:
-            send_sms_notification.delay(notification.id)
+        email_ids = []
+        sms_ids = []
+        for notification in notifications:
+            prefs = preferences[notification.recipient_id]
+            if notification.recipient_id in wants_email and not notification.email_digest_pending:
+                email_ids.append(notification.id)
+            if send_sms and prefs.sms_enabled and _type_allows(prefs, notification_type, 'sms') \
+                    and (priority == 'urgent' or not prefs.sms_urgent_only):
+                sms_ids.append(notification.id)
         
-        return notification
+        realtime.notifications_created(notifications)
+        
+        # Workers have no tenant of their own; send from this one
+        schema = getattr(connection, 'schema_name', None)
+        if email_ids:
+            transaction.on_commit(lambda: send_bulk_email_notifications.delay(email_ids, schema=schema))
+        if sms_ids:
+            transaction.on_commit(lambda: send_bulk_sms_notifications.delay(sms_ids, schema=schema))
+        
+        return notifications
+    
+    @staticmethod
+    def get_preferences(user_ids):
+        """
+        Get notification preferences for many users.
+        
+        Args:
+            user_ids: IDs of the users
+            
+        Returns:
+            dict: ``{user_id: NotificationPreference}``, with default
+            preferences created for users that had none
+        """
+        preferences = {
+            prefs.user_id: prefs
+            for prefs in NotificationPreference.objects.filter(user_id__in=user_ids)
+        }
+        missing = [
+            NotificationPreference(user_id=user_id)
+            for user_id in user_ids if user_id not in preferences
+        ]
+        if missing:
+            NotificationPreference.objects.bulk_create(
+                missing, batch_size=BULK_BATCH_SIZE, ignore_conflicts=True
+            )
+            preferences.update((prefs.user_id, prefs) for prefs in missing)
+        return preferences
     
     @staticmethod
     def notify_case_update(case, user, message=None):
@@ -153,10 +245,23 @@ class NotificationService:
             QuerySet: Unread notifications
         """
         return Notification.objects.filter(
-            user=user,
+            recipient=user,
             is_read=False
         ).select_related('content_type').order_by('-created_at')
     
+    @staticmethod
+    def get_unread_count(user):
+        """
+        Get the number of unread notifications for a user, from cache.
+        
+        Args:
+            user: The User
+            
+        Returns:
+            int: Unread notification count
+        """
+        return realtime.get_unread_count(user.id)
+    
     @staticmethod
     def mark_as_read(notification_id):
         """
@@ -184,11 +289,12 @@ class NotificationService:
             int: Number of notifications marked as read
         """
         count = Notification.objects.filter(
-            user=user,
+            recipient=user,
             is_read=False
         ).update(
             is_read=True,
             read_at=timezone.now()
         )
+        realtime.unread_changed(user.id, 0)
         
         return count
\ No newline at end of file
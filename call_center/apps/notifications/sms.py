@@ -0,0 +1,70 @@
+# apps/notifications/sms.py
+"""
+SMS delivery for notifications.
+
+The backend is chosen with ``NOTIFICATION_SMS_BACKEND`` (a dotted path), the
+way ``EMAIL_BACKEND`` chooses the email backend, and built with
+``NOTIFICATION_SMS_OPTIONS``. There is no default: until a provider backend
+is configured, SMS notifications stay unsent instead of being reported as
+delivered.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class BaseSMSBackend:
+    """
+    Interface for an SMS provider.
+
+    A backend instance is used for one task run, so it may keep a
+    connection open between messages.
+    """
+
+    def send(self, phone, message):
+        """
+        Send one SMS.
+
+        Raises:
+            Exception: If the provider did not accept the message
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class ConsoleSMSBackend(BaseSMSBackend):
+    """Logs messages instead of sending them (development only)."""
+
+    def send(self, phone, message):
+        logger.info(f"SMS to {phone}: {message}")
+
+
+class LocalMemorySMSBackend(BaseSMSBackend):
+    """Records messages in memory for tests, like Django's locmem email backend."""
+
+    outbox = []
+    _lock = threading.Lock()
+
+    def send(self, phone, message):
+        with self._lock:
+            self.outbox.append({'phone': phone, 'message': message})
+
+
+def get_sms_backend():
+    """
+    Build the configured SMS backend.
+
+    Raises:
+        ImproperlyConfigured: If ``NOTIFICATION_SMS_BACKEND`` is not set
+    """
+    path = getattr(settings, 'NOTIFICATION_SMS_BACKEND', '')
+    if not path:
+        raise ImproperlyConfigured("NOTIFICATION_SMS_BACKEND must name an SMS backend")
+    return import_string(path)(**getattr(settings, 'NOTIFICATION_SMS_OPTIONS', {}))
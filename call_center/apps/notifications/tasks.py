@@ -1,163 +1,473 @@
 # apps/notifications/tasks.py
+import logging
+from contextlib import nullcontext
+from datetime import timedelta
+
 from celery import shared_task
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import DurationField, ExpressionWrapper, F, Q
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
 from django.utils import timezone
 from django.conf import settings
+from django_tenants.utils import get_public_schema_name, get_tenant_model, schema_context
+
+from .sms import get_sms_backend
+
+logger = logging.getLogger(__name__)
 
 @shared_task
-def send_email_notification(notification_id):
+def send_email_notification(notification_id, schema=None):
     """
     Send email notification.
     
     Args:
         notification_id: ID of the notification to send
+        schema: Tenant schema of the notification
     """
     from .models import Notification
     
+    with _tenant(schema):
+        if not Notification.objects.filter(id=notification_id).exists():
+            return {'success': False, 'reason': 'notification_not_found'}
+        result = _send_emails([notification_id])
+    if result['sent']:
+        return {'success': True}
+    if result['skipped']:
+        return {'success': False, 'reason': 'no_email'}
+    return {'success': False, 'error': result['errors'][0] if result['errors'] else 'unknown'}
+
+@shared_task
+def send_bulk_email_notifications(notification_ids, batch_size=None, schema=None):
+    """
+    Send email notifications over a single pooled SMTP connection.
+    
+    Notifications are loaded (with recipients and related objects) in a
+    few queries, each notification type's template is loaded once, and
+    sent notifications are marked in one UPDATE per batch.
+    
+    Args:
+        notification_ids: IDs of the notifications to send
+        batch_size: Emails per batch (defaults to NOTIFICATION_EMAIL_BATCH_SIZE)
+        schema: Tenant schema of the notifications
+    """
+    with _tenant(schema):
+        return _send_emails(notification_ids, batch_size)
+
+def _send_emails(notification_ids, batch_size=None):
+    from .models import Notification
+    
+    batch_size = batch_size or getattr(settings, 'NOTIFICATION_EMAIL_BATCH_SIZE', 100)
+    notifications = list(
+        Notification.objects
+        .filter(id__in=notification_ids, email_sent=False)
+        .select_related('recipient', 'content_type')
+        .prefetch_related('content_object')
+    )
+    
+    result = {'sent': 0, 'skipped': 0, 'errors': []}
+    templates = {}
+    connection = get_connection()
     try:
-        notification = Notification.objects.select_related('user', 'content_type').get(id=notification_id)
-        user = notification.user
-        
-        # Skip if user has no email
-        if not user.email:
-            return {'success': False, 'reason': 'no_email'}
-        
-        # Determine template based on notification type
-        template_name = f"notifications/email/{notification.notification_type}.html"
-        
+        for start in range(0, len(notifications), batch_size):
+            sent_ids = []
+            for notification in notifications[start:start + batch_size]:
+                if not notification.recipient.email:
+                    result['skipped'] += 1
+                    continue
+                email = _build_notification_email(notification, templates, connection)
+                if _send_pooled(email, connection, notification.id, result):
+                    sent_ids.append(notification.id)
+            if sent_ids:
+                Notification.objects.filter(id__in=sent_ids).update(
+                    email_sent=True,
+                    email_sent_at=timezone.now()
+                )
+                result['sent'] += len(sent_ids)
+    finally:
+        connection.close()
+    
+    return result
+
+@shared_task
+def send_bulk_sms_notifications(notification_ids, schema=None):
+    """
+    Send SMS notifications through the configured SMS backend.
+    
+    A notification counts as sent (and is marked ``sms_sent``) only once
+    the backend accepted it; without a configured backend nothing is sent.
+    
+    Args:
+        notification_ids: IDs of the notifications to send
+        schema: Tenant schema of the notifications
+    """
+    with _tenant(schema):
+        return _send_sms(notification_ids)
+
+def _send_sms(notification_ids):
+    from .models import Notification
+    
+    result = {'sent': 0, 'skipped': 0, 'errors': []}
+    try:
+        backend = get_sms_backend()
+    except ImproperlyConfigured as e:
+        logger.warning(f"SMS notifications not sent: {str(e)}")
+        result['errors'].append(str(e))
+        return result
+    
+    notifications = Notification.objects.filter(
+        id__in=notification_ids, sms_sent=False
+    ).select_related('recipient')
+    try:
+        for notification in notifications:
+            phone = notification.recipient.phone
+            if not phone:
+                result['skipped'] += 1
+                continue
+            try:
+                backend.send(phone, notification.message)
+            except Exception as e:
+                logger.error(f"Failed to send SMS notification {notification.id}: {str(e)}")
+                result['errors'].append(str(e))
+                continue
+            # Mark each message as it goes out so a retry never resends it
+            Notification.objects.filter(id=notification.id).update(
+                sms_sent=True,
+                sms_sent_at=timezone.now()
+            )
+            result['sent'] += 1
+    finally:
+        backend.close()
+    
+    return result
+
+@shared_task
+def broadcast_notification(user_ids, title, message, notification_type='info',
+                           priority='normal', sender_id=None, data=None,
+                           send_email=False, send_sms=False, schema=None):
+    """
+    Notify many users in one task (e.g. a broadcast to all agents).
+    
+    Args:
+        user_ids: IDs of the users to notify
+        title: Notification title
+        message: Notification message
+        notification_type: Type of notification
+        priority: Priority level
+        sender_id: Optional ID of the sending user
+        data: Optional additional data
+        send_email: Whether to send email notifications
+        send_sms: Whether to send SMS notifications
+        schema: Tenant schema of the users
+    """
+    from .services import NotificationService
+    
+    with _tenant(schema):
+        notifications = NotificationService.notify_users(
+            user_ids,
+            title=title,
+            message=message,
+            notification_type=notification_type,
+            priority=priority,
+            sender=_get_user(sender_id) if sender_id else None,
+            data=data,
+            send_email=send_email,
+            send_sms=send_sms
+        )
+    return {'success': True, 'created': len(notifications)}
+
+@shared_task
+def send_notification_digests(schemas=None):
+    """
+    Email each digest user their pending notifications once their digest
+    window has elapsed, in every tenant. Meant to run every few minutes.
+    
+    Args:
+        schemas: Optional list of tenant schemas (defaults to all tenants)
+    
+    Returns:
+        dict: Digest summary per schema
+    """
+    summaries = {}
+    for schema in schemas if schemas is not None else _tenant_schemas():
         try:
-            # Get the related object if any
-            related_object = notification.content_object
-            
-            # Render email content
+            with schema_context(schema):
+                summaries[schema] = _send_digests()
+        except Exception as e:
+            logger.error(f"Failed to send notification digests for {schema}: {str(e)}")
+    return summaries
+
+def _send_digests():
+    from .models import Notification, NotificationPreference
+    
+    now = timezone.now()
+    window = ExpressionWrapper(
+        F('digest_window_minutes') * timedelta(minutes=1),
+        output_field=DurationField()
+    )
+    due_users = set(
+        NotificationPreference.objects
+        .filter(email_enabled=True, email_digest=True, user__is_active=True)
+        .annotate(due_at=F('last_digest_sent_at') + window)
+        .filter(Q(last_digest_sent_at__isnull=True) | Q(due_at__lte=now))
+        .values_list('user_id', flat=True)
+    )
+    if not due_users:
+        return {'success': True, 'digests': 0}
+    
+    pending = {}
+    for notification in (
+        Notification.objects
+        .filter(email_digest_pending=True, recipient_id__in=due_users)
+        .select_related('recipient')
+        .order_by('recipient_id', 'created_at')
+    ):
+        pending.setdefault(notification.recipient_id, []).append(notification)
+    
+    result = {'sent': 0, 'skipped': 0, 'errors': []}
+    delivered_users = []
+    connection = get_connection()
+    try:
+        for user_id, notifications in pending.items():
+            user = notifications[0].recipient
+            if not user.email:
+                result['skipped'] += 1
+                continue
             context = {
                 'user': user,
-                'notification': notification,
-                'related_object': related_object,
-                'site_url': settings.SITE_URL
+                'notifications': notifications,
+                'site_url': getattr(settings, 'SITE_URL', '')
             }
-            
-            html_message = render_to_string(template_name, context)
-            
-            # Send the email
-            send_mail(
-                subject=notification.title,
-                message=notification.message,  # Plain text version
+            email = EmailMultiAlternatives(
+                subject=f"You have {len(notifications)} new notification(s)",
+                body='\n\n'.join(f"{n.title}\n{n.message}" for n in notifications),
                 from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],
-                html_message=html_message
+                to=[user.email],
+                connection=connection
             )
-            
-            # Update notification status
-            notification.email_sent = True
-            notification.email_sent_at = timezone.now()
-            notification.save(update_fields=['email_sent', 'email_sent_at'])
-            
-            return {'success': True}
-            
-        except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Failed to send email notification {notification_id}: {str(e)}")
-            return {'success': False, 'error': str(e)}
-            
-    except Notification.DoesNotExist:
-        return {'success': False, 'reason': 'notification_not_found'}
+            html = _render_optional('notifications/email/digest.html', context, {})
+            if html:
+                email.attach_alternative(html, 'text/html')
+            if _send_pooled(email, connection, user_id, result):
+                delivered_users.append(user_id)
+                result['sent'] += 1
+    finally:
+        connection.close()
+    
+    if delivered_users:
+        Notification.objects.filter(
+            email_digest_pending=True,
+            recipient_id__in=delivered_users,
+            created_at__lte=now
+        ).update(email_digest_pending=False, email_sent=True, email_sent_at=now)
+    # Users with nothing pending start a new window too
+    NotificationPreference.objects.filter(
+        user_id__in=(due_users - set(pending)) | set(delivered_users)
+    ).update(last_digest_sent_at=now)
+    
+    return {'success': True, 'digests': result['sent'], 'errors': result['errors']}
 
 @shared_task
-def send_sms_notification(notification_id):
+def send_sms_notification(notification_id, schema=None):
     """
     Send SMS notification.
     
     Args:
         notification_id: ID of the notification to send
+        schema: Tenant schema of the notification
     """
     from .models import Notification
     
-    try:
-        notification = Notification.objects.select_related('user').get(id=notification_id)
-        user = notification.user
-        
-        # Skip if user has no phone
-        if not hasattr(user, 'contact') or not user.contact or not user.contact.phone:
-            return {'success': False, 'reason': 'no_phone'}
-        
-        phone = user.contact.phone
-        
-        # Here you would integrate with your SMS provider
-        # For example, using Twilio:
+    with _tenant(schema):
+        if not Notification.objects.filter(id=notification_id).exists():
+            return {'success': False, 'reason': 'notification_not_found'}
+        result = _send_sms([notification_id])
+    if result['sent']:
+        return {'success': True}
+    if result['skipped']:
+        return {'success': False, 'reason': 'no_phone'}
+    return {'success': False, 'error': result['errors'][0] if result['errors'] else 'already_sent'}
+
+@shared_task
+def send_daily_summary_emails(day=None, chunk_size=None, schemas=None):
+    """
+    Send daily summary emails to users who have opted in, in every tenant.
+    
+    Each tenant's eligible users are split into chunks that run in
+    parallel as ``send_daily_summary_chunk`` tasks. Users are marked once
+    their email is sent, so running this again for the same day (e.g.
+    after a crash) only picks up users who have not received it yet.
+    
+    Args:
+        day: ISO date to summarise (defaults to today)
+        chunk_size: Users per chunk (defaults to DAILY_SUMMARY_CHUNK_SIZE)
+        schemas: Optional list of tenant schemas (defaults to all tenants)
+    
+    Returns:
+        dict: Users and chunks queued per schema
+    """
+    day = day or timezone.localdate().isoformat()
+    chunk_size = chunk_size or getattr(settings, 'DAILY_SUMMARY_CHUNK_SIZE', 500)
+    
+    summaries = {}
+    for schema in schemas if schemas is not None else _tenant_schemas():
         try:
-            # Pseudo-code for SMS sending
-            # from twilio.rest import Client
-            # client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
-            # client.messages.create(
-            #     body=notification.message,
-            #     from_=settings.TWILIO_PHONE_NUMBER,
-            #     to=phone
-            # )
-            
-            # For now, just log that we would send SMS
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.info(f"Would send SMS to {phone}: {notification.message}")
-            
-            # Update notification status
-            notification.sms_sent = True
-            notification.sms_sent_at = timezone.now()
-            notification.save(update_fields=['sms_sent', 'sms_sent_at'])
-            
-            return {'success': True}
-            
+            with schema_context(schema):
+                summaries[schema] = _queue_daily_summaries(day, chunk_size, schema)
         except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Failed to send SMS notification {notification_id}: {str(e)}")
-            return {'success': False, 'error': str(e)}
-            
-    except Notification.DoesNotExist:
-        return {'success': False, 'reason': 'notification_not_found'}
+            logger.error(f"Failed to queue daily summaries for {schema}: {str(e)}")
+    return summaries
 
-@shared_task
-def send_daily_summary_emails():
+def _queue_daily_summaries(day, chunk_size, schema):
+    from celery import group
+    from apps.accounts.models import User
+    
+    user_ids = list(
+        User.objects.filter(
+            is_active=True,
+            notification_preferences__email_enabled=True,
+            notification_preferences__email_daily_summary=True
+        ).exclude(
+            notification_preferences__daily_summary_sent_for=day
+        ).order_by('id').values_list('id', flat=True)
+    )
+    chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+    if chunks:
+        group(send_daily_summary_chunk.s(chunk, day, schema=schema) for chunk in chunks).apply_async()
+    
+    return {'users': len(user_ids), 'chunks': len(chunks)}
+
+@shared_task(acks_late=True)
+def send_daily_summary_chunk(user_ids, day, batch_size=None, schema=None):
     """
-    Send daily summary emails to users who have opted in.
+    Compute and send daily summaries for a chunk of users.
+    
+    Summaries for the whole chunk come from ``ReportingService`` in two
+    grouped queries; emails go out over one SMTP connection, and each batch
+    of recipients is marked sent in one UPDATE.
+    
+    Args:
+        user_ids: IDs of the users in this chunk
+        day: ISO date to summarise
+        batch_size: Emails between progress updates
+        schema: Tenant schema the summaries are computed in
     """
+    with _tenant(schema):
+        return _send_daily_summaries(user_ids, day, batch_size)
+
+def _send_daily_summaries(user_ids, day, batch_size=None):
+    from datetime import date
     from apps.accounts.models import User
+    from apps.analytics.services import ReportingService
     from .models import NotificationPreference
     
-    # Get users who want daily summaries
-    users = User.objects.filter(
-        is_active=True,
-        notification_preferences__email_enabled=True,
-        notification_preferences__email_daily_summary=True
-    ).select_related('notification_preferences')
+    summary_date = date.fromisoformat(day)
+    batch_size = batch_size or getattr(settings, 'NOTIFICATION_EMAIL_BATCH_SIZE', 100)
+    
+    # Skip users already handled by an earlier, interrupted attempt
+    users = list(
+        User.objects.filter(id__in=user_ids)
+        .exclude(notification_preferences__daily_summary_sent_for=summary_date)
+        .order_by('id')
+    )
+    summaries = ReportingService.generate_daily_summaries([user.id for user in users], summary_date)
+    
+    result = {'sent': 0, 'skipped': 0, 'errors': []}
+    templates = {}
+    connection = get_connection()
+    try:
+        for start in range(0, len(users), batch_size):
+            done_ids = []
+            for user in users[start:start + batch_size]:
+                if not user.email:
+                    result['skipped'] += 1
+                    done_ids.append(user.id)
+                    continue
+                context = {
+                    'user': user,
+                    'summary': summaries[user.id],
+                    'date': day,
+                    'site_url': getattr(settings, 'SITE_URL', '')
+                }
+                email = EmailMultiAlternatives(
+                    subject=f"Daily Summary - {day}",
+                    body=f"Your daily summary for {day}",
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    to=[user.email],
+                    connection=connection
+                )
+                html_message = _render_optional('notifications/email/daily_summary.html', context, templates)
+                if html_message:
+                    email.attach_alternative(html_message, 'text/html')
+                if _send_pooled(email, connection, f"daily summary for user {user.id}", result):
+                    result['sent'] += 1
+                    done_ids.append(user.id)
+            if done_ids:
+                NotificationPreference.objects.filter(user_id__in=done_ids).update(
+                    daily_summary_sent_for=summary_date
+                )
+    finally:
+        connection.close()
+    
+    return result
+
+def _tenant_schemas():
+    return list(
+        get_tenant_model().objects.exclude(schema_name=get_public_schema_name())
+        .values_list('schema_name', flat=True)
+    )
+
+def _tenant(schema):
+    """Schema context for a task enqueued from a tenant (no-op without a schema)."""
+    return schema_context(schema) if schema else nullcontext()
+
+def _get_user(user_id):
+    from apps.accounts.models import User
     
-    for user in users:
+    return User.objects.filter(id=user_id).first()
+
+def _render_optional(template_name, context, templates):
+    """Render a template if it exists; ``templates`` caches lookups per run."""
+    if template_name not in templates:
         try:
-            # Generate user's daily summary
-            from apps.analytics.services import ReportingService # type: ignore
-            summary = ReportingService.generate_user_daily_summary(user)
-            
-            # Send summary email
-            context = {
-                'user': user,
-                'summary': summary,
-                'date': timezone.now().strftime('%Y-%m-%d'),
-                'site_url': settings.SITE_URL
-            }
-            
-            html_message = render_to_string('notifications/email/daily_summary.html', context)
-            
-            send_mail(
-                subject=f"Daily Summary - {timezone.now().strftime('%Y-%m-%d')}",
-                message=f"Your daily summary for {timezone.now().strftime('%Y-%m-%d')}",
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],
-                html_message=html_message
-            )
-            
-        except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Failed to send daily summary to user {user.id}: {str(e)}")
\ No newline at end of file
+            templates[template_name] = get_template(template_name)
+        except TemplateDoesNotExist:
+            templates[template_name] = None
+    template = templates[template_name]
+    return template.render(context) if template else None
+
+def _build_notification_email(notification, templates, connection):
+    context = {
+        'user': notification.recipient,
+        'notification': notification,
+        'related_object': notification.content_object,
+        'site_url': getattr(settings, 'SITE_URL', '')
+    }
+    email = EmailMultiAlternatives(
+        subject=notification.title,
+        body=notification.message,  # Plain text version
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[notification.recipient.email],
+        connection=connection
+    )
+    html_message = _render_optional(
+        f"notifications/email/{notification.notification_type}.html", context, templates
+    )
+    if html_message:
+        email.attach_alternative(html_message, 'text/html')
+    return email
+
+def _send_pooled(email, connection, reference, result):
+    """Send one email on the shared connection, reconnecting after a failure."""
+    try:
+        # Keep the SMTP session open across sends; open() is a no-op when it already is
+        connection.open()
+        connection.send_messages([email])
+        return True
+    except Exception as e:
+        logger.error(f"Failed to send email {reference}: {str(e)}")
+        result['errors'].append(str(e))
+        # The SMTP session may be unusable now; the next send reopens it
+        connection.close()
+        return False
@@ -1,3 +1,252 @@
-from django.test import TestCase
+import asyncio
+from contextlib import nullcontext
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.core import mail
+from django.test import TestCase, override_settings
+
+from apps.accounts.models import User
+from apps.analytics.services import ReportingService
+
+from . import consumers, realtime
+from .consumers import NotificationConsumer
+from .models import Notification, NotificationPreference
+from .sms import LocalMemorySMSBackend
+from .tasks import _queue_daily_summaries, _send_daily_summaries, send_bulk_sms_notifications
+
+
+class SMSNotificationTests(TestCase):
+    """SMS notifications count as sent only once a backend accepted them."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='jane', password='secret', phone='+254700000000')
+        cls.no_phone = User.objects.create_user(username='john', password='secret')
+
+    def setUp(self):
+        LocalMemorySMSBackend.outbox = []
+        self.notification = Notification.objects.create(
+            recipient=self.user, title='Case assigned', message='Case 42 is yours',
+            notification_type='case_assigned',
+        )
+
+    def test_sends_and_marks_once(self):
+        skipped = Notification.objects.create(
+            recipient=self.no_phone, title='Case assigned', message='Case 43 is yours',
+            notification_type='case_assigned',
+        )
+
+        result = send_bulk_sms_notifications([self.notification.id, skipped.id])
+        again = send_bulk_sms_notifications([self.notification.id])
+
+        self.assertEqual((result['sent'], result['skipped']), (1, 1))
+        self.assertEqual(again['sent'], 0)
+        self.assertEqual(LocalMemorySMSBackend.outbox, [
+            {'phone': '+254700000000', 'message': 'Case 42 is yours'},
+        ])
+        self.notification.refresh_from_db()
+        self.assertTrue(self.notification.sms_sent)
+        self.assertIsNotNone(self.notification.sms_sent_at)
+
+    @override_settings(NOTIFICATION_SMS_BACKEND='')
+    def test_nothing_is_marked_sent_without_a_backend(self):
+        result = send_bulk_sms_notifications([self.notification.id])
+
+        self.assertEqual(result['sent'], 0)
+        self.assertTrue(result['errors'])
+        self.notification.refresh_from_db()
+        self.assertFalse(self.notification.sms_sent)
+
+
+@mock.patch.object(
+    ReportingService, 'generate_daily_summaries',
+    side_effect=lambda user_ids, day: {user_id: {} for user_id in user_ids},
+)
+class DailySummaryTests(TestCase):
+    """Daily summaries fan out in chunks and reach each user once per day."""
+
+    DAY = '2026-03-02'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = []
+        for index in range(5):
+            user = User.objects.create_user(
+                username=f'agent{index}', password='secret', email=f'agent{index}@example.com',
+            )
+            NotificationPreference.objects.create(user=user, email_daily_summary=True)
+            cls.users.append(user)
+        opted_out = User.objects.create_user(username='quiet', password='secret', email='quiet@example.com')
+        NotificationPreference.objects.create(user=opted_out)
+
+    def queued_chunks(self):
+        with mock.patch('celery.group') as group:
+            summary = _queue_daily_summaries(self.DAY, 2, 'tenant_a')
+        chunks = [signature.args[0] for signature in group.call_args[0][0]] if group.called else []
+        return summary, chunks
+
+    def test_users_are_split_into_chunks(self, summaries):
+        summary, chunks = self.queued_chunks()
+
+        ids = [user.id for user in self.users]
+        self.assertEqual(summary, {'users': 5, 'chunks': 3})
+        self.assertEqual(chunks, [ids[0:2], ids[2:4], ids[4:5]])
+
+    def test_second_run_skips_users_already_sent(self, summaries):
+        ids = [user.id for user in self.users]
+        first = _send_daily_summaries(ids[:3], self.DAY)
+        self.assertEqual(first['sent'], 3)
+
+        # A rerun after a crash queues only the rest, and a duplicate chunk sends nothing
+        summary, chunks = self.queued_chunks()
+        again = _send_daily_summaries(ids[:3], self.DAY)
+
+        self.assertEqual(summary, {'users': 2, 'chunks': 1})
+        self.assertEqual(chunks, [ids[3:5]])
+        self.assertEqual(again['sent'], 0)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_next_day_is_sent_again(self, summaries):
+        _send_daily_summaries([self.users[0].id], self.DAY)
+
+        result = _send_daily_summaries([self.users[0].id], '2026-03-03')
+
+        self.assertEqual(result['sent'], 1)
+        self.assertEqual(len(mail.outbox), 2)
+
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def receive_or_none(channel_name, timeout=0.1):
+    async def receive():
+        try:
+            return await asyncio.wait_for(get_channel_layer().receive(channel_name), timeout)
+        except asyncio.TimeoutError:
+            return None
+    return async_to_sync(receive)()
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class RealtimePushTests(TestCase):
+    """Pushes reach the recipient's group only once the transaction commits."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='jane', password='secret')
+
+    def setUp(self):
+        layer = get_channel_layer()
+        self.channel_name = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(realtime.user_group(self.user.id), self.channel_name)
+
+    def test_push_waits_for_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            realtime.push_to_users([self.user.id], 'case_assigned', {'case': 42})
+            self.assertIsNone(receive_or_none(self.channel_name))
+
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(receive_or_none(self.channel_name), {
+            'type': 'push.event', 'event': 'case_assigned', 'payload': {'case': 42},
+        })
+
+    def test_created_notification_bumps_the_cached_counter(self):
+        self.assertEqual(realtime.get_unread_count(self.user.id), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            notification = Notification.objects.create(
+                recipient=self.user, title='Case assigned', message='Case 42 is yours',
+                notification_type='case_assigned',
+            )
+            realtime.notifications_created([notification])
+
+        pushed = receive_or_none(self.channel_name)
+        self.assertEqual(pushed['event'], 'notification')
+        self.assertEqual(pushed['payload']['id'], notification.id)
+        self.assertEqual(pushed['payload']['unread_count'], 1)
+        self.assertEqual(realtime.get_unread_count(self.user.id), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+@mock.patch.object(consumers, 'schema_context', lambda schema: nullcontext())
+class NotificationConsumerTests(TestCase):
+    """Consoles need a user and a tenant, and only join their own tenant's groups."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='jane', password='secret')
+
+    def communicator(self, user, schema='tenant_a'):
+        communicator = WebsocketCommunicator(NotificationConsumer.as_asgi(), '/ws/notifications/')
+        communicator.scope['user'] = user
+        communicator.scope['schema_name'] = schema
+        return communicator
+
+    async def push(self, group, payload):
+        await get_channel_layer().group_send(group, {
+            'type': 'push.event', 'event': 'test', 'payload': payload,
+        })
+
+    async def test_anonymous_connection_is_refused(self):
+        from django.contrib.auth.models import AnonymousUser
+
+        connected, code = await self.communicator(AnonymousUser()).connect()
+
+        self.assertFalse(connected)
+        self.assertEqual(code, 4401)
+
+    async def test_unknown_tenant_is_refused(self):
+        connected, code = await self.communicator(self.user, schema=None).connect()
+
+        self.assertFalse(connected)
+        self.assertEqual(code, 4401)
+
+    async def test_connection_gets_its_unread_count(self):
+        communicator = self.communicator(self.user)
+        connected, _ = await communicator.connect()
+
+        self.assertTrue(connected)
+        self.assertEqual(await communicator.receive_json_from(), {
+            'event': 'unread_count', 'payload': {'count': 0},
+        })
+        await communicator.disconnect()
+
+    async def test_user_and_tenant_groups_are_scoped_to_the_tenant(self):
+        communicator = self.communicator(self.user)
+        await communicator.connect()
+        await communicator.receive_json_from()
+
+        await self.push(realtime.user_group(self.user.id, 'tenant_b'), {'to': 'other tenant'})
+        await self.push(realtime.tenant_group('tenant_b'), {'to': 'other tenant'})
+        self.assertTrue(await communicator.receive_nothing())
+
+        await self.push(realtime.user_group(self.user.id, 'tenant_a'), {'to': 'user'})
+        await self.push(realtime.tenant_group('tenant_a'), {'to': 'tenant'})
+        self.assertEqual((await communicator.receive_json_from())['payload'], {'to': 'user'})
+        self.assertEqual((await communicator.receive_json_from())['payload'], {'to': 'tenant'})
+        await communicator.disconnect()
+
+    async def test_queue_subscription(self):
+        communicator = self.communicator(self.user)
+        await communicator.connect()
+        await communicator.receive_json_from()
+
+        await communicator.send_json_to({'action': 'subscribe_queue', 'queue': 'billing'})
+        await communicator.send_json_to({'action': 'ping'})
+        self.assertEqual(await communicator.receive_json_from(), {'event': 'pong', 'payload': {}})
+
+        await self.push(realtime.queue_group('billing', 'tenant_b'), {'queue': 'other tenant'})
+        await self.push(realtime.queue_group('billing', 'tenant_a'), {'queue': 'billing'})
+        self.assertEqual((await communicator.receive_json_from())['payload'], {'queue': 'billing'})
+
+        await communicator.send_json_to({'action': 'unsubscribe_queue', 'queue': 'billing'})
+        await communicator.send_json_to({'action': 'ping'})
+        await communicator.receive_json_from()
+        await self.push(realtime.queue_group('billing', 'tenant_a'), {'queue': 'billing'})
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
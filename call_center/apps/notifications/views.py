@@ -15,7 +15,7 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         """Return only the user's notifications."""
         return Notification.objects.filter(
-            user=self.request.user
+            recipient=self.request.user
         ).order_by('-created_at')
     
     @action(detail=False, methods=['get'])
@@ -31,6 +31,11 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = self.get_serializer(notifications, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        """Get the unread notification count (cached; pushed live over WebSocket)."""
+        return Response({'count': NotificationService.get_unread_count(request.user)})
+    
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
         """Mark a notification as read."""
@@ -55,6 +55,7 @@ SHARED_APPS = [
     'import_export',
     'phonenumber_field',
     'drf_yasg',
+    'channels',
     
     # Your shared apps (tenant management, core utilities)
     'apps.tenant.apps.TenantConfig',  # Tenant management
@@ -172,6 +173,25 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Call recordings go to their own storage so they can live in object
+# storage (e.g. a django-storages S3 backend) while media stays local
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+    'recordings': {
+        'BACKEND': os.environ.get(
+            'RECORDINGS_STORAGE_BACKEND', 'django.core.files.storage.FileSystemStorage'
+        ),
+        'OPTIONS': {
+            'location': os.environ.get('RECORDINGS_ROOT', str(BASE_DIR / 'recordings')),
+        },
+    },
+}
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -289,9 +309,101 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Channels (WebSocket push to agent consoles)
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels_redis.core.RedisChannelLayer',
+        'CONFIG': {
+            'hosts': [config('CHANNEL_LAYER_REDIS_URL', default='redis://127.0.0.1:6379/2')],
+        },
+    },
+}
+
+# Live wallboard (see apps.calls.wallboard, published by `manage.py run_wallboard`)
+WALLBOARD = {
+    'WINDOW_SECONDS': int(os.environ.get('WALLBOARD_WINDOW_SECONDS', 900)),
+    'PUBLISH_INTERVAL': 1.0,
+    'SLA_SECONDS': 20,
+}
+
+# IVR engine (see apps.ivr.services.menu); the FastAGI server is started
+# with `manage.py run_ivr`, and AGI_PUBLIC_HOST is how Asterisk reaches it
+IVR = {
+    'AGI_HOST': os.environ.get('IVR_AGI_HOST', '0.0.0.0'),
+    'AGI_PUBLIC_HOST': os.environ.get('IVR_AGI_PUBLIC_HOST', '127.0.0.1'),
+    'AGI_PORT': int(os.environ.get('IVR_AGI_PORT', 4573)),
+    'CACHE_SECONDS': 300,
+    'MAX_TRANSITIONS': 50,
+}
+
+# Call recording ingestion (see apps.calls.services.recording)
+CALL_RECORDINGS = {
+    'SPOOL_DIR': os.environ.get('RECORDINGS_SPOOL_DIR', '/var/spool/asterisk/monitor'),
+    'FILENAME_PATTERN': r'(?P<unique_id>\d+\.\d+)',
+    'MIN_AGE_SECONDS': 10,
+    'ORPHAN_SECONDS': 3600,
+    'BATCH_SIZE': 200,
+    'CHUNK_SIZE': 1024 * 1024,
+    'CODEC': 'libopus',
+    'BITRATE': '16k',
+    'FFMPEG': os.environ.get('FFMPEG_BINARY', 'ffmpeg'),
+    'TRANSCODE_WORKERS': int(os.environ.get('RECORDINGS_TRANSCODE_WORKERS', 2)),
+    'TRANSCODE_TIMEOUT': 600,
+    'VERIFY': True,
+}
+
+# Offline transcription of call recordings (see apps.ai.services.transcription_queue)
+TRANSCRIPTION = {
+    # Dotted path of the engine, e.g. 'apps.ai.services.transcription_engines.WhisperTranscriptionEngine'.
+    # Required: transcription fails rather than storing placeholder transcripts.
+    'ENGINE': os.environ.get('TRANSCRIPTION_ENGINE', ''),
+    # e.g. {'model': 'small', 'device': 'cpu'} for the Whisper engine
+    'ENGINE_OPTIONS': {},
+    'LANGUAGE': None,
+    'SEGMENT_SECONDS': 30,
+    'SEGMENT_WORKERS': int(os.environ.get('TRANSCRIPTION_SEGMENT_WORKERS', 2)),
+    'BATCH_SIZE': 50,
+    'ENQUEUE_LIMIT': 1000,
+    'MAX_ATTEMPTS': 3,
+    'RETRY_DELAY_SECONDS': 300,
+    'LEASE_SECONDS': 3600,
+    'FFMPEG': os.environ.get('FFMPEG_BINARY', 'ffmpeg'),
+}
+
 # Email configuration (configured in environment-specific settings)
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 
+# Notification emails sent per batch over one SMTP connection
+NOTIFICATION_EMAIL_BATCH_SIZE = int(os.environ.get('NOTIFICATION_EMAIL_BATCH_SIZE', 100))
+# Users per parallel daily summary task
+DAILY_SUMMARY_CHUNK_SIZE = int(os.environ.get('DAILY_SUMMARY_CHUNK_SIZE', 500))
+# SMS provider backend for notifications (see apps.notifications.sms); SMS
+# notifications are not sent until one is configured
+NOTIFICATION_SMS_BACKEND = os.environ.get('NOTIFICATION_SMS_BACKEND', '')
+NOTIFICATION_SMS_OPTIONS = {}
+
+# Outbound dialer (see apps.campaigns.services); ORIGINATOR is the dotted path
+# of a callable(campaign, contacts) that places the calls
+CAMPAIGN_DIALER = {
+    'ORIGINATOR': os.environ.get('CAMPAIGN_DIALER_ORIGINATOR', ''),
+    'LEASE_SECONDS': int(os.environ.get('CAMPAIGN_DIALER_LEASE_SECONDS', 120)),
+    # Lease held by answered calls; renewed as the call progresses
+    'MAX_CALL_SECONDS': int(os.environ.get('CAMPAIGN_DIALER_MAX_CALL_SECONDS', 4 * 60 * 60)),
+    'DEFAULT_ANSWER_RATE': 0.3,
+    'MAX_DIAL_RATIO': 3.0,
+}
+
+# Agent presence store and skills router (see apps.accounts.presence);
+# BACKEND is 'redis' (shared through the default cache's Redis) or 'local'
+AGENT_ROUTING = {
+    'BACKEND': os.environ.get('AGENT_ROUTING_BACKEND', 'redis'),
+    'AUTO_ASSIGN_CASES': os.environ.get('AGENT_ROUTING_AUTO_ASSIGN_CASES', 'False') == 'True',
+    'SCAN_DEPTH': 20,
+    'CASE_LIMITS': {'agent': 20, 'supervisor': 30, 'manager': 50, 'admin': 100},
+    # Longest an agent stays claimed for a call that is never released
+    'CALL_CLAIM_SECONDS': 4 * 60 * 60,
+}
+
 # AI settings
 AI_SETTINGS = {
     'default_provider': 'openai',
@@ -299,6 +411,12 @@ AI_SETTINGS = {
     'max_suggestions': 5,
     'cache_responses': True,
     'cache_timeout': 3600,  # 1 hour
+    # Narratives are truncated so rendered prompts stay within this budget
+    'max_prompt_tokens': int(os.environ.get('AI_MAX_PROMPT_TOKENS', 6000)),
+    # tiktoken encoding used for counting when installed (else ~4 chars per token)
+    'token_encoding': 'cl100k_base',
+    # Reference data categories rendered into prompts (changes invalidate them)
+    'prompt_reference_categories': ['case_category'],
 }
 
 # Asterisk Integration Settings
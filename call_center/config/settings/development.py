@@ -38,8 +38,19 @@ CACHES = {
     }
 }
 
+# Placeholder transcripts unless a real engine is configured
+TRANSCRIPTION = {
+    **TRANSCRIPTION,
+    'ENGINE': config(
+        'TRANSCRIPTION_ENGINE', default='apps.ai.services.transcription_engines.StubTranscriptionEngine'
+    ),
+}
+
 # Email backend for development
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+NOTIFICATION_SMS_BACKEND = config(
+    'NOTIFICATION_SMS_BACKEND', default='apps.notifications.sms.ConsoleSMSBackend'
+)
 
 # Additional debugging
 LOGGING['loggers']['django']['level'] = 'DEBUG'
@@ -35,8 +35,22 @@ MIGRATION_MODULES = DisableMigrations()
 CELERY_TASK_ALWAYS_EAGER = True
 CELERY_TASK_EAGER_PROPAGATES = True
 
+# Keep WebSocket push in-process for tests
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
+
+# Keep the agent presence store in-process for tests
+AGENT_ROUTING = {**AGENT_ROUTING, 'BACKEND': 'local'}
+
+# Describe audio instead of transcribing it
+TRANSCRIPTION = {**TRANSCRIPTION, 'ENGINE': 'apps.ai.services.transcription_engines.StubTranscriptionEngine'}
+
 # Use console email backend for tests
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+NOTIFICATION_SMS_BACKEND = 'apps.notifications.sms.LocalMemorySMSBackend'
 
 # Reduce password strength requirements for tests
 AUTH_PASSWORD_VALIDATORS = []
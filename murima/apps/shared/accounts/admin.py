@@ -407,11 +407,12 @@ class OTPTokenAdmin(admin.ModelAdmin):
     
     list_display = [
         'user_email', 'token_type', 'delivery_method', 'token_masked',
-        'is_used', 'expires_at', 'attempts', 'created_at'
+        'is_used', 'delivery_status', 'expires_at', 'attempts', 'created_at'
     ]
     
     list_filter = [
-        'token_type', 'delivery_method', 'is_used', 'expires_at', 'created_at'
+        'token_type', 'delivery_method', 'delivery_status', 'is_used',
+        'expires_at', 'created_at'
     ]
     
     search_fields = [
@@ -419,7 +420,9 @@ class OTPTokenAdmin(admin.ModelAdmin):
     ]
     
     readonly_fields = [
-        'token', 'created_at', 'used_at', 'ip_address', 'user_agent'
+        'token', 'created_at', 'used_at', 'ip_address', 'user_agent',
+        'delivery_status', 'delivered_via', 'delivered_at',
+        'delivery_attempts', 'delivery_error'
     ]
     
     raw_id_fields = ['user']
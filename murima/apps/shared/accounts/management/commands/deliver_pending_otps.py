@@ -0,0 +1,51 @@
+# apps/shared/accounts/management/commands/deliver_pending_otps.py
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.shared.accounts.models import OTPToken
+from apps.shared.accounts.otp_delivery import OTPDispatcher, claim_token, deliver_token
+
+
+class Command(BaseCommand):
+    help = (
+        'Deliver OTP tokens left queued (e.g. after a worker restart). '
+        'Tokens a worker has already claimed (status "sending") are left alone.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=30,
+            help='Only pick up tokens queued for at least this many seconds'
+        )
+        parser.add_argument(
+            '--retry-failed', action='store_true',
+            help='Also retry tokens whose delivery failed'
+        )
+
+    def handle(self, *args, **options):
+        statuses = ['queued', 'failed'] if options['retry_failed'] else ['queued']
+        cutoff = timezone.now() - timedelta(seconds=options['older_than'])
+        token_ids = OTPToken.objects.valid().filter(
+            delivery_status__in=statuses, created_at__lte=cutoff
+        ).values_list('pk', flat=True)
+
+        dispatcher = OTPDispatcher()
+        sent = failed = 0
+        try:
+            for token_id in token_ids.iterator():
+                # A queue worker may pick the token up meanwhile; only the claimant sends
+                otp_token = claim_token(token_id, statuses)
+                if otp_token is None:
+                    continue
+                if deliver_token(otp_token, dispatcher):
+                    sent += 1
+                else:
+                    failed += 1
+        finally:
+            dispatcher.close()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Delivered {sent} OTP(s), {failed} failed')
+        )
@@ -176,6 +176,9 @@ class TenantMembershipManager(BaseModelManager):
     
     def create_membership(self, user, tenant, role, invited_by=None, created_by=None):
         """Create a new tenant membership with proper audit trail."""
+        from apps.shared.tenants.usage import enforce_quota
+        
+        enforce_quota(tenant, 'users')
         membership = self.create(
             user=user,
             tenant=tenant,
@@ -218,8 +221,26 @@ class TenantRoleQuerySet(models.QuerySet):
         return self.filter(is_system_role=False)
     
     def with_permission(self, permission_key):
-        """Return roles that have a specific permission."""
-        return self.filter(permissions__has_key=permission_key)
+        """
+        Return roles that have a specific permission.
+        
+        Matches the exact key, any wildcard namespace covering it, and
+        full-access roles, mirroring PermissionSet semantics. Each key is
+        matched in flat, nested and mixed JSON form.
+        """
+        from .permissions import FULL_ACCESS_KEYS, WILDCARD_SUFFIX, json_forms
+        
+        candidates = set(FULL_ACCESS_KEYS) | {permission_key}
+        prefix, _, _ = permission_key.rpartition('.')
+        while prefix:
+            candidates.add(f'{prefix}{WILDCARD_SUFFIX}')
+            prefix, _, _ = prefix.rpartition('.')
+        
+        query = Q()
+        for key in candidates:
+            for form in json_forms(key):
+                query |= Q(permissions__contains=form)
+        return self.filter(query)
     
     def ordered(self):
         """Return roles ordered by sort_order and name."""
@@ -440,8 +461,7 @@ class OTPTokenManager(models.Manager):
             user_agent=user_agent
         )
         
-        # TODO: Send OTP via chosen delivery method
-        # This would integrate with email/SMS/WhatsApp services
+        # Delivery runs off the request path after commit
         self._send_otp(otp_token)
         
         return otp_token
@@ -579,142 +599,14 @@ class OTPTokenManager(models.Manager):
     
     def _send_otp(self, otp_token):
         """
-        Send OTP via the specified delivery method.
-        This is a placeholder for actual delivery service integration.
+        Queue the OTP for delivery once the token is committed.
+
+        Delivery (with retries and channel fallback) happens on background
+        workers; see ``otp_delivery``.
         """
-        # TODO: Implement actual OTP delivery
-        # This would integrate with:
-        # - Email service (SMTP, SendGrid, etc.)
-        # - SMS service (Twilio, Africa's Talking, etc.) 
-        # - WhatsApp Business API
-        
-        delivery_methods = {
-            'email': self._send_email_otp,
-            'sms': self._send_sms_otp,
-            'whatsapp': self._send_whatsapp_otp
-        }
-        
-        send_method = delivery_methods.get(otp_token.delivery_method)
-        if send_method:
-            try:
-                send_method(otp_token)
-            except Exception as e:
-                # Log the error but don't fail the OTP creation
-                # In production, you'd want proper logging here
-                print(f"Failed to send OTP via {otp_token.delivery_method}: {e}")
-    
-    def _send_email_otp(self, otp_token):
-        """Send OTP via email."""
-        from django.core.mail import send_mail
-        from django.conf import settings
-        
-        user = otp_token.user
-        
-        # Determine email subject based on token type
-        subject_map = {
-            'login': 'Your Login OTP Code',
-            'password_reset': 'Password Reset OTP Code',
-            'email_verification': 'Email Verification Code',
-            'account_unlock': 'Account Unlock Code'
-        }
-        
-        subject = subject_map.get(otp_token.token_type, 'Your OTP Code')
-        
-        # Create personalized message based on token type
-        user_name = user.get_full_name() or user.first_name or user.email.split('@')[0]
+        from .otp_delivery import enqueue_otp
         
-        if otp_token.token_type == 'login':
-            message = (
-                f"Hello {user_name},\n\n"
-                f"Your login verification code is: {otp_token.token}\n\n"
-                f"This code will expire in 10 minutes.\n"
-                f"If you didn't request this code, please ignore this email.\n\n"
-                f"Best regards,\n"
-                f"Murima Support Team"
-            )
-        elif otp_token.token_type == 'password_reset':
-            message = (
-                f"Hello {user_name},\n\n"
-                f"You requested to reset your password. Your verification code is: {otp_token.token}\n\n"
-                f"This code will expire in 15 minutes.\n"
-                f"If you didn't request a password reset, please ignore this email.\n\n"
-                f"Best regards,\n"
-                f"Murima Support Team"
-            )
-        elif otp_token.token_type == 'email_verification':
-            message = (
-                f"Hello {user_name},\n\n"
-                f"Welcome to Murima! Please verify your email address with this code: {otp_token.token}\n\n"
-                f"This code will expire in 30 minutes.\n"
-                f"If you didn't create an account, please ignore this email.\n\n"
-                f"Best regards,\n"
-                f"Murima Support Team"
-            )
-        elif otp_token.token_type == 'account_unlock':
-            message = (
-                f"Hello {user_name},\n\n"
-                f"Your account unlock verification code is: {otp_token.token}\n\n"
-                f"This code will expire in 10 minutes.\n"
-                f"If you didn't request account unlock, please contact support.\n\n"
-                f"Best regards,\n"
-                f"Murima Support Team"
-            )
-        else:
-            message = (
-                f"Hello {user_name},\n\n"
-                f"Your OTP code is: {otp_token.token}\n\n"
-                f"This code will expire soon.\n\n"
-                f"Best regards,\n"
-                f"Murima Support Team"
-            )
-        
-        try:
-            # Get sender email from settings, fallback to default
-            from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', 'support@bitz-itc.com')
-            
-            send_mail(
-                subject,
-                message,
-                from_email,
-                [otp_token.recipient],
-                fail_silently=False,
-            )
-            print(f"✅ OTP email sent to {otp_token.recipient}")
-            
-        except Exception as e:
-            print(f"❌ EMAIL ERROR: Failed to send OTP to {otp_token.recipient} - {e}")
-            # In production, you might want to log this error properly
-            # and potentially retry or use an alternative delivery method
-            raise
-    
-    def _send_sms_otp(self, otp_token):
-        """Send OTP via SMS."""
-        # Placeholder for SMS delivery (Twilio, Africa's Talking, etc.)
-        user = otp_token.user
-        user_name = user.get_full_name() or user.first_name or "User"
-        
-        message = f"Hello {user_name}, your Murima verification code is: {otp_token.token}. It expires in {self._get_expiry_minutes(otp_token)} minutes."
-        
-        print(f"📱 SMS OTP: Sending '{message}' to {otp_token.recipient}")
-        # TODO: Integrate with SMS service provider
-        # Example: send_sms(to=otp_token.recipient, message=message)
-    
-    def _send_whatsapp_otp(self, otp_token):
-        """Send OTP via WhatsApp."""
-        # Placeholder for WhatsApp Business API
-        user = otp_token.user
-        user_name = user.get_full_name() or user.first_name or "User"
-        
-        message = f"Hello {user_name}, your Murima verification code is: {otp_token.token}. It expires in {self._get_expiry_minutes(otp_token)} minutes."
-        
-        print(f"💬 WhatsApp OTP: Sending '{message}' to {otp_token.recipient}")
-        # TODO: Integrate with WhatsApp Business API
-        # Example: send_whatsapp_message(to=otp_token.recipient, message=message)
-    
-    def _get_expiry_minutes(self, otp_token):
-        """Calculate remaining minutes until OTP expires."""
-        remaining = otp_token.expires_at - timezone.now()
-        return max(1, int(remaining.total_seconds() / 60))
+        enqueue_otp(otp_token)
 
 class UserSessionQuerySet(models.QuerySet):
     """Custom queryset for UserSession model."""
@@ -758,7 +650,14 @@ class UserSessionManager(models.Manager):
         return self.get_queryset().for_user(user)
     
     def create_session(self, user, session_key, ip_address, user_agent=None):
-        """Create a new user session."""
+        """
+        Start a new user session.
+        
+        The session becomes active in the session store immediately; the
+        returned row is inserted after commit by the write-behind worker.
+        """
+        from .session_store import open_session
+        
         # Parse user agent for device info (simplified)
         device_type = 'unknown'
         browser = ''
@@ -783,7 +682,7 @@ class UserSessionManager(models.Manager):
             elif 'edge' in user_agent_lower:
                 browser = 'Edge'
         
-        session = self.create(
+        session = self.model(
             user=user,
             session_key=session_key,
             device_type=device_type,
@@ -792,10 +691,15 @@ class UserSessionManager(models.Manager):
             ip_address=ip_address
         )
         
-        return session
+        return open_session(session)
     
     def cleanup_inactive(self, inactive_days=30):
-        """Clean up inactive sessions older than specified days."""
+        """
+        Close session rows older than specified days.
+        
+        Active state expires on its own in the session store; this only
+        tidies the audit history and uses the last_activity index.
+        """
         cutoff_date = timezone.now() - timedelta(days=inactive_days)
         updated_count = self.filter(
             is_active=True,
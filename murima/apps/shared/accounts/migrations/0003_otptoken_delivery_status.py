@@ -0,0 +1,42 @@
+# Generated by Django 5.2.2 on 2026-10-19 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='otptoken',
+            name='delivery_status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('sent', 'Sent'), ('failed', 'Failed'), ('skipped', 'Skipped')], default='queued', help_text='Outcome of delivering this OTP to the user.', max_length=20, verbose_name='delivery status'),
+        ),
+        migrations.AddField(
+            model_name='otptoken',
+            name='delivered_via',
+            field=models.CharField(blank=True, help_text='Channel that delivered the OTP; differs from the delivery method after a fallback.', max_length=20, verbose_name='delivered via'),
+        ),
+        migrations.AddField(
+            model_name='otptoken',
+            name='delivered_at',
+            field=models.DateTimeField(blank=True, help_text='Date and time when the OTP was handed to the provider.', null=True, verbose_name='delivered at'),
+        ),
+        migrations.AddField(
+            model_name='otptoken',
+            name='delivery_attempts',
+            field=models.PositiveIntegerField(default=0, help_text='Number of provider calls made to deliver this OTP.', verbose_name='delivery attempts'),
+        ),
+        migrations.AddField(
+            model_name='otptoken',
+            name='delivery_error',
+            field=models.CharField(blank=True, help_text='Last provider error when delivery failed.', max_length=500, verbose_name='delivery error'),
+        ),
+        migrations.AddIndex(
+            model_name='otptoken',
+            index=models.Index(fields=['delivery_status', 'created_at'], name='accounts_ot_deliver_218b9e_idx'),
+        ),
+    ]
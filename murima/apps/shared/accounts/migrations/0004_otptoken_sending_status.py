@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-19 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_otptoken_delivery_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='otptoken',
+            name='delivery_status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed'), ('skipped', 'Skipped')], default='queued', help_text='Outcome of delivering this OTP to the user.', max_length=20, verbose_name='delivery status'),
+        ),
+    ]
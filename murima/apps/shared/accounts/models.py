@@ -9,7 +9,6 @@ but are not tenant-specific themselves.
 """
 
 import uuid
-from datetime import timedelta
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
 from django.db import models
@@ -124,18 +123,26 @@ class User(AbstractUser):
         return self.first_name or self.email.split('@')[0]
     
     def is_account_locked(self):
-        """Check if account is currently locked."""
+        """Check if account is currently locked (cache first, then the stored lock)."""
+        from .session_store import get_lock_expiry
+        
+        if get_lock_expiry(self.email):
+            return True
         if self.account_locked_until:
             return timezone.now() < self.account_locked_until
         return False
     
     def lock_account(self, duration_minutes=30):
-        """Lock the account for specified duration."""
-        self.account_locked_until = timezone.now() + timedelta(minutes=duration_minutes)
-        self.save(update_fields=['account_locked_until'])
+        """Lock the account for specified duration; the row is updated after commit."""
+        from .session_store import lock_email
+        
+        self.account_locked_until = lock_email(self.email, duration_minutes)
     
     def unlock_account(self):
         """Unlock the account and reset failed attempts."""
+        from .session_store import unlock_email
+        
+        unlock_email(self.email)
         self.account_locked_until = None
         self.failed_login_attempts = 0
         self.save(update_fields=['account_locked_until', 'failed_login_attempts'])
@@ -314,9 +321,15 @@ class TenantRole(BaseModel):
     def __str__(self):
         return f"{self.tenant.name} - {self.display_name}"
     
+    @property
+    def compiled_permissions(self):
+        """Permissions compiled into an immutable PermissionSet (wildcards resolved)."""
+        from .permissions import get_compiled_permissions
+        return get_compiled_permissions(self)
+    
     def has_permission(self, permission_key):
         """Check if this role has a specific permission."""
-        return self.permissions.get(permission_key, False)
+        return self.compiled_permissions.has(permission_key)
 
 
 class PlatformRole(BaseModel):
@@ -480,6 +493,47 @@ class OTPToken(TimestampedModel):
         blank=True,
         help_text=_('User agent string from the request.')
     )
+    
+    delivery_status = models.CharField(
+        _('delivery status'),
+        max_length=20,
+        choices=[
+            ('queued', _('Queued')),
+            ('sending', _('Sending')),
+            ('sent', _('Sent')),
+            ('failed', _('Failed')),
+            ('skipped', _('Skipped')),
+        ],
+        default='queued',
+        help_text=_('Outcome of delivering this OTP to the user.')
+    )
+    
+    delivered_via = models.CharField(
+        _('delivered via'),
+        max_length=20,
+        blank=True,
+        help_text=_('Channel that delivered the OTP; differs from the delivery method after a fallback.')
+    )
+    
+    delivered_at = models.DateTimeField(
+        _('delivered at'),
+        null=True,
+        blank=True,
+        help_text=_('Date and time when the OTP was handed to the provider.')
+    )
+    
+    delivery_attempts = models.PositiveIntegerField(
+        _('delivery attempts'),
+        default=0,
+        help_text=_('Number of provider calls made to deliver this OTP.')
+    )
+    
+    delivery_error = models.CharField(
+        _('delivery error'),
+        max_length=500,
+        blank=True,
+        help_text=_('Last provider error when delivery failed.')
+    )
 
     objects = OTPTokenManager()
     
@@ -491,6 +545,7 @@ class OTPToken(TimestampedModel):
             models.Index(fields=['user', 'token_type', 'is_used']),
             models.Index(fields=['token', 'expires_at']),
             models.Index(fields=['expires_at', 'is_used']),
+            models.Index(fields=['delivery_status', 'created_at']),
         ]
     
     def __str__(self):
@@ -606,10 +661,12 @@ class UserSession(TimestampedModel):
         return f"{self.user.email} - {self.device_type} - {self.ip_address}"
     
     def end_session(self):
-        """End this session."""
+        """End this session; the row is closed after commit."""
+        from .session_store import end_session
+        
         self.is_active = False
         self.ended_at = timezone.now()
-        self.save(update_fields=['is_active', 'ended_at'])
+        end_session(self.session_key)
 
 
 class UserInvitation(BaseModel):
@@ -714,14 +771,13 @@ class UserInvitation(BaseModel):
         if not self.is_valid():
             raise ValueError("Invitation is not valid for acceptance")
         
-        # Create tenant membership
-        membership = TenantMembership.objects.create(
+        # Create tenant membership (enforces the tenant's user quota)
+        membership = TenantMembership.objects.create_membership(
             user=user,
             tenant=self.tenant,
             role=self.role,
             invited_by=self.invited_by,
-            created_by=user,
-            updated_by=user
+            created_by=user
         )
         
         # Mark invitation as accepted
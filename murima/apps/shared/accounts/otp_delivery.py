@@ -0,0 +1,490 @@
+"""
+Accounts App OTP Delivery
+
+Delivers OTP codes off the request path. ``OTPTokenManager.create_otp``
+only enqueues the token; a small pool of background worker threads renders
+the message and hands it to a per-channel provider, so login latency no
+longer depends on SMTP or SMS gateway latency.
+
+Each channel (email, SMS, WhatsApp) is served by a pluggable provider class
+configured in ``OTP_DELIVERY_PROVIDERS``. Providers keep their connection
+open between deliveries. A failed delivery is retried with exponential
+backoff, then handed to the next channel in ``OTP_DELIVERY_FALLBACKS`` for
+which the user has a recipient.
+
+Tokens still ``queued`` after a process restart are picked up again by the
+``deliver_pending_otps`` management command. Whoever delivers a token first
+moves it to ``sending`` (see ``claim_token``), so it is sent only once.
+"""
+
+import http.client
+import json
+import logging
+import queue
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROVIDERS = {
+    'email': 'apps.shared.accounts.otp_delivery.EmailOTPProvider',
+    'sms': 'apps.shared.accounts.otp_delivery.ConsoleOTPProvider',
+    'whatsapp': 'apps.shared.accounts.otp_delivery.ConsoleOTPProvider',
+}
+
+DEFAULT_FALLBACKS = {
+    'email': [],
+    'sms': ['whatsapp', 'email'],
+    'whatsapp': ['sms', 'email'],
+}
+
+SUBJECTS = {
+    'login': 'Your Login OTP Code',
+    'password_reset': 'Password Reset OTP Code',
+    'email_verification': 'Email Verification Code',
+    'account_unlock': 'Account Unlock Code',
+}
+
+EMAIL_BODIES = {
+    'login': (
+        "Your login verification code is: {token}\n\n"
+        "This code will expire in {minutes} minutes.\n"
+        "If you didn't request this code, please ignore this email."
+    ),
+    'password_reset': (
+        "You requested to reset your password. Your verification code is: {token}\n\n"
+        "This code will expire in {minutes} minutes.\n"
+        "If you didn't request a password reset, please ignore this email."
+    ),
+    'email_verification': (
+        "Welcome to Murima! Please verify your email address with this code: {token}\n\n"
+        "This code will expire in {minutes} minutes.\n"
+        "If you didn't create an account, please ignore this email."
+    ),
+    'account_unlock': (
+        "Your account unlock verification code is: {token}\n\n"
+        "This code will expire in {minutes} minutes.\n"
+        "If you didn't request account unlock, please contact support."
+    ),
+}
+
+
+def get_delivery_settings():
+    """Return OTP delivery settings with defaults applied."""
+    return {
+        'providers': {**DEFAULT_PROVIDERS, **getattr(settings, 'OTP_DELIVERY_PROVIDERS', {})},
+        'fallbacks': {**DEFAULT_FALLBACKS, **getattr(settings, 'OTP_DELIVERY_FALLBACKS', {})},
+        'max_attempts': getattr(settings, 'OTP_DELIVERY_MAX_ATTEMPTS', 3),
+        'backoff_seconds': getattr(settings, 'OTP_DELIVERY_BACKOFF_SECONDS', 0.5),
+        'workers': getattr(settings, 'OTP_DELIVERY_WORKERS', 4),
+        'synchronous': getattr(settings, 'OTP_DELIVERY_SYNCHRONOUS', False),
+    }
+
+
+class OTPDeliveryError(Exception):
+    """Raised by providers when a message could not be delivered."""
+
+
+class OTPMessage:
+    """A rendered OTP message, independent of the model so providers stay DB-free."""
+
+    def __init__(self, token_id, channel, recipients, subject, bodies):
+        self.token_id = token_id
+        self.channel = channel
+        # channel -> recipient address/number the user has for that channel
+        self.recipients = recipients
+        self.subject = subject
+        # channel -> body text (email is long form, SMS/WhatsApp are one line)
+        self.bodies = bodies
+
+    def channels(self, fallbacks):
+        """Yield the primary channel then each fallback the user can receive on."""
+        yield self.channel
+        for channel in fallbacks.get(self.channel, []):
+            if channel != self.channel and self.recipients.get(channel):
+                yield channel
+
+
+def _expiry_minutes(otp_token):
+    remaining = otp_token.expires_at - timezone.now()
+    return max(1, int(remaining.total_seconds() / 60))
+
+
+def render_otp_message(otp_token):
+    """Build the OTPMessage for a token, with bodies for every channel."""
+    user = otp_token.user
+    user_name = user.get_full_name() or user.first_name or user.email.split('@')[0]
+    minutes = _expiry_minutes(otp_token)
+
+    email_body = EMAIL_BODIES.get(
+        otp_token.token_type,
+        "Your OTP code is: {token}\n\nThis code will expire soon."
+    ).format(token=otp_token.token, minutes=minutes)
+    short_body = (
+        f"Hello {user_name}, your Murima verification code is: {otp_token.token}. "
+        f"It expires in {minutes} minutes."
+    )
+
+    recipients = {
+        'email': user.email,
+        'sms': user.phone,
+        'whatsapp': user.phone,
+    }
+    recipients[otp_token.delivery_method] = otp_token.recipient
+
+    return OTPMessage(
+        token_id=otp_token.pk,
+        channel=otp_token.delivery_method,
+        recipients=recipients,
+        subject=SUBJECTS.get(otp_token.token_type, 'Your OTP Code'),
+        bodies={
+            'email': f"Hello {user_name},\n\n{email_body}\n\nBest regards,\nMurima Support Team",
+            'sms': short_body,
+            'whatsapp': short_body,
+        },
+    )
+
+
+# ---------------------------------------------------------------------------
+# Providers
+# ---------------------------------------------------------------------------
+
+class BaseOTPProvider:
+    """
+    Interface for a delivery channel.
+
+    A provider instance is owned by a single worker thread, so it may keep a
+    connection open across deliveries without locking.
+    """
+
+    channel = None
+
+    def __init__(self, channel):
+        self.channel = channel
+
+    def send(self, recipient, subject, body):
+        """Deliver one message or raise OTPDeliveryError."""
+        raise NotImplementedError
+
+    def close(self):
+        """Release any pooled connection."""
+
+
+class EmailOTPProvider(BaseOTPProvider):
+    """Sends OTP emails over one reused connection of the configured email backend."""
+
+    def __init__(self, channel):
+        super().__init__(channel)
+        self.connection = None
+        self.from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', 'support@bitz-itc.com')
+
+    def send(self, recipient, subject, body):
+        if self.connection is None:
+            self.connection = get_connection(fail_silently=False)
+            self.connection.open()
+        message = EmailMessage(subject, body, self.from_email, [recipient],
+                               connection=self.connection)
+        try:
+            message.send()
+        except Exception as exc:
+            # Drop the connection so the retry reconnects
+            self.close()
+            raise OTPDeliveryError(str(exc)) from exc
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+            self.connection = None
+
+
+class HTTPOTPProvider(BaseOTPProvider):
+    """
+    Posts OTP messages as JSON to an HTTP gateway (SMS or WhatsApp).
+
+    Configured per channel in ``OTP_DELIVERY_HTTP_GATEWAYS``:
+
+        OTP_DELIVERY_HTTP_GATEWAYS = {
+            'sms': {
+                'url': 'https://gateway.example.com/v1/messages',
+                'headers': {'Authorization': 'Bearer ...'},
+                'sender': 'MURIMA',
+                'timeout': 5,
+            },
+        }
+
+    The HTTP connection is kept alive between messages.
+    """
+
+    def __init__(self, channel):
+        super().__init__(channel)
+        config = getattr(settings, 'OTP_DELIVERY_HTTP_GATEWAYS', {}).get(channel)
+        if not config:
+            raise OTPDeliveryError(f"No HTTP gateway configured for channel '{channel}'")
+        self.url = urlsplit(config['url'])
+        self.headers = {'Content-Type': 'application/json', **config.get('headers', {})}
+        self.sender = config.get('sender', '')
+        self.timeout = config.get('timeout', 5)
+        self.connection = None
+
+    def _connect(self):
+        connection_class = (
+            http.client.HTTPSConnection if self.url.scheme == 'https' else http.client.HTTPConnection
+        )
+        return connection_class(self.url.hostname, self.url.port, timeout=self.timeout)
+
+    def send(self, recipient, subject, body):
+        payload = json.dumps({
+            'channel': self.channel,
+            'to': recipient,
+            'from': self.sender,
+            'message': body,
+        })
+        if self.connection is None:
+            self.connection = self._connect()
+        try:
+            self.connection.request('POST', self.url.path or '/', body=payload, headers=self.headers)
+            response = self.connection.getresponse()
+            response_body = response.read()
+        except (OSError, http.client.HTTPException) as exc:
+            self.close()
+            raise OTPDeliveryError(str(exc)) from exc
+        if response.status >= 300:
+            raise OTPDeliveryError(
+                f"Gateway returned {response.status}: {response_body[:200]!r}"
+            )
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class ConsoleOTPProvider(BaseOTPProvider):
+    """
+    Logs OTP messages instead of sending them (development default for SMS/WhatsApp).
+
+    The message carries a live code, so it is only logged at DEBUG.
+    """
+
+    def send(self, recipient, subject, body):
+        logger.debug("OTP via %s to %s: %s", self.channel, recipient, body)
+
+
+class LocalMemoryOTPProvider(BaseOTPProvider):
+    """
+    Records deliveries in memory for tests, like Django's locmem email backend.
+
+    Set ``LocalMemoryOTPProvider.failing_channels`` to make a channel raise,
+    which exercises retries and fallback.
+    """
+
+    outbox = []
+    failing_channels = set()
+    _lock = threading.Lock()
+
+    def send(self, recipient, subject, body):
+        if self.channel in self.failing_channels:
+            raise OTPDeliveryError(f"{self.channel} provider unavailable")
+        with self._lock:
+            self.outbox.append({
+                'channel': self.channel,
+                'recipient': recipient,
+                'subject': subject,
+                'body': body,
+            })
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls.outbox.clear()
+        cls.failing_channels = set()
+
+
+# ---------------------------------------------------------------------------
+# Delivery
+# ---------------------------------------------------------------------------
+
+class OTPDispatcher:
+    """
+    Delivers OTPMessages with retries, backoff and channel fallback.
+
+    Holds one provider per channel; not thread-safe, each worker owns one.
+    """
+
+    def __init__(self, delivery_settings=None, sleep=time.sleep):
+        self.settings = delivery_settings or get_delivery_settings()
+        self.providers = {}
+        self.sleep = sleep
+
+    def get_provider(self, channel):
+        if channel not in self.providers:
+            provider_class = import_string(self.settings['providers'][channel])
+            self.providers[channel] = provider_class(channel)
+        return self.providers[channel]
+
+    def deliver(self, message):
+        """
+        Try each channel in turn until one succeeds.
+
+        Returns:
+            tuple: (channel or None, attempts made, last error message)
+        """
+        attempts = 0
+        last_error = ''
+        for channel in message.channels(self.settings['fallbacks']):
+            try:
+                provider = self.get_provider(channel)
+            except Exception as exc:
+                last_error = f"{channel}: {exc}"
+                continue
+            for attempt in range(self.settings['max_attempts']):
+                attempts += 1
+                try:
+                    provider.send(
+                        message.recipients[channel], message.subject, message.bodies[channel]
+                    )
+                    return channel, attempts, ''
+                except Exception as exc:
+                    last_error = f"{channel}: {exc}"
+                    logger.warning("OTP %s delivery via %s failed (attempt %d): %s",
+                                   message.token_id, channel, attempt + 1, exc)
+                    if attempt + 1 < self.settings['max_attempts']:
+                        self.sleep(self.settings['backoff_seconds'] * (2 ** attempt))
+        return None, attempts, last_error
+
+    def close(self):
+        for provider in self.providers.values():
+            provider.close()
+        self.providers = {}
+
+
+def claim_token(token_id, statuses=('queued',)):
+    """
+    Move a token to ``sending`` unless another worker already has.
+
+    The conditional UPDATE is the claim: only the worker that changed the
+    row delivers it, so a queue worker and ``deliver_pending_otps`` never
+    send the same code twice.
+
+    Returns:
+        OTPToken or None: the claimed token, or None if it was not claimable
+    """
+    from .models import OTPToken
+
+    claimed = OTPToken.objects.filter(pk=token_id, delivery_status__in=statuses).update(
+        delivery_status='sending', updated_at=timezone.now()
+    )
+    if not claimed:
+        return None
+    return OTPToken.objects.select_related('user').get(pk=token_id)
+
+
+def deliver_token(otp_token, dispatcher):
+    """Deliver one token and record the outcome on it."""
+    if otp_token.is_used or otp_token.is_expired():
+        otp_token.delivery_status = 'skipped'
+        otp_token.save(update_fields=['delivery_status', 'updated_at'])
+        return False
+
+    channel, attempts, error = dispatcher.deliver(render_otp_message(otp_token))
+    otp_token.delivery_attempts += attempts
+    if channel:
+        otp_token.delivery_status = 'sent'
+        otp_token.delivered_via = channel
+        otp_token.delivered_at = timezone.now()
+        otp_token.delivery_error = ''
+    else:
+        otp_token.delivery_status = 'failed'
+        otp_token.delivery_error = error[:500]
+    otp_token.save(update_fields=[
+        'delivery_status', 'delivered_via', 'delivered_at',
+        'delivery_attempts', 'delivery_error', 'updated_at',
+    ])
+    return bool(channel)
+
+
+class OTPDeliveryQueue:
+    """
+    Process-wide queue drained by a bounded pool of daemon worker threads.
+
+    Workers are started lazily on the first enqueue, each with its own
+    dispatcher (and therefore its own pooled provider connections).
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+
+    def enqueue(self, token_id):
+        self._ensure_workers()
+        self._queue.put(token_id)
+
+    def join(self):
+        """Block until every queued token has been processed."""
+        self._queue.join()
+
+    def _ensure_workers(self):
+        if self._workers:
+            return
+        with self._lock:
+            if self._workers:
+                return
+            for index in range(get_delivery_settings()['workers']):
+                worker = threading.Thread(
+                    target=self._run, name=f'otp-delivery-{index}', daemon=True
+                )
+                worker.start()
+                self._workers.append(worker)
+
+    def _run(self):
+        dispatcher = OTPDispatcher()
+        while True:
+            token_id = self._queue.get()
+            try:
+                close_old_connections()
+                otp_token = claim_token(token_id)
+                if otp_token is not None:
+                    deliver_token(otp_token, dispatcher)
+            except Exception:
+                logger.exception("Unexpected error delivering OTP %s", token_id)
+            finally:
+                self._queue.task_done()
+
+
+delivery_queue = OTPDeliveryQueue()
+
+
+def _deliver_now(token_id):
+    otp_token = claim_token(token_id)
+    if otp_token is None:
+        return
+    dispatcher = OTPDispatcher()
+    try:
+        deliver_token(otp_token, dispatcher)
+    finally:
+        dispatcher.close()
+
+
+def enqueue_otp(otp_token):
+    """
+    Schedule delivery of a freshly created token once its row is committed.
+
+    With ``OTP_DELIVERY_SYNCHRONOUS = True`` (tests, management commands) the
+    token is delivered inline instead.
+    """
+    token_id = otp_token.pk
+    if get_delivery_settings()['synchronous']:
+        transaction.on_commit(lambda: _deliver_now(token_id))
+        return
+    transaction.on_commit(lambda: delivery_queue.enqueue(token_id))
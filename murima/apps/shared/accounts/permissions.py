@@ -0,0 +1,262 @@
+"""
+Accounts App Permission Compilation
+
+Role and API key permissions are stored as JSON blobs. Checking them used to
+mean walking the JSON on every call, and loading membership, role and
+permissions fresh on every request. This module compiles a permission blob
+once into an immutable ``PermissionSet`` and caches the compiled set per
+(user, tenant).
+
+Supported permission formats (both may be mixed):
+- Flat dot-notation keys: ``{"cases.create": true}``
+- Nested objects: ``{"cases": {"create": true}}``
+
+Wildcards are resolved at compile time:
+- ``"cases.*": true`` grants every permission under ``cases``
+- ``"*": true`` or ``"admin.full_access": true`` grants everything
+
+Cached sets are invalidated by bumping a per-tenant version whenever a role
+or membership of that tenant changes (see ``signals.py``).
+"""
+
+import json
+from functools import lru_cache
+
+from django.core.cache import cache
+
+FULL_ACCESS_KEYS = frozenset({'*', 'admin.full_access'})
+WILDCARD_SUFFIX = '.*'
+
+PERMISSION_CACHE_TIMEOUT = 60 * 60  # One hour; versioning handles invalidation
+LOCAL_CACHE_SIZE = 4096
+
+
+class PermissionSet:
+    """
+    Immutable, precompiled set of granted permissions.
+
+    Membership tests are set lookups: the permission itself, then each of its
+    parent namespaces against the precomputed wildcard prefixes.
+    """
+
+    __slots__ = ('granted', 'wildcards', 'full_access')
+
+    def __init__(self, granted=(), wildcards=(), full_access=False):
+        self.granted = frozenset(granted)
+        self.wildcards = frozenset(wildcards)
+        self.full_access = full_access
+
+    def has(self, permission_key):
+        """Return True if the permission is granted."""
+        if self.full_access or permission_key in self.granted:
+            return True
+        if self.wildcards:
+            prefix, _, _ = permission_key.rpartition('.')
+            while prefix:
+                if prefix in self.wildcards:
+                    return True
+                prefix, _, _ = prefix.rpartition('.')
+        return False
+
+    __contains__ = has
+
+    def has_all(self, permission_keys):
+        return all(self.has(key) for key in permission_keys)
+
+    def has_any(self, permission_keys):
+        return any(self.has(key) for key in permission_keys)
+
+    def has_namespace(self, namespace):
+        """Return True if any permission under `namespace` is granted."""
+        if self.full_access or namespace in self.wildcards:
+            return True
+        prefix = f'{namespace}.'
+        return any(key.startswith(prefix) for key in self.granted)
+
+    def __bool__(self):
+        return self.full_access or bool(self.granted) or bool(self.wildcards)
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, PermissionSet)
+            and self.granted == other.granted
+            and self.wildcards == other.wildcards
+            and self.full_access == other.full_access
+        )
+
+    def __hash__(self):
+        return hash((self.granted, self.wildcards, self.full_access))
+
+    def __reduce__(self):
+        return (PermissionSet, (self.granted, self.wildcards, self.full_access))
+
+    def __repr__(self):
+        if self.full_access:
+            return 'PermissionSet(full_access=True)'
+        return f'PermissionSet(granted={sorted(self.granted)}, wildcards={sorted(self.wildcards)})'
+
+
+EMPTY_PERMISSION_SET = PermissionSet()
+
+
+def _flatten(permissions, prefix=''):
+    """Yield (dot_key, value) pairs from flat and/or nested permission JSON."""
+    for key, value in permissions.items():
+        full_key = f'{prefix}.{key}' if prefix else key
+        if isinstance(value, dict):
+            yield from _flatten(value, full_key)
+        else:
+            yield full_key, value
+
+
+def json_forms(permission_key):
+    """
+    Return every JSON blob shape that grants exactly ``permission_key``.
+
+    The inverse of ``_flatten``: ``"cases.notes.view"`` may be stored flat,
+    fully nested, or with any run of its segments kept dotted, e.g.
+    ``{"cases": {"notes.view": true}}``. Used to query stored blobs for a key.
+    """
+    segments = permission_key.split('.')
+    forms = []
+    # Each of the n-1 dots either separates two nesting levels or stays in a key
+    for splits in range(2 ** (len(segments) - 1)):
+        keys = [segments[0]]
+        for index, segment in enumerate(segments[1:]):
+            if splits & (1 << index):
+                keys.append(segment)
+            else:
+                keys[-1] = f'{keys[-1]}.{segment}'
+        form = True
+        for key in reversed(keys):
+            form = {key: form}
+        forms.append(form)
+    return forms
+
+
+@lru_cache(maxsize=LOCAL_CACHE_SIZE)
+def _compile_canonical(canonical_json):
+    permissions = json.loads(canonical_json)
+    granted = set()
+    wildcards = set()
+    for key, value in _flatten(permissions):
+        if value is not True:
+            continue
+        if key in FULL_ACCESS_KEYS:
+            return PermissionSet(full_access=True)
+        if key.endswith(WILDCARD_SUFFIX):
+            wildcards.add(key[:-len(WILDCARD_SUFFIX)])
+        else:
+            granted.add(key)
+    return PermissionSet(granted, wildcards)
+
+
+def compile_permissions(permissions):
+    """
+    Compile a permission JSON blob into a PermissionSet.
+
+    Compilation is memoized on the canonical JSON, so identical blobs (every
+    agent sharing the same role, an API key used on every request) compile once
+    per process.
+    """
+    if not permissions or not isinstance(permissions, dict):
+        return EMPTY_PERMISSION_SET
+    return _compile_canonical(json.dumps(permissions, sort_keys=True))
+
+
+def get_compiled_permissions(instance):
+    """
+    Return the compiled permissions of a model with a ``permissions`` JSON field.
+
+    The result is kept on the instance and recompiled only when the field is
+    reassigned.
+    """
+    source = instance.permissions
+    cached = instance.__dict__.get('_compiled_permissions')
+    if cached is not None and cached[0] is source:
+        return cached[1]
+    compiled = compile_permissions(source)
+    instance.__dict__['_compiled_permissions'] = (source, compiled)
+    return compiled
+
+
+# ---------------------------------------------------------------------------
+# Per-(user, tenant) cache with version-based invalidation
+# ---------------------------------------------------------------------------
+
+def _version_key(tenant_id):
+    return f'perm_version:{tenant_id}'
+
+
+def get_permissions_version(tenant_id):
+    """Return the current permission version for a tenant."""
+    version = cache.get(_version_key(tenant_id))
+    if version is None:
+        cache.add(_version_key(tenant_id), 1, None)
+        version = cache.get(_version_key(tenant_id), 1)
+    return version
+
+
+def bump_permissions_version(tenant_id):
+    """Invalidate every cached permission set of a tenant."""
+    try:
+        cache.incr(_version_key(tenant_id))
+    except ValueError:
+        cache.add(_version_key(tenant_id), 2, None)
+
+
+@lru_cache(maxsize=LOCAL_CACHE_SIZE)
+def _local_membership_permissions(user_id, tenant_id, version):
+    """Process-local layer; the version in the key makes stale entries unreachable."""
+    cache_key = f'perms:{tenant_id}:{user_id}:{version}'
+    permission_set = cache.get(cache_key)
+    if permission_set is None:
+        permission_set = _load_membership_permissions(user_id, tenant_id)
+        cache.set(cache_key, permission_set, PERMISSION_CACHE_TIMEOUT)
+    return permission_set
+
+
+def _load_membership_permissions(user_id, tenant_id):
+    from .models import TenantMembership
+
+    permissions = (
+        TenantMembership.objects
+        .filter(
+            user_id=user_id,
+            tenant_id=tenant_id,
+            is_active=True,
+            is_deleted=False,
+            role__is_active=True,
+        )
+        .values_list('role__permissions', flat=True)
+        .first()
+    )
+    return compile_permissions(permissions)
+
+
+def get_user_permissions(user, tenant):
+    """
+    Return the compiled PermissionSet of a user within a tenant.
+
+    Costs one cache read for the tenant's version; the set itself comes from
+    process memory, then the shared cache, and only then the database.
+    """
+    if user is None or tenant is None or not getattr(user, 'is_authenticated', False):
+        return EMPTY_PERMISSION_SET
+    if getattr(user, 'is_superuser', False):
+        return PermissionSet(full_access=True)
+
+    api_key = getattr(user, 'api_key', None)
+    if api_key is not None:
+        return api_key.compiled_permissions
+
+    tenant_id = getattr(tenant, 'pk', tenant)
+    if user.pk is None or tenant_id is None:
+        return EMPTY_PERMISSION_SET
+    version = get_permissions_version(tenant_id)
+    return _local_membership_permissions(user.pk, tenant_id, version)
+
+
+def user_has_permission(user, tenant, permission_key):
+    """Shortcut for ``get_user_permissions(user, tenant).has(permission_key)``."""
+    return get_user_permissions(user, tenant).has(permission_key)
@@ -21,6 +21,8 @@ from .models import (
     User, TenantMembership, TenantRole, PlatformRole,
     OTPToken, UserSession, UserInvitation
 )
+from .session_store import clear_login_failures, get_lock_expiry, is_ip_blocked
+from .signals import get_client_ip
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -300,6 +302,11 @@ class LoginSerializer(serializers.Serializer):
         if user.is_account_locked():
             raise ValidationError(_('Account is temporarily locked. Please try again later.'))
         
+        # Block addresses with too many recent failures across accounts
+        request = self.context.get('request')
+        if request is not None and is_ip_blocked(get_client_ip(request)):
+            raise ValidationError(_('Too many failed login attempts. Please try again later.'))
+        
         # Check if account is active
         if not user.is_active:
             raise ValidationError(_('Account is disabled. Please contact support.'))
@@ -317,23 +324,14 @@ class LoginSerializer(serializers.Serializer):
             )
             
             if not authenticated_user:
-                # Increment failed login attempts
-                user.failed_login_attempts += 1
-                
-                # Lock account after 5 failed attempts
-                if user.failed_login_attempts >= 5:
-                    user.lock_account(duration_minutes=30)
-                    user.save(update_fields=['failed_login_attempts', 'account_locked_until'])
+                # The failure was counted by the user_login_failed signal
+                if get_lock_expiry(email):
                     raise ValidationError(_('Too many failed attempts. Account locked for 30 minutes.'))
-                else:
-                    user.save(update_fields=['failed_login_attempts'])
                 
                 raise ValidationError(_('Invalid email or password.'))
             
             # Reset failed login attempts on successful authentication
-            if user.failed_login_attempts > 0:
-                user.failed_login_attempts = 0
-                user.save(update_fields=['failed_login_attempts'])
+            clear_login_failures(user)
             
             data['user'] = authenticated_user
             data['requires_otp'] = False
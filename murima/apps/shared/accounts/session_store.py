@@ -0,0 +1,395 @@
+"""
+Accounts App Session and Lockout Store
+
+Active-session state and login-failure counters live in the cache with
+TTLs, so the hot paths (login, refresh, failed login) no longer write to
+``accounts_user`` / ``accounts_usersession`` or the audit log inline:
+
+- Failure counters expire on their own after ``LOGIN_FAILURE_WINDOW_SECONDS``.
+  Reaching ``ACCOUNT_LOCKOUT_THRESHOLD`` locks the account; reaching
+  ``LOGIN_IP_FAILURE_THRESHOLD`` from one address blocks that address, which
+  holds up against credential stuffing spread over many accounts.
+- Locks are cache keys whose TTL is the lock duration.
+- Sessions are cache entries keyed by the refresh token's JTI, expiring
+  after ``SESSION_IDLE_TIMEOUT_SECONDS`` without activity. Ending a session
+  replaces its entry with a tombstone, so the not-yet-closed table row
+  cannot bring it back through the cache-miss fallback.
+
+The relational tables remain the audit history. They are written by a
+write-behind worker after the request's transaction commits, and session
+activity is flushed at most once per ``SESSION_ACTIVITY_FLUSH_SECONDS``.
+"""
+
+import logging
+import queue
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def lockout_threshold():
+    return _setting('ACCOUNT_LOCKOUT_THRESHOLD', 5)
+
+
+def lockout_minutes():
+    return _setting('ACCOUNT_LOCKOUT_MINUTES', 30)
+
+
+def failure_window():
+    return _setting('LOGIN_FAILURE_WINDOW_SECONDS', 15 * 60)
+
+
+def ip_failure_threshold():
+    return _setting('LOGIN_IP_FAILURE_THRESHOLD', 50)
+
+
+def session_idle_timeout():
+    default = settings.SIMPLE_JWT['REFRESH_TOKEN_LIFETIME'].total_seconds()
+    return int(_setting('SESSION_IDLE_TIMEOUT_SECONDS', default))
+
+
+def activity_flush_interval():
+    return _setting('SESSION_ACTIVITY_FLUSH_SECONDS', 5 * 60)
+
+
+# ---------------------------------------------------------------------------
+# Write-behind queue for the relational audit history
+# ---------------------------------------------------------------------------
+
+class WriteBehindQueue:
+    """Runs deferred database writes on a single daemon thread."""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def put(self, func, args, kwargs):
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(
+                        target=self._run, name='accounts-write-behind', daemon=True
+                    )
+                    self._worker.start()
+        self._queue.put((func, args, kwargs))
+
+    def join(self):
+        """Block until every queued write has run."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            func, args, kwargs = self._queue.get()
+            try:
+                close_old_connections()
+                func(*args, **kwargs)
+            except Exception:
+                logger.exception("Deferred accounts write %s failed", func.__name__)
+            finally:
+                self._queue.task_done()
+
+
+write_queue = WriteBehindQueue()
+
+
+def defer(func, *args, **kwargs):
+    """
+    Run ``func`` after the current transaction commits, off the request thread.
+
+    Set ``ACCOUNTS_WRITE_BEHIND = False`` to run it inline after commit.
+    """
+    if _setting('ACCOUNTS_WRITE_BEHIND', True):
+        transaction.on_commit(lambda: write_queue.put(func, args, kwargs))
+    else:
+        transaction.on_commit(lambda: func(*args, **kwargs))
+
+
+# ---------------------------------------------------------------------------
+# Cache keys
+# ---------------------------------------------------------------------------
+
+def _normalize(email):
+    return (email or '').strip().lower()
+
+
+def _failures_key(email):
+    return f'login_failures:{_normalize(email)}'
+
+
+def _ip_failures_key(ip_address):
+    return f'login_failures:ip:{ip_address}'
+
+
+def _lock_key(email):
+    return f'account_lock:{_normalize(email)}'
+
+
+def _ip_lock_key(ip_address):
+    return f'account_lock:ip:{ip_address}'
+
+
+def _session_key(session_key):
+    return f'user_session:{session_key}'
+
+
+# Cached in place of an ended session's state until its row is closed
+SESSION_ENDED = 'ended'
+
+
+def _user_sessions_key(user_id):
+    return f'user_sessions:{user_id}'
+
+
+def _increment(key, timeout):
+    """Increment a counter whose window starts at the first increment."""
+    cache.add(key, 0, timeout)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Expired between add() and incr()
+        cache.set(key, 1, timeout)
+        return 1
+
+
+# ---------------------------------------------------------------------------
+# Login failures and lockout
+# ---------------------------------------------------------------------------
+
+def record_login_failure(email, ip_address=None):
+    """
+    Count a failed login for an email (and source address).
+
+    Returns:
+        int: failures for the email within the current window
+    """
+    failures = _increment(_failures_key(email), failure_window())
+
+    if ip_address:
+        ip_failures = _increment(_ip_failures_key(ip_address), failure_window())
+        if ip_failures >= ip_failure_threshold():
+            cache.set(_ip_lock_key(ip_address), True, lockout_minutes() * 60)
+
+    if failures >= lockout_threshold() and not get_lock_expiry(email):
+        lock_email(email, lockout_minutes(), failures)
+    return failures
+
+
+def clear_login_failures(user):
+    """Reset the failure counter after a successful login."""
+    cache.delete(_failures_key(user.email))
+    if user.failed_login_attempts:
+        user.failed_login_attempts = 0
+        defer(_persist_lock_state, user.pk, user.account_locked_until, 0)
+
+
+def get_lock_expiry(email):
+    """Return when the cached lock on an email ends, or None if not locked."""
+    expiry = cache.get(_lock_key(email))
+    if expiry is None:
+        return None
+    until = datetime.fromtimestamp(expiry, tz=dt_timezone.utc)
+    return until if until > timezone.now() else None
+
+
+def is_ip_blocked(ip_address):
+    """Return True if too many failures came from this address recently."""
+    return bool(ip_address) and cache.get(_ip_lock_key(ip_address)) is not None
+
+
+def lock_email(email, duration_minutes, failures=None):
+    """
+    Lock an account by email for ``duration_minutes``.
+
+    The cache entry is authoritative; the user row is updated afterwards for
+    admin visibility and audit history.
+    """
+    until = timezone.now() + timedelta(minutes=duration_minutes)
+    cache.set(_lock_key(email), until.timestamp(), duration_minutes * 60)
+    defer(_persist_lock, _normalize(email), until, failures)
+    return until
+
+
+def unlock_email(email):
+    """Clear the cached lock and failure counter of an account."""
+    cache.delete_many([_lock_key(email), _failures_key(email)])
+
+
+def _persist_lock(email, until, failures):
+    from .models import User
+    from .signals import log_account_lockout
+
+    user = User.objects.filter(email__iexact=email).first()
+    if user is None:
+        return
+    _persist_lock_state(user.pk, until, failures if failures is not None else user.failed_login_attempts)
+    user.account_locked_until = until
+    if failures is not None:
+        user.failed_login_attempts = failures
+    log_account_lockout(user)
+
+
+def _persist_lock_state(user_id, until, failures):
+    from .models import User
+
+    # update() bypasses the User save signals (and their audit diffing)
+    User.objects.filter(pk=user_id).update(
+        account_locked_until=until, failed_login_attempts=failures
+    )
+
+
+# ---------------------------------------------------------------------------
+# Sessions
+# ---------------------------------------------------------------------------
+
+def open_session(session):
+    """
+    Register an unsaved ``UserSession`` as active and persist it later.
+
+    Returns the session instance (its pk is assigned by the deferred insert).
+    """
+    now = timezone.now()
+    timeout = session_idle_timeout()
+    cache.set(_session_key(session.session_key), {
+        'user_id': session.user_id,
+        'ip_address': session.ip_address,
+        'device_type': session.device_type,
+        'browser': session.browser,
+        'created_at': now.timestamp(),
+        'last_activity': now.timestamp(),
+        'flushed_at': now.timestamp(),
+    }, timeout)
+
+    index_key = _user_sessions_key(session.user_id)
+    keys = [key for key in cache.get(index_key, []) if key != session.session_key]
+    cache.set(index_key, keys + [session.session_key], timeout)
+
+    defer(_persist_session, session)
+    return session
+
+
+def get_session(session_key):
+    """
+    Return the cached state of an active session, or None.
+
+    Falls back to the session table when the cache has no entry (e.g. after
+    a cache flush) and re-warms it.
+    """
+    if not session_key:
+        return None
+    state = cache.get(_session_key(session_key))
+    if state == SESSION_ENDED:
+        return None
+    if state is not None:
+        return state
+
+    from .models import UserSession
+
+    cutoff = timezone.now() - timedelta(seconds=session_idle_timeout())
+    row = UserSession.objects.filter(
+        session_key=session_key, is_active=True, last_activity__gte=cutoff
+    ).values('user_id', 'ip_address', 'device_type', 'browser', 'created_at', 'last_activity').first()
+    if row is None:
+        return None
+    state = {
+        **row,
+        'created_at': row['created_at'].timestamp(),
+        'last_activity': row['last_activity'].timestamp(),
+        'flushed_at': row['last_activity'].timestamp(),
+    }
+    # add() never overwrites a tombstone written since the row was read
+    if not cache.add(_session_key(session_key), state, session_idle_timeout()):
+        current = cache.get(_session_key(session_key))
+        return None if current == SESSION_ENDED else current
+    return state
+
+
+def is_session_active(session_key, user_id=None):
+    """Return True if the session exists, has not idled out and belongs to ``user_id``."""
+    state = get_session(session_key)
+    if state is None:
+        return False
+    return user_id is None or str(state['user_id']) == str(user_id)
+
+
+def touch_session(session_key):
+    """
+    Record activity on a session and extend its idle TTL.
+
+    ``last_activity`` reaches the database at most once per flush interval.
+    """
+    state = get_session(session_key)
+    if state is None:
+        return False
+    now = timezone.now().timestamp()
+    state['last_activity'] = now
+    if now - state['flushed_at'] >= activity_flush_interval():
+        state['flushed_at'] = now
+        defer(_persist_activity, session_key, timezone.now())
+    cache.set(_session_key(session_key), state, session_idle_timeout())
+    return True
+
+
+def end_session(session_key):
+    """End one session immediately; the row is closed afterwards."""
+    cache.set(_session_key(session_key), SESSION_ENDED, session_idle_timeout())
+    defer(_persist_session_end, [session_key], timezone.now())
+
+
+def end_user_sessions(user, exclude=None):
+    """
+    End every active session of a user except ``exclude``.
+
+    Returns:
+        int: number of sessions that were active in the store
+    """
+    index_key = _user_sessions_key(user.pk)
+    keys = cache.get(index_key, [])
+    ended = [key for key in keys if key != exclude]
+    active = [
+        state for state in cache.get_many([_session_key(key) for key in ended]).values()
+        if state != SESSION_ENDED
+    ]
+    cache.set_many(
+        {_session_key(key): SESSION_ENDED for key in ended}, session_idle_timeout()
+    )
+    cache.set(index_key, [key for key in keys if key == exclude], session_idle_timeout())
+    defer(_persist_user_sessions_end, user.pk, exclude, timezone.now())
+    return len(active)
+
+
+def _persist_session(session):
+    session.save()
+
+
+def _persist_activity(session_key, when):
+    from .models import UserSession
+
+    UserSession.objects.filter(session_key=session_key, is_active=True).update(last_activity=when)
+
+
+def _persist_session_end(session_keys, when):
+    from .models import UserSession
+
+    UserSession.objects.filter(session_key__in=session_keys, is_active=True).update(
+        is_active=False, ended_at=when
+    )
+
+
+def _persist_user_sessions_end(user_id, exclude, when):
+    from .models import UserSession
+
+    sessions = UserSession.objects.filter(user_id=user_id, is_active=True)
+    if exclude:
+        sessions = sessions.exclude(session_key=exclude)
+    sessions.update(is_active=False, ended_at=when)
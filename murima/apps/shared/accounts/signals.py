@@ -9,8 +9,10 @@ comprehensive audit trails for compliance and security.
 """
 
 import json
+from django.conf import settings
 from django.contrib.auth.signals import user_logged_in, user_logged_out, user_login_failed
 from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
@@ -20,6 +22,8 @@ from .models import (
     User, TenantMembership, TenantRole, PlatformRole,
     OTPToken, UserSession, UserInvitation
 )
+from .permissions import bump_permissions_version
+from .session_store import defer, record_login_failure
 
 # Core app imports (will be available when core app is implemented)
 try:
@@ -30,12 +34,20 @@ except ImportError:
     AuditLog = None
     
     def get_client_ip(request):
+        """
+        Return the client address of a request.
+
+        X-Forwarded-For is client-supplied, so only the entries appended by
+        our own ``TRUSTED_PROXY_COUNT`` reverse proxies are believed; without
+        trusted proxies the socket address (REMOTE_ADDR) is used.
+        """
+        trusted_proxies = getattr(settings, 'TRUSTED_PROXY_COUNT', 0)
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        if trusted_proxies and x_forwarded_for:
+            hops = [hop.strip() for hop in x_forwarded_for.split(',') if hop.strip()]
+            if hops:
+                return hops[-min(trusted_proxies, len(hops))]
+        return request.META.get('REMOTE_ADDR')
 
 
 def create_audit_log(action, instance, user=None, changes=None, description=None, 
@@ -241,10 +253,13 @@ def log_user_deletion(sender, instance, **kwargs):
 
 
 # Authentication Signals
+# Audit rows for authentication events are written by the write-behind
+# worker so logins and failures never wait on the audit table.
 @receiver(user_logged_in)
 def log_user_login(sender, request, user, **kwargs):
     """Log successful user login."""
-    create_audit_log(
+    defer(
+        create_audit_log,
         action='LOGIN',
         instance=user,
         user=user,
@@ -262,7 +277,8 @@ def log_user_login(sender, request, user, **kwargs):
 def log_user_logout(sender, request, user, **kwargs):
     """Log user logout."""
     if user:  # user might be None for anonymous sessions
-        create_audit_log(
+        defer(
+            create_audit_log,
             action='LOGOUT',
             instance=user,
             user=user,
@@ -276,27 +292,39 @@ def log_user_logout(sender, request, user, **kwargs):
 
 
 @receiver(user_login_failed)
-def log_login_failure(sender, credentials, request, **kwargs):
-    """Log failed login attempts."""
+def log_login_failure(sender, credentials, request=None, **kwargs):
+    """Count failed login attempts towards lockout and log them."""
     email = credentials.get('username', 'unknown')
+    ip_address = get_client_ip(request) if request else None
     
-    # Try to get the user for audit purposes
-    user = None
-    try:
-        user = User.objects.get(email=email)
-    except User.DoesNotExist:
-        pass
+    failures = record_login_failure(email, ip_address)
+    
+    defer(
+        _log_login_failure,
+        email=email,
+        failures=failures,
+        ip_address=ip_address,
+        user_agent=request.META.get('HTTP_USER_AGENT', '') if request else None
+    )
+
+
+def _log_login_failure(email, failures, ip_address, user_agent):
+    # Resolve the user here, off the request path
+    user = User.objects.filter(email__iexact=email).first()
+    if user is None:
+        return
     
     create_audit_log(
         action='LOGIN_FAILED',
         instance=user,
         user=None,  # No authenticated user for failed login
         description=f"Failed login attempt for: {email}",
-        ip_address=get_client_ip(request),
-        user_agent=request.META.get('HTTP_USER_AGENT', ''),
+        ip_address=ip_address,
+        user_agent=user_agent,
         metadata={
             'email': email,
-            'reason': 'invalid_credentials'
+            'reason': 'invalid_credentials',
+            'failures_in_window': failures
         }
     )
 
@@ -393,6 +421,17 @@ def log_role_deletion(sender, instance, **kwargs):
     )
 
 
+# Permission Cache Invalidation
+@receiver(post_save, sender=TenantRole)
+@receiver(post_delete, sender=TenantRole)
+@receiver(post_save, sender=TenantMembership)
+@receiver(post_delete, sender=TenantMembership)
+def invalidate_tenant_permissions(sender, instance, **kwargs):
+    """Bump the tenant's permission version so compiled sets are rebuilt."""
+    tenant_id = instance.tenant_id
+    transaction.on_commit(lambda: bump_permissions_version(tenant_id))
+
+
 # Platform Role Signals
 @receiver(post_save, sender=PlatformRole)
 def log_platform_role_changes(sender, instance, created, **kwargs):
@@ -1,3 +1,198 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.utils import timezone
+
+from .otp_delivery import ConsoleOTPProvider, LocalMemoryOTPProvider, OTPDispatcher, OTPMessage
+from .models import UserSession
+from .permissions import PermissionSet, compile_permissions, json_forms
+from .signals import get_client_ip
+from . import session_store
+
+
+class CompilePermissionsTestCase(SimpleTestCase):
+    def test_flat_keys(self):
+        permissions = compile_permissions({'cases.create': True, 'cases.view': True})
+        self.assertTrue(permissions.has('cases.create'))
+        self.assertFalse(permissions.has('cases.delete'))
+
+    def test_nested_keys(self):
+        permissions = compile_permissions({'cases': {'create': True, 'delete': False}})
+        self.assertTrue(permissions.has('cases.create'))
+        self.assertFalse(permissions.has('cases.delete'))
+        self.assertFalse(permissions.has('cases'))
+
+    def test_only_true_values_grant(self):
+        permissions = compile_permissions({'cases.view': 'yes', 'reports.view': 1})
+        self.assertFalse(permissions)
+
+    def test_namespace_wildcard(self):
+        permissions = compile_permissions({'cases.*': True})
+        self.assertTrue(permissions.has('cases.create'))
+        self.assertTrue(permissions.has('cases.notes.delete'))
+        self.assertFalse(permissions.has('reports.view'))
+        self.assertTrue(permissions.has_namespace('cases'))
+
+    def test_full_access(self):
+        for blob in ({'*': True}, {'admin.full_access': True}, {'admin': {'full_access': True}}):
+            self.assertTrue(compile_permissions(blob).has('billing.manage'))
+
+    def test_compilation_is_memoized(self):
+        first = compile_permissions({'a.b': True, 'c.d': True})
+        second = compile_permissions({'c.d': True, 'a.b': True})
+        self.assertIs(first, second)
+
+    def test_json_forms_cover_flat_nested_and_mixed(self):
+        forms = json_forms('cases.notes.view')
+        self.assertCountEqual(forms, [
+            {'cases.notes.view': True},
+            {'cases': {'notes.view': True}},
+            {'cases.notes': {'view': True}},
+            {'cases': {'notes': {'view': True}}},
+        ])
+        for form in forms:
+            self.assertEqual(compile_permissions(form).granted, {'cases.notes.view'})
+        self.assertEqual(json_forms('*'), [{'*': True}])
+
+    def test_permission_set_pickles(self):
+        import pickle
+
+        permissions = PermissionSet({'cases.view'}, {'reports'})
+        self.assertEqual(pickle.loads(pickle.dumps(permissions)), permissions)
+
+
+LOCMEM_PROVIDER = 'apps.shared.accounts.otp_delivery.LocalMemoryOTPProvider'
+
+
+@override_settings(
+    OTP_DELIVERY_PROVIDERS={
+        'email': LOCMEM_PROVIDER, 'sms': LOCMEM_PROVIDER, 'whatsapp': LOCMEM_PROVIDER,
+    },
+    OTP_DELIVERY_MAX_ATTEMPTS=2,
+)
+class OTPDispatcherTestCase(SimpleTestCase):
+    def setUp(self):
+        LocalMemoryOTPProvider.reset()
+        self.sleeps = []
+        self.dispatcher = OTPDispatcher(sleep=self.sleeps.append)
+        self.message = OTPMessage(
+            token_id=1,
+            channel='sms',
+            recipients={'email': 'jane@example.com', 'sms': '+254700000000', 'whatsapp': ''},
+            subject='Your Login OTP Code',
+            bodies={'email': 'long body', 'sms': 'short body', 'whatsapp': 'short body'},
+        )
+
+    def tearDown(self):
+        self.dispatcher.close()
+        LocalMemoryOTPProvider.reset()
+
+    def test_delivers_on_primary_channel(self):
+        self.assertEqual(self.dispatcher.deliver(self.message), ('sms', 1, ''))
+        self.assertEqual(LocalMemoryOTPProvider.outbox[0]['recipient'], '+254700000000')
+
+    def test_retries_then_falls_back_skipping_channels_without_recipient(self):
+        LocalMemoryOTPProvider.failing_channels = {'sms'}
+        channel, attempts, _ = self.dispatcher.deliver(self.message)
+        self.assertEqual((channel, attempts), ('email', 3))
+        self.assertEqual(self.sleeps, [0.5])
+        self.assertEqual(LocalMemoryOTPProvider.outbox[0]['body'], 'long body')
+
+    def test_reports_failure_when_every_channel_fails(self):
+        LocalMemoryOTPProvider.failing_channels = {'sms', 'email'}
+        channel, attempts, error = self.dispatcher.deliver(self.message)
+        self.assertIsNone(channel)
+        self.assertEqual(attempts, 4)
+        self.assertIn('email', error)
+
+    def test_console_provider_keeps_codes_out_of_info_logs(self):
+        provider = ConsoleOTPProvider('sms')
+        with self.assertNoLogs('apps.shared.accounts.otp_delivery', level='INFO'):
+            provider.send('+254700000000', '', 'Your code is 123456')
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    ACCOUNT_LOCKOUT_THRESHOLD=3,
+    LOGIN_IP_FAILURE_THRESHOLD=5,
+)
+class LoginLockoutTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(session_store, 'defer')
+        self.defer = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_locks_account_at_threshold(self):
+        for _ in range(2):
+            session_store.record_login_failure('Jane@Example.com', '10.0.0.1')
+        self.assertIsNone(session_store.get_lock_expiry('jane@example.com'))
+
+        session_store.record_login_failure('jane@example.com', '10.0.0.1')
+        self.assertIsNotNone(session_store.get_lock_expiry('jane@example.com'))
+        self.defer.assert_called_once()
+
+    def test_blocks_address_across_accounts(self):
+        for index in range(5):
+            session_store.record_login_failure(f'user{index}@example.com', '10.0.0.2')
+        self.assertTrue(session_store.is_ip_blocked('10.0.0.2'))
+        self.assertFalse(session_store.is_ip_blocked('10.0.0.3'))
+
+    def test_unlock_clears_lock_and_counter(self):
+        for _ in range(3):
+            session_store.record_login_failure('jane@example.com')
+        session_store.unlock_email('jane@example.com')
+        self.assertIsNone(session_store.get_lock_expiry('jane@example.com'))
+        self.assertEqual(session_store.record_login_failure('jane@example.com'), 1)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class SessionStoreTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(session_store, 'defer')
+        self.defer = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # The session row stays active until the deferred write closes it
+        now = timezone.now()
+        row = {
+            'user_id': 1, 'ip_address': '10.0.0.1', 'device_type': 'desktop',
+            'browser': 'Firefox', 'created_at': now, 'last_activity': now,
+        }
+        objects = mock.MagicMock()
+        objects.filter.return_value.values.return_value.first.return_value = row
+        patcher = mock.patch.object(UserSession, 'objects', objects)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_cache_miss_falls_back_to_active_row(self):
+        self.assertTrue(session_store.is_session_active('jti-1', user_id=1))
+        self.assertIsNotNone(cache.get('user_session:jti-1'))
+
+    def test_ended_session_is_not_rewarmed_from_row(self):
+        session_store.get_session('jti-1')
+        session_store.end_session('jti-1')
+
+        self.assertIsNone(session_store.get_session('jti-1'))
+        self.assertFalse(session_store.touch_session('jti-1'))
+        self.defer.assert_called_once()
+
+
+class ClientIPTestCase(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_ignores_forwarded_for_without_trusted_proxies(self):
+        request = self.factory.get('/', HTTP_X_FORWARDED_FOR='1.2.3.4', REMOTE_ADDR='10.0.0.9')
+        self.assertEqual(get_client_ip(request), '10.0.0.9')
+
+    @override_settings(TRUSTED_PROXY_COUNT=1)
+    def test_uses_address_appended_by_trusted_proxy(self):
+        request = self.factory.get(
+            '/', HTTP_X_FORWARDED_FOR='6.6.6.6, 203.0.113.7', REMOTE_ADDR='10.0.0.9'
+        )
+        self.assertEqual(get_client_ip(request), '203.0.113.7')
@@ -29,6 +29,8 @@ from .models import (
     User, TenantMembership, TenantRole, PlatformRole,
     OTPToken, UserSession, UserInvitation
 )
+from .session_store import end_session, end_user_sessions, is_session_active, touch_session
+from .signals import get_client_ip
 from .serializers import (
     UserRegistrationSerializer, UserProfileSerializer, ChangePasswordSerializer,
     LoginSerializer, OTPRequestSerializer, OTPVerificationSerializer,
@@ -41,16 +43,6 @@ from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 
-def get_client_ip(request):
-    """Get client IP address from request."""
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
-    else:
-        ip = request.META.get('REMOTE_ADDR')
-    return ip
-
-
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     """Custom JWT token serializer with additional user data."""
     
@@ -363,13 +355,7 @@ class AuthViewSet(GenericViewSet):
             user.save(update_fields=['password', 'last_password_change'])
             
             # End all user sessions for security
-            UserSession.objects.filter(
-                user=user, 
-                is_active=True
-            ).update(
-                is_active=False,
-                ended_at=timezone.now()
-            )
+            end_user_sessions(user)
             
             return Response({
                 'message': 'Password reset successful'
@@ -388,15 +374,8 @@ class AuthViewSet(GenericViewSet):
             
             # End user session record
             session_id = request.data.get('session_id')
-            if session_id:
-                UserSession.objects.filter(
-                    session_key=session_id,
-                    user=request.user,
-                    is_active=True
-                ).update(
-                    is_active=False,
-                    ended_at=timezone.now()
-                )
+            if session_id and is_session_active(session_id, request.user.pk):
+                end_session(session_id)
             
             return Response({
                 'message': 'Logout successful'
@@ -419,6 +398,13 @@ class AuthViewSet(GenericViewSet):
                 }, status=status.HTTP_400_BAD_REQUEST)
             
             token = RefreshToken(refresh_token)
+            
+            # Ended or idled-out sessions can no longer mint access tokens
+            if not touch_session(str(token['jti'])):
+                return Response({
+                    'error': 'Session has ended'
+                }, status=status.HTTP_401_UNAUTHORIZED)
+            
             access_token = token.access_token
             
             return Response({
@@ -440,7 +426,8 @@ class AuthViewSet(GenericViewSet):
             ip_address=get_client_ip(request),
             user_agent=request.META.get('HTTP_USER_AGENT', '')
         )
-        return {'session_id': str(session.id)}
+        # The row is inserted after commit; the JTI identifies the session
+        return {'session_id': session.session_key}
 
 # User Profile Management
 class UserProfileViewSet(GenericViewSet):
@@ -497,15 +484,7 @@ class UserProfileViewSet(GenericViewSet):
             serializer.save()
             
             # End all other sessions for security
-            UserSession.objects.filter(
-                user=request.user, 
-                is_active=True
-            ).exclude(
-                session_key=request.session.session_key
-            ).update(
-                is_active=False,
-                ended_at=timezone.now()
-            )
+            end_user_sessions(request.user, exclude=request.session.session_key)
             
             return Response({
                 'message': 'Password changed successfully'
@@ -634,15 +613,7 @@ class UserSessionViewSet(mixins.ListModelMixin,
         """
         current_session_key = request.session.session_key
         
-        ended_count = UserSession.objects.filter(
-            user=request.user,
-            is_active=True
-        ).exclude(
-            session_key=current_session_key
-        ).update(
-            is_active=False,
-            ended_at=timezone.now()
-        )
+        ended_count = end_user_sessions(request.user, exclude=current_session_key)
         
         return Response({
             'message': f'Ended {ended_count} other session(s)'
@@ -174,11 +174,7 @@ class APIKeyAuthentication(authentication.BaseAuthentication):
             
             def has_module_perms(self, app_label):
                 """Check if API key has any permissions for the given app."""
-                # Check if any permission starts with the app label
-                for permission_key in self.api_key.permissions.keys():
-                    if permission_key.startswith(f"{app_label}."):
-                        return True
-                return False
+                return self.api_key.compiled_permissions.has_namespace(app_label)
             
             def save(self, *args, **kwargs):
                 """Prevent saving - this is a pseudo-user."""
@@ -195,6 +195,12 @@ class APIKey(BaseModel):
         if save:
             self.save(update_fields=['current_usage', 'last_used_at'])
     
+    @property
+    def compiled_permissions(self):
+        """Permissions compiled into an immutable PermissionSet (wildcards resolved)."""
+        from apps.shared.accounts.permissions import get_compiled_permissions
+        return get_compiled_permissions(self)
+    
     def has_permission(self, permission_key):
         """
         Check if this API key has a specific permission.
@@ -205,21 +211,7 @@ class APIKey(BaseModel):
         Returns:
             bool: True if permission is granted
         """
-        if not self.permissions:
-            return False
-        
-        # Split permission key into parts (e.g., 'cases.create' -> ['cases', 'create'])
-        parts = permission_key.split('.')
-        current_level = self.permissions
-        
-        for part in parts:
-            if isinstance(current_level, dict) and part in current_level:
-                current_level = current_level[part]
-            else:
-                return False
-        
-        # Final value should be True to grant permission
-        return current_level is True
+        return self.compiled_permissions.has(permission_key)
     
     def is_origin_allowed(self, origin):
         """Check if the given origin is allowed for this API key."""
@@ -19,6 +19,37 @@ class IsTenantAdmin(permissions.BasePermission):
                 hasattr(request, 'tenant') and 
                 request.user.is_tenant_admin)
 
+class HasTenantPermission(permissions.BasePermission):
+    """
+    Checks a role/API key permission against the user's compiled permission set.
+    
+    Views declare what they require either as a single key or per action:
+    
+        required_permission = 'cases.view'
+        required_permissions = {'list': 'cases.view', 'create': 'cases.create'}
+    
+    The check is an in-memory set lookup; the compiled set is cached per
+    (user, tenant) and invalidated when roles or memberships change.
+    """
+    def has_permission(self, request, view):
+        from apps.shared.accounts.permissions import get_user_permissions
+        
+        required = self._get_required_permission(view)
+        if required is None:
+            return True
+        
+        permission_set = get_user_permissions(request.user, getattr(request, 'tenant', None))
+        if isinstance(required, str):
+            return permission_set.has(required)
+        return permission_set.has_all(required)
+    
+    def _get_required_permission(self, view):
+        per_action = getattr(view, 'required_permissions', None)
+        if per_action:
+            action = getattr(view, 'action', None) or view.request.method.lower()
+            return per_action.get(action)
+        return getattr(view, 'required_permission', None)
+
 class IsObjectOwnerOrTenantAdmin(permissions.BasePermission):
     """
     Allows access to object owners or tenant admins.
@@ -16,7 +16,7 @@ from django.http import HttpResponseRedirect
 from django.contrib import messages
 from django.core.exceptions import ValidationError
 
-from .models import Tenant, Domain, TenantInvitation, TenantSettings
+from .models import Tenant, Domain, TenantInvitation, TenantSettings, TenantDailyUsage
 
 User = get_user_model()
 
@@ -693,6 +693,29 @@ class TenantSettingsAdmin(admin.ModelAdmin):
 
 
 # Register any additional admin customizations
+@admin.register(TenantDailyUsage)
+class TenantDailyUsageAdmin(admin.ModelAdmin):
+    """
+    Read-only view of the metered per-day usage counters.
+    """
+    
+    list_display = [
+        'tenant', 'date', 'users', 'storage_bytes', 'calls', 'sms', 'reconciled_at'
+    ]
+    
+    list_filter = ['date']
+    
+    search_fields = ['tenant__name', 'tenant__subdomain']
+    
+    date_hierarchy = 'date'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 admin.site.site_header = "Murima Platform Administration"
 admin.site.site_title = "Murima Admin"
 admin.site.index_title = "Platform Management"
\ No newline at end of file
@@ -0,0 +1,33 @@
+# apps/shared/tenants/management/commands/reconcile_tenant_usage.py
+from django.core.management.base import BaseCommand
+from django_tenants.utils import get_public_schema_name
+
+from apps.shared.tenants.models import Tenant
+from apps.shared.tenants.usage import reconcile_tenant_usage
+
+
+class Command(BaseCommand):
+    help = 'Recompute tenant usage gauges from source tables (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schema', help='Only reconcile this tenant schema')
+
+    def handle(self, *args, **options):
+        tenants = Tenant.objects.active().exclude(schema_name=get_public_schema_name())
+        if options['schema']:
+            tenants = tenants.filter(schema_name=options['schema'])
+
+        corrected = 0
+        for tenant in tenants.iterator():
+            try:
+                drift = reconcile_tenant_usage(tenant)
+            except Exception as exc:
+                self.stderr.write(f"{tenant.schema_name}: reconciliation failed: {exc}")
+                continue
+            if drift:
+                corrected += 1
+                self.stdout.write(f"{tenant.schema_name}: corrected {drift}")
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Usage reconciled ({corrected} tenant(s) had drift)')
+        )
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.2 on 2026-10-19 10:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TenantDailyUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Timestamp when the record was first created')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Timestamp when the record was last updated')),
+                ('date', models.DateField(help_text='Day the counters apply to (UTC)')),
+                ('users', models.IntegerField(default=0, help_text='Active members at the end of the day')),
+                ('storage_bytes', models.BigIntegerField(default=0, help_text='Document storage in use at the end of the day')),
+                ('calls', models.PositiveIntegerField(default=0, help_text='Calls handled during the day')),
+                ('sms', models.PositiveIntegerField(default=0, help_text='SMS messages sent during the day')),
+                ('reconciled_at', models.DateTimeField(blank=True, help_text='When the gauges were last corrected from source tables', null=True)),
+                ('tenant', models.ForeignKey(help_text='Tenant the usage belongs to', on_delete=django.db.models.deletion.CASCADE, related_name='daily_usage', to='tenants.tenant')),
+            ],
+            options={
+                'verbose_name': 'Tenant Daily Usage',
+                'verbose_name_plural': 'Tenant Daily Usage',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date'], name='tenants_ten_date_7607d9_idx')],
+                'constraints': [models.UniqueConstraint(fields=('tenant', 'date'), name='unique_tenant_daily_usage')],
+            },
+        ),
+    ]
@@ -9,6 +9,7 @@ Key Models:
 - Domain: Domain routing for tenants (inherits from DomainMixin)  
 - TenantInvitation: System for inviting users to join tenants
 - TenantSettings: Flexible tenant-specific configuration
+- TenantDailyUsage: Per-day usage counters maintained by the metering subsystem
 """
 
 import uuid
@@ -352,15 +353,22 @@ class Tenant(TenantMixin):
         self.save(update_fields=['feature_flags'])
     
     def get_usage_stats(self):
-        """Get current usage statistics for this tenant."""
-        # Note: This would be implemented with actual usage queries
-        # when other apps are built
+        """Get current usage statistics for this tenant (served from the metering cache)."""
+        from .usage import get_usage
+        
+        usage = get_usage(self.pk)
         return {
-            'current_users': 0,  # User.objects.filter(tenant_memberships__tenant=self).count()
-            'storage_used_mb': 0,  # Calculate from documents
-            'monthly_calls': 0,  # Calculate from calls this month
-            'monthly_sms': 0,  # Calculate from SMS this month
+            'current_users': usage['users'],
+            'storage_used_mb': round(usage['storage_bytes'] / (1024 * 1024), 2),
+            'monthly_calls': usage['calls'],
+            'monthly_sms': usage['sms'],
         }
+    
+    def check_quota(self, metric, amount=1):
+        """Check whether adding `amount` of a metered resource stays within plan limits."""
+        from .usage import check_quota
+        
+        return check_quota(self, metric, amount)
 
 
 class Domain(DomainMixin):
@@ -752,4 +760,70 @@ class TenantSettings(BaseModel):
             import json
             self.value = json.dumps(value)
         else:
-            self.value = str(value)
\ No newline at end of file
+            self.value = str(value)
+
+
+class TenantDailyUsage(TimestampedModel):
+    """
+    Compact per-day usage counters for a tenant.
+    
+    One row per tenant per day, maintained incrementally by the metering
+    subsystem in ``tenants.usage`` as events happen. ``users`` and
+    ``storage_bytes`` are gauges carried forward from the previous day;
+    ``calls`` and ``sms`` count events that happened on that day, so a
+    monthly total is a sum over at most 31 rows.
+    """
+    
+    tenant = models.ForeignKey(
+        Tenant,
+        on_delete=models.CASCADE,
+        related_name='daily_usage',
+        help_text="Tenant the usage belongs to"
+    )
+    
+    date = models.DateField(
+        help_text="Day the counters apply to (UTC)"
+    )
+    
+    users = models.IntegerField(
+        default=0,
+        help_text="Active members at the end of the day"
+    )
+    
+    storage_bytes = models.BigIntegerField(
+        default=0,
+        help_text="Document storage in use at the end of the day"
+    )
+    
+    calls = models.PositiveIntegerField(
+        default=0,
+        help_text="Calls handled during the day"
+    )
+    
+    sms = models.PositiveIntegerField(
+        default=0,
+        help_text="SMS messages sent during the day"
+    )
+    
+    reconciled_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the gauges were last corrected from source tables"
+    )
+    
+    class Meta:
+        verbose_name = "Tenant Daily Usage"
+        verbose_name_plural = "Tenant Daily Usage"
+        ordering = ['-date']
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tenant', 'date'],
+                name='unique_tenant_daily_usage'
+            )
+        ]
+    
+    def __str__(self):
+        return f"{self.tenant.name} usage on {self.date}"
@@ -0,0 +1,45 @@
+"""
+Tenants App Signals
+
+Feeds the usage metering subsystem (see usage.py) from membership events.
+"""
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.shared.accounts.models import TenantMembership
+from .usage import record_usage
+
+
+def _counts_as_user(membership):
+    return membership.is_active and not membership.is_deleted
+
+
+@receiver(pre_save, sender=TenantMembership)
+def store_original_membership_state(sender, instance, **kwargs):
+    """Remember whether the membership was counted before this save."""
+    if instance._state.adding:
+        instance._was_counted = False
+        return
+    original = TenantMembership.objects.filter(pk=instance.pk).values(
+        'is_active', 'is_deleted'
+    ).first()
+    instance._was_counted = bool(original) and original['is_active'] and not original['is_deleted']
+    if original:
+        instance._original_is_active = original['is_active']
+
+
+@receiver(post_save, sender=TenantMembership)
+def meter_membership_changes(sender, instance, created, **kwargs):
+    """Adjust the tenant's user count when a membership starts or stops counting."""
+    was_counted = getattr(instance, '_was_counted', False)
+    is_counted = _counts_as_user(instance)
+    if was_counted != is_counted:
+        record_usage(instance.tenant_id, 'users', 1 if is_counted else -1)
+
+
+@receiver(post_delete, sender=TenantMembership)
+def meter_membership_deletion(sender, instance, **kwargs):
+    """Release the user slot of a deleted membership."""
+    if _counts_as_user(instance):
+        record_usage(instance.tenant_id, 'users', -1)
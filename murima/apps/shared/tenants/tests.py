@@ -1,3 +1,41 @@
-from django.test import TestCase
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from . import usage
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class UsageQuotaTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.tenant = SimpleNamespace(
+            pk=42, max_users=3, max_storage_mb=1, max_monthly_calls=None, max_monthly_sms=10
+        )
+        patcher = mock.patch.object(usage, 'load_usage', return_value={
+            'users': 3, 'storage_bytes': 512 * 1024, 'calls': 1000, 'sms': 4,
+        })
+        self.load_usage = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_usage_is_cached_after_first_load(self):
+        usage.get_usage(self.tenant.pk)
+        usage.get_usage(self.tenant.pk)
+        self.assertEqual(self.load_usage.call_count, 1)
+
+    def test_check_quota(self):
+        self.assertFalse(usage.check_quota(self.tenant, 'users'))
+        self.assertTrue(usage.check_quota(self.tenant, 'storage_bytes', 512 * 1024))
+        self.assertFalse(usage.check_quota(self.tenant, 'storage_bytes', 512 * 1024 + 1))
+        self.assertTrue(usage.check_quota(self.tenant, 'sms', 6))
+
+    def test_unlimited_metric_is_always_allowed(self):
+        self.assertTrue(usage.check_quota(self.tenant, 'calls', 10 ** 6))
+
+    def test_enforce_quota_raises(self):
+        with self.assertRaises(usage.QuotaExceeded) as ctx:
+            usage.enforce_quota(self.tenant, 'users')
+        self.assertEqual(ctx.exception.metric, 'users')
+        self.assertEqual(ctx.exception.limit, 3)
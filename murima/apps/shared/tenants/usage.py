@@ -0,0 +1,293 @@
+"""
+Tenant Usage Metering
+
+Maintains per-tenant usage counters incrementally as events happen, instead
+of computing them with cross-schema COUNT queries on demand.
+
+Every metered event performs one UPDATE on the tenant's ``TenantDailyUsage``
+row for the day and bumps the matching cache key, so quota checks are a
+single cache lookup. A nightly reconciliation (``reconcile_tenant_usage``)
+recomputes the gauges from the source tables and corrects any drift.
+
+Metrics:
+- users: active tenant memberships (gauge)
+- storage_bytes: document bytes stored (gauge)
+- calls: calls handled this month (counter)
+- sms: SMS messages sent this month (counter)
+"""
+
+import logging
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+GAUGES = ('users', 'storage_bytes')
+COUNTERS = ('calls', 'sms')
+METRICS = GAUGES + COUNTERS
+
+# metric -> (Tenant limit field, multiplier to convert the limit into metric units)
+QUOTA_LIMITS = {
+    'users': ('max_users', 1),
+    'storage_bytes': ('max_storage_mb', 1024 * 1024),
+    'calls': ('max_monthly_calls', 1),
+    'sms': ('max_monthly_sms', 1),
+}
+
+CACHE_TIMEOUT = 60 * 60 * 24 * 2  # Two days; reconciliation refreshes nightly
+
+
+class QuotaExceeded(ValidationError):
+    """Raised when an action would push a tenant past its plan limits."""
+
+    def __init__(self, metric, limit, current, amount):
+        self.metric = metric
+        self.limit = limit
+        self.current = current
+        super().__init__(
+            f"Tenant quota exceeded for {metric}: {current} used, "
+            f"{amount} requested, limit is {limit}",
+            code='quota_exceeded'
+        )
+
+
+def _today():
+    return timezone.now().date()
+
+
+def _month_key(day):
+    return day.strftime('%Y-%m')
+
+
+def _cache_key(tenant_id, metric, day=None):
+    if metric in COUNTERS:
+        return f"tenant_usage:{tenant_id}:{metric}:{_month_key(day or _today())}"
+    return f"tenant_usage:{tenant_id}:{metric}"
+
+
+def get_current_tenant_id():
+    """Return the pk of the tenant whose schema is active, or None for the public schema."""
+    tenant = getattr(connection, 'tenant', None)
+    if tenant is None or getattr(tenant, 'schema_name', None) == 'public':
+        return None
+    return getattr(tenant, 'pk', None)
+
+
+# ---------------------------------------------------------------------------
+# Recording
+# ---------------------------------------------------------------------------
+
+def record_usage(tenant_id, metric, amount=1):
+    """
+    Record a usage event for a tenant.
+
+    The write is deferred until the surrounding transaction commits, so
+    rolled-back work is never metered.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown usage metric: {metric}")
+    if not tenant_id or not amount:
+        return
+    day = _today()
+    transaction.on_commit(lambda: _apply_usage(tenant_id, metric, amount, day))
+
+
+def record_call(tenant_id=None):
+    """Meter one call for a tenant (defaults to the active tenant schema)."""
+    record_usage(tenant_id or get_current_tenant_id(), 'calls')
+
+
+def record_sms(tenant_id=None, segments=1):
+    """Meter SMS messages for a tenant (defaults to the active tenant schema)."""
+    record_usage(tenant_id or get_current_tenant_id(), 'sms', segments)
+
+
+def _apply_usage(tenant_id, metric, amount, day):
+    from .models import TenantDailyUsage
+
+    updates = {metric: F(metric) + amount, 'updated_at': timezone.now()}
+    rows = TenantDailyUsage.objects.filter(tenant_id=tenant_id, date=day)
+    if not rows.update(**updates):
+        _open_day(tenant_id, day)
+        rows.update(**updates)
+
+    key = _cache_key(tenant_id, metric, day)
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        # Key missing or evicted: reload the whole snapshot from the table
+        cache.delete(key)
+        get_usage(tenant_id)
+
+
+def _open_day(tenant_id, day):
+    """Create the usage row for a day, carrying gauges forward from the last known day."""
+    from .models import TenantDailyUsage
+
+    previous = (
+        TenantDailyUsage.objects
+        .filter(tenant_id=tenant_id, date__lt=day)
+        .order_by('-date')
+        .values(*GAUGES)
+        .first()
+    ) or {}
+    try:
+        with transaction.atomic():
+            TenantDailyUsage.objects.create(tenant_id=tenant_id, date=day, **previous)
+    except IntegrityError:
+        # Another worker opened the day first
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Reading and quota checks
+# ---------------------------------------------------------------------------
+
+def get_usage(tenant_id):
+    """
+    Return current usage for a tenant as ``{metric: value}``.
+
+    Served from the cache; on a miss the snapshot is rebuilt from at most
+    two small queries against the daily usage table.
+    """
+    keys = {metric: _cache_key(tenant_id, metric) for metric in METRICS}
+    cached = cache.get_many(list(keys.values()))
+    if len(cached) == len(keys):
+        return {metric: cached[key] for metric, key in keys.items()}
+
+    usage = load_usage(tenant_id)
+    cache.set_many({keys[metric]: usage[metric] for metric in METRICS}, CACHE_TIMEOUT)
+    return usage
+
+
+def load_usage(tenant_id, day=None):
+    """Compute current usage for a tenant from the daily usage table."""
+    from .models import TenantDailyUsage
+
+    day = day or _today()
+    rows = TenantDailyUsage.objects.filter(tenant_id=tenant_id)
+    gauges = rows.filter(date__lte=day).order_by('-date').values(*GAUGES).first() or {}
+    counters = rows.filter(
+        date__gte=day.replace(day=1), date__lte=day
+    ).aggregate(**{metric: Sum(metric) for metric in COUNTERS})
+
+    usage = {metric: gauges.get(metric) or 0 for metric in GAUGES}
+    usage.update({metric: counters[metric] or 0 for metric in COUNTERS})
+    return usage
+
+
+def get_limit(tenant, metric):
+    """Return the limit for a metric in metric units, or None when unlimited."""
+    field, multiplier = QUOTA_LIMITS[metric]
+    limit = getattr(tenant, field)
+    if limit is None:
+        return None
+    return limit * multiplier
+
+
+def check_quota(tenant, metric, amount=1):
+    """Return True if the tenant can consume `amount` more of `metric`."""
+    limit = get_limit(tenant, metric)
+    if limit is None:
+        return True
+    return get_usage(tenant.pk)[metric] + amount <= limit
+
+
+def enforce_quota(tenant, metric, amount=1):
+    """Raise QuotaExceeded if the tenant cannot consume `amount` more of `metric`."""
+    limit = get_limit(tenant, metric)
+    if limit is None:
+        return
+    current = get_usage(tenant.pk)[metric]
+    if current + amount > limit:
+        raise QuotaExceeded(metric, limit, current, amount)
+
+
+def get_platform_usage(day=None):
+    """
+    Aggregate usage across all tenants.
+
+    Uses one DISTINCT ON query for the latest gauges and one aggregate
+    for this month's counters, regardless of the number of tenants.
+    """
+    from .models import TenantDailyUsage
+
+    day = day or _today()
+    latest = (
+        TenantDailyUsage.objects
+        .filter(date__lte=day)
+        .order_by('tenant_id', '-date')
+        .distinct('tenant_id')
+        .values(*GAUGES)
+    )
+    totals = {metric: 0 for metric in METRICS}
+    for row in latest:
+        for metric in GAUGES:
+            totals[metric] += row[metric]
+
+    counters = TenantDailyUsage.objects.filter(
+        date__gte=day.replace(day=1), date__lte=day
+    ).aggregate(**{metric: Sum(metric) for metric in COUNTERS})
+    totals.update({metric: counters[metric] or 0 for metric in COUNTERS})
+    return totals
+
+
+# ---------------------------------------------------------------------------
+# Reconciliation
+# ---------------------------------------------------------------------------
+
+def measure_tenant_usage(tenant):
+    """Compute the gauges for a tenant directly from the source tables."""
+    from django_tenants.utils import tenant_context
+    from apps.shared.accounts.models import TenantMembership
+
+    users = TenantMembership.objects.filter(
+        tenant=tenant, is_active=True, is_deleted=False
+    ).count()
+
+    with tenant_context(tenant):
+        from apps.tenant.documents.models import Document
+
+        storage_bytes = Document.objects.aggregate(total=Sum('file_size'))['total'] or 0
+
+    return {'users': users, 'storage_bytes': storage_bytes}
+
+
+def reconcile_tenant_usage(tenant, day=None):
+    """
+    Correct a tenant's gauges from the source tables and refresh its cache.
+
+    Counters (calls, SMS) have no other source of truth and are left as
+    recorded.
+
+    Returns:
+        dict of ``{metric: drift}`` for the gauges that were corrected.
+    """
+    from .models import TenantDailyUsage
+
+    day = day or _today()
+    measured = measure_tenant_usage(tenant)
+
+    with transaction.atomic():
+        _open_day(tenant.pk, day)
+        row = TenantDailyUsage.objects.select_for_update().get(tenant=tenant, date=day)
+        drift = {
+            metric: measured[metric] - getattr(row, metric)
+            for metric in GAUGES
+            if measured[metric] != getattr(row, metric)
+        }
+        for metric in GAUGES:
+            setattr(row, metric, measured[metric])
+        row.reconciled_at = timezone.now()
+        row.save(update_fields=list(GAUGES) + ['reconciled_at', 'updated_at'])
+
+    if drift:
+        logger.info("Corrected usage drift for tenant %s: %s", tenant.schema_name, drift)
+
+    cache.delete_many([_cache_key(tenant.pk, metric, day) for metric in METRICS])
+    get_usage(tenant.pk)
+    return drift
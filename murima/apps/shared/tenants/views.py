@@ -34,6 +34,7 @@ from django_filters.rest_framework import DjangoFilterBackend
 
 from django.conf import settings
 from .models import Tenant, Domain, TenantInvitation, TenantSettings
+from .usage import METRICS, get_platform_usage
 from .serializers import (
     TenantListSerializer, TenantDetailSerializer, TenantCreateSerializer,
     TenantPublicSerializer, DomainSerializer, TenantInvitationSerializer,
@@ -385,6 +386,9 @@ class PlatformTenantViewSet(ModelViewSet):
                 'max_monthly_calls': tenant.max_monthly_calls,
                 'max_monthly_sms': tenant.max_monthly_sms
             },
+            'within_limits': {
+                metric: tenant.check_quota(metric, 0) for metric in METRICS
+            },
             'domains': [
                 {
                     'domain': d.domain,
@@ -422,6 +426,7 @@ class PlatformTenantViewSet(ModelViewSet):
             'recent_signups': Tenant.objects.filter(
                 created_at__gte=timezone.now() - timedelta(days=30)
             ).count(),
+            'usage': get_platform_usage(),
         }
         
         return Response(stats)
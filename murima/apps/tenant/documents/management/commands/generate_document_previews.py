@@ -0,0 +1,51 @@
+# apps/tenant/documents/management/commands/generate_document_previews.py
+import time
+
+from django.core.management.base import BaseCommand
+from django_tenants.utils import get_public_schema_name, get_tenant_model, tenant_context
+
+from apps.tenant.documents.previews import PreviewGenerator
+
+
+class Command(BaseCommand):
+    help = 'Generate thumbnails and previews for pending documents'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schema', help='Only process this tenant schema')
+        parser.add_argument('--workers', type=int, help='Size of the rendering process pool')
+        parser.add_argument('--batch-size', type=int, help='Previews claimed per batch')
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling for new pending previews instead of exiting'
+        )
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds to sleep between polls in --loop mode')
+
+    def handle(self, *args, **options):
+        tenants = get_tenant_model().objects.exclude(schema_name=get_public_schema_name())
+        if options['schema']:
+            tenants = tenants.filter(schema_name=options['schema'])
+        else:
+            tenants = tenants.filter(is_active=True)
+
+        # One pool is shared by all tenants so the worker count stays bounded
+        with PreviewGenerator(workers=options['workers'],
+                              batch_size=options['batch_size']) as generator:
+            while True:
+                processed = 0
+                for tenant in tenants:
+                    with tenant_context(tenant):
+                        stats = generator.process_pending()
+                    processed += sum(stats.values())
+                    if any(stats.values()):
+                        self.stdout.write(
+                            f"{tenant.schema_name}: {stats['rendered']} rendered, "
+                            f"{stats['reused']} reused, {stats['failed']} failed"
+                        )
+
+                if not options['loop']:
+                    break
+                if not processed:
+                    time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS('Document preview generation complete'))
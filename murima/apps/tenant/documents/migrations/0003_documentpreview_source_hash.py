@@ -0,0 +1,27 @@
+# Generated by Django 5.2.2 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentpreview',
+            name='source_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 of the document content the preview was rendered from', max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='documentpreview',
+            name='thumbnail',
+            field=models.ImageField(blank=True, upload_to='document-previews/'),
+        ),
+        migrations.AddIndex(
+            model_name='documentpreview',
+            index=models.Index(fields=['status', 'created_at'], name='documents_d_status_a646d8_idx'),
+        ),
+    ]
@@ -127,8 +127,10 @@ class Document(BaseModel):
         """Calculate file size and hash before saving"""
         if self.file:
             self.file_size = self.file.size
-            # In production, calculate actual file hash
-            self.file_hash = str(uuid.uuid4())  
+            # Only re-hash newly uploaded content; the hash keys the preview cache
+            if not self.file_hash or not getattr(self.file, '_committed', True):
+                from .previews import compute_file_hash
+                self.file_hash = compute_file_hash(self.file)
         super().save(*args, **kwargs)
 
     def get_absolute_url(self):
@@ -219,7 +221,7 @@ class DocumentPreview(BaseModel):
         on_delete=models.CASCADE,
         related_name='preview'
     )
-    thumbnail = models.ImageField(upload_to='document-previews/')
+    thumbnail = models.ImageField(upload_to='document-previews/', blank=True)
     preview_file = models.FileField(
         upload_to='document-previews/',
         null=True,
@@ -235,9 +237,18 @@ class DocumentPreview(BaseModel):
         ],
         default='pending'
     )
+    source_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        help_text="SHA-256 of the document content the preview was rendered from"
+    )
     metadata = models.JSONField(default=dict)
 
     class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
         verbose_name = _("Document Preview")
         verbose_name_plural = _("Document Previews")
 
@@ -0,0 +1,448 @@
+"""
+Document Preview Pipeline
+
+Generates thumbnails and first-page previews for documents so clients can
+render case documents without downloading the original file.
+
+The pipeline is split in two halves:
+- Rendering (``render_preview``) is pure CPU work on a local file and runs
+  inside a bounded process pool. It never touches the database.
+- Orchestration (``PreviewGenerator``) claims pending ``DocumentPreview``
+  rows, dispatches rendering to the pool and stores the results.
+
+Rendered files are stored under a path derived from the SHA-256 of the
+source file, so identical uploads (re-uploads, copies attached to several
+cases) are rendered once and shared.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+IMAGE_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif'}
+PDF_EXTENSIONS = {'pdf'}
+TEXT_EXTENSIONS = {'txt', 'csv'}
+
+PREVIEW_ROOT = 'document-previews'
+THUMBNAIL_NAME = 'thumbnail.png'
+PREVIEW_NAME = 'preview.png'
+
+
+def get_preview_settings():
+    """Return preview pipeline settings with defaults applied."""
+    return {
+        'workers': getattr(settings, 'DOCUMENT_PREVIEW_WORKERS', 2),
+        'batch_size': getattr(settings, 'DOCUMENT_PREVIEW_BATCH_SIZE', 20),
+        'thumbnail_size': getattr(settings, 'DOCUMENT_PREVIEW_THUMBNAIL_SIZE', 256),
+        'preview_size': getattr(settings, 'DOCUMENT_PREVIEW_SIZE', 1024),
+        'text_max_lines': getattr(settings, 'DOCUMENT_PREVIEW_TEXT_LINES', 60),
+        'render_timeout': getattr(settings, 'DOCUMENT_PREVIEW_TIMEOUT', 60),
+    }
+
+
+def compute_file_hash(file_obj):
+    """
+    Compute the SHA-256 hex digest of a file-like object in chunks.
+
+    The file position is restored afterwards so the file can still be
+    saved by the storage backend.
+    """
+    digest = hashlib.sha256()
+    position = file_obj.tell() if hasattr(file_obj, 'tell') else None
+    file_obj.seek(0)
+    if hasattr(file_obj, 'chunks'):
+        for chunk in file_obj.chunks(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    else:
+        for chunk in iter(lambda: file_obj.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    file_obj.seek(position or 0)
+    return digest.hexdigest()
+
+
+def get_file_kind(filename):
+    """Map a filename to the renderer that handles it, or None if unsupported."""
+    extension = os.path.splitext(filename)[1].lower().lstrip('.')
+    if extension in IMAGE_EXTENSIONS:
+        return 'image'
+    if extension in PDF_EXTENSIONS:
+        return 'pdf'
+    if extension in TEXT_EXTENSIONS:
+        return 'text'
+    return None
+
+
+def get_preview_paths(content_hash):
+    """Return the storage paths of the thumbnail and preview for a content hash."""
+    base = f"{PREVIEW_ROOT}/{content_hash[:2]}/{content_hash}"
+    return f"{base}/{THUMBNAIL_NAME}", f"{base}/{PREVIEW_NAME}"
+
+
+# ---------------------------------------------------------------------------
+# Rendering (runs inside worker processes)
+# ---------------------------------------------------------------------------
+
+def _encode_png(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def _fit(image, size):
+    from PIL import Image
+
+    image = image.copy()
+    image.thumbnail((size, size), Image.LANCZOS)
+    return image
+
+
+def _normalize_mode(image):
+    if image.mode in ('RGBA', 'LA'):
+        return image
+    if image.mode == 'P' and 'transparency' in image.info:
+        return image.convert('RGBA')
+    return image.convert('RGB')
+
+
+def _render_image(source_path, options):
+    from PIL import Image, ImageOps
+
+    with Image.open(source_path) as image:
+        image.seek(0)  # First frame of animated GIFs
+        image = ImageOps.exif_transpose(image)
+        image = _normalize_mode(image)
+        width, height = image.size
+        return image, {'width': width, 'height': height}
+
+
+def _render_pdf(source_path, options):
+    from PIL import Image
+
+    pdftoppm = shutil.which('pdftoppm')
+    if not pdftoppm:
+        raise RuntimeError('pdftoppm is not installed; cannot render PDF previews')
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        output_prefix = os.path.join(output_dir, 'page')
+        subprocess.run(
+            [
+                pdftoppm, '-png', '-singlefile', '-f', '1', '-l', '1',
+                '-scale-to', str(options['preview_size']),
+                source_path, output_prefix,
+            ],
+            check=True,
+            capture_output=True,
+            timeout=options['render_timeout'],
+        )
+        with Image.open(f'{output_prefix}.png') as page:
+            page.load()
+            return page.convert('RGB'), {'pages_rendered': 1}
+
+
+def _render_text(source_path, options):
+    from PIL import Image, ImageDraw, ImageFont
+
+    max_lines = options['text_max_lines']
+    lines = []
+    with open(source_path, 'r', encoding='utf-8', errors='replace') as handle:
+        for line in handle:
+            lines.append(line.rstrip('\n').expandtabs(4)[:160])
+            if len(lines) >= max_lines:
+                break
+
+    font = ImageFont.load_default()
+    line_height = 14
+    margin = 16
+    width = options['preview_size']
+    height = max(margin * 2 + line_height * max(len(lines), 1), width * 4 // 3)
+
+    page = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(page)
+    for index, line in enumerate(lines):
+        draw.text((margin, margin + index * line_height), line, fill='black', font=font)
+    return page, {'lines_rendered': len(lines)}
+
+
+RENDERERS = {
+    'image': _render_image,
+    'pdf': _render_pdf,
+    'text': _render_text,
+}
+
+
+def render_preview(source_path, kind, options):
+    """
+    Render a thumbnail and a first-page preview for a local file.
+
+    Executed in a worker process, so it only takes and returns plain data.
+
+    Returns:
+        dict with ``thumbnail`` and ``preview`` PNG bytes and ``metadata``.
+    """
+    page, metadata = RENDERERS[kind](source_path, options)
+    preview = _fit(page, options['preview_size'])
+    thumbnail = _fit(page, options['thumbnail_size'])
+    metadata.update({
+        'renderer': kind,
+        'preview_size': list(preview.size),
+        'thumbnail_size': list(thumbnail.size),
+    })
+    return {
+        'thumbnail': _encode_png(thumbnail),
+        'preview': _encode_png(preview),
+        'metadata': metadata,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Orchestration (runs in the parent process)
+# ---------------------------------------------------------------------------
+
+class PreviewGenerator:
+    """
+    Claims pending previews and renders them in a bounded process pool.
+
+    Usage:
+        with PreviewGenerator(workers=4) as generator:
+            generator.process_pending()
+    """
+
+    def __init__(self, workers=None, batch_size=None):
+        self.options = get_preview_settings()
+        self.workers = workers or self.options['workers']
+        self.batch_size = batch_size or self.options['batch_size']
+        self._executor = None
+
+    def __enter__(self):
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def claim_batch(self):
+        """Atomically move a batch of pending previews to processing."""
+        from .models import DocumentPreview
+
+        with transaction.atomic():
+            previews = list(
+                DocumentPreview.objects
+                .select_for_update(skip_locked=True)
+                .select_related('document')
+                .filter(status='pending', is_deleted=False)
+                .order_by('created_at')[:self.batch_size]
+            )
+            if previews:
+                DocumentPreview.objects.filter(
+                    pk__in=[preview.pk for preview in previews]
+                ).update(status='processing', updated_at=timezone.now())
+        for preview in previews:
+            preview.status = 'processing'
+        return previews
+
+    def requeue_stale(self, older_than_minutes=30):
+        """Return previews stuck in processing (e.g. after a worker crash) to pending."""
+        from .models import DocumentPreview
+
+        cutoff = timezone.now() - timedelta(minutes=older_than_minutes)
+        return DocumentPreview.objects.filter(
+            status='processing', updated_at__lt=cutoff
+        ).update(status='pending', updated_at=timezone.now())
+
+    def process_pending(self):
+        """
+        Process pending previews until none are left.
+
+        Returns:
+            dict counting previews that were rendered, reused or failed.
+        """
+        stats = {'rendered': 0, 'reused': 0, 'failed': 0}
+        self.requeue_stale()
+        while True:
+            previews = self.claim_batch()
+            if not previews:
+                return stats
+            for outcome in self.process_batch(previews):
+                stats[outcome] += 1
+
+    def process_batch(self, previews):
+        """Render a batch of claimed previews, yielding the outcome of each."""
+        if self._executor is None:
+            raise RuntimeError('PreviewGenerator must be used as a context manager')
+
+        futures = {}
+        pending_by_hash = {}
+        temp_paths = []
+        try:
+            for preview in previews:
+                document = preview.document
+                content_hash = document.file_hash
+                kind = get_file_kind(document.file.name)
+
+                # Identical content in the same batch is rendered only once
+                if content_hash in pending_by_hash:
+                    pending_by_hash[content_hash].append(preview)
+                    continue
+
+                if kind is None:
+                    self._mark_failed(preview, f'Unsupported file type: {document.file.name}')
+                    yield 'failed'
+                    continue
+
+                if self._reuse_cached(preview, content_hash):
+                    yield 'reused'
+                    continue
+
+                try:
+                    source_path, is_temp = self._local_path(document.file)
+                except Exception as exc:
+                    self._mark_failed(preview, f'Could not read source file: {exc}')
+                    yield 'failed'
+                    continue
+                if is_temp:
+                    temp_paths.append(source_path)
+
+                future = self._executor.submit(render_preview, source_path, kind, self.options)
+                futures[future] = content_hash
+                pending_by_hash[content_hash] = [preview]
+
+            for future in as_completed(futures):
+                content_hash = futures[future]
+                first, *duplicates = pending_by_hash[content_hash]
+                try:
+                    result = future.result()
+                except Exception as exc:
+                    logger.warning('Preview rendering failed for document %s: %s',
+                                   first.document_id, exc)
+                    for preview in pending_by_hash[content_hash]:
+                        self._mark_failed(preview, str(exc))
+                        yield 'failed'
+                    continue
+                self._store_result(first, content_hash, result)
+                yield 'rendered'
+                for preview in duplicates:
+                    self._reuse_cached(preview, content_hash)
+                    yield 'reused'
+        finally:
+            for path in temp_paths:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+    def _local_path(self, field_file):
+        """Return a filesystem path for a stored file, copying it locally if needed."""
+        try:
+            return field_file.path, False
+        except NotImplementedError:
+            pass
+
+        suffix = os.path.splitext(field_file.name)[1]
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'wb') as output:
+            field_file.open('rb')
+            try:
+                for chunk in field_file.chunks(HASH_CHUNK_SIZE):
+                    output.write(chunk)
+            finally:
+                field_file.close()
+        return path, True
+
+    def _reuse_cached(self, preview, content_hash):
+        """Point the preview at already rendered files for the same content, if any."""
+        from .models import DocumentPreview
+
+        if not content_hash:
+            return False
+
+        cached = (
+            DocumentPreview.objects
+            .filter(source_hash=content_hash, status='ready')
+            .exclude(pk=preview.pk)
+            .values('thumbnail', 'preview_file', 'metadata')
+            .first()
+        )
+        if cached is None:
+            thumbnail_path, preview_path = get_preview_paths(content_hash)
+            storage = preview.thumbnail.storage
+            if not (storage.exists(thumbnail_path) and storage.exists(preview_path)):
+                return False
+            cached = {'thumbnail': thumbnail_path, 'preview_file': preview_path, 'metadata': {}}
+
+        preview.thumbnail.name = cached['thumbnail']
+        preview.preview_file.name = cached['preview_file']
+        preview.source_hash = content_hash
+        preview.metadata = {**cached['metadata'], 'cache_hit': True}
+        preview.status = 'ready'
+        preview.save(update_fields=[
+            'thumbnail', 'preview_file', 'source_hash', 'metadata', 'status', 'updated_at'
+        ])
+        return True
+
+    def _store_result(self, preview, content_hash, result):
+        thumbnail_path, preview_path = get_preview_paths(content_hash)
+        storage = preview.thumbnail.storage
+        for path in (thumbnail_path, preview_path):
+            if storage.exists(path):
+                storage.delete(path)
+        preview.thumbnail.name = storage.save(thumbnail_path, ContentFile(result['thumbnail']))
+        preview.preview_file.name = storage.save(preview_path, ContentFile(result['preview']))
+        preview.source_hash = content_hash
+        preview.metadata = {**result['metadata'], 'generated_at': timezone.now().isoformat()}
+        preview.status = 'ready'
+        preview.save(update_fields=[
+            'thumbnail', 'preview_file', 'source_hash', 'metadata', 'status', 'updated_at'
+        ])
+
+    def _mark_failed(self, preview, error):
+        preview.status = 'failed'
+        preview.metadata = {**preview.metadata, 'error': error[:500]}
+        preview.save(update_fields=['status', 'metadata', 'updated_at'])
+
+
+def request_preview(document):
+    """
+    Queue preview generation for a document.
+
+    Creates the preview row in ``pending`` state, or resets an existing one
+    when the document content has changed since it was rendered.
+    """
+    from .models import DocumentPreview
+
+    preview = DocumentPreview.objects.filter(document=document).first()
+    if preview is None:
+        return DocumentPreview.objects.create(
+            document=document,
+            created_by=document.created_by,
+            source_hash=document.file_hash,
+            status='pending',
+        )
+
+    if preview.source_hash == document.file_hash and preview.status in ('pending', 'processing', 'ready'):
+        return preview
+
+    preview.source_hash = document.file_hash
+    preview.status = 'pending'
+    preview.metadata = {}
+    preview.save(update_fields=['source_hash', 'status', 'metadata', 'updated_at'])
+    return preview
@@ -1,4 +1,7 @@
+from django.db import connection
 from rest_framework import serializers
+
+from apps.shared.tenants.usage import QuotaExceeded, enforce_quota
 from .models import (
     DocumentType, Document, DocumentVersion,
     DocumentAccessLog, DocumentShareLink,
@@ -17,6 +20,16 @@ class DocumentSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ('file_size', 'file_hash', 'version')
 
+    def validate_file(self, value):
+        """Reject uploads that would push the tenant past its storage quota."""
+        tenant = getattr(connection, 'tenant', None)
+        if tenant is not None and getattr(tenant, 'pk', None) and hasattr(tenant, 'max_storage_mb'):
+            try:
+                enforce_quota(tenant, 'storage_bytes', value.size)
+            except QuotaExceeded as exc:
+                raise serializers.ValidationError(exc.messages)
+        return value
+
 
 class DocumentVersionSerializer(serializers.ModelSerializer):
     class Meta:
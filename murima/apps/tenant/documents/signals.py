@@ -0,0 +1,35 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.shared.tenants.usage import get_current_tenant_id, record_usage
+from .models import Document
+from .previews import request_preview
+
+
+@receiver(pre_save, sender=Document)
+def document_pre_save(sender, instance, **kwargs):
+    """Work out how many storage bytes a new or replaced upload adds."""
+    instance._storage_delta = 0
+    if instance.file and not getattr(instance.file, '_committed', True):
+        previous_size = 0
+        if not instance._state.adding:
+            previous_size = Document.objects.filter(pk=instance.pk).values_list(
+                'file_size', flat=True
+            ).first() or 0
+        instance._storage_delta = instance.file_size - previous_size
+
+
+@receiver(post_save, sender=Document)
+def document_post_save(sender, instance, created, **kwargs):
+    """Meter storage and queue a preview whenever a document's content changes."""
+    if instance._storage_delta:
+        record_usage(get_current_tenant_id(), 'storage_bytes', instance._storage_delta)
+    if instance.file and instance.file_hash:
+        request_preview(instance)
+
+
+@receiver(post_delete, sender=Document)
+def document_post_delete(sender, instance, **kwargs):
+    """Release the storage held by a deleted document."""
+    if instance.file_size:
+        record_usage(get_current_tenant_id(), 'storage_bytes', -instance.file_size)
@@ -1,3 +1,117 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.base import ContentFile
+from django.test import RequestFactory, SimpleTestCase
+
+from .models import DocumentPreview
+from .previews import compute_file_hash, get_file_kind, get_preview_settings, render_preview
+from .views import DocumentViewSet, parse_range_header, serve_preview_file
+
+
+class ParseRangeHeaderTestCase(SimpleTestCase):
+    def test_missing_or_malformed_header_serves_whole_file(self):
+        self.assertIsNone(parse_range_header(None, 100))
+        self.assertIsNone(parse_range_header('items=0-10', 100))
+        self.assertIsNone(parse_range_header('bytes=-', 100))
+
+    def test_explicit_range(self):
+        self.assertEqual(parse_range_header('bytes=0-9', 100), (0, 9))
+        self.assertEqual(parse_range_header('bytes=90-', 100), (90, 99))
+        self.assertEqual(parse_range_header('bytes=50-500', 100), (50, 99))
+
+    def test_suffix_range(self):
+        self.assertEqual(parse_range_header('bytes=-10', 100), (90, 99))
+        self.assertEqual(parse_range_header('bytes=-500', 100), (0, 99))
+
+    def test_unsatisfiable_range(self):
+        self.assertIs(parse_range_header('bytes=100-', 100), False)
+        self.assertIs(parse_range_header('bytes=20-10', 100), False)
+
+
+class RenderPreviewTestCase(SimpleTestCase):
+    def setUp(self):
+        self.options = get_preview_settings()
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _write(self, name, data):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'wb') as handle:
+            handle.write(data)
+        return path
+
+    def test_image_preview_is_bounded(self):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (3000, 1500), 'red').save(buffer, format='JPEG')
+        path = self._write('photo.jpg', buffer.getvalue())
+
+        result = render_preview(path, get_file_kind(path), self.options)
+
+        thumbnail = Image.open(io.BytesIO(result['thumbnail']))
+        self.assertEqual(thumbnail.size, (256, 128))
+        self.assertEqual(result['metadata']['width'], 3000)
+
+    def test_text_preview(self):
+        path = self._write('notes.txt', b'first line\nsecond line\n')
+
+        result = render_preview(path, get_file_kind(path), self.options)
+
+        self.assertEqual(result['metadata']['lines_rendered'], 2)
+        self.assertTrue(result['preview'].startswith(b'\x89PNG'))
+
+    def test_unsupported_extension(self):
+        self.assertIsNone(get_file_kind('report.docx'))
+
+    def test_content_hash_is_stable(self):
+        first = compute_file_hash(io.BytesIO(b'case document'))
+        second = compute_file_hash(io.BytesIO(b'case document'))
+        self.assertEqual(first, second)
+        self.assertEqual(len(first), 64)
+
+
+class ServePreviewTestCase(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_preview_must_be_revalidated(self):
+        response = serve_preview_file(
+            self.factory.get('/'), ContentFile(b'\x89PNG preview', name='preview.png'), etag='abc-thumbnail'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        self.assertEqual(response['ETag'], '"abc-thumbnail"')
+
+    def test_matching_etag_is_not_modified(self):
+        request = self.factory.get('/', HTTP_IF_NONE_MATCH='"abc-thumbnail"')
+
+        response = serve_preview_file(request, ContentFile(b'png', name='preview.png'), etag='abc-thumbnail')
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+    def _preview_response(self, preview):
+        view = DocumentViewSet()
+        with mock.patch.object(view, 'get_object'), \
+                mock.patch.object(DocumentPreview.objects, 'filter') as previews:
+            previews.return_value.first.return_value = preview
+            return view._serve_preview(self.factory.get('/'), 'thumbnail')
+
+    def test_pending_preview_is_accepted(self):
+        response = self._preview_response(DocumentPreview(status='processing'))
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data, {'status': 'processing'})
+
+    def test_failed_preview_is_terminal(self):
+        response = self._preview_response(DocumentPreview(status='failed'))
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.data, {'status': 'failed'})
@@ -1,3 +1,7 @@
+import re
+
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import quote_etag
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
@@ -13,6 +17,110 @@ from .serializers import (
     DocumentTemplateSerializer
 )
 
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_CHUNK_SIZE = 64 * 1024
+PREVIEW_CACHE_CONTROL = 'private, no-cache'
+
+
+def parse_range_header(header, size):
+    """
+    Parse a single-range ``Range`` header.
+
+    Returns:
+        (start, end) inclusive byte offsets, None when the header is absent
+        or malformed (serve the whole file), or False when the range cannot
+        be satisfied.
+    """
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+
+    start, end = match.groups()
+    if start == '' and end == '':
+        return None
+    if start == '':
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = int(end) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, min(end, size - 1)
+
+
+def _iter_file_range(field_file, start, length):
+    field_file.open('rb')
+    try:
+        field_file.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = field_file.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        field_file.close()
+
+
+def serve_preview_file(request, field_file, etag, content_type='image/png'):
+    """
+    Serve a stored preview file with ETag revalidation and byte-range support.
+
+    Preview URLs are per document, not per content, so a re-rendered preview
+    is served from the same URL. Clients may keep a copy but must revalidate
+    it; the ETag (derived from the source hash) turns that into a 304 while
+    the document is unchanged.
+    """
+    if not field_file:
+        return HttpResponse(status=status.HTTP_404_NOT_FOUND)
+
+    etag = quote_etag(etag)
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+    if etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+        response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        response['ETag'] = etag
+        response['Cache-Control'] = PREVIEW_CACHE_CONTROL
+        return response
+
+    size = field_file.size
+    byte_range = parse_range_header(request.META.get('HTTP_RANGE'), size)
+
+    # Ranges only apply when If-Range (if sent) still matches the current ETag
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if byte_range and if_range and if_range.strip() != etag:
+        byte_range = None
+
+    if byte_range is False:
+        response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range is None:
+        response = FileResponse(field_file.open('rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            _iter_file_range(field_file, start, length),
+            status=status.HTTP_206_PARTIAL_CONTENT,
+            content_type=content_type,
+        )
+        response['Content-Length'] = str(length)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+
+    response['ETag'] = etag
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = PREVIEW_CACHE_CONTROL
+    return response
+
+
 class DocumentTypeViewSet(viewsets.ModelViewSet):
     queryset = DocumentType.objects.all()
     serializer_class = DocumentTypeSerializer
@@ -31,6 +139,34 @@ class DocumentViewSet(viewsets.ModelViewSet):
         serializer = DocumentVersionSerializer(versions, many=True)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'])
+    def thumbnail(self, request, pk=None):
+        return self._serve_preview(request, 'thumbnail')
+
+    @action(detail=True, methods=['get'], url_path='preview-image')
+    def preview_image(self, request, pk=None):
+        return self._serve_preview(request, 'preview_file')
+
+    def _serve_preview(self, request, field_name):
+        document = self.get_object()
+        preview = DocumentPreview.objects.filter(document=document).first()
+        if preview is not None and preview.status == 'failed':
+            # Terminal: polling again will not produce a preview
+            return Response(
+                {'status': 'failed'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        if preview is None or preview.status != 'ready':
+            return Response(
+                {'status': preview.status if preview else 'pending'},
+                status=status.HTTP_202_ACCEPTED
+            )
+        return serve_preview_file(
+            request,
+            getattr(preview, field_name),
+            etag=f'{preview.source_hash}-{field_name}'
+        )
+
 
 class DocumentVersionViewSet(viewsets.ModelViewSet):
     queryset = DocumentVersion.objects.all()
@@ -55,6 +191,20 @@ class DocumentPreviewViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = DocumentPreviewSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @action(detail=True, methods=['get'], url_path='thumbnail')
+    def thumbnail_file(self, request, pk=None):
+        preview = self.get_object()
+        return serve_preview_file(
+            request, preview.thumbnail, etag=f'{preview.source_hash}-thumbnail'
+        )
+
+    @action(detail=True, methods=['get'], url_path='image')
+    def preview_image(self, request, pk=None):
+        preview = self.get_object()
+        return serve_preview_file(
+            request, preview.preview_file, etag=f'{preview.source_hash}-preview_file'
+        )
+
 
 class DocumentTemplateViewSet(viewsets.ModelViewSet):
     queryset = DocumentTemplate.objects.all()
@@ -181,4 +181,30 @@ CSRF_COOKIE_SECURE = False  # Set to True in production with HTTPS
 
 # Email configuration (base settings)
 # EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
-# DEFAULT_FROM_EMAIL = 'noreply@murima.com'
\ No newline at end of file
+# DEFAULT_FROM_EMAIL = 'noreply@murima.com'
+
+# Login lockout and session store (see apps.shared.accounts.session_store)
+ACCOUNT_LOCKOUT_THRESHOLD = 5
+ACCOUNT_LOCKOUT_MINUTES = 30
+LOGIN_FAILURE_WINDOW_SECONDS = 15 * 60
+LOGIN_IP_FAILURE_THRESHOLD = config('LOGIN_IP_FAILURE_THRESHOLD', default=50, cast=int)
+SESSION_ACTIVITY_FLUSH_SECONDS = 5 * 60
+# Reverse proxies in front of the app that append to X-Forwarded-For;
+# 0 means client addresses come from REMOTE_ADDR only
+TRUSTED_PROXY_COUNT = config('TRUSTED_PROXY_COUNT', default=0, cast=int)
+
+# OTP delivery (see apps.shared.accounts.otp_delivery)
+OTP_DELIVERY_WORKERS = config('OTP_DELIVERY_WORKERS', default=4, cast=int)
+OTP_DELIVERY_MAX_ATTEMPTS = 3
+OTP_DELIVERY_BACKOFF_SECONDS = 0.5
+OTP_DELIVERY_PROVIDERS = {
+    'email': 'apps.shared.accounts.otp_delivery.EmailOTPProvider',
+    'sms': config('OTP_SMS_PROVIDER', default='apps.shared.accounts.otp_delivery.ConsoleOTPProvider'),
+    'whatsapp': config('OTP_WHATSAPP_PROVIDER', default='apps.shared.accounts.otp_delivery.ConsoleOTPProvider'),
+}
+
+# Document preview pipeline
+DOCUMENT_PREVIEW_WORKERS = config('DOCUMENT_PREVIEW_WORKERS', default=2, cast=int)
+DOCUMENT_PREVIEW_BATCH_SIZE = 20
+DOCUMENT_PREVIEW_THUMBNAIL_SIZE = 256
+DOCUMENT_PREVIEW_SIZE = 1024